@@ -0,0 +1,75 @@
+"""
+Download Engine Benchmark
+Downloads an HLS video from a local fixture whose segments arrive with
+per-request latency and a per-connection bandwidth cap, as from a CDN edge,
+and compares throughput for different concurrent fragment counts.
+
+Usage:
+    python benchmarks/bench_download_engine.py [--segments 40] [--segment-kb 256]
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import hls_handler, serve  # noqa: E402
+from download_engine import DownloadEngine  # noqa: E402
+from ydl_pool import YoutubeDLPool  # noqa: E402
+
+
+def download(engine: DownloadEngine, url: str, download_dir: str) -> float:
+    """Seconds to download the video once with the given engine settings."""
+    pool = YoutubeDLPool(
+        {
+            'outtmpl': f'{download_dir}/%(id)s.%(ext)s',
+            'quiet': True, 'no_warnings': True, 'noprogress': True,
+        },
+        platform_params=engine.params
+    )
+    try:
+        start = time.perf_counter()
+        with pool.session('generic') as ydl:
+            ydl.extract_info(url, download=True)
+        return time.perf_counter() - start
+    finally:
+        pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--segments', type=int, default=40, help='Segments in the HLS playlist')
+    parser.add_argument('--segment-kb', type=int, default=256, help='Size of each segment')
+    parser.add_argument('--bandwidth-mbps', type=float, default=20, help='Bandwidth cap per connection')
+    parser.add_argument('--latency-ms', type=float, default=30, help='Delay before each segment response')
+    parser.add_argument('--fragments', type=str, default='1,2,4,8,16', help='Concurrent fragment counts to compare')
+    args = parser.parse_args()
+    
+    handler = hls_handler(
+        args.segments,
+        args.segment_kb * 1024,
+        bytes_per_second=args.bandwidth_mbps * 1e6 / 8,
+        latency=args.latency_ms / 1000
+    )
+    total_mb = args.segments * args.segment_kb / 1024
+    
+    with serve(handler) as (_, base_url):
+        print(f"{'fragments':>9} {'seconds':>8} {'MB/s':>7} {'speedup':>8}")
+        baseline = None
+        for n, fragments in enumerate(int(f) for f in args.fragments.split(',')):
+            download_dir = tempfile.mkdtemp(prefix='bench_engine_')
+            try:
+                engine = DownloadEngine(concurrent_fragments=fragments)
+                elapsed = download(engine, f'{base_url}/hls/{n}/index.m3u8', download_dir)
+            finally:
+                shutil.rmtree(download_dir, ignore_errors=True)
+            baseline = baseline or elapsed
+            print(f"{fragments:>9} {elapsed:8.2f} {total_mb / elapsed:7.1f} {baseline / elapsed:7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Metrics Overhead Benchmark
+Measures what instrumentation adds to the hot path: the cost of the metric
+updates one delivered video records (metadata, download and upload timers,
+cache and byte counters), the cost of rendering /metrics, and a scrape over
+HTTP from the local metrics server.
+
+Usage:
+    python benchmarks/bench_metrics.py [--requests 200000] [--repeat 5]
+"""
+
+import sys
+import time
+import timeit
+import asyncio
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from metrics import BotMetrics, MetricsServer  # noqa: E402
+
+
+PLATFORMS = ('youtube', 'facebook', 'twitter', 'instagram', 'tiktok')
+
+
+def instrumented_request(metrics: BotMetrics, platform: str) -> None:
+    """Every metric update recorded for one video sent as a file."""
+    with metrics.stage('end_to_end', platform):
+        with metrics.stage('metadata', platform):
+            pass
+        metrics.cache('metadata', False)
+        metrics.cache('file_id', False)
+        with metrics.stage('download', platform):
+            pass
+        metrics.cache('download', False)
+        metrics.transferred('download', platform, 12_345_678)
+        with metrics.stage('upload', platform):
+            pass
+        metrics.transferred('upload', platform, 12_345_678)
+
+
+def bare_request(metrics: BotMetrics, platform: str) -> None:
+    """The same request shape without instrumentation."""
+
+
+async def scrape(metrics: BotMetrics, count: int) -> float:
+    """Average seconds per HTTP scrape of /metrics."""
+    server = MetricsServer(metrics.render, port=0)
+    await server.start()
+    try:
+        start = time.perf_counter()
+        for _ in range(count):
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            writer.write(b'GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n')
+            await writer.drain()
+            await reader.read()
+            writer.close()
+        return (time.perf_counter() - start) / count
+    finally:
+        await server.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200000, help='Simulated requests per timing run')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+    parser.add_argument('--scrapes', type=int, default=200, help='HTTP scrapes of /metrics')
+    args = parser.parse_args()
+    
+    metrics = BotMetrics()
+    results = {}
+    for name, request in (('bare', bare_request), ('instrumented', instrumented_request)):
+        def run():
+            for n in range(args.requests):
+                request(metrics, PLATFORMS[n % len(PLATFORMS)])
+        results[name] = min(timeit.repeat(run, number=1, repeat=args.repeat)) / args.requests
+        print(f"{name:<14} {results[name] * 1e6:8.2f} us/request")
+    
+    overhead = results['instrumented'] - results['bare']
+    # A delivery makes at least one Bot API round trip, typically ~100 ms
+    print(f"{'overhead':<14} {overhead * 1e6:8.2f} us/request "
+          f"({overhead / 0.1:.3%} of a 100 ms Bot API call)")
+    
+    body = metrics.render()
+    render = min(timeit.repeat(metrics.render, number=100, repeat=args.repeat)) / 100
+    print(f"{'render':<14} {render * 1e3:8.2f} ms for {body.count(chr(10))} lines")
+    print(f"{'http scrape':<14} {asyncio.run(scrape(metrics, args.scrapes)) * 1e3:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Streaming Upload Benchmark
+Compares the disk path (download to download_dir, reopen, upload) with the
+streaming path (pipe the source straight into sendVideo) on local fixture
+servers. Reports end-to-end latency and peak disk usage.
+
+Usage:
+    python benchmarks/bench_streaming_upload.py [--size-mb 64] [--source-mbps 400] [--upload-mbps 400]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+import tempfile
+import threading
+from pathlib import Path
+
+import httpx
+from telegram import Bot
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import bot_api_handler, media_handler, serve  # noqa: E402
+from stream_upload import StreamingUploader  # noqa: E402
+
+
+class DiskSampler:
+    """Samples the total size of a directory in a background thread."""
+    
+    def __init__(self, directory: str, interval: float = 0.002):
+        self.directory = directory
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+    
+    def __enter__(self):
+        self._thread.start()
+        return self
+    
+    def __exit__(self, *args):
+        self._stop.set()
+        self._thread.join()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            total = 0
+            for entry in os.scandir(self.directory):
+                try:
+                    total += entry.stat().st_size
+                except OSError:
+                    pass
+            self.peak = max(self.peak, total)
+            time.sleep(self.interval)
+
+
+async def disk_path(source_url: str, api_url: str, download_dir: str) -> None:
+    """Current path: write the whole file to disk, then upload it with the bot."""
+    file_path = os.path.join(download_dir, 'video.mp4')
+    async with httpx.AsyncClient(timeout=None) as client:
+        async with client.stream('GET', source_url) as response:
+            with open(file_path, 'wb') as f:
+                async for chunk in response.aiter_bytes(256 * 1024):
+                    f.write(chunk)
+    
+    bot = Bot('TOKEN', base_url=f"{api_url}/bot")
+    async with bot:
+        with open(file_path, 'rb') as video_file:
+            await bot.send_video(chat_id=1, video=video_file, write_timeout=None, read_timeout=None)
+    os.remove(file_path)
+
+
+async def streaming_path(source_url: str, api_url: str) -> None:
+    """Streaming path: forward source chunks into the upload request."""
+    uploader = StreamingUploader(timeout=None)
+    stream = {'url': source_url, 'ext': 'mp4', 'protocol': 'http'}
+    bot = Bot('TOKEN', base_url=f"{api_url}/bot")
+    try:
+        async with bot:
+            await uploader.send_video(bot, 1, stream, caption='bench')
+    finally:
+        await uploader.close()
+
+
+def measure(name: str, download_dir: str, run) -> None:
+    """Run one variant and print its latency and peak disk usage."""
+    with DiskSampler(download_dir) as sampler:
+        start = time.perf_counter()
+        asyncio.run(run())
+        elapsed = time.perf_counter() - start
+    print(f"{name:<10} latency {elapsed:7.3f} s   peak disk {sampler.peak / 1024 / 1024:8.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size-mb', type=int, default=64, help='Video size in MB')
+    parser.add_argument('--source-mbps', type=float, default=400, help='Media server bandwidth in MB/s (0 = unlimited)')
+    parser.add_argument('--upload-mbps', type=float, default=400, help='Bot API read bandwidth in MB/s (0 = unlimited)')
+    args = parser.parse_args()
+    
+    video = os.urandom(args.size_mb * 1024 * 1024)
+    mb = 1024 * 1024
+    
+    with serve(media_handler({'/video.mp4': video}, args.source_mbps * mb)) as (_, media_url), \
+            serve(bot_api_handler(args.upload_mbps * mb)) as (_, api_url), \
+            tempfile.TemporaryDirectory() as download_dir:
+        source_url = f"{media_url}/video.mp4"
+        print(f"{args.size_mb} MB video, source {args.source_mbps} MB/s, upload {args.upload_mbps} MB/s")
+        measure('disk', download_dir, lambda: disk_path(source_url, api_url, download_dir))
+        measure('streaming', download_dir, lambda: streaming_path(source_url, api_url))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Telegram Request Benchmark
+Runs text replies and video uploads at the same time against a local stub
+Bot API and compares connection setups: one small shared pool, PTB's default
+shared pool, and separate pools for uploads and ordinary calls. Reports text
+calls per second, their p95 latency and pool timeouts as concurrency grows.
+
+Usage:
+    python benchmarks/bench_telegram_requests.py [--concurrency 1,8,32,128] [--uploads 16] [--seconds 5]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+import statistics
+from pathlib import Path
+
+from telegram import Bot
+from telegram.error import TimedOut
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import bot_api_handler, serve  # noqa: E402
+from telegram_request import RoutingRequest, make_request  # noqa: E402
+
+TIMEOUTS = {'read_timeout': 10.0, 'write_timeout': 60.0, 'connect_timeout': 10.0, 'pool_timeout': 5.0}
+
+
+def setups() -> dict:
+    """Request factories for each compared setup."""
+    return {
+        'shared pool of 8': lambda: make_request(8, **TIMEOUTS),
+        'shared pool of 256': lambda: make_request(256, **TIMEOUTS),
+        'routed 128 + 8 uploads': lambda: RoutingRequest(
+            make_request(128, **TIMEOUTS),
+            make_request(8, **dict(TIMEOUTS, pool_timeout=600.0))
+        ),
+    }
+
+
+async def text_sender(bot: Bot, deadline: float, latencies: list, errors: list) -> None:
+    """Send messages back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        began = time.perf_counter()
+        try:
+            await bot.send_message(chat_id=1, text='progress')
+            latencies.append(time.perf_counter() - began)
+        except TimedOut:
+            errors.append(1)
+
+
+async def uploader(bot: Bot, deadline: float, video: bytes, done: list, errors: list) -> None:
+    """Upload videos back to back until the deadline."""
+    while time.perf_counter() < deadline:
+        try:
+            await bot.send_video(chat_id=1, video=video)
+            done.append(1)
+        except TimedOut:
+            errors.append(1)
+
+
+async def run(api_url: str, request, concurrency: int, uploads: int, video: bytes, seconds: float) -> dict:
+    """Run one setup at one concurrency level."""
+    bot = Bot('TOKEN', base_url=f"{api_url}/bot", request=request)
+    latencies, text_errors, uploaded, upload_errors = [], [], [], []
+    async with bot:
+        deadline = time.perf_counter() + seconds
+        start = time.perf_counter()
+        await asyncio.gather(
+            *[text_sender(bot, deadline, latencies, text_errors) for _ in range(concurrency)],
+            *[uploader(bot, deadline, video, uploaded, upload_errors) for _ in range(uploads)]
+        )
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'calls_per_second': len(latencies) / elapsed,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] if latencies else float('nan'),
+        'median': statistics.median(latencies) if latencies else float('nan'),
+        'timeouts': len(text_errors) + len(upload_errors),
+        'uploads': len(uploaded),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', default='1,8,32,128', help='Concurrent text senders per run')
+    parser.add_argument('--uploads', type=int, default=16, help='Concurrent video uploads per run')
+    parser.add_argument('--size-mb', type=float, default=2, help='Size of each uploaded video')
+    parser.add_argument('--upload-mbps', type=float, default=4, help='Upload speed per connection in MB/s')
+    parser.add_argument('--latency-ms', type=float, default=20, help='Stub Bot API response latency')
+    parser.add_argument('--seconds', type=float, default=5, help='Duration of each run')
+    args = parser.parse_args()
+    
+    video = b'\0' * int(args.size_mb * 1024 * 1024)
+    handler = bot_api_handler(args.upload_mbps * 1024 * 1024, latency=args.latency_ms / 1000)
+    print(f"{args.uploads} uploads of {args.size_mb:g} MB at {args.upload_mbps:g} MB/s each, "
+          f"{args.latency_ms:g} ms API latency, {args.seconds:g} s per run")
+    print(f"{'setup':<24}{'senders':>8}{'text/s':>10}{'median':>10}{'p95':>10}{'uploads':>9}{'timeouts':>10}")
+    with serve(handler) as (_, api_url):
+        for concurrency in [int(value) for value in args.concurrency.split(',')]:
+            for name, factory in setups().items():
+                result = asyncio.run(run(api_url, factory(), concurrency, args.uploads, video, args.seconds))
+                print(f"{name:<24}{concurrency:>8}{result['calls_per_second']:>10.1f}"
+                      f"{result['median'] * 1000:>8.0f}ms{result['p95'] * 1000:>8.0f}ms"
+                      f"{result['uploads']:>9}{result['timeouts']:>10}")
+
+
+if __name__ == '__main__':
+    main()
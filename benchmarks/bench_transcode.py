@@ -0,0 +1,107 @@
+"""
+Transcode Benchmark
+Generates local sample clips with ffmpeg and runs them through the
+transcoder: remuxing a Matroska clip against re-encoding it, and fitting a
+batch of oversized clips with different numbers of worker processes.
+Reports wall time, output size against the limit and clips per minute.
+
+Usage:
+    python benchmarks/bench_transcode.py [--seconds 20] [--clips 4] [--limit-mb 2] [--workers 1,2,4]
+"""
+
+import os
+import sys
+import time
+import shutil
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from download_cache import DownloadCache  # noqa: E402
+from transcoder import Transcoder, fit_file  # noqa: E402
+
+
+def make_clip(path: Path, seconds: int, bitrate: str, container_args: list) -> str:
+    """Encode a synthetic 720p clip with a tone."""
+    subprocess.run(
+        ['ffmpeg', '-v', 'error', '-y',
+         '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+         '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+         '-c:v', 'libx264', '-preset', 'ultrafast', '-b:v', bitrate, *container_args, str(path)],
+        check=True
+    )
+    return str(path)
+
+
+def settings(preset: str) -> dict:
+    return {'ffmpeg': 'ffmpeg', 'ffprobe': 'ffprobe', 'preset': preset, 'threads': 0, 'audio_bitrate': 96_000}
+
+
+async def fit_batch(sources: list, limit: int, workers: int, preset: str, cache_dir: str) -> float:
+    """Fit every clip through one Transcoder; returns wall time."""
+    cache = DownloadCache(cache_dir)
+    for n, source in enumerate(sources):
+        cache.put(f'bench:{n}:default', source)
+    stage = Transcoder(cache, limit, workers=workers, preset=preset)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*[stage.fit(source, f'bench:{n}:default') for n, source in enumerate(sources)])
+        elapsed = time.perf_counter() - start
+    finally:
+        stage.shutdown()
+    failed = [result['error'] for result in results if not result['success']]
+    if failed:
+        raise SystemExit(f"Transcoding failed: {failed[0]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--seconds', type=int, default=20, help='Length of each sample clip')
+    parser.add_argument('--clips', type=int, default=4, help='Oversized clips fitted per batch')
+    parser.add_argument('--limit-mb', type=float, default=2, help='Upload limit the clips are fitted to')
+    parser.add_argument('--workers', default='1,2,4', help='Worker process counts to compare')
+    parser.add_argument('--preset', default=Transcoder.DEFAULT_PRESET, help='x264 preset')
+    args = parser.parse_args()
+    
+    if not Transcoder.available():
+        raise SystemExit("ffmpeg and ffprobe are required for this benchmark")
+    
+    limit = int(args.limit_mb * 1024 * 1024)
+    work_dir = Path(tempfile.mkdtemp(prefix='bench_transcode_'))
+    try:
+        print(f"Generating {args.seconds} s sample clips at 4 Mbit/s in {work_dir}")
+        mkv = make_clip(work_dir / 'sample.mkv', args.seconds, '4M', ['-c:a', 'aac'])
+        size = os.path.getsize(mkv)
+        
+        print(f"\n{'path':<28} {'seconds':>8} {'output MB':>10}")
+        for name, max_bytes in (('remux (container only)', size * 2), ('re-encode (oversized)', limit)):
+            target = str(work_dir / f'out-{max_bytes}.mp4')
+            start = time.perf_counter()
+            outcome = fit_file(mkv, target, max_bytes, settings(args.preset))
+            elapsed = time.perf_counter() - start
+            print(f"{name:<28} {elapsed:8.2f} {outcome['size'] / 1024 / 1024:10.2f}  ({outcome['action']})")
+        
+        print(f"\nFitting {args.clips} clips of {size / 1024 / 1024:.1f} MB to {args.limit_mb:g} MB "
+              f"on {os.cpu_count()} CPUs")
+        print(f"{'workers':>7} {'seconds':>8} {'clips/min':>10}")
+        for workers in [int(value) for value in args.workers.split(',')]:
+            batch_dir = work_dir / f'batch-{workers}'
+            batch_dir.mkdir()
+            sources = []
+            for n in range(args.clips):
+                source = batch_dir / f'clip{n}.mkv'
+                shutil.copyfile(mkv, source)
+                sources.append(str(source))
+            elapsed = asyncio.run(fit_batch(sources, limit, workers, args.preset, str(batch_dir)))
+            print(f"{workers:>7} {elapsed:8.2f} {args.clips * 60 / elapsed:10.1f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+URL Handler Benchmark
+Compares URL extraction throughput of the precompiled single-pass classifier
+with the previous implementation (two findall scans followed by uncompiled
+re.match calls per candidate) over a corpus of mixed messages.
+
+Usage:
+    python benchmarks/bench_url_handler.py [--messages 20000] [--repeat 5]
+"""
+
+import re
+import sys
+import random
+import timeit
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from url_handler import URLHandler  # noqa: E402
+
+
+class LegacyURLHandler:
+    """The previous URLHandler.extract_urls, kept for comparison."""
+    
+    SUPPORTED_PLATFORMS = {
+        'youtube': [
+            r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
+            r'(?:https?://)?(?:www\.)?youtu\.be/[\w-]+',
+            r'(?:https?://)?(?:www\.)?youtube\.com/shorts/[\w-]+',
+        ],
+        'facebook': [
+            r'(?:https?://)?(?:www\.)?facebook\.com/.*?/videos/\d+',
+            r'(?:https?://)?(?:www\.)?fb\.watch/[\w-]+',
+        ],
+        'twitter': [
+            r'(?:https?://)?(?:www\.)?twitter\.com/\w+/status/\d+',
+            r'(?:https?://)?(?:www\.)?x\.com/\w+/status/\d+',
+        ],
+        'instagram': [
+            r'(?:https?://)?(?:www\.)?instagram\.com/p/[\w-]+',
+            r'(?:https?://)?(?:www\.)?instagram\.com/reel/[\w-]+',
+        ],
+        'tiktok': [
+            r'(?:https?://)?(?:www\.)?tiktok\.com/@[\w.-]+/video/\d+',
+            r'(?:https?://)?(?:vm\.)?tiktok\.com/[\w-]+',
+        ],
+    }
+    
+    @classmethod
+    def extract_urls(cls, text):
+        url_pattern = r'https?://[^\s]+'
+        no_protocol_pattern = r'(?:www\.)?(?:youtube\.com|youtu\.be|facebook\.com|fb\.watch|twitter\.com|x\.com|instagram\.com|tiktok\.com|vm\.tiktok\.com)[^\s]+'
+        urls = re.findall(url_pattern, text, re.IGNORECASE)
+        urls.extend(re.findall(no_protocol_pattern, text, re.IGNORECASE))
+        extracted = []
+        seen = set()
+        for url in urls:
+            if not url.startswith('http'):
+                url = 'https://' + url
+            if url in seen:
+                continue
+            platform = cls.identify_platform(url)
+            if platform:
+                extracted.append({'url': url, 'platform': platform})
+                seen.add(url)
+        return extracted
+    
+    @classmethod
+    def identify_platform(cls, url):
+        for platform, patterns in cls.SUPPORTED_PLATFORMS.items():
+            for pattern in patterns:
+                if re.match(pattern, url, re.IGNORECASE):
+                    return platform
+        return ''
+
+
+SAMPLES = [
+    "look at this https://www.youtube.com/watch?v=dQw4w9WgXcQ lol",
+    "https://youtu.be/abcDEF12345",
+    "youtube.com/shorts/Xy_z-123",
+    "https://www.facebook.com/someone/videos/1234567890/",
+    "fb.watch/aBcD12/",
+    "https://twitter.com/user/status/1712345678901234567",
+    "x.com/someone/status/42 and https://x.com/other/status/43",
+    "https://www.instagram.com/reel/CzAbC123xyz/?igsh=abc",
+    "https://www.tiktok.com/@some.user/video/7301234567890123456",
+    "https://vm.tiktok.com/ZM2abcDEF/",
+    "no links in this message at all, just chatting",
+    "https://example.com/video and https://news.site/article?id=5",
+    "good morning everyone 👋",
+]
+
+
+def build_corpus(count: int, seed: int = 1) -> list:
+    """Build a reproducible list of mixed chat messages."""
+    rng = random.Random(seed)
+    return [' '.join(rng.sample(SAMPLES, rng.randint(1, 3))) for _ in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=20000, help='Messages in the corpus')
+    parser.add_argument('--repeat', type=int, default=5, help='Timing repetitions (best is reported)')
+    args = parser.parse_args()
+    
+    corpus = build_corpus(args.messages)
+    
+    for name, handler in (('legacy', LegacyURLHandler), ('compiled', URLHandler)):
+        def run():
+            for message in corpus:
+                handler.extract_urls(message)
+        best = min(timeit.repeat(run, number=1, repeat=args.repeat))
+        print(f"{name:<10} {best:7.3f} s   {args.messages / best:12,.0f} messages/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+yt-dlp Reuse Benchmark
+Compares per-request overhead of a fresh YoutubeDL per call (the previous
+behaviour) with the long-lived instances of YoutubeDLPool. A local media
+server stands in for the platforms; yt-dlp's generic extractor resolves
+its direct links, so the timings are dominated by per-call setup.
+
+Usage:
+    python benchmarks/bench_ydl_pool.py [--requests 50] [--size-kb 256]
+"""
+
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+from pathlib import Path
+
+import yt_dlp
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import media_handler, serve  # noqa: E402
+from ydl_pool import YoutubeDLPool  # noqa: E402
+
+
+def fresh(params: dict, url: str, download: bool) -> None:
+    """Previous path: build and tear down a YoutubeDL for every call."""
+    with yt_dlp.YoutubeDL(dict(params)) as ydl:
+        ydl.extract_info(url, download=download)
+
+
+def pooled(pool: YoutubeDLPool, url: str, download: bool) -> None:
+    """New path: borrow this thread's long-lived instance."""
+    with pool.session('generic') as ydl:
+        ydl.extract_info(url, download=download)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=50, help='Requests per mode and operation')
+    parser.add_argument('--size-kb', type=int, default=256, help='Size of each fixture video')
+    args = parser.parse_args()
+    
+    files = {f'/video/{n}.mp4': b'\0' * (args.size_kb * 1024) for n in range(args.requests * 4 + 2)}
+    download_dir = tempfile.mkdtemp(prefix='bench_ydl_')
+    params = {
+        'outtmpl': f'{download_dir}/%(id)s.%(ext)s',
+        'quiet': True, 'no_warnings': True, 'noprogress': True,
+    }
+    pool = YoutubeDLPool(params)
+    
+    try:
+        with serve(media_handler(files)) as (_, base_url):
+            urls = iter(f'{base_url}{path}' for path in files)
+            # Warm up imports and the extractor registry for both modes
+            fresh(params, next(urls), download=False)
+            pooled(pool, next(urls), download=False)
+            
+            print(f"{'operation':<10} {'mode':<8} {'ms/request':>11}")
+            for operation, download in (('metadata', False), ('download', True)):
+                for mode, call in (('fresh', lambda u, d: fresh(params, u, d)),
+                                   ('pooled', lambda u, d: pooled(pool, u, d))):
+                    start = time.perf_counter()
+                    for _ in range(args.requests):
+                        call(next(urls), download)
+                    elapsed = (time.perf_counter() - start) / args.requests
+                    print(f"{operation:<10} {mode:<8} {elapsed * 1000:11.2f}")
+    finally:
+        pool.close()
+        shutil.rmtree(download_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
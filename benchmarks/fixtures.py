@@ -0,0 +1,220 @@
+"""
+Benchmark Fixtures
+Local HTTP servers standing in for platform media servers and the Telegram
+Bot API, so benchmarks run without network access.
+"""
+
+import json
+import time
+import socket
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, Optional, Tuple, Type
+
+
+class QuietHandler(BaseHTTPRequestHandler):
+    """Request handler that does not log every request to stderr."""
+    
+    protocol_version = 'HTTP/1.1'
+    
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; without this, Nagle's
+        # algorithm adds delayed-ACK stalls to small responses
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def log_message(self, format, *args):
+        pass
+
+
+def throttled_write(wfile, data: bytes, bytes_per_second: float, chunk_size: int = 64 * 1024) -> None:
+    """Write data in chunks, sleeping to hold a target bandwidth (0 = unlimited)."""
+    start = time.perf_counter()
+    for offset in range(0, len(data), chunk_size):
+        wfile.write(data[offset:offset + chunk_size])
+        if bytes_per_second:
+            expected = (offset + chunk_size) / bytes_per_second
+            delay = expected - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+
+
+def media_handler(files: Dict[str, bytes], bytes_per_second: float = 0) -> Type[BaseHTTPRequestHandler]:
+    """
+    Build a handler serving fixed media files.
+    
+    Args:
+        files: Mapping of URL path to file content
+        bytes_per_second: Bandwidth limit per response (0 = unlimited)
+    """
+    class MediaHandler(QuietHandler):
+        def do_GET(self):
+            data = files.get(self.path.split('?')[0])
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'video/mp4')
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            try:
+                throttled_write(self.wfile, data, bytes_per_second)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Extractors probing the content type hang up early
+    
+    return MediaHandler
+
+
+def hls_handler(
+    segments: int,
+    segment_bytes: int,
+    bytes_per_second: float = 0,
+    latency: float = 0
+) -> Type[BaseHTTPRequestHandler]:
+    """
+    Build a handler serving an HLS video: any path ending in .m3u8 returns a
+    media playlist of numbered MPEG-TS segments next to it.
+    
+    Args:
+        segments: Number of segments in the playlist
+        segment_bytes: Size of each segment
+        bytes_per_second: Bandwidth limit per segment response (0 = unlimited)
+        latency: Seconds before each segment response starts, as from a CDN edge
+    """
+    playlist = ''.join(
+        ['#EXTM3U\n#EXT-X-VERSION:3\n#EXT-X-TARGETDURATION:2\n#EXT-X-MEDIA-SEQUENCE:0\n']
+        + [f'#EXTINF:2.0,\nseg{n}.ts\n' for n in range(segments)]
+        + ['#EXT-X-ENDLIST\n']
+    ).encode('utf-8')
+    # 0x47 is the MPEG-TS sync byte
+    segment = b'\x47' * segment_bytes
+    
+    class HLSHandler(QuietHandler):
+        def do_GET(self):
+            path = self.path.split('?')[0]
+            if path.endswith('.m3u8'):
+                data, content_type, rate = playlist, 'application/vnd.apple.mpegurl', 0
+            elif path.endswith('.ts'):
+                time.sleep(latency)
+                data, content_type, rate = segment, 'video/mp2t', bytes_per_second
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            self.end_headers()
+            try:
+                throttled_write(self.wfile, data, rate)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+    
+    return HLSHandler
+
+
+def bot_api_handler(
+    bytes_per_second: float = 0,
+    on_call: Optional[Callable[[str, bytes], None]] = None,
+    latency: float = 0
+) -> Type[BaseHTTPRequestHandler]:
+    """
+    Build a handler acting as the Bot API: it consumes request bodies
+    (optionally at a limited rate) and answers getMe with a bot user and
+    every other method with a video message.
+    
+    Args:
+        bytes_per_second: Rate at which upload bodies are read (0 = unlimited)
+        on_call: Called with the method name and request body of every
+            call (bodies are only kept in memory when this is set)
+        latency: Seconds added before every response, like a round trip
+            to the real Bot API
+    """
+    class BotAPIHandler(QuietHandler):
+        def do_POST(self):
+            body = [] if on_call else None
+            received = self._consume_body(bytes_per_second, body)
+            if on_call:
+                on_call(self.path.rsplit('/', 1)[-1], b''.join(body))
+            if latency:
+                time.sleep(latency)
+            if self.path.endswith('/getMe'):
+                result = {'id': 1, 'is_bot': True, 'first_name': 'Bench', 'username': 'bench_bot'}
+            else:
+                result = {
+                    'message_id': 1,
+                    'date': int(time.time()),
+                    'chat': {'id': 1, 'type': 'private'},
+                    'video': {
+                        'file_id': 'FILE', 'file_unique_id': 'U', 'width': 1,
+                        'height': 1, 'duration': 1, 'file_size': received
+                    },
+                }
+            payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+        
+        def _consume_body(self, rate: float, keep: Optional[list] = None) -> int:
+            start = time.perf_counter()
+            received = 0
+            if 'chunked' in self.headers.get('Transfer-Encoding', ''):
+                while True:
+                    size = int(self.rfile.readline().strip() or b'0', 16)
+                    if size == 0:
+                        self.rfile.readline()
+                        break
+                    chunk = self.rfile.read(size)
+                    received += len(chunk)
+                    if keep is not None:
+                        keep.append(chunk)
+                    self.rfile.readline()
+                    self._throttle(start, received, rate)
+            else:
+                remaining = int(self.headers.get('Content-Length', 0))
+                while remaining:
+                    chunk = self.rfile.read(min(remaining, 64 * 1024))
+                    if not chunk:
+                        break
+                    remaining -= len(chunk)
+                    received += len(chunk)
+                    if keep is not None:
+                        keep.append(chunk)
+                    self._throttle(start, received, rate)
+            return received
+        
+        @staticmethod
+        def _throttle(start: float, received: int, rate: float) -> None:
+            if rate:
+                delay = received / rate - (time.perf_counter() - start)
+                if delay > 0:
+                    time.sleep(delay)
+    
+    return BotAPIHandler
+
+
+class FixtureServer(ThreadingHTTPServer):
+    """Threading server with a listen backlog large enough for load tests."""
+    
+    request_queue_size = 1024
+
+
+@contextmanager
+def serve(handler: Type[BaseHTTPRequestHandler]) -> Iterator[Tuple[FixtureServer, str]]:
+    """
+    Run a handler on a free local port in a background thread.
+    
+    Yields:
+        Tuple of (server, base_url)
+    """
+    server = FixtureServer(('127.0.0.1', 0), handler)
+    server.daemon_threads = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,240 @@
+"""
+Webhook Load Test
+Replays recorded Telegram updates against the bot running in webhook mode,
+with a local stub standing in for the Bot API. Each replayed update gets
+its own chat, and its latency is measured from the webhook POST to the
+bot's first reply arriving at the stub.
+
+The recorded updates (benchmarks/data/updates.json) contain no video links,
+so the handlers run without reaching any platform. The stub runs in a child
+process so its threads do not compete with the bot for the GIL.
+
+Usage:
+    python benchmarks/load_webhook.py [--updates 2000] [--concurrency 40]
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import queue
+import socket
+import asyncio
+import argparse
+import tempfile
+import threading
+import multiprocessing
+from pathlib import Path
+from urllib.parse import parse_qs
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from benchmarks.fixtures import bot_api_handler, serve  # noqa: E402
+
+RECORDED_UPDATES = Path(__file__).resolve().parent / 'data' / 'updates.json'
+WEBHOOK_PATH = 'telegram'
+WEBHOOK_SECRET = 'load-test-secret'
+
+
+REPLY_METHODS = {'sendMessage', 'editMessageText'}
+
+
+def run_stub(url_queue, replies) -> None:
+    """Child process: serve the stub Bot API and report (chat_id, time) of every reply."""
+    def on_call(method: str, body: bytes) -> None:
+        if method in REPLY_METHODS:
+            chat_id = parse_qs(body.decode('utf-8')).get('chat_id', [None])[0]
+            replies.put((chat_id, time.perf_counter()))
+    
+    with serve(bot_api_handler(on_call=on_call)) as (_, api_url):
+        url_queue.put(api_url)
+        threading.Event().wait()
+
+
+def collect_replies(replies, expected: int, timeout: float = 60) -> dict:
+    """Wait for the first reply to each of the expected chats."""
+    replied = {}
+    deadline = time.perf_counter() + timeout
+    while len(replied) < expected:
+        try:
+            chat_id, at = replies.get(timeout=max(0.0, deadline - time.perf_counter()))
+        except queue.Empty:
+            break
+        replied.setdefault(chat_id, at)
+    return replied
+
+
+def build_updates(recorded: list, count: int) -> list:
+    """Repeat the recorded updates, giving each copy a unique update and chat ID."""
+    updates = []
+    for index in range(count):
+        update = copy.deepcopy(recorded[index % len(recorded)])
+        update['update_id'] = index + 1
+        chat_id = 100000 + index
+        message = update.get('message') or update['callback_query']['message']
+        message['chat']['id'] = chat_id
+        if 'callback_query' in update:
+            update['callback_query']['id'] = str(index + 1)
+        updates.append((str(chat_id), update))
+    return updates
+
+
+def free_port() -> int:
+    """Pick an unused local TCP port."""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_bot(api_url: str, port: int, ready, stop) -> None:
+    """Child process: run the bot in webhook mode until stop is set."""
+    asyncio.run(serve_bot(api_url, port, ready, stop))
+
+
+async def serve_bot(api_url: str, port: int, ready, stop) -> None:
+    """Start the webhook server with the bot's handlers, then shut it down on stop."""
+    from bot import TelegramBot
+    
+    bot = TelegramBot()
+    application = bot.build_application(base_url=f"{api_url}/bot")
+    
+    await application.initialize()
+    await application.updater.start_webhook(
+        listen='127.0.0.1',
+        port=port,
+        url_path=bot.webhook_path,
+        webhook_url=f"http://127.0.0.1:{port}/{bot.webhook_path}",
+        secret_token=bot.webhook_secret,
+        allowed_updates=TelegramBot.ALLOWED_UPDATES
+    )
+    await application.start()
+    await bot.post_init(application)
+    ready.set()
+    
+    await asyncio.get_running_loop().run_in_executor(None, stop.wait)
+    await application.updater.stop()
+    await application.stop()
+    await bot.post_stop(application)
+    await bot.post_shutdown(application)
+    await application.shutdown()
+
+
+async def post_worker(host: str, port: int, path: str, jobs: asyncio.Queue, sent: dict) -> None:
+    """POST updates from the queue over one keep-alive connection."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                chat_id, update = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            body = json.dumps(update).encode('utf-8')
+            sent[chat_id] = time.perf_counter()
+            writer.write(
+                f"POST /{path} HTTP/1.1\r\n"
+                f"Host: {host}:{port}\r\n"
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"X-Telegram-Bot-Api-Secret-Token: {WEBHOOK_SECRET}\r\n\r\n".encode('ascii') + body
+            )
+            status = await reader.readline()
+            if b' 200 ' not in status:
+                raise RuntimeError(f"Webhook answered {status.decode().strip()}")
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                if name.lower() == 'content-length':
+                    length = int(value)
+            await reader.readexactly(length)
+    finally:
+        writer.close()
+
+
+async def replay(port: int, updates: list, concurrency: int, replies) -> dict:
+    """POST every update to the webhook and match replies to them."""
+    # A minimal keep-alive client keeps the load generator's own CPU use
+    # low, so it does not compete with the bot on small machines
+    sent = {}
+    jobs = asyncio.Queue()
+    for item in updates:
+        jobs.put_nowait(item)
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        post_worker('127.0.0.1', port, WEBHOOK_PATH, jobs, sent) for _ in range(concurrency)
+    ))
+    accepted = time.perf_counter() - start
+    replied = await asyncio.get_running_loop().run_in_executor(
+        None, collect_replies, replies, len(updates)
+    )
+    elapsed = max(replied.values(), default=start) - start
+    
+    latencies = sorted(at - sent[chat_id] for chat_id, at in replied.items() if chat_id in sent)
+    return {'accepted': accepted, 'elapsed': elapsed, 'latencies': latencies}
+
+
+def percentile(values: list, fraction: float) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2000, help='Updates to replay')
+    parser.add_argument('--concurrency', type=int, default=40, help='Concurrent webhook connections')
+    parser.add_argument('--recorded', default=str(RECORDED_UPDATES), help='JSON list of recorded updates')
+    args = parser.parse_args()
+    
+    with open(args.recorded, 'r', encoding='utf-8') as f:
+        updates = build_updates(json.load(f), args.updates)
+    
+    # Stub, bot and load generator each get their own process (and GIL)
+    context = multiprocessing.get_context('fork')
+    url_queue = context.Queue()
+    replies = context.Queue()
+    ready = context.Event()
+    stop = context.Event()
+    stub = context.Process(target=run_stub, args=(url_queue, replies), daemon=True)
+    stub.start()
+    
+    try:
+        with tempfile.TemporaryDirectory() as download_dir:
+            os.environ.update({
+                'TELEGRAM_BOT_TOKEN': '123456:LOADTEST',
+                'DOWNLOAD_DIR': download_dir,
+                'WEBHOOK_PATH': WEBHOOK_PATH,
+                'WEBHOOK_SECRET': WEBHOOK_SECRET,
+            })
+            port = free_port()
+            bot = context.Process(target=run_bot, args=(url_queue.get(timeout=10), port, ready, stop), daemon=True)
+            bot.start()
+            try:
+                if not ready.wait(30):
+                    raise RuntimeError('Bot did not start')
+                result = asyncio.run(replay(port, updates, args.concurrency, replies))
+            finally:
+                stop.set()
+                bot.join(30)
+    finally:
+        stub.terminate()
+        stub.join()
+    
+    latencies = result['latencies']
+    print(f"{len(updates)} updates, {args.concurrency} connections")
+    print(f"replied   {len(latencies)}/{len(updates)}")
+    print(f"accepted  {result['accepted']:7.3f} s   {len(updates) / result['accepted']:9,.0f} updates/s")
+    print(f"handled   {result['elapsed']:7.3f} s   {len(latencies) / result['elapsed']:9,.0f} updates/s")
+    if latencies:
+        print(
+            f"latency   p50 {percentile(latencies, 0.5) * 1000:7.1f} ms   "
+            f"p95 {percentile(latencies, 0.95) * 1000:7.1f} ms   "
+            f"p99 {percentile(latencies, 0.99) * 1000:7.1f} ms"
+        )
+
+
+if __name__ == '__main__':
+    main()
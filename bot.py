@@ -4,22 +4,47 @@ Main application file handling Telegram bot interactions with interactive button
 """
 
 import os
+import shutil
+import secrets
 import asyncio
 import logging
+from functools import partial
 from pathlib import Path
+from urllib.parse import quote
+from typing import Awaitable, Callable, Dict, Optional
 from dotenv import load_dotenv
-from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram import Bot, Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import (
     Application,
     CommandHandler,
     MessageHandler,
     CallbackQueryHandler,
     filters,
-    ContextTypes
+    ContextTypes,
+    ExtBot
 )
 
-from url_handler import URLHandler
+import config
+from download_cache import DownloadCache, claim_cache_dir
+from download_engine import DownloadEngine
+from file_id_index import FileIdIndex
+from file_server import FileServer, LinkSigner
+from format_selector import FormatSelector
+from metrics import BotMetrics, MetricsServer
+from outbound import OutboundScheduler
+from pending_store import PendingDownloadStore, SQLitePendingStore
+from platform_health import CircuitBreaker, PlatformHealth, RetryPolicy
+from progress import ProgressReporter
+from rate_limiter import AdmissionController, FairScheduler, RateLimiter, TokenBucket, format_wait
+from state_store import StateStore
+from stream_upload import StreamingUploader, StreamingUploadError
+from task_queue import InProcessTaskQueue, SQLiteTaskQueue
+from telegram_request import requests_from_env
+from transcoder import Transcoder
+from url_handler import ShortLinkResolver, URLHandler
 from video_downloader import VideoDownloader
+from worker import TaskWorker
 
 
 # Load environment variables
@@ -36,17 +61,155 @@ logger = logging.getLogger(__name__)
 class TelegramBot:
     """Main bot class handling message processing and responses."""
     
+    # Only the update types the handlers use are requested from Telegram
+    ALLOWED_UPDATES = [Update.MESSAGE, Update.CALLBACK_QUERY]
+    
     def __init__(self):
         """Initialize the bot with configuration."""
         self.token = os.getenv('TELEGRAM_BOT_TOKEN')
         if not self.token:
             raise ValueError("TELEGRAM_BOT_TOKEN not found in environment variables")
         
-        self.download_dir = os.getenv('DOWNLOAD_DIR', './downloads')
+        # Worker processes started with the same DOWNLOAD_DIR each get a
+        # subdirectory of their own, so no process sweeps or evicts files
+        # another one is still caching or delivering
+        self.shared_dir = os.getenv('DOWNLOAD_DIR', './downloads')
+        claimed_dir, self._dir_lock = claim_cache_dir(self.shared_dir)
+        self.download_dir = str(claimed_dir)
         self.web_server_url = os.getenv('WEB_SERVER_URL', '')
+        # Largest video downloaded for Get Link (0 = no limit); linked files
+        # stay on disk until the link expires
+        self.link_max_bytes = config.get_int('LINK_MAX_BYTES', 500 * 1024 * 1024)
+        self.message_concurrency = max(1, config.get_int('MESSAGE_CONCURRENCY', 4))
+        
+        # Admission control: links per user and chat, and a global budget of
+        # lookups and downloads shared round-robin between users
+        self.admission = AdmissionController(
+            RateLimiter(config.get_int('USER_RATE_LIMIT', 20), config.get_int('USER_RATE_BURST', 10)),
+            RateLimiter(config.get_int('CHAT_RATE_LIMIT', 60), config.get_int('CHAT_RATE_BURST', 30))
+        )
+        self.scheduler = FairScheduler(max(1, config.get_int('GLOBAL_CONCURRENCY', 16)))
+        
+        # Live progress edits: at most one per message per interval, within a
+        # bot-wide budget of edits per second so they never crowd out replies
+        self.progress_interval = config.get_float('PROGRESS_INTERVAL', ProgressReporter.DEFAULT_INTERVAL)
+        edits_per_second = config.get_int('PROGRESS_EDITS_PER_SECOND', 10)
+        self.edit_budget = TokenBucket(edits_per_second, edits_per_second) if edits_per_second > 0 else None
+        
+        # Pending downloads, the cache index, file_ids and deliveries survive restarts
+        self.state = StateStore(os.getenv('STATE_DB', str(Path(self.download_dir) / '.state.sqlite3')))
         
-        self.downloader = VideoDownloader(self.download_dir)
+        self.downloader = VideoDownloader(
+            self.download_dir,
+            max_workers=config.get_int('DOWNLOAD_WORKERS', VideoDownloader.DEFAULT_MAX_WORKERS),
+            platform_limits=config.get_limits('PLATFORM_CONCURRENCY'),
+            cache_max_bytes=config.get_int('CACHE_MAX_BYTES', DownloadCache.DEFAULT_MAX_BYTES),
+            cache_ttl=config.get_int('CACHE_TTL', DownloadCache.DEFAULT_TTL),
+            cache_watermarks=(
+                config.get_int('DISK_HIGH_WATERMARK', 90) / 100,
+                config.get_int('DISK_LOW_WATERMARK', 75) / 100
+            ),
+            format_selector=FormatSelector(
+                max_bytes=config.get_int('MAX_UPLOAD_BYTES', FormatSelector.DEFAULT_MAX_BYTES),
+                heights=config.get_int_list('FORMAT_HEIGHTS', FormatSelector.DEFAULT_HEIGHTS),
+                allow_merge=shutil.which('ffmpeg') is not None
+            ),
+            state=self.state,
+            engine=DownloadEngine.from_env(set(URLHandler.PLATFORM_HOSTS.values())),
+            # A platform failing most lookups is refused for a while instead of
+            # every request waiting out its timeouts
+            health=PlatformHealth(
+                failure_rate=config.get_int('CIRCUIT_FAILURE_RATE', 50) / 100,
+                min_requests=config.get_int('CIRCUIT_MIN_REQUESTS', CircuitBreaker.DEFAULT_MIN_REQUESTS),
+                window=config.get_float('CIRCUIT_WINDOW', CircuitBreaker.DEFAULT_WINDOW),
+                cooldown=config.get_float('CIRCUIT_COOLDOWN', CircuitBreaker.DEFAULT_COOLDOWN)
+            ),
+            retry=RetryPolicy(
+                retries=config.get_int('PLATFORM_RETRIES', RetryPolicy.DEFAULT_RETRIES),
+                backoff=config.get_float('PLATFORM_RETRY_BACKOFF', RetryPolicy.DEFAULT_BACKOFF),
+                backoff_max=config.get_float('PLATFORM_RETRY_BACKOFF_MAX', RetryPolicy.DEFAULT_BACKOFF_MAX)
+            )
+        )
+        self.admin_user_ids = set(config.get_int_list('ADMIN_USER_IDS', []))
         self.url_handler = URLHandler()
+        self.short_links = ShortLinkResolver(
+            ttl=config.get_int('SHORT_LINK_TTL', ShortLinkResolver.DEFAULT_TTL)
+        )
+        self.file_ids = FileIdIndex(str(Path(self.download_dir) / '.file_ids.json'), state=self.state)
+        
+        # Job queue between update handling and the download/upload workers;
+        # the SQLite backend shares tasks and pending downloads between processes
+        self.queue_backend = os.getenv('QUEUE_BACKEND', 'memory')
+        self.queue_workers = config.get_int('QUEUE_WORKERS', 64)
+        queue_db = os.getenv('QUEUE_DB', str(Path(self.shared_dir) / '.queue.sqlite3'))
+        pending_max_size = config.get_int('PENDING_MAX_SIZE', PendingDownloadStore.DEFAULT_MAX_SIZE)
+        pending_ttl = config.get_int('PENDING_TTL', PendingDownloadStore.DEFAULT_TTL)
+        
+        # Videos waiting for a button press; unclaimed entries expire
+        if self.queue_backend == 'memory':
+            self.tasks = InProcessTaskQueue()
+            self.pending = PendingDownloadStore(
+                max_size=pending_max_size, ttl=pending_ttl, state=self.state
+            )
+        elif self.queue_backend == 'sqlite':
+            self.tasks = SQLiteTaskQueue(queue_db)
+            self.pending = SQLitePendingStore(queue_db, max_size=pending_max_size, ttl=pending_ttl)
+        else:
+            raise ValueError(f"QUEUE_BACKEND must be 'memory' or 'sqlite', got {self.queue_backend!r}")
+        self.worker: Optional[TaskWorker] = None
+        self.worker_task: Optional[asyncio.Task] = None
+        self.sweep_interval = config.get_int('PENDING_SWEEP_INTERVAL', 300)
+        
+        # Optional streaming of single-stream videos straight into the upload
+        self.streamer = StreamingUploader() if config.get_bool('STREAMING_UPLOAD') else None
+        
+        # Optional ffmpeg stage fitting oversized or unplayable videos to the upload limit
+        self.transcoder: Optional[Transcoder] = None
+        if config.get_bool('TRANSCODE', True):
+            if Transcoder.available():
+                self.transcoder = Transcoder(
+                    self.downloader.cache,
+                    self.downloader.format_selector.max_bytes,
+                    workers=config.get_int('TRANSCODE_WORKERS', 0) or None,
+                    preset=os.getenv('TRANSCODE_PRESET', '').strip() or Transcoder.DEFAULT_PRESET,
+                    timeout_factor=config.get_float('TRANSCODE_TIMEOUT_FACTOR', Transcoder.DEFAULT_TIMEOUT_FACTOR)
+                )
+            else:
+                logger.info("ffmpeg not found; oversized videos are offered as links only")
+        
+        # Prometheus metrics, served on a local port when METRICS_PORT is set
+        self.metrics = BotMetrics()
+        self.metrics.queue_depth.set_function(lambda: len(self.tasks))
+        self.metrics.scheduler_waiting.set_function(lambda: self.scheduler.waiting)
+        self.metrics.pending_downloads.set_function(lambda: len(self.pending))
+        self.metrics.disk_usage_bytes.set_function(lambda: self.downloader.cache.total_bytes)
+        self.metrics_host = os.getenv('METRICS_HOST', '127.0.0.1')
+        self.metrics_port = config.get_int('METRICS_PORT', 0)
+        self.metrics_server: Optional[MetricsServer] = None
+        
+        # Built-in server for download links (WEB_SERVER_URL is its public URL
+        # when set); every process issuing links needs the same LINK_SECRET.
+        # It serves the shared DOWNLOAD_DIR, so links to files in the worker-N
+        # directories of other processes work too
+        self.file_server: Optional[FileServer] = None
+        file_server_port = config.get_int('FILE_SERVER_PORT', 0)
+        if file_server_port > 0:
+            link_secret = os.getenv('LINK_SECRET', '') or secrets.token_urlsafe(32)
+            self.file_server = FileServer(
+                self.shared_dir,
+                LinkSigner(link_secret.encode('utf-8'), ttl=config.get_int('LINK_TTL', LinkSigner.DEFAULT_TTL)),
+                base_url=self.web_server_url,
+                host=os.getenv('FILE_SERVER_HOST', '0.0.0.0'),
+                port=file_server_port
+            )
+        
+        # Webhook mode: Telegram pushes updates to WEBHOOK_URL instead of being polled
+        self.webhook_url = os.getenv('WEBHOOK_URL', '').rstrip('/')
+        self.webhook_listen = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+        self.webhook_port = config.get_int('WEBHOOK_PORT', 8443)
+        self.webhook_path = os.getenv('WEBHOOK_PATH', 'telegram').strip('/')
+        # Telegram echoes the secret in a header so forged updates are rejected
+        self.webhook_secret = os.getenv('WEBHOOK_SECRET') or secrets.token_urlsafe(32)
     
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle /start command."""
@@ -59,7 +222,7 @@ class TelegramBot:
             "• Instagram\\n"
             "• TikTok\\n\\n"
             "*Usage:*\\n"
-            "Just send a link - I'll download it and show you buttons to choose:\\n"
+            "Just send a link - I'll look it up and show you buttons to choose:\\n"
             "• 📥 Get Link - Receive download link\\n"
             "• 📹 Send Video - Get video in chat\\n\\n"
             "You can send multiple links at once!"
@@ -71,7 +234,7 @@ class TelegramBot:
         help_message = (
             "*How to use:*\\n\\n"
             "1. Send me a video URL from supported platforms\\n"
-            "2. Wait for download to complete\\n"
+            "2. Wait for the video to be found\\n"
             "3. Click a button to choose how to receive it\\n\\n"
             "*Examples:*\\n"
             "`https://youtube.com/watch?v=abc123`\\n"
@@ -80,6 +243,61 @@ class TelegramBot:
         )
         await update.message.reply_text(help_message, parse_mode='Markdown')
     
+    async def health_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Handle /health command: per-platform error rates and circuit states (admins only)."""
+        user = update.effective_user
+        if user is None or user.id not in self.admin_user_ids:
+            return
+        await update.message.reply_text(self.health_report())
+    
+    def health_report(self) -> str:
+        """Plain-text summary of the downloader's platform health."""
+        health = self.downloader.health.snapshot()
+        if not health:
+            return "🩺 No lookups or downloads yet"
+        
+        icons = {CircuitBreaker.CLOSED: '✅', CircuitBreaker.HALF_OPEN: '🟡', CircuitBreaker.OPEN: '🔴'}
+        window = self.downloader.health.settings['window']
+        lines = [f"🩺 Platform health (last {window:.0f}s)"]
+        for platform, stats in health.items():
+            line = (f"{icons[stats['state']]} {platform}: {stats['state'].replace('_', '-')}, "
+                    f"{stats['failures']}/{stats['requests']} failed ({stats['error_rate']:.0%})")
+            if stats['state'] != CircuitBreaker.CLOSED:
+                line += f", retry in {format_wait(stats['retry_after'])}"
+            totals = stats['totals']
+            line += (f"\n    since start: {totals['success']} ok, {totals['transient']} transient, "
+                     f"{totals['permanent']} permanent, {totals['unknown']} unknown, "
+                     f"{totals['unavailable']} refused")
+            if stats['last_error']:
+                line += f"\n    last error: {stats['last_error'][:200]}"
+            lines.append(line)
+        return '\n'.join(lines)
+    
+    async def enqueue_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Hand a message or button press to the download/upload workers."""
+        kind = 'callback' if update.callback_query else 'message'
+        # Not retried: a second run would reply twice, charge the rate limits
+        # again and find the pending download already claimed
+        await self.tasks.put(kind, update.to_dict(), max_attempts=1)
+    
+    def task_handlers(self, bot: Bot) -> Dict[str, Callable[[Dict], Awaitable[None]]]:
+        """
+        Build the worker handlers that run queued updates.
+        
+        Args:
+            bot: Bot used to reply to the rebuilt updates
+            
+        Returns:
+            Coroutine function per task kind
+        """
+        async def handle_message(payload: Dict):
+            await self.process_message(Update.de_json(payload, bot), None)
+        
+        async def handle_callback(payload: Dict):
+            await self.button_callback(Update.de_json(payload, bot), None)
+        
+        return {'message': handle_message, 'callback': handle_callback}
+    
     async def process_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Process incoming messages containing video URLs."""
         message_text = update.message.text
@@ -94,71 +312,158 @@ class TelegramBot:
             )
             return
         
+        # Links beyond the sender's and the chat's rate limits are dropped
+        # before anything, including short-link resolution, goes out
+        user_id = self._user_id(update)
+        wanted = len(urls)
+        admitted, retry_after = self.admission.admit(user_id, update.effective_chat.id, wanted)
+        if admitted < wanted:
+            self.metrics.rate_limited_total.inc(wanted - admitted)
+        if not admitted:
+            await update.message.reply_text(
+                f"🐢 Too many links, please wait {format_wait(retry_after)} before sending more."
+            )
+            return
+        
+        # Resolve the admitted short links so links to the same video are handled once
+        urls = await self.short_links.resolve_all(urls[:admitted])
+        
         # Send processing notification
-        processing_msg = await update.message.reply_text(
-            f"⏳ Processing {len(urls)} link(s)..."
-        )
+        notice = f"⏳ Processing {len(urls)} link(s)..."
+        if admitted < wanted:
+            notice += (
+                f" 🐢 {wanted - admitted} link(s) skipped by the rate limit, "
+                f"send them again in {format_wait(retry_after)}."
+            )
+        position = self.scheduler.position(user_id)
+        if position:
+            notice += f" 🕒 Queue position: {position}"
+        processing_msg = await update.message.reply_text(notice)
         
-        # Process each URL
-        for url_info in urls:
-            url = url_info['url']
-            platform = url_info['platform']
-            
-            logger.info(f"Processing {platform} URL: {url}")
-            
-            # Download video
-            download_result = self.downloader.download_video(url, platform)
-            
-            # Check if download succeeded
-            if not download_result['success']:
-                logger.warning(f"Download failed for {url}: {download_result['error']}")
-                await update.message.reply_text(f"❌ Download failed: {download_result['error']}")
-                continue
-            
-            # Store file info for callback
-            file_path = download_result['file_path']
-            filename = Path(file_path).name
-            title = download_result.get('title', 'Video')
-            
-            # Generate download link
-            if self.web_server_url:
-                download_link = f"{self.web_server_url.rstrip('/')}/{filename}"
-            else:
-                download_link = f"file:///{file_path}"
-            
-            # Create unique identifier for this download
-            video_id = filename.replace('.', '_').replace('-', '_')
-            
-            # Store in context for callback handler
-            if 'downloads' not in context.bot_data:
-                context.bot_data['downloads'] = {}
-            
-            context.bot_data['downloads'][video_id] = {
-                'file_path': file_path,
-                'download_link': download_link,
-                'title': title,
-                'url': url
-            }
+        # Process URLs concurrently; each reply goes out as soon as its
+        # download finishes
+        semaphore = asyncio.Semaphore(self.message_concurrency)
+        
+        async def process_limited(url_info):
+            async with semaphore, self.scheduler.slot(user_id):
+                return await self.process_url(update, context, url_info)
+        
+        tasks = [asyncio.create_task(process_limited(url_info)) for url_info in urls]
+        completed = 0
+        failed = 0
+        
+        try:
+            for task in asyncio.as_completed(tasks):
+                try:
+                    ok = await task
+                except Exception as e:
+                    # One broken link must not stop the others or the summary
+                    logger.error(f"Error processing link: {e}", exc_info=True)
+                    ok = False
+                if ok:
+                    completed += 1
+                else:
+                    failed += 1
+                
+                if completed + failed < len(urls):
+                    await self._update_progress(processing_msg, len(urls), completed, failed)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Delete processing message
+            try:
+                await processing_msg.delete()
+            except Exception as e:
+                logger.debug(f"Could not delete processing message: {e}")
+        
+        logger.info(f"Completed processing {len(urls)} URLs ({failed} failed)")
+    
+    @staticmethod
+    def _user_id(update: Update) -> int:
+        """Key for per-user limits; channel posts have no sender and use the chat."""
+        if update.effective_user is not None:
+            return update.effective_user.id
+        return update.effective_chat.id
+    
+    async def process_url(self, update: Update, context: ContextTypes.DEFAULT_TYPE, url_info: dict) -> bool:
+        """
+        Resolve a single URL and reply with the delivery buttons.
+        
+        Only metadata is fetched here; the video itself is downloaded when a
+        button asks for it.
+        
+        Args:
+            update: Update containing the user's message
+            context: Handler context
+            url_info: Dictionary with 'url' and 'platform' keys
             
-            # Create inline keyboard with two options
+        Returns:
+            True if the video was found, False otherwise
+        """
+        url = url_info['url']
+        platform = url_info['platform']
+        
+        logger.info(f"Processing {platform} URL: {url}")
+        
+        try:
+            # Resolve metadata in the worker pool so other updates keep flowing
+            with self.metrics.stage('metadata', platform):
+                metadata = await self.downloader.fetch_metadata_async(url, platform)
+        except Exception as e:
+            metadata = {'success': False, 'error': f'Unexpected error: {str(e)}'}
+        
+        # Check if the lookup succeeded
+        if not metadata['success']:
+            self.metrics.error('metadata', metadata['error'])
+            logger.warning(f"Metadata lookup failed for {url}: {metadata['error']}")
+            await update.message.reply_text(f"❌ Download failed: {metadata['error']}")
+            return False
+        
+        self.metrics.cache('metadata', metadata.get('cached', False))
+        title = metadata.get('title', 'Video')
+        
+        # Store for the callback handler under a unique identifier
+        video_id = self.pending.add({
+            'url': url,
+            'platform': platform,
+            'title': title,
+            'format_id': metadata.get('format_id'),
+            'filesize': metadata.get('filesize'),
+            'stream': metadata.get('stream'),
+            'cache_key': metadata.get('cache_key')
+        })
+        
+        # Videos too large for Telegram are offered as a link only, unless
+        # they can be compressed after the download
+        if metadata.get('fits_upload', True) or self.transcoder:
             keyboard = [
                 [
                     InlineKeyboardButton("📥 Get Link", callback_data=f"link_{video_id}"),
                     InlineKeyboardButton("📹 Send Video", callback_data=f"file_{video_id}")
                 ]
             ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            # Send message with buttons
-            await update.message.reply_text(
-                f"✅ Downloaded: {title}\\n\\nChoose how to receive:",
-                reply_markup=reply_markup
-            )
-        
-        # Delete processing message
-        await processing_msg.delete()
+            text = f"✅ Found: {title}\\n\\nChoose how to receive:"
+            if not metadata.get('fits_upload', True):
+                size_mb = metadata['filesize'] / (1024 * 1024)
+                text = (f"✅ Found: {title}\\n\\n⚠️ Large video (~{size_mb:.0f} MB), "
+                        f"it will be compressed to fit.\\n\\nChoose how to receive:")
+        else:
+            size_mb = metadata['filesize'] / (1024 * 1024)
+            keyboard = [[InlineKeyboardButton("📥 Get Link", callback_data=f"link_{video_id}")]]
+            text = f"✅ Found: {title}\\n\\n⚠️ Too large to send in chat (~{size_mb:.0f} MB), link only:"
         
-        logger.info(f"Completed processing {len(urls)} URLs")
+        # Send message with buttons
+        await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+        return True
+    
+    async def _update_progress(self, processing_msg, total: int, completed: int, failed: int):
+        """Edit the processing message with live completed/failed counts."""
+        try:
+            await self._progress_edit(processing_msg)(
+                f"⏳ Processing {total} link(s)... ✅ {completed} done, ❌ {failed} failed"
+            )
+        except Exception as e:
+            logger.debug(f"Could not update progress message: {e}")
     
     async def button_callback(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle button clicks."""
@@ -172,78 +477,480 @@ class TelegramBot:
             await query.edit_message_text("❌ Error: Invalid button data.")
             return
         
-        # Retrieve stored data
-        if 'downloads' not in context.bot_data or video_id not in context.bot_data['downloads']:
+        # Claim stored data; a second click on the same message finds nothing
+        video_data = self.pending.pop(video_id)
+        if video_data is None:
             await query.edit_message_text("❌ Error: Video data expired. Please download again.")
             return
         
-        video_data = context.bot_data['downloads'][video_id]
-        file_path = video_data['file_path']
-        download_link = video_data['download_link']
+        # End-to-end time runs from the button press to the final reply
+        with self.metrics.stage('end_to_end', video_data['platform']):
+            await self._deliver(query, action, video_id, video_data)
+    
+    async def _deliver(self, query, action: str, video_id: str, video_data: dict):
+        """Send the link or the video a button asked for."""
         title = video_data['title']
+        cache_key = video_data.get('cache_key')
+        platform = video_data['platform']
         
         if action == 'link':
-            # User wants the download link
+            # User wants the download link; a cached video needs no download
+            download_link = self._existing_link(video_data)
+            if not download_link:
+                filesize = video_data.get('filesize')
+                if self.link_max_bytes and filesize and filesize > self.link_max_bytes:
+                    await query.edit_message_text(
+                        f"❌ Too large to download (~{filesize / (1024 * 1024):.0f} MB, "
+                        f"limit {self.link_max_bytes // (1024 * 1024)} MB)."
+                    )
+                    return
+                
+                download_result = await self._download(query, video_data)
+                if not download_result:
+                    return
+                
+                if self.file_server:
+                    # The link keeps our reference until it expires
+                    download_link = self._serve_link(download_result['file_path'])
+                else:
+                    download_link = self._file_link(download_result['file_path'])
+                    # Release our reference; the cache keeps the file until eviction
+                    self.downloader.cleanup_file(download_result['file_path'])
+            
             await query.edit_message_text(
                 f"📥 Download Link for: {title}\\n\\n{download_link}",
                 disable_web_page_preview=True
             )
+            self.state.record_delivery(query.message.chat_id, 'link', cache_key)
             logger.info(f"Sent download link for {video_id}")
         
         elif action == 'file':
-            # User wants the video file
+            # User wants the video file; videos sent before need no download
+            sent = await self._send_by_file_id(query.message, title, cache_key)
+            self.metrics.cache('file_id', sent)
+            if sent:
+                await query.edit_message_text(f"✅ Video uploaded: {title}")
+                return
+            
+            if await self._send_streaming(query, video_data):
+                await query.edit_message_text(f"✅ Video uploaded: {title}")
+                logger.info(f"Streamed video for {video_id}")
+                return
+            
+            download_result = await self._download(query, video_data)
+            if not download_result:
+                return
+            
+            file_path = await self._fit_upload(query, download_result, platform)
+            if not file_path:
+                return
             await query.edit_message_text(f"⏳ Uploading video...")
             
             try:
-                # Upload video to chat
-                with open(file_path, 'rb') as video_file:
-                    await query.message.reply_video(
-                        video=video_file,
-                        caption=f"📹 {title}",
-                        read_timeout=60,
-                        write_timeout=60,
-                        connect_timeout=30,
-                        pool_timeout=30
-                    )
+                # Upload video to chat; the Bot API client reports no byte
+                # progress, so the message shows the elapsed time instead
+                with self.metrics.stage('upload', platform):
+                    async with self._progress(query) as progress:
+                        async with progress.heartbeat('Uploading video', self._file_size(file_path)):
+                            await self.send_video(
+                                query.message, file_path, title, download_result.get('cache_key') or cache_key
+                            )
+                self.metrics.transferred('upload', platform, self._file_size(file_path))
                 
                 # Update message to show success
                 await query.edit_message_text(f"✅ Video uploaded: {title}")
                 logger.info(f"Uploaded video file for {video_id}")
                 
-                # Cleanup
-                self.downloader.cleanup_file(file_path)
-                
             except Exception as e:
+                self.metrics.error('upload', type(e).__name__)
                 logger.error(f"Video upload failed: {str(e)}")
                 await query.edit_message_text(f"❌ Upload failed: {str(e)}")
+            
+            finally:
+                # Release our reference; the cache keeps the file until eviction
+                self.downloader.cleanup_file(file_path)
+    
+    async def _download(self, query, video_data: dict) -> Optional[dict]:
+        """
+        Download the video behind a button press.
+        
+        Returns:
+            Successful download result, or None after reporting the failure
+        """
+        user_id = query.from_user.id
+        position = self.scheduler.position(user_id)
+        if position:
+            await query.edit_message_text(f"🕒 Queued for download, position {position}...")
+        
+        platform = video_data['platform']
+        async with self.scheduler.slot(user_id):
+            await query.edit_message_text(f"⏳ Downloading video...")
+            
+            try:
+                with self.metrics.stage('download', platform):
+                    async with self._progress(query) as progress:
+                        result = await self.downloader.download_video_async(
+                            video_data['url'], platform, video_data.get('format_id'),
+                            progress_hook=progress.hook
+                        )
+            except Exception as e:
+                result = {'success': False, 'error': f'Unexpected error: {str(e)}'}
+        
+        if not result['success']:
+            self.metrics.error('download', result['error'])
+            logger.warning(f"Download failed for {video_data['url']}: {result['error']}")
+            await query.edit_message_text(f"❌ Download failed: {result['error']}")
+            return None
+        
+        self.metrics.cache('download', result.get('cached', False))
+        if not result.get('cached'):
+            self.metrics.transferred('download', platform, self._file_size(result['file_path']))
+        return result
+    
+    async def _fit_upload(self, query, download_result: dict, platform: str) -> Optional[str]:
+        """
+        Remux or compress a downloaded video Telegram would reject.
+        
+        Returns:
+            Path of the file to upload (the caller owns a reference on it), or
+            None after reporting the failure
+        """
+        file_path = download_result['file_path']
+        cache_key = download_result.get('cache_key')
+        if not self.transcoder or not cache_key or not self.transcoder.needs_fitting(file_path):
+            return file_path
+        
+        try:
+            await query.edit_message_text(f"⏳ Preparing video for Telegram...")
+            with self.metrics.stage('transcode', platform):
+                async with self._progress(query) as progress:
+                    async with progress.heartbeat('Compressing video', self._file_size(file_path)):
+                        result = await self.transcoder.fit(file_path, cache_key)
+        except asyncio.CancelledError:
+            self.downloader.cleanup_file(file_path)
+            raise
+        except Exception as e:
+            result = {'success': False, 'file_path': None, 'error': f'Unexpected error: {str(e)}'}
+        
+        if not result['success']:
+            self.metrics.error('transcode', result['error'])
+            logger.warning(f"Could not fit {file_path} to the upload limit: {result['error']}")
+            self.downloader.cleanup_file(file_path)
+            await query.edit_message_text(f"❌ Upload failed: {result['error']}")
+            return None
         
-        # Clean up stored data
-        if video_id in context.bot_data['downloads']:
-            del context.bot_data['downloads'][video_id]
+        if result['file_path'] != file_path:
+            # Upload the fitted copy; the cache keeps the original for links
+            self.downloader.cleanup_file(file_path)
+            logger.info(f"Prepared {result['file_path']} ({result['action']})")
+        return result['file_path']
+    
+    def _progress(self, query) -> ProgressReporter:
+        """Progress reporter editing the message behind a button press."""
+        edit = self._progress_edit(query.message) if query.message else query.edit_message_text
+        return ProgressReporter(edit, self.progress_interval, self.edit_budget)
+    
+    @staticmethod
+    def _progress_edit(message) -> Callable[[str], Awaitable]:
+        """Edit function for a progress message, queued behind interactive replies."""
+        bot = message.get_bot()
+        if not isinstance(bot, ExtBot) or not isinstance(bot.rate_limiter, OutboundScheduler):
+            return message.edit_text
+        return partial(
+            bot.edit_message_text,
+            chat_id=message.chat.id,
+            message_id=message.message_id,
+            rate_limit_args=OutboundScheduler.PROGRESS_ARGS
+        )
+    
+    @staticmethod
+    def _file_size(file_path: str) -> Optional[int]:
+        """Size of a file, or None if it is gone."""
+        try:
+            return os.path.getsize(file_path)
+        except OSError:
+            return None
+    
+    def _existing_link(self, video_data: dict) -> Optional[str]:
+        """
+        Return a link to an already downloaded copy of the video, if there is one.
+        
+        Only files the bot serves itself are linked: platform media URLs are
+        signed for the extracting IP, expire quickly and often need the
+        extractor's headers or cookies.
+        """
+        cache_key = video_data.get('cache_key')
+        if cache_key and self.file_server:
+            # Take a reference for the link to hold until it expires
+            entry = self.downloader.cache.acquire(cache_key)
+            if entry is not None:
+                return self._serve_link(entry['file_path'])
+        else:
+            entry = self.downloader.cache.get(cache_key) if cache_key else None
+            if entry is not None and self.web_server_url:
+                return self._file_link(entry['file_path'])
+        return None
+    
+    def _serve_link(self, file_path: str) -> str:
+        """Signed link from the built-in server; releases the file once it expires."""
+        return self.file_server.link(file_path, on_expire=partial(self.downloader.cleanup_file, file_path))
+    
+    def _file_link(self, file_path: str) -> str:
+        """Build the download link for a file under DOWNLOAD_DIR (worker-N directories included)."""
+        if self.web_server_url:
+            name = Path(file_path).resolve().relative_to(Path(self.shared_dir).resolve()).as_posix()
+            return f"{self.web_server_url.rstrip('/')}/{quote(name)}"
+        return f"file:///{file_path}"
+    
+    async def send_video(self, message, file_path: str, title: str, cache_key: Optional[str] = None):
+        """
+        Send a video to the chat of the given message.
+        
+        Videos uploaded before are sent by their Telegram file_id, so repeat
+        deliveries transfer no bytes. The file_id of a fresh upload is recorded.
+        
+        Args:
+            message: Message to reply to
+            file_path: Path of the downloaded video
+            title: Video title used in the caption
+            cache_key: Source video key from the download result
+        """
+        if await self._send_by_file_id(message, title, cache_key):
+            return
+        
+        with open(file_path, 'rb') as video_file:
+            sent = await message.reply_video(
+                video=video_file,
+                caption=f"📹 {title}"
+            )
+        
+        file_id = sent.video.file_id if sent.video else None
+        if cache_key and file_id:
+            self.file_ids.set(cache_key, file_id)
+        self.state.record_delivery(message.chat_id, 'upload', cache_key, file_id)
+    
+    async def _send_streaming(self, query, video_data: dict) -> bool:
+        """
+        Pipe a single-stream video from the platform into the upload.
+        
+        Returns:
+            True if the video was sent, False if the disk path has to be used
+        """
+        stream = video_data.get('stream')
+        if not self.streamer or not StreamingUploader.can_stream(stream):
+            return False
+        
+        await query.edit_message_text(f"⏳ Uploading video...")
+        
+        try:
+            with self.metrics.stage('upload', video_data['platform']):
+                async with self._progress(query) as progress:
+                    sent = await self.streamer.send_video(
+                        query.get_bot(),
+                        query.message.chat_id,
+                        stream,
+                        caption=f"📹 {video_data['title']}",
+                        filename=f"{stream.get('format_id') or 'video'}.{stream['ext']}",
+                        progress=progress.transfer('Uploading video')
+                    )
+        except StreamingUploadError as e:
+            self.metrics.error('stream_upload', type(e).__name__)
+            logger.warning(f"Streaming upload failed, falling back to download: {e}")
+            return False
+        
+        self.metrics.transferred('upload', video_data['platform'], stream.get('filesize'))
+        
+        cache_key = video_data.get('cache_key')
+        file_id = sent['video']['file_id'] if sent.get('video') else None
+        if cache_key and file_id:
+            self.file_ids.set(cache_key, file_id)
+        self.state.record_delivery(query.message.chat_id, 'stream', cache_key, file_id)
+        return True
+    
+    async def _send_by_file_id(self, message, title: str, cache_key: Optional[str]) -> bool:
+        """
+        Send a previously uploaded video by its Telegram file_id.
+        
+        Returns:
+            True if the video was sent, False if it has to be uploaded
+        """
+        file_id = self.file_ids.get(cache_key) if cache_key else None
+        if not file_id:
+            return False
+        
+        try:
+            await message.reply_video(video=file_id, caption=f"📹 {title}")
+            self.state.record_delivery(message.chat_id, 'file_id', cache_key, file_id)
+            logger.info(f"Sent cached file_id for {cache_key}")
+            return True
+        except BadRequest as e:
+            logger.warning(f"Telegram rejected cached file_id for {cache_key}: {e}")
+            self.file_ids.remove(cache_key)
+            return False
+    
+    async def sweep_pending(self, context: ContextTypes.DEFAULT_TYPE):
+        """Periodic job dropping expired pending downloads and orphaned files."""
+        expired = self.pending.sweep()
+        if self.file_server:
+            # Files whose links expired become evictable in this same sweep
+            self.file_server.expire_links()
+        evicted = self.downloader.cache.evict()
+        orphaned = self.downloader.remove_orphaned_files(min_age=self.pending.ttl)
+        
+        if expired or evicted or orphaned:
+            usage = self.downloader.cache.disk_usage()
+            logger.info(
+                f"Sweep: {len(expired)} pending expired, {len(evicted)} cached evicted, "
+                f"{len(orphaned)} orphaned files removed ({len(self.pending)} pending, "
+                f"{usage['used_bytes']}/{usage['max_bytes']} bytes cached)"
+            )
+    
+    async def start_metrics(self):
+        """Serve /metrics on METRICS_HOST:METRICS_PORT when a port is configured."""
+        if self.metrics_port <= 0 or self.metrics_server is not None:
+            return
+        self.metrics_server = MetricsServer(self.metrics.render, self.metrics_host, self.metrics_port)
+        await self.metrics_server.start()
+        logger.info(f"Serving metrics on http://{self.metrics_host}:{self.metrics_server.port}/metrics")
+    
+    async def start_file_server(self):
+        """Serve download links on FILE_SERVER_HOST:FILE_SERVER_PORT when a port is configured."""
+        if self.file_server is None or self.file_server.is_serving:
+            return
+        await self.file_server.start()
+        logger.info(f"Serving download links on {self.file_server.host}:{self.file_server.port} "
+                    f"as {self.file_server.base_url}")
+    
+    async def post_init(self, application: Application):
+        """Start the in-process workers once the application is initialized."""
+        await self.start_metrics()
+        await self.start_file_server()
+        if self.queue_workers > 0:
+            self.worker = TaskWorker(self.tasks, self.task_handlers(application.bot), self.queue_workers)
+            self.worker_task = asyncio.create_task(self.worker.run())
+        else:
+            logger.info("No local workers; queued updates are handled by worker.py processes")
+    
+    async def post_stop(self, application: Application):
+        """Let the in-process workers finish their running tasks."""
+        if self.worker:
+            self.worker.stop()
+            await self.worker_task
+    
+    async def post_shutdown(self, application: Application):
+        """Release network resources when the application stops."""
+        await self.close()
+    
+    async def close(self):
+        """Release network connections and shared stores."""
+        if self.metrics_server:
+            await self.metrics_server.close()
+        if self.file_server:
+            await self.file_server.close()
+        await self.short_links.close()
+        if self.streamer:
+            await self.streamer.close()
+        await self.tasks.close()
+        if isinstance(self.pending, SQLitePendingStore):
+            self.pending.close()
+        self.downloader.shutdown(wait=False)
+        if self.transcoder:
+            self.transcoder.shutdown(wait=False)
+        self.state.close()
+        if self._dir_lock:
+            # Frees the cache directory for the next process
+            self._dir_lock.close()
     
     async def error_handler(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Handle errors."""
         logger.error(f"Update {update} caused error {context.error}")
     
-    def run(self):
-        """Start the bot."""
-        logger.info("Starting Telegram bot...")
+    def rate_limiter(self) -> OutboundScheduler:
+        """Create the scheduler sending Bot API calls within Telegram's limits."""
+        return OutboundScheduler(
+            global_rate=config.get_float('TELEGRAM_SEND_RATE', OutboundScheduler.DEFAULT_GLOBAL_RATE),
+            chat_rate=config.get_int('TELEGRAM_CHAT_SEND_RATE', OutboundScheduler.DEFAULT_CHAT_RATE),
+            group_rate=config.get_int('TELEGRAM_GROUP_SEND_RATE', OutboundScheduler.DEFAULT_GROUP_RATE),
+            chat_burst=config.get_int('TELEGRAM_CHAT_SEND_BURST', OutboundScheduler.DEFAULT_CHAT_BURST),
+            max_retries=max(0, config.get_int('TELEGRAM_MAX_RETRIES', OutboundScheduler.DEFAULT_MAX_RETRIES))
+        )
+    
+    def make_bot(self) -> ExtBot:
+        """Create a bot with the tuned connection pools, for worker processes."""
+        return ExtBot(self.token, request=requests_from_env(), rate_limiter=self.rate_limiter())
+    
+    def build_application(self, base_url: Optional[str] = None) -> Application:
+        """
+        Create the application with all handlers and jobs registered.
         
-        # Create application
-        application = Application.builder().token(self.token).build()
+        Args:
+            base_url: Bot API base URL (defaults to the public Bot API)
+            
+        Returns:
+            Application ready for polling or webhook mode
+        """
+        # Create application; updates are handled concurrently so a long
+        # download in one chat does not hold up the others
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .request(requests_from_env())
+            .rate_limiter(self.rate_limiter())
+            .concurrent_updates(config.get_int('CONCURRENT_UPDATES', 64))
+            .post_init(self.post_init)
+            .post_stop(self.post_stop)
+            .post_shutdown(self.post_shutdown)
+        )
+        if base_url:
+            builder = builder.base_url(base_url)
+        application = builder.build()
         
-        # Register handlers
+        # Register handlers; links and button clicks go through the job queue
         application.add_handler(CommandHandler("start", self.start_command))
         application.add_handler(CommandHandler("help", self.help_command))
-        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.process_message))
-        application.add_handler(CallbackQueryHandler(self.button_callback))  # Handle button clicks
+        application.add_handler(CommandHandler("health", self.health_command))
+        application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, self.enqueue_update))
+        application.add_handler(CallbackQueryHandler(self.enqueue_update))  # Handle button clicks
         
         # Register error handler
         application.add_error_handler(self.error_handler)
         
-        # Start polling
+        # Periodically expire unclaimed downloads
+        if application.job_queue:
+            application.job_queue.run_repeating(
+                self.sweep_pending,
+                interval=self.sweep_interval,
+                first=self.sweep_interval
+            )
+        else:
+            logger.warning("Job queue unavailable; install python-telegram-bot[job-queue] to sweep pending downloads")
+        
+        return application
+    
+    def run(self):
+        """Start the bot."""
+        logger.info("Starting Telegram bot...")
+        
+        application = self.build_application()
+        
         logger.info("Bot started successfully!")
-        application.run_polling(allowed_updates=Update.ALL_TYPES)
+        try:
+            if self.webhook_url:
+                logger.info(f"Receiving updates via webhook on {self.webhook_listen}:{self.webhook_port}")
+                application.run_webhook(
+                    listen=self.webhook_listen,
+                    port=self.webhook_port,
+                    url_path=self.webhook_path,
+                    webhook_url=f"{self.webhook_url}/{self.webhook_path}",
+                    secret_token=self.webhook_secret,
+                    allowed_updates=self.ALLOWED_UPDATES
+                )
+            else:
+                application.run_polling(allowed_updates=self.ALLOWED_UPDATES)
+        finally:
+            self.downloader.shutdown(wait=False)
+            if self.transcoder:
+                self.transcoder.shutdown(wait=False)
 
 
 def main():
@@ -0,0 +1,124 @@
+"""
+Configuration Module
+Helpers for reading typed settings from environment variables.
+"""
+
+import os
+from typing import Dict, List, Sequence
+
+
+def get_int(name: str, default: int) -> int:
+    """
+    Read an integer setting from the environment.
+    
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+    
+    Returns:
+        Parsed integer value
+    """
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        raise ValueError(f"{name} must be an integer, got {value!r}")
+
+
+def get_float(name: str, default: float) -> float:
+    """
+    Read a decimal setting from the environment.
+    
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+    
+    Returns:
+        Parsed float value
+    """
+    value = os.getenv(name, '').strip()
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        raise ValueError(f"{name} must be a number, got {value!r}")
+
+
+def get_bool(name: str, default: bool = False) -> bool:
+    """
+    Read a boolean setting (1/0, true/false, yes/no, on/off) from the environment.
+    
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+        
+    Returns:
+        Parsed boolean value
+    """
+    value = os.getenv(name, '').strip().lower()
+    if not value:
+        return default
+    if value in ('1', 'true', 'yes', 'on'):
+        return True
+    if value in ('0', 'false', 'no', 'off'):
+        return False
+    raise ValueError(f"{name} must be a boolean, got {value!r}")
+
+
+def get_int_list(name: str, default: Sequence[int]) -> List[int]:
+    """
+    Read a comma-separated list of integers from the environment.
+    
+    Args:
+        name: Environment variable name
+        default: Value used when the variable is unset or empty
+        
+    Returns:
+        List of parsed integers
+    """
+    value = os.getenv(name, '').strip()
+    if not value:
+        return list(default)
+    try:
+        return [int(item) for item in value.split(',') if item.strip()]
+    except ValueError:
+        raise ValueError(f"{name} must be a comma-separated list of integers, got {value!r}")
+
+
+def get_limits(name: str) -> Dict[str, int]:
+    """
+    Read a per-platform limit mapping such as ``youtube=2,tiktok=4``.
+    
+    Args:
+        name: Environment variable name
+    
+    Returns:
+        Dictionary mapping lowercase platform names to integer limits
+    """
+    return parse_limits(os.getenv(name, ''))
+
+
+def parse_limits(value: str) -> Dict[str, int]:
+    """
+    Parse a comma-separated ``platform=limit`` string.
+    
+    Args:
+        value: Raw setting value
+    
+    Returns:
+        Dictionary mapping lowercase platform names to integer limits
+    """
+    limits = {}
+    for item in value.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            platform, limit = item.split('=', 1)
+            limits[platform.strip().lower()] = int(limit)
+        except ValueError:
+            raise ValueError(f"Invalid limit entry {item!r}, expected platform=number")
+    return limits
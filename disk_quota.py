@@ -0,0 +1,159 @@
+"""
+Disk Quota Module
+Byte budget for download_dir with high/low watermarks. Usage is tracked
+incrementally as files are added and removed, so enforcing the quota never
+rescans the directory; once usage passes the high watermark the least
+recently used unpinned files are evicted down to the low watermark.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class DiskQuota:
+    """LRU accounting of files under a byte budget."""
+    
+    DEFAULT_HIGH_WATERMARK = 1.0
+    DEFAULT_LOW_WATERMARK = 1.0
+    
+    def __init__(
+        self,
+        max_bytes: int,
+        high_watermark: float = DEFAULT_HIGH_WATERMARK,
+        low_watermark: float = DEFAULT_LOW_WATERMARK
+    ):
+        """
+        Initialize an empty quota.
+        
+        Args:
+            max_bytes: Byte budget
+            high_watermark: Fraction of max_bytes above which eviction starts
+            low_watermark: Fraction of max_bytes eviction brings usage down to
+        """
+        if not 0 < low_watermark <= high_watermark <= 1:
+            raise ValueError("watermarks must satisfy 0 < low <= high <= 1")
+        
+        self.max_bytes = max_bytes
+        self.high_watermark = high_watermark
+        self.low_watermark = low_watermark
+        
+        self._lock = threading.RLock()
+        # Path to size, least recently used first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._pins: Dict[str, int] = {}
+        self._used = 0
+        self.evicted_files = 0
+        self.evicted_bytes = 0
+    
+    def __len__(self) -> int:
+        return len(self._files)
+    
+    def __contains__(self, path: str) -> bool:
+        return path in self._files
+    
+    @property
+    def used_bytes(self) -> int:
+        """Bytes used by tracked files."""
+        return self._used
+    
+    @property
+    def high_bytes(self) -> int:
+        """Usage in bytes above which eviction starts."""
+        return int(self.max_bytes * self.high_watermark)
+    
+    @property
+    def low_bytes(self) -> int:
+        """Usage in bytes eviction brings the total down to."""
+        return int(self.max_bytes * self.low_watermark)
+    
+    def add(self, path: str, size: Optional[int] = None) -> None:
+        """
+        Track a file as the most recently used one.
+        
+        Args:
+            path: File path
+            size: File size in bytes (read from disk when not given)
+        """
+        if size is None:
+            size = os.path.getsize(path)
+        with self._lock:
+            self._used += size - self._files.pop(path, 0)
+            self._files[path] = size
+    
+    def touch(self, path: str) -> None:
+        """Mark a tracked file as the most recently used one."""
+        with self._lock:
+            if path in self._files:
+                self._files.move_to_end(path)
+    
+    def discard(self, path: str) -> None:
+        """Stop tracking a file (removed by its owner)."""
+        with self._lock:
+            size = self._files.pop(path, None)
+            if size is not None:
+                self._used -= size
+            self._pins.pop(path, None)
+    
+    def pin(self, path: str) -> None:
+        """Protect a file from eviction, e.g. while it is being uploaded."""
+        with self._lock:
+            self._pins[path] = self._pins.get(path, 0) + 1
+    
+    def unpin(self, path: str) -> None:
+        """Drop one pin on a file."""
+        with self._lock:
+            count = self._pins.get(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+            else:
+                self._pins.pop(path, None)
+    
+    def is_pinned(self, path: str) -> bool:
+        """Check whether a file is protected from eviction."""
+        return path in self._pins
+    
+    def evict(self) -> List[str]:
+        """
+        Pick least recently used unpinned files for eviction if usage passed
+        the high watermark. Picked files are no longer tracked; the caller
+        deletes them.
+        
+        Returns:
+            Paths of the evicted files
+        """
+        evicted = []
+        with self._lock:
+            if self._used <= self.high_bytes:
+                return evicted
+            
+            for path in list(self._files):
+                if self._used <= self.low_bytes:
+                    break
+                if path in self._pins:
+                    continue
+                size = self._files.pop(path)
+                self._used -= size
+                self.evicted_files += 1
+                self.evicted_bytes += size
+                evicted.append(path)
+        return evicted
+    
+    def stats(self) -> Dict[str, int]:
+        """
+        Report current usage.
+        
+        Returns:
+            Dictionary with 'used_bytes', 'max_bytes', 'files', 'pinned_files',
+            'evicted_files' and 'evicted_bytes' keys
+        """
+        with self._lock:
+            return {
+                'used_bytes': self._used,
+                'max_bytes': self.max_bytes,
+                'files': len(self._files),
+                'pinned_files': len(self._pins),
+                'evicted_files': self.evicted_files,
+                'evicted_bytes': self.evicted_bytes,
+            }
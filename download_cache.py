@@ -0,0 +1,392 @@
+"""
+Download Cache Module
+Persistent, content-addressed cache of downloaded videos.
+Entries are keyed by (extractor, video id, format) and evicted by TTL and LRU
+within a disk-size budget. Files are reference counted so that a video that is
+still waiting to be delivered is never deleted.
+"""
+
+import os
+import json
+import time
+import threading
+from pathlib import Path
+from typing import IO, Callable, Dict, List, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: a single process per DOWNLOAD_DIR is assumed
+    fcntl = None
+
+from disk_quota import DiskQuota
+from state_store import StateStore
+
+LOCK_FILENAME = '.owner.lock'
+
+
+def claim_cache_dir(base_dir: str, max_slots: int = 64) -> Tuple[Path, Optional[IO]]:
+    """
+    Take exclusive ownership of a cache directory for this process.
+    
+    The cache index, reference counts and the orphan sweep only know about
+    files of their own process, so two processes must never share a cache
+    directory. The first process gets base_dir; processes started while it
+    runs get base_dir/worker-1, worker-2, ... (the same slot again after a
+    restart, so its cached files are reused). Ownership lasts while the
+    returned lock file stays open.
+    
+    Args:
+        base_dir: Configured download directory
+        max_slots: Worker subdirectories tried before giving up
+    
+    Returns:
+        (directory owned by this process, open lock file to keep alive)
+    
+    Raises:
+        RuntimeError: If every slot is taken
+    """
+    base = Path(base_dir)
+    base.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        return base, None
+    
+    for slot in range(max_slots + 1):
+        directory = base / f'worker-{slot}' if slot else base
+        directory.mkdir(exist_ok=True)
+        lock = open(directory / LOCK_FILENAME, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            continue
+        return directory, lock
+    raise RuntimeError(f"All {max_slots} cache directories under {base} are in use")
+
+
+class DownloadCache:
+    """Maps canonical video keys to downloaded files and their metadata."""
+    
+    INDEX_FILENAME = '.cache_index.json'
+    DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+    DEFAULT_TTL = 24 * 60 * 60
+    
+    def __init__(
+        self,
+        cache_dir: str,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttl: float = DEFAULT_TTL,
+        clock: Callable[[], float] = time.time,
+        state: Optional[StateStore] = None,
+        high_watermark: float = DiskQuota.DEFAULT_HIGH_WATERMARK,
+        low_watermark: float = DiskQuota.DEFAULT_LOW_WATERMARK
+    ):
+        """
+        Initialize the cache and load the persisted index.
+        
+        Args:
+            cache_dir: Directory holding the cached files and the index
+            max_bytes: Disk-size budget for unreferenced cached files
+            ttl: Seconds after the last access before an entry expires
+            clock: Time source (injectable for tests)
+            state: Store persisting the index entry by entry; without it
+                the whole index is rewritten to a JSON file on every change
+            high_watermark: Fraction of max_bytes at which LRU eviction starts
+            low_watermark: Fraction of max_bytes LRU eviction frees space down to
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / self.INDEX_FILENAME
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.state = state
+        
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict] = {}
+        self._aliases: Dict[str, str] = {}
+        self._refcounts: Dict[str, int] = {}
+        self._paths: Dict[str, str] = {}
+        # Usage is tracked incrementally; referenced files are pinned
+        self.quota = DiskQuota(max_bytes, high_watermark, low_watermark)
+        self._load()
+    
+    @staticmethod
+    def make_key(extractor: str, video_id: str, fmt: str = 'default') -> str:
+        """
+        Build a cache key.
+        
+        Args:
+            extractor: Extractor or platform name (case-insensitive)
+            video_id: Video ID reported by the platform
+            fmt: Format selector used for the download
+        
+        Returns:
+            Cache key string
+        """
+        return f"{extractor.lower()}:{video_id}:{fmt}"
+    
+    @property
+    def total_bytes(self) -> int:
+        """Total size of all cached files in bytes."""
+        return self.quota.used_bytes
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up an entry without taking a reference.
+        
+        Args:
+            key: Cache key or alias
+        
+        Returns:
+            Copy of the entry, or None if missing, expired or deleted
+        """
+        with self._lock:
+            key = self._aliases.get(key, key)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            
+            if self._is_expired(entry) and not self._refcounts.get(key):
+                self._remove(key)
+                self._save()
+                return None
+            
+            if not os.path.exists(entry['file_path']):
+                self._remove(key)
+                self._save()
+                return None
+            
+            entry['last_access'] = self.clock()
+            self.quota.touch(entry['file_path'])
+            self._persist(key)
+            return dict(entry)
+    
+    def acquire(self, key: str) -> Optional[Dict]:
+        """
+        Look up an entry and take a reference on its file.
+        
+        Args:
+            key: Cache key or alias
+        
+        Returns:
+            Copy of the entry, or None on a cache miss
+        """
+        with self._lock:
+            entry = self.get(key)
+            if entry is not None:
+                self._refcounts[entry['key']] = self._refcounts.get(entry['key'], 0) + 1
+                self.quota.pin(entry['file_path'])
+            return entry
+    
+    def put(
+        self,
+        key: str,
+        file_path: str,
+        metadata: Optional[Dict] = None,
+        aliases: Optional[List[str]] = None
+    ) -> Dict:
+        """
+        Add a downloaded file to the cache and take a reference on it.
+        
+        Args:
+            key: Canonical cache key
+            file_path: Path of the downloaded file
+            metadata: Extra fields to keep (title, duration, ...)
+            aliases: Additional keys resolving to this entry
+        
+        Returns:
+            Copy of the stored entry
+        """
+        now = self.clock()
+        entry = dict(metadata or {})
+        entry.update({
+            'key': key,
+            'file_path': str(file_path),
+            'size': os.path.getsize(file_path),
+            'created': now,
+            'last_access': now,
+        })
+        
+        with self._lock:
+            previous = self._entries.get(key)
+            if previous is not None and previous['file_path'] != entry['file_path']:
+                self._untrack(previous['file_path'])
+            self._entries[key] = entry
+            self._paths[entry['file_path']] = key
+            self.quota.add(entry['file_path'], entry['size'])
+            self._refcounts[key] = self._refcounts.get(key, 0) + 1
+            self.quota.pin(entry['file_path'])
+            self._persist(key)
+            for alias in aliases or []:
+                if alias != key:
+                    self._aliases[alias] = key
+                    if self.state is not None:
+                        self.state.set('cache_alias', alias, key)
+            self.evict()
+            self._save()
+            return dict(entry)
+    
+    def release(self, file_path: str) -> bool:
+        """
+        Drop a reference on a cached file.
+        
+        The file is only deleted later by eviction, once it is unreferenced
+        and either expired or over the disk budget.
+        
+        Args:
+            file_path: Path of the cached file
+        
+        Returns:
+            True if the file belongs to the cache, False otherwise
+        """
+        with self._lock:
+            key = self._key_for_path(str(file_path))
+            if key is None:
+                return False
+            
+            count = self._refcounts.get(key, 0) - 1
+            if count > 0:
+                self._refcounts[key] = count
+            else:
+                self._refcounts.pop(key, None)
+            self.quota.unpin(str(file_path))
+            
+            if self.evict():
+                self._save()
+            return True
+    
+    def contains_path(self, file_path: str) -> bool:
+        """Check whether a file is tracked by the cache."""
+        with self._lock:
+            return self._key_for_path(str(file_path)) is not None
+    
+    def evict(self) -> List[str]:
+        """
+        Delete unreferenced entries that expired or exceed the disk budget.
+        
+        Once usage passes the high watermark, least recently used entries
+        are deleted until it is back under the low watermark.
+        
+        Returns:
+            List of evicted cache keys
+        """
+        evicted = []
+        with self._lock:
+            for key, entry in list(self._entries.items()):
+                if self._is_expired(entry) and not self._refcounts.get(key):
+                    self._remove(key)
+                    evicted.append(key)
+            
+            for path in self.quota.evict():
+                key = self._paths.get(path)
+                if key is not None:
+                    self._remove(key)
+                    evicted.append(key)
+        return evicted
+    
+    def disk_usage(self) -> Dict[str, int]:
+        """
+        Report disk usage of the cache.
+        
+        Returns:
+            Dictionary with 'used_bytes', 'max_bytes', 'files', 'pinned_files',
+            'evicted_files' and 'evicted_bytes' keys
+        """
+        return self.quota.stats()
+    
+    def _is_expired(self, entry: Dict) -> bool:
+        """Check whether an entry has outlived its TTL."""
+        return self.clock() - entry['last_access'] > self.ttl
+    
+    def _key_for_path(self, file_path: str) -> Optional[str]:
+        """Find the cache key owning a file path."""
+        return self._paths.get(file_path)
+    
+    def _remove(self, key: str) -> None:
+        """Remove an entry, its aliases and its file."""
+        entry = self._entries.pop(key, None)
+        self._refcounts.pop(key, None)
+        stale = [alias for alias, target in self._aliases.items() if target == key]
+        for alias in stale:
+            del self._aliases[alias]
+        if self.state is not None:
+            self.state.delete('cache', key)
+            for alias in stale:
+                self.state.delete('cache_alias', alias)
+        if entry is not None:
+            self._untrack(entry['file_path'])
+            try:
+                if os.path.exists(entry['file_path']):
+                    os.remove(entry['file_path'])
+            except OSError:
+                pass  # File will be retried on the next eviction pass
+    
+    def _untrack(self, file_path: str) -> None:
+        """Drop a file from the path index and the disk usage."""
+        self._paths.pop(file_path, None)
+        self.quota.discard(file_path)
+    
+    def _persist(self, key: str) -> None:
+        """Write one entry to the state store (batched by the store)."""
+        if self.state is not None:
+            self.state.set('cache', key, self._entries[key])
+    
+    def _load(self) -> None:
+        """
+        Load the persisted index, dropping entries whose files are gone.
+        
+        Only indexed files are checked, so loading takes time proportional
+        to the number of entries, not to the contents of cache_dir.
+        """
+        if self.state is not None:
+            data = {'entries': self.state.load('cache'), 'aliases': self.state.load('cache_alias')}
+            if not data['entries']:
+                data = self._read_index_file() or data
+        else:
+            data = self._read_index_file() or {}
+        
+        for key, entry in data.get('entries', {}).items():
+            if os.path.exists(entry.get('file_path', '')):
+                self._entries[key] = entry
+            elif self.state is not None:
+                self.state.delete('cache', key)
+        self._aliases = {
+            alias: target for alias, target in data.get('aliases', {}).items()
+            if target in self._entries
+        }
+        for entry in sorted(self._entries.values(), key=lambda entry: entry['last_access']):
+            self._paths[entry['file_path']] = entry['key']
+            self.quota.add(entry['file_path'], entry['size'])
+        
+        if self.state is not None and self.index_path.exists():
+            # One-time import of an index written before the state store was used
+            for key in self._entries:
+                self._persist(key)
+            for alias, target in self._aliases.items():
+                self.state.set('cache_alias', alias, target)
+            self.state.flush()
+            try:
+                os.remove(self.index_path)
+            except OSError:
+                pass
+    
+    def _read_index_file(self) -> Optional[Dict]:
+        """Read the JSON index file, if there is one."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+    
+    def _save(self) -> None:
+        """Atomically write the index to disk (state-store entries are already persisted)."""
+        if self.state is not None:
+            return
+        data = {'entries': self._entries, 'aliases': self._aliases}
+        tmp_path = self.index_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass  # The in-memory cache keeps working without persistence
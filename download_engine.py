@@ -0,0 +1,186 @@
+"""
+Download Engine Module
+Tuning of yt-dlp's downloaders: parallel HLS/DASH fragments, HTTP chunking,
+read buffers, retries with exponential backoff and an optional external
+downloader, with per-platform overrides.
+"""
+
+import os
+import shlex
+from functools import partial
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import config
+
+
+def backoff_delay(n: int, initial: float, maximum: float) -> float:
+    """
+    Seconds to sleep before retry n (0-based), doubling from initial up to maximum.
+    
+    Args:
+        n: Number of the retry about to be made, starting at 0
+        initial: Delay before the first retry
+        maximum: Upper bound of the delay
+    
+    Returns:
+        Delay in seconds
+    """
+    return min(initial * 2 ** n, maximum)
+
+
+class DownloadEngine:
+    """Downloader settings translated into yt-dlp options per platform."""
+    
+    DEFAULT_CONCURRENT_FRAGMENTS = 4
+    # Range requests of this size dodge per-connection throttling on YouTube
+    DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+    DEFAULT_BUFFER_SIZE = 64 * 1024
+    DEFAULT_RETRIES = 10
+    DEFAULT_RETRY_BACKOFF = 1.0
+    DEFAULT_RETRY_BACKOFF_MAX = 30.0
+    
+    # Setting name -> environment variable (suffixed with _<PLATFORM> for overrides)
+    ENV_VARS = {
+        'concurrent_fragments': 'DOWNLOAD_FRAGMENTS',
+        'chunk_size': 'DOWNLOAD_CHUNK_SIZE',
+        'buffer_size': 'DOWNLOAD_BUFFER_SIZE',
+        'retries': 'DOWNLOAD_RETRIES',
+        'retry_backoff': 'DOWNLOAD_RETRY_BACKOFF',
+        'retry_backoff_max': 'DOWNLOAD_RETRY_BACKOFF_MAX',
+        'external_downloader': 'EXTERNAL_DOWNLOADER',
+        'external_downloader_args': 'EXTERNAL_DOWNLOADER_ARGS',
+    }
+    
+    def __init__(
+        self,
+        concurrent_fragments: int = DEFAULT_CONCURRENT_FRAGMENTS,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        buffer_size: int = DEFAULT_BUFFER_SIZE,
+        retries: int = DEFAULT_RETRIES,
+        retry_backoff: float = DEFAULT_RETRY_BACKOFF,
+        retry_backoff_max: float = DEFAULT_RETRY_BACKOFF_MAX,
+        external_downloader: Optional[str] = None,
+        external_downloader_args: Sequence[str] = (),
+        overrides: Optional[Dict[str, Dict[str, Any]]] = None
+    ):
+        """
+        Initialize the engine settings.
+        
+        Args:
+            concurrent_fragments: HLS/DASH fragments fetched at the same time
+            chunk_size: Bytes per HTTP range request for direct downloads
+                (0 fetches the file in one request)
+            buffer_size: Initial read buffer in bytes (0 keeps yt-dlp's default)
+            retries: Attempts per HTTP request and per fragment
+            retry_backoff: Seconds before the first retry; doubles per retry
+            retry_backoff_max: Upper bound of the retry delay
+            external_downloader: Program such as aria2c that takes over
+                downloads it supports (None uses yt-dlp's native downloaders;
+                yt-dlp falls back to them when the program is not installed)
+            external_downloader_args: Extra command-line arguments for it
+            overrides: Mapping of platform name to settings that replace the
+                defaults above for that platform
+        """
+        self.defaults = {
+            'concurrent_fragments': concurrent_fragments,
+            'chunk_size': chunk_size,
+            'buffer_size': buffer_size,
+            'retries': retries,
+            'retry_backoff': retry_backoff,
+            'retry_backoff_max': retry_backoff_max,
+            'external_downloader': external_downloader,
+            'external_downloader_args': list(external_downloader_args),
+        }
+        self.overrides: Dict[str, Dict[str, Any]] = {}
+        for platform, settings in (overrides or {}).items():
+            unknown = set(settings) - set(self.defaults)
+            if unknown:
+                raise ValueError(f"Unknown download engine settings for {platform}: {sorted(unknown)}")
+            self.overrides[platform.lower()] = dict(settings)
+    
+    @classmethod
+    def from_env(cls, platforms: Iterable[str]) -> 'DownloadEngine':
+        """
+        Build the engine from environment variables.
+        
+        Each variable in ENV_VARS sets the default, and the same name with a
+        ``_<PLATFORM>`` suffix (e.g. DOWNLOAD_FRAGMENTS_YOUTUBE) overrides it
+        for one platform.
+        
+        Args:
+            platforms: Platform names to look for overrides of
+        
+        Returns:
+            Configured DownloadEngine
+        """
+        defaults = {}
+        overrides: Dict[str, Dict[str, Any]] = {}
+        for setting, name in cls.ENV_VARS.items():
+            value = cls._read_env(setting, name)
+            if value is not None:
+                defaults[setting] = value
+            for platform in platforms:
+                value = cls._read_env(setting, f"{name}_{platform.upper()}")
+                if value is not None:
+                    overrides.setdefault(platform, {})[setting] = value
+        return cls(**defaults, overrides=overrides)
+    
+    @staticmethod
+    def _read_env(setting: str, name: str) -> Any:
+        """Parse one setting from the environment (None when unset)."""
+        if not os.getenv(name, '').strip():
+            return None
+        if setting == 'external_downloader':
+            return os.getenv(name).strip()
+        if setting == 'external_downloader_args':
+            return shlex.split(os.getenv(name))
+        if setting.startswith('retry_backoff'):
+            return config.get_float(name, 0.0)
+        return config.get_int(name, 0)
+    
+    def settings(self, platform: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Effective settings for a platform.
+        
+        Args:
+            platform: Platform name (None for the defaults)
+        
+        Returns:
+            Dictionary of setting name to value
+        """
+        settings = dict(self.defaults)
+        if platform:
+            settings.update(self.overrides.get(platform.lower(), {}))
+        return settings
+    
+    def params(self, platform: Optional[str] = None) -> Dict[str, Any]:
+        """
+        yt-dlp options implementing the settings for a platform.
+        
+        Args:
+            platform: Platform name (None for the defaults)
+        
+        Returns:
+            Dictionary of YoutubeDL parameters
+        """
+        settings = self.settings(platform)
+        retry_sleep = partial(
+            backoff_delay,
+            initial=settings['retry_backoff'],
+            maximum=settings['retry_backoff_max']
+        )
+        params: Dict[str, Any] = {
+            'concurrent_fragment_downloads': max(1, settings['concurrent_fragments']),
+            'retries': settings['retries'],
+            'fragment_retries': settings['retries'],
+            'retry_sleep_functions': {'http': retry_sleep, 'fragment': retry_sleep},
+        }
+        if settings['chunk_size'] > 0:
+            params['http_chunk_size'] = settings['chunk_size']
+        if settings['buffer_size'] > 0:
+            params['buffersize'] = settings['buffer_size']
+        if settings['external_downloader']:
+            params['external_downloader'] = {'default': settings['external_downloader']}
+            if settings['external_downloader_args']:
+                params['external_downloader_args'] = {'default': list(settings['external_downloader_args'])}
+        return params
@@ -0,0 +1,115 @@
+"""
+File ID Index Module
+Remembers the Telegram file_id of every uploaded video so later deliveries
+of the same source video can be sent by reference instead of re-uploading.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from state_store import StateStore
+
+
+class FileIdIndex:
+    """Persistent mapping from source video keys to Telegram file_ids."""
+    
+    NAMESPACE = 'file_id'
+    
+    def __init__(self, index_path: str, state: Optional[StateStore] = None):
+        """
+        Initialize the index and load any persisted entries.
+        
+        Args:
+            index_path: JSON file storing the index (imported into state
+                once when a state store is given)
+            state: Store persisting file_ids one by one instead of rewriting
+                the JSON file on every change
+        """
+        self.index_path = Path(index_path)
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.state = state
+        self._lock = threading.Lock()
+        self._file_ids: Dict[str, str] = {}
+        self._load()
+    
+    def get(self, key: str) -> Optional[str]:
+        """
+        Look up the Telegram file_id for a source video.
+        
+        Args:
+            key: Source video key (see DownloadCache.make_key)
+        
+        Returns:
+            Telegram file_id or None if the video was never uploaded
+        """
+        with self._lock:
+            return self._file_ids.get(key)
+    
+    def set(self, key: str, file_id: str) -> None:
+        """
+        Record the file_id returned by a successful upload.
+        
+        Args:
+            key: Source video key
+            file_id: Telegram file_id of the uploaded video
+        """
+        with self._lock:
+            if self._file_ids.get(key) == file_id:
+                return
+            self._file_ids[key] = file_id
+            if self.state is not None:
+                self.state.set(self.NAMESPACE, key, file_id)
+            else:
+                self._save()
+    
+    def remove(self, key: str) -> None:
+        """
+        Forget a file_id, e.g. after Telegram rejected it.
+        
+        Args:
+            key: Source video key
+        """
+        with self._lock:
+            if self._file_ids.pop(key, None) is not None:
+                if self.state is not None:
+                    self.state.delete(self.NAMESPACE, key)
+                else:
+                    self._save()
+    
+    def _load(self) -> None:
+        """Load the persisted index."""
+        if self.state is not None:
+            self._file_ids = self.state.load(self.NAMESPACE)
+            if self.index_path.exists():
+                # One-time import of an index written before the state store was used
+                for key, file_id in self._read_index_file().items():
+                    self._file_ids.setdefault(key, file_id)
+                    self.state.set(self.NAMESPACE, key, self._file_ids[key])
+                self.state.flush()
+                try:
+                    os.remove(self.index_path)
+                except OSError:
+                    pass
+        else:
+            self._file_ids = self._read_index_file()
+    
+    def _read_index_file(self) -> Dict[str, str]:
+        """Read the JSON index file, if there is one."""
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                return dict(json.load(f))
+        except (OSError, ValueError, TypeError):
+            return {}
+    
+    def _save(self) -> None:
+        """Atomically write the index to disk."""
+        tmp_path = self.index_path.with_suffix('.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._file_ids, f)
+            os.replace(tmp_path, self.index_path)
+        except OSError:
+            pass  # The in-memory index keeps working without persistence
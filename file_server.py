@@ -0,0 +1,391 @@
+"""
+File Server Module
+Built-in HTTP server for download links: serves the download directory
+(including the cache directories of worker processes below it) with Range
+requests, zero-copy sendfile and ETag revalidation, behind signed URLs that
+expire. Files stay referenced in the cache while a link to them is live.
+"""
+
+import os
+import hmac
+import time
+import heapq
+import base64
+import asyncio
+import hashlib
+import itertools
+import mimetypes
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, quote, unquote, urlsplit
+
+
+class LinkSigner:
+    """Signs file paths with an expiry time using HMAC-SHA256."""
+    
+    DEFAULT_TTL = 24 * 3600
+    
+    def __init__(self, secret: bytes, ttl: int = DEFAULT_TTL, clock: Callable[[], float] = time.time):
+        """
+        Initialize the signer.
+        
+        Args:
+            secret: HMAC key; links signed with another key are rejected
+            ttl: Seconds a link stays valid
+            clock: Wall-clock time source (injectable for tests)
+        """
+        if not secret:
+            raise ValueError("secret must not be empty")
+        self.secret = secret
+        self.ttl = ttl
+        self.clock = clock
+    
+    def sign(self, name: str, expires: Optional[int] = None) -> Tuple[int, str]:
+        """
+        Sign a file path.
+        
+        Args:
+            name: File path relative to the served directory, with forward slashes
+            expires: Unix time the link expires (defaults to now + ttl)
+        
+        Returns:
+            Tuple of (expires, signature)
+        """
+        if expires is None:
+            expires = int(self.clock()) + self.ttl
+        return expires, self._signature(name, expires)
+    
+    def verify(self, name: str, expires: str, signature: str) -> Optional[bool]:
+        """
+        Check a signed link.
+        
+        Args:
+            name: File path from the URL
+            expires: Expiry from the URL
+            signature: Signature from the URL
+        
+        Returns:
+            True if valid, False if the signature is wrong, None if the link expired
+        """
+        try:
+            expires_at = int(expires)
+        except (TypeError, ValueError):
+            return False
+        if not hmac.compare_digest(self._signature(name, expires_at), signature or ''):
+            return False
+        if expires_at < self.clock():
+            return None
+        return True
+    
+    def _signature(self, name: str, expires: int) -> str:
+        digest = hmac.new(self.secret, f"{name}:{expires}".encode('utf-8'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:16]).rstrip(b'=').decode('ascii')
+
+
+class FileServer:
+    """Async HTTP/1.1 server for signed links to files under one directory."""
+    
+    IDLE_TIMEOUT = 30.0
+    MAX_HEADER_LINES = 100
+    STATUS = {
+        200: 'OK', 206: 'Partial Content', 304: 'Not Modified', 400: 'Bad Request',
+        403: 'Forbidden', 404: 'Not Found', 405: 'Method Not Allowed', 410: 'Gone',
+        416: 'Range Not Satisfiable',
+    }
+    
+    def __init__(
+        self,
+        root: str,
+        signer: LinkSigner,
+        base_url: str = '',
+        host: str = '0.0.0.0',
+        port: int = 8080,
+        sendfile: bool = True
+    ):
+        """
+        Initialize the server.
+        
+        Args:
+            root: Directory whose files, and files in its subdirectories, are
+                served (hidden files and directories never are)
+            signer: Signs and verifies links
+            base_url: Public URL links start with (defaults to http://host:port);
+                processes that only issue links need no running server
+            host: Address to listen on
+            port: Port to listen on (0 picks a free port)
+            sendfile: Send file bodies with zero-copy sendfile (False copies
+                them through user space, for comparison)
+        """
+        self.root = Path(root).resolve()
+        self.signer = signer
+        self.host = host
+        self.port = port
+        self.base_url = base_url.rstrip('/') or (self._default_base_url() if port else '')
+        self.sendfile = sendfile
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._links: List[Tuple[float, int, Optional[Callable[[], None]]]] = []
+        self._sequence = itertools.count()
+        self.bytes_sent = 0
+    
+    async def start(self) -> None:
+        """Start listening; the bound port is available as self.port."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        if not self.base_url:
+            self.base_url = self._default_base_url()
+    
+    @property
+    def is_serving(self) -> bool:
+        return self._server is not None
+    
+    async def close(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    def _default_base_url(self) -> str:
+        host = 'localhost' if self.host in ('0.0.0.0', '::', '') else self.host
+        return f"http://{host}:{self.port}"
+    
+    def link(self, file_path: str, on_expire: Optional[Callable[[], None]] = None) -> str:
+        """
+        Issue a signed, expiring URL for a file under the served directory.
+        
+        Args:
+            file_path: Path of the file
+            on_expire: Called once the link has expired, e.g. to release the
+                cache reference that kept the file on disk
+        
+        Returns:
+            Absolute URL of the file
+        
+        Raises:
+            ValueError: If the file is not under the served directory
+        """
+        name = self.relative_name(file_path)
+        expires, signature = self.signer.sign(name)
+        heapq.heappush(self._links, (expires, next(self._sequence), on_expire))
+        return f"{self.base_url}/{quote(name)}?e={expires}&s={signature}"
+    
+    def relative_name(self, file_path: str) -> str:
+        """
+        Path of a file relative to the served directory, as used in links.
+        
+        Raises:
+            ValueError: If the file is not under the served directory
+        """
+        return Path(file_path).resolve().relative_to(self.root).as_posix()
+    
+    def expire_links(self) -> int:
+        """
+        Run the callbacks of links that have expired (called by the periodic sweep).
+        
+        Returns:
+            Number of links expired
+        """
+        now = self.signer.clock()
+        expired = 0
+        while self._links and self._links[0][0] < now:
+            _, _, on_expire = heapq.heappop(self._links)
+            expired += 1
+            if on_expire is not None:
+                on_expire()
+        return expired
+    
+    @property
+    def live_links(self) -> int:
+        """Number of issued links that have not been expired yet."""
+        return len(self._links)
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve requests on one connection until the client closes it."""
+        try:
+            while True:
+                request = await asyncio.wait_for(self._read_request(reader), self.IDLE_TIMEOUT)
+                if request is None:
+                    break
+                method, target, version, headers = request
+                keep_alive = self._keep_alive(version, headers)
+                await self._respond(writer, method, target, headers, keep_alive)
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError, ValueError):
+            pass
+        finally:
+            writer.close()
+    
+    async def _read_request(self, reader: asyncio.StreamReader) -> Optional[Tuple[str, str, str, Dict[str, str]]]:
+        """Parse a request line and headers (None at end of stream)."""
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        parts = request_line.decode('latin-1').split()
+        if len(parts) != 3:
+            raise ValueError('Malformed request line')
+        
+        headers = {}
+        for _ in range(self.MAX_HEADER_LINES):
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+        else:
+            raise ValueError('Too many headers')
+        return parts[0], parts[1], parts[2], headers
+    
+    @staticmethod
+    def _keep_alive(version: str, headers: Dict[str, str]) -> bool:
+        connection = headers.get('connection', '').lower()
+        if version == 'HTTP/1.0':
+            return connection == 'keep-alive'
+        return connection != 'close'
+    
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        method: str,
+        target: str,
+        headers: Dict[str, str],
+        keep_alive: bool
+    ) -> None:
+        """Answer one request."""
+        if method not in ('GET', 'HEAD'):
+            await self._send_status(writer, 405, keep_alive, {'Allow': 'GET, HEAD'})
+            return
+        
+        url = urlsplit(target)
+        name = unquote(url.path.lstrip('/'))
+        query = parse_qs(url.query)
+        # Only plain files under root; index, state and lock files and '..' are hidden
+        if not name or any(not part or part.startswith('.') for part in name.split('/')):
+            await self._send_status(writer, 404, keep_alive)
+            return
+        
+        valid = self.signer.verify(name, query.get('e', [''])[0], query.get('s', [''])[0])
+        if not valid:
+            await self._send_status(writer, 403 if valid is False else 410, keep_alive)
+            return
+        
+        # Symlinks (or backslashes on Windows) must not lead outside root
+        path = (self.root / name).resolve()
+        try:
+            path.relative_to(self.root)
+        except ValueError:
+            await self._send_status(writer, 404, keep_alive)
+            return
+        
+        try:
+            file = open(path, 'rb')
+        except OSError:
+            await self._send_status(writer, 404, keep_alive)
+            return
+        
+        with file:
+            stat = os.fstat(file.fileno())
+            size = stat.st_size
+            etag = f'"{size:x}-{stat.st_mtime_ns:x}"'
+            expires = int(query['e'][0])
+            response_headers = {
+                'Content-Type': mimetypes.guess_type(name)[0] or 'application/octet-stream',
+                'Accept-Ranges': 'bytes',
+                'ETag': etag,
+                'Cache-Control': f"private, max-age={max(0, expires - int(self.signer.clock()))}",
+            }
+            
+            if etag in [tag.strip() for tag in headers.get('if-none-match', '').split(',')]:
+                await self._send_status(writer, 304, keep_alive, response_headers, body=False)
+                return
+            
+            status, start, length = 200, 0, size
+            range_header = headers.get('range')
+            if range_header and headers.get('if-range', etag) == etag:
+                byte_range = self.parse_range(range_header, size)
+                if byte_range is None:
+                    response_headers['Content-Range'] = f"bytes */{size}"
+                    await self._send_status(writer, 416, keep_alive, response_headers)
+                    return
+                if byte_range != (0, size):
+                    start, end = byte_range
+                    status, length = 206, end - start
+                    response_headers['Content-Range'] = f"bytes {start}-{end - 1}/{size}"
+            
+            response_headers['Content-Length'] = str(length)
+            writer.write(self._head(status, response_headers, keep_alive))
+            if method == 'GET' and length:
+                await writer.drain()
+                await self._send_body(writer, file, start, length)
+            await writer.drain()
+    
+    async def _send_body(self, writer: asyncio.StreamWriter, file, start: int, length: int) -> None:
+        """Write a byte range of a file to the connection."""
+        if self.sendfile:
+            loop = asyncio.get_running_loop()
+            await loop.sendfile(writer.transport, file, start, length)
+        else:
+            file.seek(start)
+            remaining = length
+            while remaining:
+                chunk = file.read(min(remaining, 256 * 1024))
+                if not chunk:
+                    break
+                writer.write(chunk)
+                await writer.drain()
+                remaining -= len(chunk)
+        self.bytes_sent += length
+    
+    @staticmethod
+    def parse_range(value: str, size: int) -> Optional[Tuple[int, int]]:
+        """
+        Parse a single-range Range header.
+        
+        Args:
+            value: Header value such as ``bytes=0-499``, ``bytes=500-`` or ``bytes=-500``
+            size: File size
+        
+        Returns:
+            (start, end) with end exclusive; (0, size) for headers that are
+            ignored (multiple ranges or other units); None if unsatisfiable
+        """
+        unit, _, spec = value.partition('=')
+        if unit.strip().lower() != 'bytes' or ',' in spec:
+            return 0, size
+        first, _, last = spec.strip().partition('-')
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix <= 0:
+                    return None
+                return max(0, size - suffix), size
+            start = int(first)
+            end = int(last) + 1 if last else size
+        except ValueError:
+            return 0, size
+        if start >= size or end <= start:
+            return None
+        return start, min(end, size)
+    
+    def _head(self, status: int, headers: Dict[str, str], keep_alive: bool) -> bytes:
+        lines = [f"HTTP/1.1 {status} {self.STATUS[status]}"]
+        lines.extend(f"{name}: {value}" for name, value in headers.items())
+        lines.append('Connection: keep-alive' if keep_alive else 'Connection: close')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+    
+    async def _send_status(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        keep_alive: bool,
+        headers: Optional[Dict[str, str]] = None,
+        body: bool = True
+    ) -> None:
+        """Send a response without a file body."""
+        headers = dict(headers or {})
+        payload = f"{self.STATUS[status]}\n".encode('latin-1') if body and status >= 400 else b''
+        if body:
+            headers['Content-Type'] = 'text/plain; charset=utf-8'
+            headers['Content-Length'] = str(len(payload))
+        writer.write(self._head(status, headers, keep_alive) + payload)
+        await writer.drain()
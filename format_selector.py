@@ -0,0 +1,142 @@
+"""
+Format Selector Module
+Chooses a yt-dlp format whose estimated size fits Telegram's upload limit.
+"""
+
+from typing import Dict, List, Optional, Sequence
+
+
+class FormatSelector:
+    """Size-aware format selection policy with a resolution fallback ladder."""
+    
+    # Telegram Bot API limit for files uploaded by bots
+    DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+    DEFAULT_HEIGHTS = (1080, 720, 480, 360, 240, 144)
+    
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        heights: Sequence[int] = DEFAULT_HEIGHTS,
+        allow_merge: bool = False
+    ):
+        """
+        Initialize the selector.
+        
+        Args:
+            max_bytes: Byte budget a selected format must fit
+            heights: Resolution ladder tried from highest to lowest
+            allow_merge: Whether separate video and audio streams may be
+                combined (requires ffmpeg)
+        """
+        self.max_bytes = max_bytes
+        self.heights = sorted(set(heights), reverse=True)
+        self.allow_merge = allow_merge
+    
+    @property
+    def profile(self) -> str:
+        """Short name of this policy, used in cache keys."""
+        return f"max{self.max_bytes}"
+    
+    def select(self, info: Dict) -> Dict:
+        """
+        Pick the best format from yt-dlp info that fits the byte budget.
+        
+        Args:
+            info: Info dictionary from extract_info(download=False)
+        
+        Returns:
+            Dictionary with 'format_id' (yt-dlp format spec or None for
+            yt-dlp's default), 'filesize' (estimated bytes or None), 'height',
+            'urls' (direct media URLs of the choice), 'formats' (the yt-dlp
+            formats making up the choice) and 'fits' (False when every format
+            is known to exceed the budget; the choice is then the smallest one)
+        """
+        duration = info.get('duration')
+        candidates = self._candidates(info.get('formats') or [], duration)
+        sized = [c for c in candidates if c['filesize'] is not None]
+        
+        if not sized:
+            # Nothing to compare against the budget; trust the top-level estimate
+            filesize = self.estimate_size(info, duration)
+            return {
+                'format_id': None,
+                'filesize': filesize,
+                'height': info.get('height'),
+                'urls': [info['url']] if info.get('url') else [],
+                'formats': [info] if info.get('url') else [],
+                'fits': filesize is None or filesize <= self.max_bytes,
+            }
+        
+        for index, height in enumerate(self.heights):
+            lower = self.heights[index + 1] if index + 1 < len(self.heights) else 0
+            # Unknown heights count as the lowest rung
+            rung = [
+                c for c in sized
+                if lower < (c['height'] or 1) <= height and c['filesize'] <= self.max_bytes
+            ]
+            if rung:
+                best = max(rung, key=lambda c: (c['height'] or 1, c['filesize']))
+                return dict(best, fits=True)
+        
+        # Nothing fits: the smallest format keeps the download (and any
+        # compression to the budget) proportional to the target size
+        smallest = min(sized, key=lambda c: c['filesize'])
+        return dict(smallest, fits=False)
+    
+    @staticmethod
+    def estimate_size(fmt: Dict, duration: Optional[float]) -> Optional[int]:
+        """
+        Estimate the size of a format in bytes.
+        
+        Args:
+            fmt: yt-dlp format (or info) dictionary
+            duration: Video duration in seconds, used with the bitrate
+        
+        Returns:
+            Estimated size in bytes or None if unknown
+        """
+        size = fmt.get('filesize') or fmt.get('filesize_approx')
+        if size:
+            return int(size)
+        if fmt.get('tbr') and duration:
+            return int(fmt['tbr'] * 1000 / 8 * duration)
+        return None
+    
+    def _candidates(self, formats: List[Dict], duration: Optional[float]) -> List[Dict]:
+        """Build selectable candidates from progressive and merged formats."""
+        candidates = []
+        video_only = []
+        audio_only = []
+        
+        for fmt in formats:
+            has_video = fmt.get('vcodec') not in (None, 'none')
+            has_audio = fmt.get('acodec') not in (None, 'none')
+            if not fmt.get('format_id'):
+                continue
+            if has_video and has_audio:
+                candidates.append(self._candidate([fmt], duration))
+            elif has_video:
+                video_only.append(fmt)
+            elif has_audio:
+                audio_only.append(fmt)
+        
+        if self.allow_merge and video_only and audio_only:
+            # Smallest known audio stream leaves the most room for video
+            sized_audio = [a for a in audio_only if self.estimate_size(a, duration)]
+            if sized_audio:
+                audio = min(sized_audio, key=lambda a: self.estimate_size(a, duration))
+                for video in video_only:
+                    candidates.append(self._candidate([video, audio], duration))
+        
+        return candidates
+    
+    def _candidate(self, parts: List[Dict], duration: Optional[float]) -> Dict:
+        """Describe a format made of one or more streams."""
+        sizes = [self.estimate_size(part, duration) for part in parts]
+        return {
+            'format_id': '+'.join(part['format_id'] for part in parts),
+            'filesize': sum(sizes) if all(sizes) else None,
+            'height': parts[0].get('height'),
+            'urls': [part['url'] for part in parts if part.get('url')],
+            'formats': parts,
+        }
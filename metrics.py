@@ -0,0 +1,406 @@
+"""
+Metrics Module
+Counters, gauges and histograms rendered in the Prometheus text exposition
+format, and a small HTTP server exposing them on /metrics.
+
+Recording a sample is a dictionary lookup plus a locked add, so the metrics
+can stay on the download and upload hot paths.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers cache hits (milliseconds) up to long downloads and uploads
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def _format_value(value: float) -> str:
+    """Format a sample value the way Prometheus expects."""
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    """Render a label set such as {platform="youtube"}."""
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class _Metric:
+    """Base class holding one child per label combination."""
+    
+    TYPE = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+    
+    def labels(self, *values: str):
+        """
+        Get the child for a label combination, creating it on first use.
+        
+        Args:
+            values: One string value per label name, in order
+        
+        Returns:
+            Child metric with the same recording methods as an unlabeled metric
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+    
+    def render(self) -> List[str]:
+        """Render the metric in the text exposition format."""
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.TYPE}']
+        for values, child in list(self._children.items()):
+            lines.extend(self._render_child(values, child))
+        return lines
+    
+    def _new_child(self):
+        raise NotImplementedError
+    
+    def _render_child(self, values: Tuple[str, ...], child) -> List[str]:
+        raise NotImplementedError
+
+
+class _Value:
+    """A single float guarded by a lock."""
+    
+    __slots__ = ('value', '_lock', 'function')
+    
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+        self.function: Optional[Callable[[], float]] = None
+    
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+    
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+    
+    def set(self, value: float) -> None:
+        self.value = value
+    
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read the value from a callable at scrape time instead."""
+        self.function = function
+    
+    def get(self) -> float:
+        if self.function is not None:
+            return self.function()
+        return self.value
+
+
+class Counter(_Metric):
+    """Monotonically increasing count."""
+    
+    TYPE = 'counter'
+    
+    def inc(self, amount: float = 1) -> None:
+        """Add to an unlabeled counter."""
+        self._children[()].inc(amount)
+    
+    def _new_child(self) -> _Value:
+        return _Value()
+    
+    def _render_child(self, values: Tuple[str, ...], child: _Value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}']
+
+
+class Gauge(Counter):
+    """Value that can go up and down, or be read from a callable when scraped."""
+    
+    TYPE = 'gauge'
+    
+    def set(self, value: float) -> None:
+        """Set an unlabeled gauge."""
+        self._children[()].set(value)
+    
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Read an unlabeled gauge from a callable at scrape time."""
+        self._children[()].set_function(function)
+
+
+class _HistogramValue:
+    """Bucket counts, sum and count of one histogram child."""
+    
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+    
+    def __init__(self, bounds: Tuple[float, ...]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float) -> None:
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+    
+    def time(self) -> '_Timer':
+        """Observe the duration of a with-block in seconds."""
+        return _Timer(self)
+
+
+class _Timer:
+    """Context manager observing elapsed time (a class is cheaper than a generator)."""
+    
+    __slots__ = ('histogram', 'start')
+    
+    def __init__(self, histogram: _HistogramValue):
+        self.histogram = histogram
+    
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+    
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Histogram(_Metric):
+    """Distribution of observed values over fixed buckets."""
+    
+    TYPE = 'histogram'
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+    
+    def observe(self, value: float) -> None:
+        """Record a value on an unlabeled histogram."""
+        self._children[()].observe(value)
+    
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.bounds)
+    
+    def _render_child(self, values: Tuple[str, ...], child: _HistogramValue) -> List[str]:
+        with child._lock:
+            counts = list(child.counts)
+            total = child.sum
+        lines = []
+        cumulative = 0
+        names = self.labelnames + ('le',)
+        for bound, count in zip(self.bounds + (float('inf'),), counts):
+            cumulative += count
+            labels = _format_labels(names, values + (_format_value(bound),))
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _format_labels(self.labelnames, values)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """Collection of metrics rendered together."""
+    
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+    
+    def register(self, metric: _Metric) -> _Metric:
+        """
+        Add a metric.
+        
+        Args:
+            metric: Counter, Gauge or Histogram
+        
+        Returns:
+            The metric, for assignment
+        """
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                logger.warning(f"Could not collect metric {metric.name}: {e}")
+        return '\n'.join(lines) + '\n'
+
+
+def error_type(error: Optional[str]) -> str:
+    """
+    Reduce an error message to a label value with bounded cardinality.
+    
+    Args:
+        error: Error text from a result dictionary ('Download failed: ...')
+    
+    Returns:
+        Snake-case error kind such as 'download_failed'
+    """
+    if not error:
+        return 'unknown'
+    kind = error.split(':', 1)[0].strip().lower()
+    return '_'.join(kind.split()[:4]) or 'unknown'
+
+
+class BotMetrics:
+    """The bot's metrics: per-stage latency, bytes, cache hits, queue depth and errors."""
+    
+    STAGES = ('metadata', 'download', 'transcode', 'upload', 'end_to_end')
+    
+    def __init__(self):
+        self.registry = Registry()
+        self.stage_seconds = self.registry.register(Histogram(
+            'bot_stage_seconds',
+            'Time spent per stage (metadata, download, transcode, upload, end_to_end) by platform.',
+            ('stage', 'platform')
+        ))
+        self.bytes_total = self.registry.register(Counter(
+            'bot_bytes_total',
+            'Bytes transferred by direction (download, upload) and platform.',
+            ('direction', 'platform')
+        ))
+        self.cache_requests_total = self.registry.register(Counter(
+            'bot_cache_requests_total',
+            'Cache lookups by cache (metadata, download, file_id) and result (hit, miss).',
+            ('cache', 'result')
+        ))
+        self.errors_total = self.registry.register(Counter(
+            'bot_errors_total',
+            'Failures by stage and error type.',
+            ('stage', 'type')
+        ))
+        self.rate_limited_total = self.registry.register(Counter(
+            'bot_rate_limited_links_total',
+            'Links refused by the per-user and per-chat rate limits.'
+        ))
+        self.queue_depth = self.registry.register(Gauge(
+            'bot_queue_depth', 'Tasks waiting in the job queue.'
+        ))
+        self.scheduler_waiting = self.registry.register(Gauge(
+            'bot_scheduler_waiting', 'Lookups and downloads waiting for a global slot.'
+        ))
+        self.pending_downloads = self.registry.register(Gauge(
+            'bot_pending_downloads', 'Videos waiting for a button press.'
+        ))
+        self.disk_usage_bytes = self.registry.register(Gauge(
+            'bot_disk_usage_bytes', 'Bytes used by cached downloads.'
+        ))
+    
+    def stage(self, stage: str, platform: str):
+        """
+        Time a stage.
+        
+        Args:
+            stage: One of STAGES
+            platform: Platform name
+        
+        Returns:
+            Context manager observing the block's duration
+        """
+        return self.stage_seconds.labels(stage, platform).time()
+    
+    def cache(self, cache: str, hit: bool) -> None:
+        """Count a cache lookup."""
+        self.cache_requests_total.labels(cache, 'hit' if hit else 'miss').inc()
+    
+    def error(self, stage: str, error: Optional[str]) -> None:
+        """Count a failure, classified by its error message."""
+        self.errors_total.labels(stage, error_type(error)).inc()
+    
+    def transferred(self, direction: str, platform: str, size: Optional[int]) -> None:
+        """Count transferred bytes."""
+        if size:
+            self.bytes_total.labels(direction, platform).inc(size)
+    
+    def render(self) -> str:
+        """Render all metrics."""
+        return self.registry.render()
+
+
+class MetricsServer:
+    """Minimal HTTP server answering GET /metrics."""
+    
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+    
+    def __init__(self, render: Callable[[], str], host: str = '127.0.0.1', port: int = 9100):
+        """
+        Initialize the server.
+        
+        Args:
+            render: Produces the response body on every scrape
+            host: Address to listen on (local only by default)
+            port: Port to listen on (0 picks a free port)
+        """
+        self.render = render
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+    
+    async def start(self) -> None:
+        """Start listening; the bound port is available as self.port."""
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+    
+    async def close(self) -> None:
+        """Stop listening."""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer one request and close the connection."""
+        try:
+            request_line = await reader.readline()
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass  # Headers are not needed
+            
+            parts = request_line.decode('latin-1').split()
+            if len(parts) >= 2 and parts[0] in ('GET', 'HEAD') and parts[1].split('?')[0] == '/metrics':
+                status, body = '200 OK', self.render().encode('utf-8')
+            else:
+                status, body = '404 Not Found', b'Not Found\n'
+            
+            writer.write(
+                f'HTTP/1.1 {status}\r\n'
+                f'Content-Type: {self.CONTENT_TYPE}\r\n'
+                f'Content-Length: {len(body)}\r\n'
+                'Connection: close\r\n\r\n'.encode('latin-1')
+            )
+            if parts and parts[0] != 'HEAD':
+                writer.write(body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
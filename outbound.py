@@ -0,0 +1,310 @@
+"""
+Outbound Module
+Central scheduler for messages the bot sends: every call to a chat waits for
+a token from a global and a per-chat bucket, interactive replies go ahead of
+progress edits, queued edits of the same message are merged, and calls hit
+by flood control are put back in the queue after the requested wait.
+"""
+
+import time
+import asyncio
+import logging
+from collections import deque
+from functools import partial
+from typing import Any, Callable, Coroutine, Deque, Dict, Hashable, List, Optional, Set, Tuple
+
+from telegram.error import RetryAfter
+
+from rate_limiter import RateLimiter, TokenBucket
+from telegram_request import RetryAfterLimiter, retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+class _Outgoing:
+    """One queued Bot API call and the callers waiting for its result."""
+    
+    __slots__ = ('callback', 'args', 'kwargs', 'endpoint', 'chat_id', 'key', 'priority',
+                 'max_retries', 'attempts', 'waiters', 'task')
+    
+    def __init__(self, callback, args, kwargs, endpoint: str, chat_id: Any,
+                 key: Optional[Hashable], priority: int, max_retries: int):
+        self.callback = callback
+        self.args = args
+        self.kwargs = kwargs
+        self.endpoint = endpoint
+        self.chat_id = chat_id
+        self.key = key
+        self.priority = priority
+        self.max_retries = max_retries
+        self.attempts = 0
+        self.waiters: List[asyncio.Future] = []
+        self.task: Optional[asyncio.Task] = None
+    
+    @property
+    def abandoned(self) -> bool:
+        """Whether every caller has stopped waiting (e.g. was cancelled)."""
+        return all(waiter.done() for waiter in self.waiters)
+    
+    def resolve(self, result: Any) -> None:
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_result(result)
+    
+    def fail(self, error: BaseException) -> None:
+        for waiter in self.waiters:
+            if not waiter.done():
+                waiter.set_exception(error)
+
+
+class OutboundScheduler(RetryAfterLimiter):
+    """
+    Rate limiter for ExtBot that queues calls to chats and sends them within
+    Telegram's limits.
+    
+    Calls carrying a chat_id are queued in one of two lanes and sent when
+    both the global bucket and the chat's bucket (a stricter one for groups
+    and channels) have a token; the interactive lane is always served first.
+    An edit of a message that still has an edit queued replaces the queued
+    one, and both callers get the result of the newer edit. Calls without a
+    chat (getMe, answerCallbackQuery, ...) are sent directly with the
+    RetryAfter handling of RetryAfterLimiter.
+    
+    ``rate_limit_args`` is an optional dict with ``priority`` (INTERACTIVE
+    or PROGRESS) and ``max_retries``.
+    """
+    
+    INTERACTIVE = 0
+    PROGRESS = 1
+    # Stale progress is not worth retrying; the reporter backs off itself
+    PROGRESS_ARGS = {'priority': PROGRESS, 'max_retries': 0}
+    
+    COALESCED_ENDPOINTS = frozenset({'editMessageText', 'editMessageCaption', 'editMessageReplyMarkup'})
+    
+    # Telegram's documented limits: ~30 messages/s overall, about one per
+    # second in a chat and 20 per minute in a group
+    DEFAULT_GLOBAL_RATE = 30
+    DEFAULT_CHAT_RATE = 60
+    DEFAULT_GROUP_RATE = 20
+    DEFAULT_CHAT_BURST = 5
+    
+    def __init__(
+        self,
+        global_rate: float = DEFAULT_GLOBAL_RATE,
+        chat_rate: int = DEFAULT_CHAT_RATE,
+        group_rate: int = DEFAULT_GROUP_RATE,
+        chat_burst: int = DEFAULT_CHAT_BURST,
+        max_retries: int = RetryAfterLimiter.DEFAULT_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Coroutine[Any, Any, None]] = asyncio.sleep
+    ):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            global_rate: Calls per second across all chats (0 = unlimited)
+            chat_rate: Calls per minute to one private chat (0 = unlimited)
+            group_rate: Calls per minute to one group or channel (0 = unlimited)
+            chat_burst: Calls a chat may receive at once
+            max_retries: Retries per call after RetryAfter before giving up
+            clock: Time source (injectable for tests)
+            sleep: Coroutine function used to wait (injectable for tests)
+        """
+        super().__init__(max_retries, clock, sleep)
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate), clock) if global_rate > 0 else None
+        self.chats = RateLimiter(chat_rate, chat_burst, clock)
+        self.groups = RateLimiter(group_rate, chat_burst, clock)
+        self._lanes: Tuple[Deque[_Outgoing], ...] = (deque(), deque())
+        self._queued_edits: Dict[Hashable, _Outgoing] = {}
+        self._sending_keys: Set[Hashable] = set()
+        self._in_flight: Set[asyncio.Task] = set()
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.coalesced = 0
+    
+    @property
+    def queued(self) -> int:
+        """Calls waiting to be sent."""
+        return sum(len(lane) for lane in self._lanes)
+    
+    async def shutdown(self) -> None:
+        """Stop sending; callers still waiting are cancelled."""
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for task in list(self._in_flight):
+            task.cancel()
+        for lane in self._lanes:
+            for item in lane:
+                for waiter in item.waiters:
+                    waiter.cancel()
+            lane.clear()
+        self._queued_edits.clear()
+    
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, int]]
+    ) -> Any:
+        """Queue a Bot API call to a chat and wait for its result."""
+        options = rate_limit_args or {}
+        max_retries = options.get('max_retries', self.max_retries)
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            return await super().process_request(callback, args, kwargs, endpoint, data, max_retries)
+        
+        key = None
+        if endpoint in self.COALESCED_ENDPOINTS and data.get('message_id') is not None:
+            key = (endpoint, chat_id, data['message_id'])
+        priority = min(max(options.get('priority', self.INTERACTIVE), 0), len(self._lanes) - 1)
+        item = _Outgoing(callback, args, kwargs, endpoint, chat_id, key, priority, max_retries)
+        waiter = asyncio.get_running_loop().create_future()
+        waiter.add_done_callback(partial(self._abandon, item))
+        item.waiters.append(waiter)
+        self._enqueue(item)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._run())
+        return await waiter
+    
+    def _enqueue(self, item: _Outgoing, retry: bool = False) -> None:
+        """Queue a call, merging it with a queued edit of the same message."""
+        queued = self._queued_edits.get(item.key) if item.key is not None else None
+        if queued is not None:
+            self.coalesced += 1
+            for waiter in item.waiters:
+                waiter.add_done_callback(partial(self._abandon, queued))
+            queued.waiters.extend(item.waiters)
+            if retry:
+                # The queued edit is newer than the one that hit flood control
+                return
+            queued.callback, queued.args, queued.kwargs = item.callback, item.args, item.kwargs
+            queued.max_retries = item.max_retries
+            if item.priority < queued.priority:
+                self._lanes[queued.priority].remove(queued)
+                queued.priority = item.priority
+                self._lanes[queued.priority].append(queued)
+            self._wakeup.set()
+            return
+        
+        lane = self._lanes[item.priority]
+        if retry:
+            lane.appendleft(item)
+        else:
+            lane.append(item)
+        if item.key is not None:
+            self._queued_edits[item.key] = item
+        self._wakeup.set()
+    
+    def _abandon(self, item: _Outgoing, waiter: asyncio.Future) -> None:
+        """Cancel a call being sent once every caller waiting for it was cancelled."""
+        if not waiter.cancelled():
+            return
+        # Queued calls nobody waits for are dropped by the dispatcher
+        if item.task is not None and not item.task.done() and item.abandoned:
+            item.task.cancel()
+    
+    def _chat_bucket(self, chat_id: Any) -> Optional[TokenBucket]:
+        """Bucket of a chat; groups and channels have negative or @username IDs."""
+        is_group = not isinstance(chat_id, int) or chat_id < 0
+        return (self.groups if is_group else self.chats).bucket(chat_id)
+    
+    def _blocked_for(self, item: _Outgoing, now: float) -> Optional[float]:
+        """Seconds until a call may be sent (0 = now, None = until another call finishes)."""
+        if item.key is not None and item.key in self._sending_keys:
+            return None
+        paused = max(self._paused_until.get(item.chat_id, 0.0), self._paused_until.get(None, 0.0)) - now
+        bucket = self._chat_bucket(item.chat_id)
+        return max(0.0, paused, bucket.retry_after() if bucket is not None else 0.0)
+    
+    def _dispatch_ready(self) -> Optional[float]:
+        """
+        Start every call that may be sent now, interactive lane first.
+        
+        Returns:
+            Seconds until the next queued call may be sent (None to wait for new calls)
+        """
+        now = self.clock()
+        wait = None
+        for lane in self._lanes:
+            for item in list(lane):
+                if item.abandoned:
+                    self._dequeue(lane, item)
+                    continue
+                blocked = self._blocked_for(item, now)
+                if blocked is None:
+                    continue
+                if blocked > 0:
+                    wait = blocked if wait is None else min(wait, blocked)
+                    continue
+                if self.global_bucket is not None and not self.global_bucket.consume():
+                    retry_after = self.global_bucket.retry_after()
+                    return retry_after if wait is None else min(wait, retry_after)
+                bucket = self._chat_bucket(item.chat_id)
+                if bucket is not None:
+                    bucket.consume()
+                self._dequeue(lane, item)
+                self._start(item)
+        return wait
+    
+    def _dequeue(self, lane: Deque[_Outgoing], item: _Outgoing) -> None:
+        lane.remove(item)
+        if item.key is not None and self._queued_edits.get(item.key) is item:
+            del self._queued_edits[item.key]
+    
+    def _start(self, item: _Outgoing) -> None:
+        """Send a call in the background."""
+        if item.key is not None:
+            self._sending_keys.add(item.key)
+        item.task = asyncio.create_task(self._send(item))
+        self._in_flight.add(item.task)
+        item.task.add_done_callback(self._in_flight.discard)
+    
+    async def _send(self, item: _Outgoing) -> None:
+        """Make the call and hand its result to the callers, or queue it again."""
+        try:
+            result = await item.callback(*item.args, **item.kwargs)
+        except RetryAfter as e:
+            delay = retry_after_seconds(e)
+            # Group and channel limits are per chat; anything else pauses all calls
+            self._pause(item.chat_id, delay)
+            if item.attempts < item.max_retries and not item.abandoned:
+                item.attempts += 1
+                self.retries += 1
+                logger.warning(f"Flood control on {item.endpoint} (chat {item.chat_id}): retrying in {delay:.0f}s")
+                self._enqueue(item, retry=True)
+            else:
+                item.fail(e)
+        except asyncio.CancelledError:
+            for waiter in item.waiters:
+                waiter.cancel()
+            raise
+        except Exception as e:
+            item.fail(e)
+        else:
+            self.sent += 1
+            item.resolve(result)
+        finally:
+            if item.key is not None:
+                self._sending_keys.discard(item.key)
+            self._wakeup.set()
+    
+    async def _run(self) -> None:
+        """Dispatch queued calls as tokens become available."""
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch_ready()
+            if delay is None:
+                await self._wakeup.wait()
+                continue
+            sleeper = asyncio.ensure_future(self.sleep(delay))
+            waker = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait((sleeper, waker), return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                sleeper.cancel()
+                waker.cancel()
@@ -0,0 +1,318 @@
+"""
+Pending Store Module
+Bounded, expiring store for downloads waiting for a button press.
+"""
+
+import json
+import time
+import sqlite3
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+from state_store import StateStore
+
+
+class PendingDownloadStore:
+    """Holds pending downloads keyed by the token used in button callback data."""
+    
+    DEFAULT_MAX_SIZE = 10000
+    DEFAULT_TTL = 60 * 60
+    NAMESPACE = 'pending'
+    
+    def __init__(
+        self,
+        max_size: int = DEFAULT_MAX_SIZE,
+        ttl: float = DEFAULT_TTL,
+        on_expire: Optional[Callable[[Dict], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        state: Optional[StateStore] = None
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            max_size: Maximum number of pending entries; the oldest is dropped first
+            ttl: Seconds an entry stays valid after it was added
+            on_expire: Called with the data of every entry dropped without
+                being claimed (expired or pushed out by max_size)
+            clock: Time source (injectable for tests)
+            state: Store keeping entries across restarts; live entries are
+                loaded from it on start
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.clock = clock
+        self.state = state
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        
+        if state is not None:
+            self._load()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def add(self, data: Dict) -> str:
+        """
+        Store a pending download.
+        
+        Args:
+            data: Download data needed by the button callback
+        
+        Returns:
+            Short unique key for use in callback data
+        """
+        key = secrets.token_urlsafe(8)
+        while key in self._entries:
+            key = secrets.token_urlsafe(8)
+        
+        self._entries[key] = (self.clock() + self.ttl, data)
+        if self.state is not None:
+            self.state.set(self.NAMESPACE, key, data, expires_at=self.state.clock() + self.ttl)
+        
+        while len(self._entries) > self.max_size:
+            dropped_key, (_, dropped) = self._entries.popitem(last=False)
+            self._forget(dropped_key)
+            self._expire(dropped)
+        
+        return key
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a pending download without claiming it.
+        
+        Args:
+            key: Key returned by add
+        
+        Returns:
+            Download data or None if unknown or expired
+        """
+        item = self._entries.get(key)
+        if item is None or item[0] <= self.clock():
+            return None
+        return item[1]
+    
+    def pop(self, key: str) -> Optional[Dict]:
+        """
+        Claim a pending download, removing it from the store.
+        
+        Args:
+            key: Key returned by add
+        
+        Returns:
+            Download data or None if unknown or expired
+        """
+        item = self._entries.pop(key, None)
+        if item is None:
+            return None
+        self._forget(key)
+        
+        expires_at, data = item
+        if expires_at <= self.clock():
+            self._expire(data)
+            return None
+        return data
+    
+    def sweep(self) -> List[Dict]:
+        """
+        Drop every expired entry.
+        
+        Returns:
+            Data of the dropped entries
+        """
+        now = self.clock()
+        expired = []
+        # Entries are stored in insertion order with a fixed TTL, so the
+        # expired ones are always at the front
+        while self._entries:
+            key, (expires_at, data) = next(iter(self._entries.items()))
+            if expires_at > now:
+                break
+            del self._entries[key]
+            self._forget(key)
+            self._expire(data)
+            expired.append(data)
+        return expired
+    
+    def _load(self) -> None:
+        """Restore live entries from the state store, oldest first."""
+        wall_now = self.state.clock()
+        now = self.clock()
+        for key, data, expires_at in self.state.load_with_expiry(self.NAMESPACE):
+            # The store keeps wall-clock expiry; convert it to this store's clock
+            self._entries[key] = (now + (expires_at - wall_now), data)
+        while len(self._entries) > self.max_size:
+            dropped_key, _ = self._entries.popitem(last=False)
+            self._forget(dropped_key)
+    
+    def _forget(self, key: str) -> None:
+        """Remove an entry from the state store."""
+        if self.state is not None:
+            self.state.delete(self.NAMESPACE, key)
+    
+    def _expire(self, data: Dict) -> None:
+        """Notify the owner that an entry was dropped unclaimed."""
+        if self.on_expire is not None:
+            self.on_expire(data)
+
+
+class SQLitePendingStore:
+    """
+    Pending-download store kept in a SQLite file, so a button press can be
+    served by any process sharing the file. Same interface as
+    PendingDownloadStore.
+    """
+    
+    def __init__(
+        self,
+        db_path: str,
+        max_size: int = PendingDownloadStore.DEFAULT_MAX_SIZE,
+        ttl: float = PendingDownloadStore.DEFAULT_TTL,
+        on_expire: Optional[Callable[[Dict], None]] = None,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the store.
+        
+        Args:
+            db_path: SQLite database file (created if missing)
+            max_size: Maximum number of pending entries; the oldest is dropped first
+            ttl: Seconds an entry stays valid after it was added
+            on_expire: Called with the data of every entry this process
+                drops without it being claimed
+            clock: Wall-clock time source shared by all processes (injectable for tests)
+        """
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        
+        self.max_size = max_size
+        self.ttl = ttl
+        self.on_expire = on_expire
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS pending ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'key TEXT UNIQUE NOT NULL, '
+            'data TEXT NOT NULL, '
+            'expires_at REAL NOT NULL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS pending_expires ON pending (expires_at)')
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM pending').fetchone()[0]
+    
+    def add(self, data: Dict) -> str:
+        """
+        Store a pending download.
+        
+        Args:
+            data: JSON-serializable download data needed by the button callback
+        
+        Returns:
+            Short unique key for use in callback data
+        """
+        payload = json.dumps(data)
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                while True:
+                    key = secrets.token_urlsafe(8)
+                    try:
+                        self._conn.execute(
+                            'INSERT INTO pending (key, data, expires_at) VALUES (?, ?, ?)',
+                            (key, payload, self.clock() + self.ttl)
+                        )
+                        break
+                    except sqlite3.IntegrityError:
+                        continue
+                
+                dropped = self._conn.execute(
+                    'DELETE FROM pending WHERE seq IN ('
+                    'SELECT seq FROM pending ORDER BY seq DESC LIMIT -1 OFFSET ?'
+                    ') RETURNING data',
+                    (self.max_size,)
+                ).fetchall()
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        
+        for (row,) in dropped:
+            self._expire(json.loads(row))
+        return key
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a pending download without claiming it.
+        
+        Args:
+            key: Key returned by add
+        
+        Returns:
+            Download data or None if unknown or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT data FROM pending WHERE key = ? AND expires_at > ?', (key, self.clock())
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+    
+    def pop(self, key: str) -> Optional[Dict]:
+        """
+        Claim a pending download, removing it from the store.
+        
+        Only one process can claim a given key.
+        
+        Args:
+            key: Key returned by add
+        
+        Returns:
+            Download data or None if unknown or expired
+        """
+        with self._lock:
+            row = self._conn.execute(
+                'DELETE FROM pending WHERE key = ? RETURNING data, expires_at', (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        
+        data = json.loads(row[0])
+        if row[1] <= self.clock():
+            self._expire(data)
+            return None
+        return data
+    
+    def sweep(self) -> List[Dict]:
+        """
+        Drop every expired entry.
+        
+        Returns:
+            Data of the dropped entries
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                'DELETE FROM pending WHERE expires_at <= ? RETURNING data', (self.clock(),)
+            ).fetchall()
+        expired = [json.loads(row) for (row,) in rows]
+        for data in expired:
+            self._expire(data)
+        return expired
+    
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def _expire(self, data: Dict) -> None:
+        """Notify the owner that an entry was dropped unclaimed."""
+        if self.on_expire is not None:
+            self.on_expire(data)
@@ -0,0 +1,303 @@
+"""
+Platform Health Module
+Per-platform error-rate tracking with a circuit breaker that fails fast while
+a platform keeps failing, classification of download errors into transient
+and permanent ones, and jittered exponential backoff for retrying transient
+errors.
+"""
+
+import time
+import random
+import threading
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from download_engine import backoff_delay
+
+# Error kinds
+TRANSIENT = 'transient'      # Worth retrying: rate limits, timeouts, 5xx, network errors
+PERMANENT = 'permanent'      # The video itself cannot be fetched: private, removed, unsupported
+UNKNOWN = 'unknown'          # Anything else; not retried but counted against the platform
+UNAVAILABLE = 'unavailable'  # Refused without trying because the platform's circuit is open
+
+# Checked in this order: Instagram reports "rate-limit reached or login
+# required" and 404 pages come back as "Unable to download webpage"
+RATE_LIMIT_PATTERNS = (
+    'rate-limit', 'rate limit', 'too many requests', 'http error 429', 'not a bot',
+)
+PERMANENT_PATTERNS = (
+    'private video', 'video is private', 'this video is private', 'video unavailable',
+    'this video is unavailable', 'has been removed', 'was removed', 'been deleted',
+    'no longer available', 'does not exist', 'http error 404', 'http error 410',
+    'unsupported url', 'copyright', 'members-only', 'confirm your age', 'age-restricted',
+    'no video could be found', 'there is no video',
+)
+TRANSIENT_PATTERNS = (
+    'timed out', 'timeout', 'temporarily', 'try again later', 'connection', 'reset by peer',
+    'network is unreachable', 'remote end closed', 'unable to download webpage',
+    'http error 500', 'http error 502', 'http error 503', 'http error 504', 'eof occurred',
+    'ssl', 'name resolution', 'incomplete read',
+)
+
+
+def classify_error(error: Optional[str]) -> str:
+    """
+    Classify a download error message.
+    
+    Args:
+        error: Error text, e.g. from yt-dlp's DownloadError
+    
+    Returns:
+        TRANSIENT, PERMANENT or UNKNOWN
+    """
+    text = (error or '').lower()
+    if any(pattern in text for pattern in RATE_LIMIT_PATTERNS):
+        return TRANSIENT
+    if any(pattern in text for pattern in PERMANENT_PATTERNS):
+        return PERMANENT
+    if any(pattern in text for pattern in TRANSIENT_PATTERNS):
+        return TRANSIENT
+    return UNKNOWN
+
+
+class RetryPolicy:
+    """Retries of transient errors with jittered exponential backoff."""
+    
+    DEFAULT_RETRIES = 2
+    DEFAULT_BACKOFF = 1.0
+    DEFAULT_BACKOFF_MAX = 10.0
+    
+    def __init__(
+        self,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        backoff_max: float = DEFAULT_BACKOFF_MAX,
+        rng: Callable[[], float] = random.random
+    ):
+        """
+        Initialize the policy.
+        
+        Args:
+            retries: Retries after the first attempt (0 disables retrying)
+            backoff: Upper bound of the delay before the first retry; doubles per retry
+            backoff_max: Upper bound of any delay
+            rng: Source of uniform numbers in [0, 1) (injectable for tests)
+        """
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.backoff_max = backoff_max
+        self.rng = rng
+    
+    def should_retry(self, kind: Optional[str], attempt: int) -> bool:
+        """Whether to retry after attempt (0-based) failed with an error of this kind."""
+        return kind == TRANSIENT and attempt < self.retries
+    
+    def delay(self, attempt: int) -> float:
+        """
+        Seconds to wait before retry attempt (0-based).
+        
+        Full jitter: a uniform delay up to the exponential backoff, so callers
+        that failed together do not retry together.
+        """
+        return self.rng() * backoff_delay(attempt, self.backoff, self.backoff_max)
+
+
+class CircuitBreaker:
+    """
+    Error-rate circuit breaker.
+    
+    Closed: calls go through and their outcomes are kept for a sliding
+    window. Once the window holds at least min_requests outcomes and the
+    share of failures reaches failure_rate, the breaker opens and refuses
+    calls for cooldown seconds. Then it is half-open: a single probe call
+    goes through, and its outcome closes the breaker or opens it again.
+    """
+    
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+    
+    DEFAULT_FAILURE_RATE = 0.5
+    DEFAULT_MIN_REQUESTS = 5
+    DEFAULT_WINDOW = 60.0
+    DEFAULT_COOLDOWN = 30.0
+    
+    def __init__(
+        self,
+        failure_rate: float = DEFAULT_FAILURE_RATE,
+        min_requests: int = DEFAULT_MIN_REQUESTS,
+        window: float = DEFAULT_WINDOW,
+        cooldown: float = DEFAULT_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the breaker.
+        
+        Args:
+            failure_rate: Share of failed calls in the window that opens the breaker
+            min_requests: Calls the window must hold before the rate is judged
+            window: Seconds of outcomes considered
+            cooldown: Seconds the breaker stays open before a probe is let through
+            clock: Time source (injectable for tests)
+        """
+        self.failure_rate = failure_rate
+        self.min_requests = max(1, min_requests)
+        self.window = window
+        self.cooldown = cooldown
+        self.clock = clock
+        self.state = self.CLOSED
+        self.opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+    
+    def _prune(self, now: float) -> None:
+        while self._outcomes and self._outcomes[0][0] <= now - self.window:
+            self._outcomes.popleft()
+    
+    def allow(self) -> bool:
+        """Whether a call may be made now; in half-open state only the probe is allowed."""
+        now = self.clock()
+        if self.state == self.OPEN:
+            if now < self.opened_at + self.cooldown:
+                return False
+            self.state = self.HALF_OPEN
+            self._probe_started = None
+        if self.state == self.HALF_OPEN:
+            # A probe that never reported back (e.g. was cancelled) is replaced after a cooldown
+            if self._probe_started is not None and now < self._probe_started + self.cooldown:
+                return False
+            self._probe_started = now
+        return True
+    
+    def retry_after(self) -> float:
+        """Seconds until the next call will be allowed (0 when closed)."""
+        now = self.clock()
+        if self.state == self.OPEN:
+            return max(0.0, self.opened_at + self.cooldown - now)
+        if self.state == self.HALF_OPEN and self._probe_started is not None:
+            return max(0.0, self._probe_started + self.cooldown - now)
+        return 0.0
+    
+    def record(self, ok: bool) -> None:
+        """Record the outcome of an allowed call."""
+        now = self.clock()
+        self._prune(now)
+        self._outcomes.append((now, ok))
+        if self.state == self.HALF_OPEN:
+            if ok:
+                self.state = self.CLOSED
+                self._outcomes.clear()
+            else:
+                self._open(now)
+        elif self.state == self.CLOSED:
+            requests, failures = self.counts(now)
+            if requests >= self.min_requests and failures / requests >= self.failure_rate:
+                self._open(now)
+    
+    def counts(self, now: Optional[float] = None) -> Tuple[int, int]:
+        """(calls, failed calls) in the window."""
+        self._prune(self.clock() if now is None else now)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return len(self._outcomes), failures
+    
+    def _open(self, now: float) -> None:
+        self.state = self.OPEN
+        self.opened_at = now
+        self._probe_started = None
+
+
+class PlatformHealth:
+    """Circuit breakers and error counters per platform (thread-safe)."""
+    
+    def __init__(
+        self,
+        failure_rate: float = CircuitBreaker.DEFAULT_FAILURE_RATE,
+        min_requests: int = CircuitBreaker.DEFAULT_MIN_REQUESTS,
+        window: float = CircuitBreaker.DEFAULT_WINDOW,
+        cooldown: float = CircuitBreaker.DEFAULT_COOLDOWN,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the tracker; arguments are passed to each platform's CircuitBreaker.
+        
+        Args:
+            failure_rate: Share of failed calls in the window that opens a platform's circuit
+                (0 disables the breaker; errors are still counted)
+            min_requests: Calls the window must hold before the rate is judged
+            window: Seconds of outcomes considered
+            cooldown: Seconds a platform is refused before a probe call
+            clock: Time source (injectable for tests)
+        """
+        self.settings = {
+            'failure_rate': failure_rate, 'min_requests': min_requests,
+            'window': window, 'cooldown': cooldown, 'clock': clock,
+        }
+        self.enabled = failure_rate > 0
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+        self._last_error: Dict[str, str] = {}
+        self._lock = threading.Lock()
+    
+    def _breaker(self, platform: str) -> CircuitBreaker:
+        breaker = self._breakers.get(platform)
+        if breaker is None:
+            breaker = self._breakers[platform] = CircuitBreaker(**self.settings)
+            self._totals[platform] = {'success': 0, TRANSIENT: 0, PERMANENT: 0, UNKNOWN: 0, UNAVAILABLE: 0}
+        return breaker
+    
+    def allow(self, platform: str) -> bool:
+        """Whether a call to the platform may be made; refusals are counted."""
+        if not self.enabled:
+            return True
+        with self._lock:
+            allowed = self._breaker(platform).allow()
+            if not allowed:
+                self._totals[platform][UNAVAILABLE] += 1
+            return allowed
+    
+    def retry_after(self, platform: str) -> float:
+        """Seconds until the platform accepts calls again."""
+        with self._lock:
+            return self._breaker(platform).retry_after()
+    
+    def record(self, platform: str, kind: Optional[str], error: Optional[str] = None) -> None:
+        """
+        Record the outcome of a call.
+        
+        Args:
+            platform: Platform name
+            kind: None for success, else the error kind; permanent errors
+                mean the platform answered and count as healthy
+            error: Error text kept as the platform's last error
+        """
+        with self._lock:
+            breaker = self._breaker(platform)
+            self._totals[platform]['success' if kind is None else kind] += 1
+            if kind is not None:
+                self._last_error[platform] = error or kind
+            if self.enabled:
+                breaker.record(kind in (None, PERMANENT))
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Health of every platform seen so far.
+        
+        Returns:
+            Platform -> dict with 'state', 'requests' and 'failures' (in the
+            window), 'error_rate', 'retry_after', 'totals' (counts by outcome
+            since start) and 'last_error'
+        """
+        with self._lock:
+            report = {}
+            for platform, breaker in sorted(self._breakers.items()):
+                requests, failures = breaker.counts()
+                report[platform] = {
+                    'state': breaker.state,
+                    'requests': requests,
+                    'failures': failures,
+                    'error_rate': failures / requests if requests else 0.0,
+                    'retry_after': breaker.retry_after(),
+                    'totals': dict(self._totals[platform]),
+                    'last_error': self._last_error.get(platform),
+                }
+            return report
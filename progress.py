@@ -0,0 +1,286 @@
+"""
+Progress Module
+Live download and upload progress in the chat: yt-dlp progress hooks and
+upload byte counts are coalesced into throttled edits of one message, so
+the edits stay within Telegram's limits however often progress is reported.
+"""
+
+import time
+import asyncio
+import logging
+import threading
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram.error import RetryAfter
+
+from rate_limiter import TokenBucket
+from telegram_request import retry_after_seconds
+
+logger = logging.getLogger(__name__)
+
+
+def format_bytes(size: float) -> str:
+    """Human-readable byte count, e.g. 12.3 MB."""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def format_duration(seconds: float) -> str:
+    """Duration as m:ss or h:mm:ss."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+
+def render_progress(
+    action: str,
+    done: Optional[float],
+    total: Optional[float],
+    speed: Optional[float] = None,
+    eta: Optional[float] = None,
+    elapsed: Optional[float] = None
+) -> str:
+    """
+    Render a progress line such as
+    ``⏳ Downloading video... ▓▓▓▓░░░░░░ 42% of 120.0 MB at 3.1 MB/s, ETA 0:45``.
+    
+    Args:
+        action: What is in progress, e.g. "Downloading video"
+        done: Bytes transferred (None when unknown)
+        total: Total bytes (None when unknown)
+        speed: Bytes per second
+        eta: Seconds remaining
+        elapsed: Seconds since the transfer started, shown when nothing else is known
+    
+    Returns:
+        Message text
+    """
+    parts = [f"⏳ {action}..."]
+    if done is not None and total:
+        fraction = min(1.0, done / total)
+        filled = int(fraction * 10)
+        parts.append(f"{'▓' * filled}{'░' * (10 - filled)} {fraction:.0%} of {format_bytes(total)}")
+    elif done is not None:
+        parts.append(format_bytes(done))
+    elif total:
+        parts.append(format_bytes(total))
+    
+    details = []
+    if speed:
+        details.append(f"at {format_bytes(speed)}/s")
+    if eta is not None and done is not None:
+        details.append(f"ETA {format_duration(eta)}")
+    elif elapsed is not None and not speed:
+        details.append(f"{format_duration(elapsed)} elapsed")
+    line = ' '.join(parts)
+    if details:
+        # "... 120.0 MB at 3.1 MB/s, ETA 0:45" but "... 48.2 MB, 0:35 elapsed"
+        separator = ' ' if speed or len(parts) == 1 else ', '
+        line += separator + ', '.join(details)
+    return line
+
+
+class ProgressReporter:
+    """
+    Edits one message with the latest progress of a transfer.
+    
+    update() and hook() only record the newest state and, if no edit is
+    pending, schedule one on the event loop; they are cheap and safe to call
+    from worker threads on every received block. Edits go out at most once
+    per interval, skip unchanged text, and draw on a shared budget of edits
+    per second across all messages.
+    """
+    
+    DEFAULT_INTERVAL = 3.0
+    
+    def __init__(
+        self,
+        edit: Callable[[str], Awaitable],
+        interval: float = DEFAULT_INTERVAL,
+        budget: Optional[TokenBucket] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the reporter; must be created on the event loop.
+        
+        Args:
+            edit: Coroutine function replacing the message text
+            interval: Minimum seconds between edits of the message (0
+                disables progress reporting)
+            budget: Edits allowed per second across all reporters (None = unlimited)
+            clock: Time source (injectable for tests)
+        """
+        self._edit = edit
+        self.interval = interval
+        self.budget = budget
+        self.clock = clock
+        self._loop = asyncio.get_running_loop()
+        self._lock = threading.Lock()
+        self._state: Optional[Tuple] = None
+        self._scheduled = False
+        self._closed = interval <= 0
+        self._task: Optional[asyncio.Task] = None
+        self._last_edit = clock()
+        self._last_text: Optional[str] = None
+        self._started = clock()
+        self.edits = 0
+    
+    def update(
+        self,
+        action: str,
+        done: Optional[float] = None,
+        total: Optional[float] = None,
+        speed: Optional[float] = None,
+        eta: Optional[float] = None
+    ) -> None:
+        """
+        Record the latest progress; thread-safe.
+        
+        Args:
+            action: What is in progress, e.g. "Downloading video"
+            done: Bytes transferred so far
+            total: Total bytes, if known
+            speed: Bytes per second, if known
+            eta: Seconds remaining, if known
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._state = (action, done, total, speed, eta)
+            if self._scheduled:
+                return
+            self._scheduled = True
+        self._loop.call_soon_threadsafe(self._schedule)
+    
+    def hook(self, status: Dict) -> None:
+        """
+        yt-dlp progress hook feeding the download progress.
+        
+        Args:
+            status: Progress dictionary passed by yt-dlp
+        """
+        if status.get('status') != 'downloading':
+            return
+        total = status.get('total_bytes') or status.get('total_bytes_estimate')
+        self.update(
+            'Downloading video',
+            status.get('downloaded_bytes'),
+            total,
+            status.get('speed'),
+            status.get('eta')
+        )
+    
+    def transfer(self, action: str) -> Callable[[int, Optional[int]], None]:
+        """
+        Build a (bytes done, total bytes) callback that also derives speed and ETA.
+        
+        Args:
+            action: What is in progress, e.g. "Uploading video"
+        
+        Returns:
+            Progress callback for byte-counting transfers
+        """
+        start = self.clock()
+        
+        def report(done: int, total: Optional[int]) -> None:
+            elapsed = self.clock() - start
+            speed = done / elapsed if elapsed > 0 else None
+            eta = (total - done) / speed if speed and total else None
+            self.update(action, done, total, speed, eta)
+        
+        return report
+    
+    @asynccontextmanager
+    async def heartbeat(self, action: str, total: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        Show elapsed time while a transfer without byte progress runs.
+        
+        Args:
+            action: What is in progress, e.g. "Uploading video"
+            total: Size of the transfer, if known
+        """
+        if self._closed:
+            yield
+            return
+        
+        async def beat():
+            while True:
+                self.update(action, None, total)
+                await asyncio.sleep(self.interval)
+        
+        task = asyncio.create_task(beat())
+        try:
+            yield
+        finally:
+            task.cancel()
+    
+    async def __aenter__(self) -> 'ProgressReporter':
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+    
+    async def close(self) -> None:
+        """Stop reporting; a pending edit is dropped so it cannot overwrite the final message."""
+        with self._lock:
+            self._closed = True
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+    
+    def _schedule(self) -> None:
+        """Start the edit task for the current state (runs on the event loop)."""
+        if self._closed:
+            return
+        delay = max(0.0, self._last_edit + self.interval - self.clock())
+        self._task = self._loop.create_task(self._flush(delay))
+    
+    async def _flush(self, delay: float) -> None:
+        """Wait out the interval, then edit the message with the newest state."""
+        if delay:
+            await asyncio.sleep(delay)
+        with self._lock:
+            # Updates from here on schedule the next edit
+            self._scheduled = False
+            state = self._state
+        
+        action, done, total, speed, eta = state
+        text = render_progress(action, done, total, speed, eta, elapsed=self.clock() - self._started)
+        if text == self._last_text:
+            return
+        
+        self._last_edit = self.clock()
+        if self.budget is not None and not self.budget.consume():
+            # Shared edit budget spent: retry with newer state next interval
+            self._reschedule()
+            return
+        
+        try:
+            await self._edit(text)
+            self._last_text = text
+            self.edits += 1
+        except asyncio.CancelledError:
+            raise
+        except RetryAfter as e:
+            # Flood control tells us how long to stay quiet
+            self._last_edit = self.clock() + retry_after_seconds(e)
+            logger.debug(f"Could not update progress message: {e}")
+        except Exception as e:
+            logger.debug(f"Could not update progress message: {e}")
+    
+    def _reschedule(self) -> None:
+        """Schedule another edit of the current state unless one is pending."""
+        with self._lock:
+            if self._closed or self._scheduled:
+                return
+            self._scheduled = True
+        self._schedule()
@@ -0,0 +1,297 @@
+"""
+Rate Limiter Module
+Admission control for incoming links: token buckets per user and per chat,
+and a global concurrency budget shared fairly (round-robin) across users.
+"""
+
+import math
+import time
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Hashable, Optional, Tuple
+
+
+class TokenBucket:
+    """Classic token bucket: refills at a fixed rate up to its capacity."""
+    
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic):
+        """
+        Initialize a full bucket.
+        
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held (the allowed burst)
+            clock: Time source (injectable for tests)
+        """
+        if rate <= 0 or capacity < 1:
+            raise ValueError("rate must be positive and capacity at least 1")
+        
+        self.rate = rate
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = float(capacity)
+        self._updated = clock()
+    
+    @property
+    def full(self) -> bool:
+        """Whether the bucket is back at capacity (and can be forgotten)."""
+        self._refill()
+        return self._tokens >= self.capacity
+    
+    def available(self) -> int:
+        """Whole tokens that can be taken right now."""
+        self._refill()
+        return int(self._tokens)
+    
+    def consume(self, tokens: int = 1) -> bool:
+        """
+        Take tokens if the bucket holds enough.
+        
+        Args:
+            tokens: Number of tokens to take
+        
+        Returns:
+            True if the tokens were taken
+        """
+        self._refill()
+        if self._tokens < tokens:
+            return False
+        self._tokens -= tokens
+        return True
+    
+    def retry_after(self, tokens: int = 1) -> float:
+        """Seconds until the given number of tokens is available."""
+        self._refill()
+        return max(0.0, (tokens - self._tokens) / self.rate)
+    
+    def _refill(self) -> None:
+        """Add the tokens earned since the last update."""
+        now = self.clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+
+class RateLimiter:
+    """Token buckets keyed by user or chat ID."""
+    
+    DEFAULT_MAX_KEYS = 10000
+    
+    def __init__(
+        self,
+        per_minute: int,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+        max_keys: int = DEFAULT_MAX_KEYS
+    ):
+        """
+        Initialize the limiter.
+        
+        Args:
+            per_minute: Tokens each key earns per minute (0 disables the limit)
+            burst: Tokens a key may spend at once
+            clock: Time source (injectable for tests)
+            max_keys: Number of tracked keys above which full buckets are dropped
+        """
+        self.per_minute = per_minute
+        self.burst = max(1, burst)
+        self.clock = clock
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Hashable, TokenBucket]" = OrderedDict()
+    
+    @property
+    def enabled(self) -> bool:
+        return self.per_minute > 0
+    
+    def bucket(self, key: Hashable) -> Optional[TokenBucket]:
+        """
+        Get the bucket of a key, creating a full one for new keys.
+        
+        Args:
+            key: User or chat ID
+        
+        Returns:
+            The key's bucket, or None when the limit is disabled
+        """
+        if not self.enabled:
+            return None
+        
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune()
+            bucket = TokenBucket(self.per_minute / 60, self.burst, self.clock)
+            self._buckets[key] = bucket
+        else:
+            self._buckets.move_to_end(key)
+        return bucket
+    
+    def __len__(self) -> int:
+        return len(self._buckets)
+    
+    def _prune(self) -> None:
+        """Forget buckets that refilled completely; a new full bucket is identical."""
+        for key in [key for key, bucket in self._buckets.items() if bucket.full]:
+            del self._buckets[key]
+
+
+class AdmissionController:
+    """Admits links against the per-user and per-chat limits together."""
+    
+    def __init__(self, user_limits: RateLimiter, chat_limits: RateLimiter):
+        """
+        Initialize the controller.
+        
+        Args:
+            user_limits: Limiter keyed by Telegram user ID
+            chat_limits: Limiter keyed by Telegram chat ID
+        """
+        self.user_limits = user_limits
+        self.chat_limits = chat_limits
+    
+    def admit(self, user_id: int, chat_id: int, wanted: int) -> Tuple[int, float]:
+        """
+        Take tokens for as many of the wanted links as both limits allow.
+        
+        Args:
+            user_id: Sender of the links
+            chat_id: Chat the links were sent in
+            wanted: Number of links in the message
+        
+        Returns:
+            Tuple of (links admitted, seconds until the next link would be admitted)
+        """
+        buckets = [
+            bucket for bucket in (self.user_limits.bucket(user_id), self.chat_limits.bucket(chat_id))
+            if bucket is not None
+        ]
+        admitted = min([wanted] + [bucket.available() for bucket in buckets])
+        for bucket in buckets:
+            bucket.consume(admitted)
+        
+        retry_after = 0.0
+        if admitted < wanted:
+            retry_after = max(bucket.retry_after() for bucket in buckets)
+        return admitted, retry_after
+
+
+class FairScheduler:
+    """
+    Global concurrency budget. When all slots are busy, waiting requests are
+    served round-robin across users instead of first-come first-served, so
+    a user with many queued links cannot hold up everyone else.
+    """
+    
+    def __init__(self, capacity: int):
+        """
+        Initialize the scheduler.
+        
+        Args:
+            capacity: Requests running at the same time across all users
+        """
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        
+        self.capacity = capacity
+        self._active = 0
+        # Users with waiting requests, in the order they will next be served
+        self._waiters: "OrderedDict[Hashable, Deque[asyncio.Future]]" = OrderedDict()
+    
+    @property
+    def active(self) -> int:
+        """Requests currently holding a slot."""
+        return self._active
+    
+    @property
+    def waiting(self) -> int:
+        """Requests waiting for a slot."""
+        return sum(len(queue) for queue in self._waiters.values())
+    
+    def position(self, key: Hashable) -> int:
+        """
+        Queue position a new request from this user would get.
+        
+        Args:
+            key: User ID
+        
+        Returns:
+            0 if the request would start right away, otherwise its 1-based
+            place in the round-robin serving order
+        """
+        if self._active < self.capacity and not self._waiters:
+            return 0
+        
+        own = len(self._waiters.get(key, ()))
+        ahead = own
+        before = True
+        for user, queue in self._waiters.items():
+            if user == key:
+                before = False
+                continue
+            # Users served before this one in the round get one more turn
+            ahead += min(len(queue), own + 1 if before else own)
+        return ahead + 1
+    
+    async def acquire(self, key: Hashable) -> None:
+        """
+        Wait for a slot.
+        
+        Args:
+            key: User ID the request belongs to
+        """
+        if self._active < self.capacity and not self._waiters:
+            self._active += 1
+            return
+        
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(key, deque()).append(future)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was handed over just before the cancellation
+                self.release()
+            else:
+                self._discard(key, future)
+            raise
+    
+    def release(self) -> None:
+        """Give a slot back, handing it to the next user in turn."""
+        while self._waiters:
+            key, queue = self._waiters.popitem(last=False)
+            future = queue.popleft()
+            if queue:
+                self._waiters[key] = queue  # Back of the line for its next request
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+    
+    @asynccontextmanager
+    async def slot(self, key: Hashable) -> AsyncIterator[None]:
+        """Hold a slot for the duration of the block."""
+        await self.acquire(key)
+        try:
+            yield
+        finally:
+            self.release()
+    
+    def _discard(self, key: Hashable, future: asyncio.Future) -> None:
+        """Remove a cancelled waiter."""
+        queue = self._waiters.get(key)
+        if queue is None:
+            return
+        try:
+            queue.remove(future)
+        except ValueError:
+            pass
+        if not queue:
+            del self._waiters[key]
+
+
+def format_wait(seconds: float) -> str:
+    """Format a retry delay for a user-facing reply."""
+    seconds = math.ceil(seconds)
+    if seconds < 60:
+        return f"{seconds}s"
+    return f"{math.ceil(seconds / 60)} min"
@@ -0,0 +1,52 @@
+"""
+Single Flight Module
+Collapses concurrent calls for the same key into one shared execution.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """In-flight request table sharing one future per key."""
+    
+    def __init__(self):
+        """Initialize an empty in-flight table."""
+        self._inflight: Dict[str, asyncio.Future] = {}
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of keys currently being executed."""
+        return len(self._inflight)
+    
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run func for key, or wait for the call already in flight for key.
+        
+        The shared call is shielded, so a cancelled waiter does not cancel
+        the work other waiters depend on.
+        
+        Args:
+            key: Deduplication key
+            func: Coroutine function started when no call is in flight
+        
+        Returns:
+            Tuple of (result, shared) where shared is True for waiters that
+            joined a call started by someone else
+        """
+        future = self._inflight.get(key)
+        shared = future is not None
+        
+        if not shared:
+            future = asyncio.ensure_future(func())
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+        
+        return await asyncio.shield(future), shared
+    
+    def _forget(self, key: str, future: asyncio.Future) -> None:
+        """Remove a finished call from the table."""
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            future.exception()  # Mark as retrieved when every waiter went away
@@ -0,0 +1,250 @@
+"""
+State Store Module
+Restart-safe persistence for pending downloads, the download file index,
+Telegram file_ids and delivery records. Backed by SQLite in WAL mode;
+writes are buffered and committed in batches by a background thread.
+"""
+
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+
+class StateStore:
+    """Namespaced key-value store with batched writes and a delivery log."""
+    
+    DEFAULT_FLUSH_INTERVAL = 1.0
+    DEFAULT_MAX_BATCH = 1000
+    
+    def __init__(
+        self,
+        db_path: str,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        max_batch: int = DEFAULT_MAX_BATCH,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Open (or create) the store.
+        
+        Args:
+            db_path: SQLite database file
+            flush_interval: Seconds buffered writes may wait before they are
+                committed (0 commits every write immediately)
+            max_batch: Buffered writes that trigger an early commit
+            clock: Wall-clock time source (injectable for tests)
+        """
+        self.db_path = db_path
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.clock = clock
+        
+        self._lock = threading.Lock()
+        self._db_lock = threading.Lock()
+        self._writes: Dict[tuple, Optional[tuple]] = {}
+        self._deliveries: List[tuple] = []
+        
+        self._conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS kv ('
+            'namespace TEXT NOT NULL, '
+            'key TEXT NOT NULL, '
+            'value TEXT NOT NULL, '
+            'expires_at REAL, '
+            'PRIMARY KEY (namespace, key))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS kv_expiry ON kv (namespace, expires_at)')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS deliveries ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'chat_id INTEGER NOT NULL, '
+            'cache_key TEXT, '
+            'method TEXT NOT NULL, '
+            'file_id TEXT, '
+            'delivered_at REAL NOT NULL)'
+        )
+        self._conn.commit()
+        
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._flusher = None
+        if flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, name='state-flush', daemon=True)
+            self._flusher.start()
+    
+    def set(self, namespace: str, key: str, value: Any, expires_at: Optional[float] = None) -> None:
+        """
+        Store a JSON-serializable value (committed with the next batch).
+        
+        Args:
+            namespace: Kind of record ('pending', 'cache', ...)
+            key: Record key within the namespace
+            value: JSON-serializable value
+            expires_at: Wall-clock time after which the record is not loaded
+        """
+        self._buffer((namespace, key), (json.dumps(value), expires_at))
+    
+    def delete(self, namespace: str, key: str) -> None:
+        """
+        Remove a record (committed with the next batch).
+        
+        Args:
+            namespace: Kind of record
+            key: Record key within the namespace
+        """
+        self._buffer((namespace, key), None)
+    
+    def load(self, namespace: str) -> Dict[str, Any]:
+        """
+        Read every live record of a namespace.
+        
+        Expired records are deleted instead of returned, so the cost grows
+        with the number of stored records, not with anything on disk.
+        
+        Args:
+            namespace: Kind of record
+        
+        Returns:
+            Dictionary of key to value
+        """
+        return {key: value for key, value, _ in self.load_with_expiry(namespace)}
+    
+    def load_with_expiry(self, namespace: str) -> List[tuple]:
+        """
+        Read every live record of a namespace with its expiry, oldest expiry first.
+        
+        Args:
+            namespace: Kind of record
+        
+        Returns:
+            List of (key, value, expires_at) tuples
+        """
+        self.flush()
+        now = self.clock()
+        with self._db_lock:
+            self._conn.execute(
+                'DELETE FROM kv WHERE namespace = ? AND expires_at <= ?', (namespace, now)
+            )
+            rows = self._conn.execute(
+                'SELECT key, value, expires_at FROM kv WHERE namespace = ? ORDER BY expires_at',
+                (namespace,)
+            ).fetchall()
+            self._conn.commit()
+        return [(key, json.loads(value), expires_at) for key, value, expires_at in rows]
+    
+    def record_delivery(
+        self,
+        chat_id: int,
+        method: str,
+        cache_key: Optional[str] = None,
+        file_id: Optional[str] = None
+    ) -> None:
+        """
+        Log a delivered video (committed with the next batch).
+        
+        Args:
+            chat_id: Chat the video was delivered to
+            method: How it was delivered ('upload', 'file_id', 'stream', 'link')
+            cache_key: Source video key, if known
+            file_id: Telegram file_id of the sent video, if any
+        """
+        with self._lock:
+            self._deliveries.append((chat_id, cache_key, method, file_id, self.clock()))
+            full = len(self._writes) + len(self._deliveries) >= self.max_batch
+        self._after_write(full)
+    
+    def deliveries(self, limit: int = 100) -> List[Dict]:
+        """
+        Read the most recent delivery records.
+        
+        Args:
+            limit: Maximum number of records
+        
+        Returns:
+            Delivery dictionaries, newest first
+        """
+        self.flush()
+        with self._db_lock:
+            rows = self._conn.execute(
+                'SELECT chat_id, cache_key, method, file_id, delivered_at FROM deliveries '
+                'ORDER BY id DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [
+            {'chat_id': row[0], 'cache_key': row[1], 'method': row[2], 'file_id': row[3], 'delivered_at': row[4]}
+            for row in rows
+        ]
+    
+    def flush(self) -> None:
+        """Commit all buffered writes in one transaction."""
+        # Holding the database lock while taking the buffer keeps batches in order
+        with self._db_lock:
+            with self._lock:
+                writes, self._writes = self._writes, {}
+                deliveries, self._deliveries = self._deliveries, []
+            if not writes and not deliveries:
+                return
+            
+            upserts = [
+                (namespace, key, value[0], value[1])
+                for (namespace, key), value in writes.items() if value is not None
+            ]
+            deletes = [key for key, value in writes.items() if value is None]
+            
+            try:
+                with self._conn:
+                    self._conn.executemany(
+                        'INSERT INTO kv (namespace, key, value, expires_at) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (namespace, key) DO UPDATE SET '
+                        'value = excluded.value, expires_at = excluded.expires_at',
+                        upserts
+                    )
+                    self._conn.executemany('DELETE FROM kv WHERE namespace = ? AND key = ?', deletes)
+                    self._conn.executemany(
+                        'INSERT INTO deliveries (chat_id, cache_key, method, file_id, delivered_at) '
+                        'VALUES (?, ?, ?, ?, ?)',
+                        deliveries
+                    )
+            except sqlite3.Error:
+                # Put the batch back behind any newer writes so the next flush retries it
+                with self._lock:
+                    for key, value in writes.items():
+                        self._writes.setdefault(key, value)
+                    self._deliveries[:0] = deliveries
+                raise
+    
+    def close(self) -> None:
+        """Commit outstanding writes and close the database."""
+        self._stop.set()
+        self._wake.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+        with self._db_lock:
+            self._conn.close()
+    
+    def _buffer(self, key: tuple, value: Optional[tuple]) -> None:
+        """Queue a write; later writes to the same key replace earlier ones."""
+        with self._lock:
+            self._writes[key] = value
+            full = len(self._writes) + len(self._deliveries) >= self.max_batch
+        self._after_write(full)
+    
+    def _after_write(self, full: bool) -> None:
+        """Commit now when writes are unbuffered, or wake the flusher for a full batch."""
+        if self.flush_interval <= 0:
+            self.flush()
+        elif full:
+            self._wake.set()
+    
+    def _flush_loop(self) -> None:
+        """Background thread committing buffered writes every flush_interval."""
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except sqlite3.Error:
+                pass  # The batch stays buffered and is retried on the next pass
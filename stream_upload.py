@@ -0,0 +1,209 @@
+"""
+Stream Upload Module
+Pipes a video from the platform's media server straight into a Telegram
+sendVideo request, without writing it to download_dir first. The upload
+goes through the bot's upload connection pool and rate limiter like any
+other sendVideo call.
+"""
+
+import json
+import uuid
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+import httpx
+from telegram import Bot
+from telegram.error import RetryAfter
+
+from telegram_request import retry_after_error, retry_after_seconds, upload_client
+
+
+class StreamingUploadError(Exception):
+    """Raised when a streamed upload cannot be completed."""
+
+
+class StreamingUploader:
+    """Uploads single-stream videos to Telegram while they are being fetched."""
+    
+    DEFAULT_CHUNK_SIZE = 256 * 1024
+    
+    # Only plain HTTP downloads of containers Telegram plays as video are
+    # streamed; HLS/DASH fragments and merged formats need yt-dlp on disk
+    STREAMABLE_PROTOCOLS = {'http', 'https'}
+    STREAMABLE_EXTENSIONS = {'mp4', 'm4v', 'mov'}
+    
+    def __init__(
+        self,
+        chunk_size: int = DEFAULT_CHUNK_SIZE,
+        timeout: float = 60.0,
+        client: Optional[httpx.AsyncClient] = None
+    ):
+        """
+        Initialize the uploader.
+        
+        Args:
+            chunk_size: Bytes read from the source per chunk
+            timeout: Network timeout in seconds for reads and writes
+            client: HTTP client fetching the source, and uploading when the
+                bot has no pooled upload client (one is created when omitted)
+        """
+        self.chunk_size = chunk_size
+        self._client = client or httpx.AsyncClient(timeout=httpx.Timeout(timeout), follow_redirects=True)
+    
+    @classmethod
+    def can_stream(cls, stream: Optional[Dict]) -> bool:
+        """
+        Check whether a format can be piped without touching disk.
+        
+        Args:
+            stream: Stream description from fetch_metadata ('url', 'ext', 'protocol', ...)
+        
+        Returns:
+            True if the streaming path applies
+        """
+        return bool(
+            stream
+            and stream.get('url')
+            and stream.get('protocol', 'https') in cls.STREAMABLE_PROTOCOLS
+            and stream.get('ext') in cls.STREAMABLE_EXTENSIONS
+        )
+    
+    async def send_video(
+        self,
+        bot: Bot,
+        chat_id: int,
+        stream: Dict,
+        caption: str = '',
+        filename: str = 'video.mp4',
+        progress: Optional[Callable[[int, Optional[int]], None]] = None
+    ) -> Dict:
+        """
+        Fetch a video and forward its bytes to sendVideo as they arrive.
+        
+        The upload is made with the client of the bot's upload pool against
+        the bot's base_url, and is queued by the bot's rate limiter, which
+        also retries it (fetching the source again) after flood control.
+        
+        Args:
+            bot: Bot to send as
+            chat_id: Target chat
+            stream: Stream description from fetch_metadata
+            caption: Video caption
+            filename: File name reported to Telegram
+            progress: Called with (bytes sent, total bytes or None) as video
+                chunks are handed to the upload
+        
+        Returns:
+            The sent Message as a Bot API JSON dictionary
+        
+        Raises:
+            StreamingUploadError: If the source or Telegram rejects the transfer
+        """
+        if not self.can_stream(stream):
+            raise StreamingUploadError('Format cannot be streamed')
+        
+        fields = {
+            'chat_id': str(chat_id),
+            'caption': caption,
+            'supports_streaming': 'true',
+        }
+        args = (f"{bot.base_url}/sendVideo", stream, fields, filename, progress)
+        rate_limiter = getattr(bot, 'rate_limiter', None)
+        try:
+            if rate_limiter is None:
+                return await self._transfer(upload_client(bot.request), *args)
+            return await rate_limiter.process_request(
+                self._transfer, (upload_client(bot.request),) + args, {}, 'sendVideo', {'chat_id': chat_id}, None
+            )
+        except RetryAfter as e:
+            raise StreamingUploadError(f'Flood control exceeded, retry in {retry_after_seconds(e):.0f}s') from e
+    
+    async def _transfer(
+        self,
+        client: Optional[httpx.AsyncClient],
+        url: str,
+        stream: Dict,
+        fields: Dict[str, str],
+        filename: str,
+        progress: Optional[Callable[[int, Optional[int]], None]]
+    ) -> Dict:
+        """Fetch the source and upload it in one sendVideo request."""
+        client = client or self._client
+        boundary = uuid.uuid4().hex
+        head, tail = self._envelope(boundary, fields, filename)
+        
+        try:
+            async with self._client.stream(
+                'GET', stream['url'], headers=stream.get('http_headers') or {}, follow_redirects=True
+            ) as source:
+                if source.status_code != 200:
+                    raise StreamingUploadError(f'Source returned HTTP {source.status_code}')
+                
+                headers = {'Content-Type': f'multipart/form-data; boundary={boundary}'}
+                # A known source length gives a fixed Content-Length instead of chunked encoding
+                length = source.headers.get('Content-Length')
+                total = None
+                if length and length.isdigit() and 'Content-Encoding' not in source.headers:
+                    total = int(length)
+                    headers['Content-Length'] = str(len(head) + total + len(tail))
+                
+                response = await client.post(
+                    url,
+                    content=self._body(head, source.aiter_bytes(self.chunk_size), tail, progress, total),
+                    headers=headers
+                )
+        except httpx.HTTPError as e:
+            raise StreamingUploadError(f'Transfer failed: {str(e)}') from e
+        
+        try:
+            payload = response.json()
+        except ValueError:
+            raise StreamingUploadError(f'Telegram returned HTTP {response.status_code}')
+        
+        if not payload.get('ok'):
+            retry_after = (payload.get('parameters') or {}).get('retry_after')
+            if retry_after:
+                # Raised as RetryAfter so the rate limiter pauses the chat and retries
+                raise retry_after_error(retry_after)
+            raise StreamingUploadError(payload.get('description', 'Upload rejected'))
+        return payload['result']
+    
+    async def close(self) -> None:
+        """Close the uploader's own HTTP client (the bot's upload pool is left open)."""
+        await self._client.aclose()
+    
+    @staticmethod
+    def _envelope(boundary: str, fields: Dict[str, str], filename: str) -> List[bytes]:
+        """Build the multipart bytes around the streamed video part."""
+        parts = []
+        for name, value in fields.items():
+            parts.append(
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            )
+        parts.append(
+            f'--{boundary}\r\n'
+            f'Content-Disposition: form-data; name="video"; filename={json.dumps(filename)}\r\n'
+            f'Content-Type: video/mp4\r\n\r\n'
+        )
+        head = ''.join(parts).encode('utf-8')
+        tail = f'\r\n--{boundary}--\r\n'.encode('utf-8')
+        return [head, tail]
+    
+    @staticmethod
+    async def _body(
+        head: bytes,
+        chunks: AsyncIterator[bytes],
+        tail: bytes,
+        progress: Optional[Callable[[int, Optional[int]], None]] = None,
+        total: Optional[int] = None
+    ) -> AsyncIterator[bytes]:
+        """Yield the request body, pulling video chunks only as fast as they upload."""
+        yield head
+        sent = 0
+        async for chunk in chunks:
+            yield chunk
+            sent += len(chunk)
+            if progress:
+                progress(sent, total)
+        yield tail
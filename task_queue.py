@@ -0,0 +1,269 @@
+"""
+Task Queue Module
+Job queue connecting the update-handling front-end to download/upload
+workers. The in-process backend serves a single process; the SQLite
+backend lets worker processes share one queue file.
+"""
+
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Callable, Dict, Optional
+
+
+class InProcessTaskQueue:
+    """Task queue for workers running in the same event loop as the front-end."""
+    
+    def __init__(self, max_attempts: int = 3):
+        """
+        Initialize the queue.
+        
+        Args:
+            max_attempts: Times a task is handed out before it is dropped as failed
+        """
+        self.max_attempts = max_attempts
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._running: Dict[str, Dict] = {}
+    
+    def __len__(self) -> int:
+        return self._queue.qsize()
+    
+    async def put(self, kind: str, payload: Dict, max_attempts: Optional[int] = None) -> str:
+        """
+        Enqueue a task.
+        
+        Args:
+            kind: Task type used by the worker to pick a handler
+            payload: Task data
+            max_attempts: Attempts for this task (None uses the queue's
+                max_attempts; 1 for handlers that are not safe to repeat)
+        
+        Returns:
+            Task ID
+        """
+        task = {
+            'id': uuid.uuid4().hex, 'kind': kind, 'payload': payload, 'attempts': 0,
+            'max_attempts': max_attempts or self.max_attempts
+        }
+        self._queue.put_nowait(task)
+        return task['id']
+    
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Take the next task.
+        
+        Args:
+            timeout: Seconds to wait for a task (None waits forever)
+        
+        Returns:
+            Task dictionary with 'id', 'kind', 'payload' and 'attempts' keys,
+            or None if the timeout passed
+        """
+        try:
+            task = await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        
+        task['attempts'] += 1
+        self._running[task['id']] = task
+        return task
+    
+    async def complete(self, task_id: str) -> None:
+        """
+        Mark a task as done.
+        
+        Args:
+            task_id: ID of a task returned by get
+        """
+        self._running.pop(task_id, None)
+    
+    async def fail(self, task_id: str, error: str) -> bool:
+        """
+        Return a failed task to the queue unless it ran out of attempts.
+        
+        Args:
+            task_id: ID of a task returned by get
+            error: Failure description
+        
+        Returns:
+            True if the task will be retried
+        """
+        task = self._running.pop(task_id, None)
+        if task is None or task['attempts'] >= task['max_attempts']:
+            return False
+        
+        task['error'] = error
+        self._queue.put_nowait(task)
+        return True
+    
+    async def close(self) -> None:
+        """Release resources (nothing to do in process)."""
+
+
+class SQLiteTaskQueue:
+    """
+    Task queue stored in a SQLite file shared by the front-end and worker
+    processes. A handed-out task is leased; if its worker dies the lease
+    runs out and another worker picks the task up.
+    """
+    
+    DEFAULT_LEASE = 15 * 60
+    DEFAULT_POLL_INTERVAL = 0.2
+    
+    def __init__(
+        self,
+        db_path: str,
+        lease: float = DEFAULT_LEASE,
+        max_attempts: int = 3,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        clock: Callable[[], float] = time.time
+    ):
+        """
+        Initialize the queue.
+        
+        Args:
+            db_path: SQLite database file (created if missing)
+            lease: Seconds a worker may hold a task before it is handed out again
+            max_attempts: Times a task is handed out before it is kept as failed
+            poll_interval: Seconds between checks for new tasks while waiting
+            clock: Wall-clock time source shared by all processes (injectable for tests)
+        """
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tasks ('
+            'seq INTEGER PRIMARY KEY AUTOINCREMENT, '
+            'id TEXT UNIQUE NOT NULL, '
+            'kind TEXT NOT NULL, '
+            'payload TEXT NOT NULL, '
+            "state TEXT NOT NULL DEFAULT 'queued', "
+            'attempts INTEGER NOT NULL DEFAULT 0, '
+            'lease_until REAL, '
+            'error TEXT, '
+            'max_attempts INTEGER)'
+        )
+        # Queue files created before per-task attempt limits
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(tasks)')}
+        if 'max_attempts' not in columns:
+            self._conn.execute('ALTER TABLE tasks ADD COLUMN max_attempts INTEGER')
+        self._conn.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, seq)')
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE state = 'queued'").fetchone()[0]
+    
+    @property
+    def failed(self) -> int:
+        """Number of tasks kept after running out of attempts."""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM tasks WHERE state = 'failed'").fetchone()[0]
+    
+    async def put(self, kind: str, payload: Dict, max_attempts: Optional[int] = None) -> str:
+        """
+        Enqueue a task.
+        
+        Args:
+            kind: Task type used by the worker to pick a handler
+            payload: JSON-serializable task data
+            max_attempts: Attempts for this task (None uses the queue's
+                max_attempts; 1 for handlers that are not safe to repeat)
+        
+        Returns:
+            Task ID
+        """
+        task_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._execute,
+            'INSERT INTO tasks (id, kind, payload, max_attempts) VALUES (?, ?, ?, ?)',
+            (task_id, kind, json.dumps(payload), max_attempts)
+        )
+        return task_id
+    
+    async def get(self, timeout: Optional[float] = None) -> Optional[Dict]:
+        """
+        Take the next task, polling the database until one is available.
+        
+        Args:
+            timeout: Seconds to wait for a task (None waits forever)
+        
+        Returns:
+            Task dictionary with 'id', 'kind', 'payload' and 'attempts' keys,
+            or None if the timeout passed
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            task = await asyncio.to_thread(self._claim)
+            if task is not None:
+                return task
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            await asyncio.sleep(self.poll_interval)
+    
+    async def complete(self, task_id: str) -> None:
+        """
+        Mark a task as done, removing it from the queue.
+        
+        Args:
+            task_id: ID of a task returned by get
+        """
+        await asyncio.to_thread(self._execute, 'DELETE FROM tasks WHERE id = ?', (task_id,))
+    
+    async def fail(self, task_id: str, error: str) -> bool:
+        """
+        Return a failed task to the queue unless it ran out of attempts.
+        
+        Args:
+            task_id: ID of a task returned by get
+            error: Failure description
+        
+        Returns:
+            True if the task will be retried
+        """
+        row = await asyncio.to_thread(
+            self._execute,
+            "UPDATE tasks SET state = CASE WHEN attempts >= COALESCE(max_attempts, ?) THEN 'failed' ELSE 'queued' END, "
+            'lease_until = NULL, error = ? WHERE id = ? RETURNING state',
+            (self.max_attempts, error, task_id)
+        )
+        return bool(row) and row[0] == 'queued'
+    
+    async def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
+    
+    def _execute(self, sql: str, params: tuple) -> Optional[tuple]:
+        """Run one statement and return its first row."""
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+    
+    def _claim(self) -> Optional[Dict]:
+        """Lease the oldest queued (or abandoned) task to this worker."""
+        now = self.clock()
+        with self._lock:
+            # Abandoned tasks that used up their attempts are not handed out again
+            self._conn.execute(
+                "UPDATE tasks SET state = 'failed', lease_until = NULL, error = 'Lease expired' "
+                "WHERE state = 'running' AND lease_until <= ? AND attempts >= COALESCE(max_attempts, ?)",
+                (now, self.max_attempts)
+            )
+            # A single UPDATE keeps the claim atomic across processes
+            row = self._conn.execute(
+                "UPDATE tasks SET state = 'running', attempts = attempts + 1, lease_until = ? "
+                'WHERE seq = ('
+                "SELECT seq FROM tasks WHERE state = 'queued' "
+                "OR (state = 'running' AND lease_until <= ?) ORDER BY seq LIMIT 1"
+                ') RETURNING id, kind, payload, attempts',
+                (now + self.lease, now)
+            ).fetchone()
+        if row is None:
+            return None
+        return {'id': row[0], 'kind': row[1], 'payload': json.loads(row[2]), 'attempts': row[3]}
@@ -0,0 +1,262 @@
+"""
+Telegram Request Module
+Connection handling for Bot API calls: separate HTTPX connection pools for
+file uploads and for ordinary calls, settings from the environment, and a
+rate limiter that waits out Telegram's flood control (RetryAfter) and
+retries instead of failing the call.
+"""
+
+import os
+import time
+import asyncio
+import logging
+import warnings
+import importlib.util
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple, Union
+
+import httpx
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+from telegram.request import BaseRequest, HTTPXRequest, RequestData
+from telegram.warnings import PTBDeprecationWarning
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """Check whether httpx can speak HTTP/2 (needs the h2 package)."""
+    return importlib.util.find_spec('h2') is not None
+
+
+class PooledRequest(HTTPXRequest):
+    """HTTPXRequest whose connection pool can be shared with requests PTB cannot build."""
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The HTTPX client; requests made with it count against the pool size."""
+        return self._client
+
+
+def make_request(
+    pool_size: int,
+    read_timeout: float,
+    write_timeout: float,
+    connect_timeout: float,
+    pool_timeout: float,
+    http_version: str = '1.1'
+) -> PooledRequest:
+    """
+    Create an HTTPX request object for the Bot API.
+    
+    Args:
+        pool_size: Maximum open connections
+        read_timeout: Seconds to wait for a response
+        write_timeout: Seconds to wait for a request body to be sent (also
+            used for media, which HTTPXRequest otherwise gives its own timeout)
+        connect_timeout: Seconds to wait for a connection to be established
+        pool_timeout: Seconds to wait for a free connection from the pool
+        http_version: '1.1' or '2' (falls back to 1.1 without the h2 package)
+    
+    Returns:
+        Configured PooledRequest
+    """
+    if http_version.startswith('2') and not http2_available():
+        logger.warning("HTTP/2 needs the h2 package (pip install httpx[http2]); using HTTP/1.1")
+        http_version = '1.1'
+    return PooledRequest(
+        connection_pool_size=pool_size,
+        read_timeout=read_timeout,
+        write_timeout=write_timeout,
+        connect_timeout=connect_timeout,
+        pool_timeout=pool_timeout,
+        media_write_timeout=write_timeout,
+        http_version=http_version
+    )
+
+
+class RoutingRequest(BaseRequest):
+    """
+    Sends calls that upload files through their own connection pool.
+    
+    A long upload holds its connection for the whole transfer; with one
+    shared pool, a few uploads could leave replies and edits waiting for a
+    connection. The upload pool also bounds how many uploads run at once.
+    """
+    
+    def __init__(self, api: BaseRequest, upload: BaseRequest):
+        """
+        Initialize the router.
+        
+        Args:
+            api: Request object for calls without files
+            upload: Request object for calls uploading files
+        """
+        self.api = api
+        self.upload = upload
+    
+    @property
+    def read_timeout(self) -> Optional[float]:
+        return self.api.read_timeout
+    
+    async def initialize(self) -> None:
+        await asyncio.gather(self.api.initialize(), self.upload.initialize())
+    
+    async def shutdown(self) -> None:
+        await asyncio.gather(self.api.shutdown(), self.upload.shutdown())
+    
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: Optional[RequestData] = None,
+        **timeouts: Any
+    ) -> Tuple[int, bytes]:
+        """Forward the call to the pool matching its payload."""
+        target = self.upload if request_data is not None and request_data.contains_files else self.api
+        return await target.do_request(url, method, request_data, **timeouts)
+
+
+def upload_client(request: Optional[BaseRequest]) -> Optional[httpx.AsyncClient]:
+    """
+    HTTPX client of the pool a bot uploads files through.
+    
+    Args:
+        request: The bot's request object
+    
+    Returns:
+        The upload pool's client, or None if the request object has none
+    """
+    if isinstance(request, RoutingRequest):
+        request = request.upload
+    return request.client if isinstance(request, PooledRequest) else None
+
+
+def requests_from_env() -> RoutingRequest:
+    """
+    Build the Bot API request objects from environment settings.
+    
+    Returns:
+        RoutingRequest with the ordinary and the upload pool
+    """
+    http_version = os.getenv('TELEGRAM_HTTP_VERSION', '').strip() or '1.1'
+    api = make_request(
+        pool_size=max(1, config.get_int('TELEGRAM_POOL_SIZE', 128)),
+        read_timeout=config.get_float('TELEGRAM_READ_TIMEOUT', 10.0),
+        write_timeout=config.get_float('TELEGRAM_WRITE_TIMEOUT', 10.0),
+        connect_timeout=config.get_float('TELEGRAM_CONNECT_TIMEOUT', 10.0),
+        pool_timeout=config.get_float('TELEGRAM_POOL_TIMEOUT', 10.0),
+        http_version=http_version
+    )
+    upload = make_request(
+        pool_size=max(1, config.get_int('TELEGRAM_UPLOAD_POOL_SIZE', 8)),
+        read_timeout=config.get_float('TELEGRAM_UPLOAD_READ_TIMEOUT', 120.0),
+        write_timeout=config.get_float('TELEGRAM_UPLOAD_WRITE_TIMEOUT', 300.0),
+        connect_timeout=config.get_float('TELEGRAM_CONNECT_TIMEOUT', 10.0),
+        # Waiting for an upload slot is expected under load
+        pool_timeout=config.get_float('TELEGRAM_UPLOAD_POOL_TIMEOUT', 600.0),
+        http_version=http_version
+    )
+    return RoutingRequest(api, upload)
+
+
+def retry_after_seconds(error: RetryAfter) -> float:
+    """Seconds Telegram asked us to wait, as a float."""
+    with warnings.catch_warnings():
+        # PTB warns that the type will become timedelta; both are handled
+        warnings.simplefilter('ignore', PTBDeprecationWarning)
+        value: Union[int, float, timedelta] = error.retry_after
+    return value.total_seconds() if isinstance(value, timedelta) else float(value)
+
+
+def retry_after_error(seconds: float) -> RetryAfter:
+    """RetryAfter for a wait of seconds, without PTB's deprecation warning."""
+    with warnings.catch_warnings():
+        # RetryAfter reads its own retry_after property while initialising
+        warnings.simplefilter('ignore', PTBDeprecationWarning)
+        return RetryAfter(timedelta(seconds=seconds))
+
+
+class RetryAfterLimiter(BaseRateLimiter[int]):
+    """
+    Waits out flood control and retries the call.
+    
+    A RetryAfter pauses the chat it came from (or every call, when the limit
+    was not tied to a chat) so other calls do not run into the same limit
+    while the first one waits. ``rate_limit_args`` may override the number
+    of retries per call.
+    """
+    
+    DEFAULT_MAX_RETRIES = 3
+    
+    def __init__(
+        self,
+        max_retries: int = DEFAULT_MAX_RETRIES,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], Coroutine[Any, Any, None]] = asyncio.sleep
+    ):
+        """
+        Initialize the limiter.
+        
+        Args:
+            max_retries: Retries per call after RetryAfter before giving up
+            clock: Time source (injectable for tests)
+            sleep: Coroutine function used to wait (injectable for tests)
+        """
+        self.max_retries = max_retries
+        self.clock = clock
+        self.sleep = sleep
+        self._paused_until: Dict[Any, float] = {}
+        self.retries = 0
+    
+    async def initialize(self) -> None:
+        pass
+    
+    async def shutdown(self) -> None:
+        pass
+    
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int]
+    ) -> Any:
+        """Run a Bot API call, retrying it after flood control."""
+        max_retries = self.max_retries if rate_limit_args is None else rate_limit_args
+        chat_id = data.get('chat_id')
+        attempt = 0
+        while True:
+            await self._wait(chat_id)
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+                delay = retry_after_seconds(e)
+                # Group and channel limits are per chat; anything else pauses all calls
+                self._pause(chat_id, delay)
+                logger.warning(f"Flood control on {endpoint} (chat {chat_id}): retrying in {delay:.0f}s")
+    
+    def _pause(self, chat_id: Any, delay: float) -> None:
+        """Hold calls for a chat (None = all chats) until the delay has passed."""
+        now = self.clock()
+        for key in [key for key, until in self._paused_until.items() if until <= now]:
+            del self._paused_until[key]
+        until = now + delay
+        self._paused_until[chat_id] = max(until, self._paused_until.get(chat_id, 0.0))
+    
+    async def _wait(self, chat_id: Any) -> None:
+        """Sleep while the chat or all calls are paused."""
+        while True:
+            until = max(self._paused_until.get(chat_id, 0.0), self._paused_until.get(None, 0.0))
+            delay = until - self.clock()
+            if delay <= 0:
+                return
+            await self.sleep(delay)
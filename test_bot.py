@@ -0,0 +1,295 @@
+"""
+Unit tests for the bot's message handling
+"""
+
+import socket
+import asyncio
+from pathlib import Path
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+import download_cache
+from bot import TelegramBot
+from rate_limiter import AdmissionController, RateLimiter
+
+
+class StubMessage:
+    """Telegram message stand-in recording replies, edits and deletion."""
+    
+    def __init__(self, text: str = ''):
+        self.text = text
+        self.chat_id = 1
+        self.reply_markup = None
+        self.replies = []
+        self.sent = []
+        self.edits = []
+        self.deleted = False
+    
+    def get_bot(self):
+        return None
+    
+    async def reply_text(self, text, **kwargs):
+        self.replies.append(text)
+        self.sent.append(StubMessage(text))
+        self.sent[-1].reply_markup = kwargs.get('reply_markup')
+        return self.sent[-1]
+    
+    async def edit_text(self, text, **kwargs):
+        self.edits.append(text)
+    
+    async def delete(self):
+        self.deleted = True
+
+
+class StubQuery:
+    """Callback query stand-in recording the texts it is edited to."""
+    
+    def __init__(self, data: str = '', user_id: int = 1, message=None):
+        self.data = data
+        self.from_user = SimpleNamespace(id=user_id)
+        self.message = message
+        self.edits = []
+    
+    async def answer(self):
+        pass
+    
+    async def edit_message_text(self, text, **kwargs):
+        self.edits.append(text)
+
+
+def make_update(text: str, user_id: int = 1, chat_id: int = 1):
+    return SimpleNamespace(
+        message=StubMessage(text),
+        callback_query=None,
+        effective_user=SimpleNamespace(id=user_id),
+        effective_chat=SimpleNamespace(id=chat_id)
+    )
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """Bot with its settings pointed at a temporary directory."""
+    monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123:test')
+    monkeypatch.setenv('DOWNLOAD_DIR', str(tmp_path))
+    monkeypatch.setenv('TRANSCODE', 'false')
+    bot = TelegramBot()
+    yield bot
+    asyncio.run(bot.close())
+
+
+class TestAdmission:
+    """Test cases for the per-user limits on incoming links."""
+    
+    def test_rate_limited_links_are_not_resolved(self, service, monkeypatch):
+        """Test short links over the limit cause no outbound requests."""
+        service.admission = AdmissionController(RateLimiter(60, 1), RateLimiter(0, 0))
+        resolved = []
+        processed = []
+        
+        async def resolve_all(urls):
+            resolved.extend(url_info['url'] for url_info in urls)
+            return urls
+        
+        async def process_url(update, context, url_info):
+            processed.append(url_info['url'])
+            return True
+        
+        monkeypatch.setattr(service.short_links, 'resolve_all', resolve_all)
+        monkeypatch.setattr(service, 'process_url', process_url)
+        text = 'https://vm.tiktok.com/ZMabc/ https://vm.tiktok.com/ZMdef/ https://vm.tiktok.com/ZMghi/'
+        
+        asyncio.run(service.process_message(make_update(text), None))
+        assert resolved == ['https://vm.tiktok.com/ZMabc/']
+        assert processed == ['https://vm.tiktok.com/ZMabc/']
+        
+        blocked = make_update('https://vm.tiktok.com/ZMjkl/')
+        asyncio.run(service.process_message(blocked, None))
+        assert len(resolved) == 1
+        assert blocked.message.replies[0].startswith('🐢 Too many links')
+
+
+class TestProcessMessage:
+    """Test cases for handling several links in one message."""
+    
+    def test_failing_link_counts_as_failure(self, service, monkeypatch, caplog):
+        """Test a link whose processing raises is counted as failed and the others still finish."""
+        outcomes = {
+            'https://youtu.be/aaaaaaaaaaa': (0, True),
+            'https://youtu.be/bbbbbbbbbbb': (0.01, RuntimeError('boom')),
+            'https://youtu.be/ccccccccccc': (0.02, False),
+        }
+        
+        async def process_url(update, context, url_info):
+            delay, outcome = outcomes[url_info['url']]
+            await asyncio.sleep(delay)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+        
+        monkeypatch.setattr(service, 'process_url', process_url)
+        update = make_update(' '.join(outcomes))
+        
+        with caplog.at_level('INFO', logger='bot'):
+            asyncio.run(service.process_message(update, None))
+        
+        processing_msg = update.message.sent[0]
+        assert processing_msg.edits == [
+            '⏳ Processing 3 link(s)... ✅ 1 done, ❌ 0 failed',
+            '⏳ Processing 3 link(s)... ✅ 1 done, ❌ 1 failed',
+        ]
+        assert processing_msg.deleted
+        assert 'Completed processing 3 URLs (2 failed)' in caplog.text
+    
+    def test_processing_message_deleted_when_cancelled(self, service, monkeypatch):
+        """Test the processing message is removed even if handling is cancelled."""
+        async def process_url(update, context, url_info):
+            await asyncio.sleep(10)
+            return True
+        
+        monkeypatch.setattr(service, 'process_url', process_url)
+        update = make_update('https://youtu.be/aaaaaaaaaaa')
+        
+        async def run():
+            handling = asyncio.create_task(service.process_message(update, None))
+            await asyncio.sleep(0.01)
+            handling.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await handling
+        
+        asyncio.run(run())
+        assert update.message.sent[0].deleted
+
+
+class TestFitUpload:
+    """Test cases for preparing oversized videos for upload."""
+    
+    def test_transcoder_crash_releases_download(self, service, tmp_path):
+        """Test an unexpected transcoder error is reported and the download is released."""
+        video = tmp_path / 'abc.webm'
+        video.write_bytes(b'x' * 100)
+        service.downloader.cache.put('youtube:abc:max50', str(video))
+        
+        async def fit(file_path, source_key):
+            raise RuntimeError('process pool broke')
+        
+        service.transcoder = SimpleNamespace(needs_fitting=lambda path: True, fit=fit, shutdown=lambda wait: None)
+        query = StubQuery()
+        result = {'file_path': str(video), 'cache_key': 'youtube:abc:max50'}
+        
+        assert asyncio.run(service._fit_upload(query, result, 'youtube')) is None
+        assert query.edits[-1] == '❌ Upload failed: Unexpected error: process pool broke'
+        assert service.downloader.cache.disk_usage()['pinned_files'] == 0
+
+
+class TestLinks:
+    """Test cases for the Get Link button."""
+    
+    def press_link(self, service, monkeypatch, metadata):
+        """Offer a video with the given metadata and press Get Link; returns (download calls, query)."""
+        downloads = []
+        
+        async def fetch_metadata_async(url, platform):
+            return dict({'success': True, 'error': None, 'title': 'Clip', 'cache_key': 'youtube:big:max50'}, **metadata)
+        
+        async def download_video_async(url, platform, format_id=None, progress_hook=None):
+            downloads.append(format_id)
+            return {'success': True, 'file_path': str(Path(service.download_dir) / 'big.mp4'), 'cached': True}
+        
+        monkeypatch.setattr(service.downloader, 'fetch_metadata_async', fetch_metadata_async)
+        monkeypatch.setattr(service.downloader, 'download_video_async', download_video_async)
+        update = make_update('https://youtu.be/bigbigbigbi')
+        asyncio.run(service.process_url(update, None, {'url': 'https://youtu.be/bigbigbigbi', 'platform': 'youtube'}))
+        
+        buttons = update.message.sent[0].reply_markup.inline_keyboard[0]
+        query = StubQuery(buttons[0].callback_data, message=StubMessage())
+        asyncio.run(service.button_callback(SimpleNamespace(callback_query=query), None))
+        return downloads, query
+    
+    def test_oversized_video_link_uses_selected_format(self, service, monkeypatch):
+        """Test Get Link for a video over the upload limit downloads the chosen small format, not yt-dlp's default."""
+        downloads, query = self.press_link(service, monkeypatch, {
+            'format_id': '18', 'fits_upload': False, 'filesize': 90 * 1024 * 1024
+        })
+        assert downloads == ['18']
+        assert query.edits[-1].startswith('📥 Download Link for: Clip')
+    
+    def test_link_over_size_limit_is_refused(self, service, monkeypatch):
+        """Test a video over LINK_MAX_BYTES is not downloaded for a link."""
+        service.link_max_bytes = 100 * 1024 * 1024
+        downloads, query = self.press_link(service, monkeypatch, {
+            'format_id': None, 'fits_upload': False, 'filesize': 3 * 1024 ** 3
+        })
+        assert downloads == []
+        assert query.edits[-1] == '❌ Too large to download (~3072 MB, limit 100 MB).'
+    
+    def test_platform_urls_are_not_handed_out(self, service):
+        """Test a video that is not downloaded yet has no ready link, even with a single stream."""
+        video_data = {'cache_key': 'youtube:abc:max50', 'direct_urls': ['https://cdn.example/v.mp4?sig=1']}
+        assert service._existing_link(video_data) is None
+    
+    def test_cached_video_is_linked_from_our_server(self, service, tmp_path):
+        """Test a cached video is linked through WEB_SERVER_URL."""
+        video = tmp_path / 'abc.mp4'
+        video.write_bytes(b'x')
+        service.downloader.cache.put('youtube:abc:max50', str(video))
+        service.web_server_url = 'https://files.example/downloads'
+        
+        link = service._existing_link({'cache_key': 'youtube:abc:max50'})
+        assert link == 'https://files.example/downloads/abc.mp4'
+    
+    @pytest.mark.skipif(download_cache.fcntl is None, reason='needs fcntl')
+    def test_link_to_other_process_file_resolves(self, tmp_path, monkeypatch):
+        """Test a link issued by a second process for its worker directory is served by the first."""
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            port = probe.getsockname()[1]
+        for name, value in {
+            'TELEGRAM_BOT_TOKEN': '123:test', 'DOWNLOAD_DIR': str(tmp_path), 'TRANSCODE': 'false',
+            'FILE_SERVER_PORT': str(port), 'FILE_SERVER_HOST': '127.0.0.1', 'LINK_SECRET': 'shared',
+        }.items():
+            monkeypatch.setenv(name, value)
+        front, worker = TelegramBot(), TelegramBot()
+        assert Path(worker.download_dir) == tmp_path / 'worker-1'
+        
+        video = Path(worker.download_dir) / 'abc.mp4'
+        video.write_bytes(b'worker video')
+        worker.downloader.cache.put('youtube:abc:max50', str(video))
+        link = worker._existing_link({'cache_key': 'youtube:abc:max50'})
+        assert '/worker-1/abc.mp4?' in link
+        
+        async def fetch():
+            await front.start_file_server()
+            try:
+                async with httpx.AsyncClient() as client:
+                    return await client.get(link)
+            finally:
+                await front.close()
+                await worker.close()
+        
+        response = asyncio.run(fetch())
+        assert response.status_code == 200
+        assert response.content == b'worker video'
+
+
+class TestLifecycle:
+    """Test cases for starting and stopping the bot."""
+    
+    @pytest.mark.skipif(download_cache.fcntl is None, reason='needs fcntl')
+    def test_close_frees_cache_directory(self, tmp_path, monkeypatch):
+        """Test a closed bot hands its cache directory to the next process."""
+        monkeypatch.setenv('TELEGRAM_BOT_TOKEN', '123:test')
+        monkeypatch.setenv('DOWNLOAD_DIR', str(tmp_path))
+        monkeypatch.setenv('TRANSCODE', 'false')
+        bot = TelegramBot()
+        assert bot.download_dir == str(tmp_path)
+        asyncio.run(bot.close())
+        
+        claimed, lock = download_cache.claim_cache_dir(str(tmp_path))
+        assert claimed == tmp_path
+        lock.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,71 @@
+"""
+Unit tests for Config module
+"""
+
+import pytest
+import config
+
+
+class TestConfig:
+    """Test cases for environment setting helpers."""
+    
+    def test_get_int_default(self, monkeypatch):
+        """Test default value when variable is unset."""
+        monkeypatch.delenv('TEST_SETTING', raising=False)
+        assert config.get_int('TEST_SETTING', 7) == 7
+    
+    def test_get_int_value(self, monkeypatch):
+        """Test parsing an integer value."""
+        monkeypatch.setenv('TEST_SETTING', ' 12 ')
+        assert config.get_int('TEST_SETTING', 7) == 12
+    
+    def test_get_int_invalid(self, monkeypatch):
+        """Test invalid integer raises ValueError."""
+        monkeypatch.setenv('TEST_SETTING', 'many')
+        with pytest.raises(ValueError):
+            config.get_int('TEST_SETTING', 7)
+    
+    def test_get_bool(self, monkeypatch):
+        """Test parsing boolean values."""
+        monkeypatch.setenv('TEST_SETTING', 'Yes')
+        assert config.get_bool('TEST_SETTING') is True
+        monkeypatch.setenv('TEST_SETTING', '0')
+        assert config.get_bool('TEST_SETTING', True) is False
+        monkeypatch.setenv('TEST_SETTING', 'maybe')
+        with pytest.raises(ValueError):
+            config.get_bool('TEST_SETTING')
+    
+    def test_get_float(self, monkeypatch):
+        """Test parsing decimal settings."""
+        monkeypatch.setenv('TEST_SETTING', '0.5')
+        assert config.get_float('TEST_SETTING', 1.0) == 0.5
+        
+        monkeypatch.setenv('TEST_SETTING', 'half')
+        with pytest.raises(ValueError):
+            config.get_float('TEST_SETTING', 1.0)
+    
+    def test_get_int_list(self, monkeypatch):
+        """Test parsing a list of integers."""
+        monkeypatch.setenv('TEST_SETTING', '720, 480,360')
+        assert config.get_int_list('TEST_SETTING', [1]) == [720, 480, 360]
+        
+        monkeypatch.delenv('TEST_SETTING')
+        assert config.get_int_list('TEST_SETTING', (1, 2)) == [1, 2]
+    
+    def test_parse_limits(self):
+        """Test per-platform limit parsing."""
+        limits = config.parse_limits('YouTube=2, tiktok=4,')
+        assert limits == {'youtube': 2, 'tiktok': 4}
+    
+    def test_parse_limits_empty(self):
+        """Test empty limit string."""
+        assert config.parse_limits('') == {}
+    
+    def test_parse_limits_invalid(self):
+        """Test malformed limit entry."""
+        with pytest.raises(ValueError):
+            config.parse_limits('youtube')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
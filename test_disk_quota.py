@@ -0,0 +1,89 @@
+"""
+Unit tests for Disk Quota module
+"""
+
+import pytest
+from disk_quota import DiskQuota
+
+
+class TestDiskQuota:
+    """Test cases for the watermark-based disk quota."""
+    
+    def test_usage_is_tracked_incrementally(self):
+        """Test adding, resizing and discarding files updates usage."""
+        quota = DiskQuota(100)
+        quota.add('a.mp4', 10)
+        quota.add('b.mp4', 20)
+        quota.add('a.mp4', 15)
+        
+        assert quota.used_bytes == 35
+        quota.discard('b.mp4')
+        quota.discard('missing.mp4')
+        assert quota.used_bytes == 15
+        assert len(quota) == 1
+    
+    def test_size_read_from_disk(self, tmp_path):
+        """Test the size defaults to the file size on disk."""
+        path = tmp_path / 'a.mp4'
+        path.write_bytes(b'x' * 42)
+        quota = DiskQuota(100)
+        quota.add(str(path))
+        
+        assert quota.used_bytes == 42
+    
+    def test_no_eviction_below_high_watermark(self):
+        """Test usage between the watermarks evicts nothing."""
+        quota = DiskQuota(100, high_watermark=0.9, low_watermark=0.5)
+        for name in 'abc':
+            quota.add(name, 30)
+        
+        assert quota.evict() == []
+    
+    def test_evicts_lru_down_to_low_watermark(self):
+        """Test eviction removes least recently used files until under the low watermark."""
+        quota = DiskQuota(100, high_watermark=0.9, low_watermark=0.5)
+        for name in 'abcd':
+            quota.add(name, 25)
+        quota.touch('a')
+        
+        assert quota.evict() == ['b', 'c']
+        assert quota.used_bytes == 50
+        assert 'a' in quota and 'd' in quota
+    
+    def test_pinned_files_are_skipped(self):
+        """Test files pinned by an upload survive eviction."""
+        quota = DiskQuota(100, high_watermark=0.9, low_watermark=0.5)
+        for name in 'abcd':
+            quota.add(name, 25)
+        quota.pin('a')
+        quota.pin('b')
+        quota.unpin('b')
+        
+        assert quota.evict() == ['b', 'c']
+        assert quota.is_pinned('a')
+    
+    def test_stats(self):
+        """Test usage is reported as a metric."""
+        quota = DiskQuota(100, high_watermark=0.5, low_watermark=0.5)
+        quota.add('a', 40)
+        quota.add('b', 40)
+        quota.pin('b')
+        quota.evict()
+        
+        assert quota.stats() == {
+            'used_bytes': 40,
+            'max_bytes': 100,
+            'files': 1,
+            'pinned_files': 1,
+            'evicted_files': 1,
+            'evicted_bytes': 40,
+        }
+    
+    def test_invalid_watermarks(self):
+        """Test a low watermark above the high one is rejected."""
+        with pytest.raises(ValueError):
+            DiskQuota(100, high_watermark=0.5, low_watermark=0.8)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
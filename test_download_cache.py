@@ -0,0 +1,232 @@
+"""
+Unit tests for Download Cache module
+"""
+
+import os
+import pytest
+from download_cache import DownloadCache, claim_cache_dir, fcntl
+from state_store import StateStore
+from video_downloader import VideoDownloader
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+def make_file(directory, name, size):
+    """Create a file of the given size and return its path."""
+    path = directory / name
+    path.write_bytes(b'x' * size)
+    return str(path)
+
+
+class TestDownloadCache:
+    """Test cases for the content-addressed download cache."""
+    
+    def test_make_key(self):
+        """Test cache key format."""
+        assert DownloadCache.make_key('Youtube', 'abc') == 'youtube:abc:default'
+        assert DownloadCache.make_key('TikTok', '123', '720p') == 'tiktok:123:720p'
+    
+    def test_put_and_get(self, tmp_path):
+        """Test storing an entry with metadata."""
+        cache = DownloadCache(str(tmp_path))
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path, {'title': 'Video', 'duration': 5})
+        
+        entry = cache.get('youtube:abc:default')
+        assert entry['file_path'] == path
+        assert entry['title'] == 'Video'
+        assert entry['size'] == 10
+    
+    def test_alias_lookup(self, tmp_path):
+        """Test short-link aliases resolve to the canonical entry."""
+        cache = DownloadCache(str(tmp_path))
+        path = make_file(tmp_path, '123.mp4', 10)
+        cache.put('tiktok:123:default', path, aliases=['tiktok:ZMabc:default'])
+        
+        assert cache.get('tiktok:ZMabc:default')['key'] == 'tiktok:123:default'
+    
+    def test_index_persists(self, tmp_path):
+        """Test the index survives a restart."""
+        cache = DownloadCache(str(tmp_path))
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path, {'title': 'Video'})
+        
+        reloaded = DownloadCache(str(tmp_path))
+        assert reloaded.get('youtube:abc:default')['title'] == 'Video'
+    
+    def test_missing_file_is_a_miss(self, tmp_path):
+        """Test entries whose file was removed are dropped."""
+        cache = DownloadCache(str(tmp_path))
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path)
+        os.remove(path)
+        
+        assert cache.get('youtube:abc:default') is None
+    
+    def test_release_keeps_file(self, tmp_path):
+        """Test releasing the last reference does not delete a fresh file."""
+        cache = DownloadCache(str(tmp_path))
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path)
+        
+        assert cache.release(path) is True
+        assert os.path.exists(path)
+    
+    def test_release_unknown_file(self, tmp_path):
+        """Test releasing a file the cache does not own."""
+        cache = DownloadCache(str(tmp_path))
+        assert cache.release(str(tmp_path / 'other.mp4')) is False
+    
+    def test_ttl_eviction(self, tmp_path):
+        """Test expired, unreferenced entries are evicted."""
+        clock = FakeClock()
+        cache = DownloadCache(str(tmp_path), ttl=60, clock=clock)
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path)
+        cache.release(path)
+        
+        clock.now += 61
+        assert cache.evict() == ['youtube:abc:default']
+        assert not os.path.exists(path)
+    
+    def test_referenced_entry_survives_ttl(self, tmp_path):
+        """Test files still referenced are never evicted."""
+        clock = FakeClock()
+        cache = DownloadCache(str(tmp_path), ttl=60, clock=clock)
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path)
+        
+        clock.now += 61
+        assert cache.evict() == []
+        assert os.path.exists(path)
+    
+    def test_lru_eviction_over_budget(self, tmp_path):
+        """Test least recently used files are evicted past the disk budget."""
+        clock = FakeClock()
+        cache = DownloadCache(str(tmp_path), max_bytes=25, clock=clock)
+        first = make_file(tmp_path, 'a.mp4', 10)
+        second = make_file(tmp_path, 'b.mp4', 10)
+        cache.put('youtube:a:default', first)
+        clock.now += 1
+        cache.put('youtube:b:default', second)
+        cache.release(first)
+        cache.release(second)
+        
+        clock.now += 1
+        cache.get('youtube:a:default')  # 'a' is now the most recently used
+        clock.now += 1
+        third = make_file(tmp_path, 'c.mp4', 10)
+        cache.put('youtube:c:default', third)
+        
+        assert cache.get('youtube:b:default') is None
+        assert cache.get('youtube:a:default') is not None
+        assert cache.total_bytes == 20
+    
+    def test_refcounted_release(self, tmp_path):
+        """Test a file shared by two requests survives the first release."""
+        clock = FakeClock()
+        cache = DownloadCache(str(tmp_path), ttl=60, clock=clock)
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path)
+        cache.acquire('youtube:abc:default')
+        
+        clock.now += 61
+        cache.release(path)
+        assert os.path.exists(path)
+        cache.release(path)
+        assert not os.path.exists(path)
+    
+    def test_index_persists_in_state_store(self, tmp_path):
+        """Test the index and aliases survive a restart through the state store."""
+        db_path = str(tmp_path / 'state.sqlite3')
+        state = StateStore(db_path)
+        cache = DownloadCache(str(tmp_path), state=state)
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        cache.put('youtube:abc:default', path, {'title': 'Video'}, aliases=['youtube:abc:720p'])
+        state.close()
+        
+        assert not cache.index_path.exists()
+        reloaded = DownloadCache(str(tmp_path), state=StateStore(db_path))
+        assert reloaded.get('youtube:abc:720p')['title'] == 'Video'
+    
+    def test_json_index_is_imported_into_state_store(self, tmp_path):
+        """Test an index written without the state store is migrated once."""
+        path = make_file(tmp_path, 'abc.mp4', 10)
+        DownloadCache(str(tmp_path)).put('youtube:abc:default', path)
+        
+        state = StateStore(str(tmp_path / 'state.sqlite3'))
+        cache = DownloadCache(str(tmp_path), state=state)
+        assert cache.get('youtube:abc:default') is not None
+        assert not cache.index_path.exists()
+        assert 'youtube:abc:default' in state.load('cache')
+    
+    def test_watermark_eviction_frees_space_below_budget(self, tmp_path):
+        """Test passing the high watermark evicts unreferenced files down to the low watermark."""
+        clock = FakeClock()
+        cache = DownloadCache(str(tmp_path), max_bytes=100, clock=clock, high_watermark=0.9, low_watermark=0.5)
+        paths = []
+        for name in 'abcd':
+            clock.now += 1
+            paths.append(make_file(tmp_path, f'{name}.mp4', 24))
+            cache.put(f'youtube:{name}:default', paths[-1])
+        assert cache.total_bytes == 96  # Over the high watermark, but every file is referenced
+        
+        for path in paths:
+            cache.release(path)
+        assert cache.total_bytes == 72
+        
+        clock.now += 1
+        cache.put('youtube:e:default', make_file(tmp_path, 'e.mp4', 24))
+        
+        assert cache.total_bytes == 48
+        assert [name for name in 'abcde' if cache.get(f'youtube:{name}:default')] == ['d', 'e']
+        assert not any(os.path.exists(path) for path in paths[:3])
+        assert cache.disk_usage()['evicted_files'] == 3
+
+
+@pytest.mark.skipif(fcntl is None, reason='file locks need fcntl')
+class TestClaimCacheDir:
+    """Test cases for giving each process its own cache directory."""
+    
+    def test_second_process_gets_own_slot(self, tmp_path):
+        """Test a directory in use is never handed out again and a freed slot is reused."""
+        first, first_lock = claim_cache_dir(str(tmp_path))
+        second, second_lock = claim_cache_dir(str(tmp_path))
+        third, third_lock = claim_cache_dir(str(tmp_path))
+        
+        assert first == tmp_path
+        assert second == tmp_path / 'worker-1'
+        assert third == tmp_path / 'worker-2'
+        
+        second_lock.close()
+        again, again_lock = claim_cache_dir(str(tmp_path))
+        assert again == tmp_path / 'worker-1'
+        for lock in (first_lock, third_lock, again_lock):
+            lock.close()
+    
+    def test_sweep_leaves_other_slots_alone(self, tmp_path):
+        """Test the owner of the base directory does not treat worker slots as orphans."""
+        _, base_lock = claim_cache_dir(str(tmp_path))
+        slot, slot_lock = claim_cache_dir(str(tmp_path))
+        video = slot / 'abc.mp4'
+        video.write_bytes(b'x')
+        os.utime(video, (0, 0))
+        
+        downloader = VideoDownloader(str(tmp_path))
+        assert downloader.remove_orphaned_files(min_age=0) == []
+        assert video.exists()
+        downloader.shutdown()
+        base_lock.close()
+        slot_lock.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
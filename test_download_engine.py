@@ -0,0 +1,83 @@
+"""
+Unit tests for Download Engine module
+"""
+
+import pytest
+from download_engine import DownloadEngine, backoff_delay
+
+
+class TestDownloadEngine:
+    """Test cases for download engine settings."""
+    
+    def test_default_params(self):
+        """Test the defaults translate into yt-dlp options."""
+        params = DownloadEngine().params()
+        
+        assert params['concurrent_fragment_downloads'] == DownloadEngine.DEFAULT_CONCURRENT_FRAGMENTS
+        assert params['http_chunk_size'] == DownloadEngine.DEFAULT_CHUNK_SIZE
+        assert params['buffersize'] == DownloadEngine.DEFAULT_BUFFER_SIZE
+        assert params['retries'] == params['fragment_retries'] == DownloadEngine.DEFAULT_RETRIES
+        assert 'external_downloader' not in params
+    
+    def test_zero_disables_chunking_and_buffer(self):
+        """Test a zero chunk or buffer size leaves yt-dlp's behaviour alone."""
+        params = DownloadEngine(chunk_size=0, buffer_size=0, concurrent_fragments=0).params()
+        
+        assert 'http_chunk_size' not in params
+        assert 'buffersize' not in params
+        assert params['concurrent_fragment_downloads'] == 1
+    
+    def test_retry_backoff(self):
+        """Test retries sleep with capped exponential backoff."""
+        sleep = DownloadEngine(retry_backoff=0.5, retry_backoff_max=3).params()['retry_sleep_functions']
+        
+        assert [sleep['http'](n=n) for n in range(5)] == [0.5, 1.0, 2.0, 3, 3]
+        assert sleep['fragment'](n=0) == 0.5
+        assert backoff_delay(0, 0, 10) == 0
+    
+    def test_external_downloader(self):
+        """Test an external downloader and its arguments are passed through."""
+        params = DownloadEngine(external_downloader='aria2c', external_downloader_args=['-x', '8']).params()
+        
+        assert params['external_downloader'] == {'default': 'aria2c'}
+        assert params['external_downloader_args'] == {'default': ['-x', '8']}
+    
+    def test_platform_overrides(self):
+        """Test overrides apply only to their platform."""
+        engine = DownloadEngine(concurrent_fragments=4, overrides={'YouTube': {'concurrent_fragments': 16}})
+        
+        assert engine.params('youtube')['concurrent_fragment_downloads'] == 16
+        assert engine.params('tiktok')['concurrent_fragment_downloads'] == 4
+        assert engine.params()['concurrent_fragment_downloads'] == 4
+    
+    def test_unknown_override_rejected(self):
+        """Test a misspelt override setting is reported."""
+        with pytest.raises(ValueError):
+            DownloadEngine(overrides={'youtube': {'fragments': 8}})
+    
+    def test_from_env(self, monkeypatch):
+        """Test defaults and per-platform overrides are read from the environment."""
+        monkeypatch.setenv('DOWNLOAD_FRAGMENTS', '6')
+        monkeypatch.setenv('DOWNLOAD_RETRY_BACKOFF', '0.25')
+        monkeypatch.setenv('DOWNLOAD_FRAGMENTS_YOUTUBE', '12')
+        monkeypatch.setenv('EXTERNAL_DOWNLOADER_FACEBOOK', 'aria2c')
+        monkeypatch.setenv('EXTERNAL_DOWNLOADER_ARGS_FACEBOOK', '-x 4 --summary-interval=0')
+        
+        engine = DownloadEngine.from_env(['youtube', 'facebook', 'tiktok'])
+        
+        assert engine.settings()['concurrent_fragments'] == 6
+        assert engine.settings()['retry_backoff'] == 0.25
+        assert engine.settings('youtube')['concurrent_fragments'] == 12
+        assert engine.settings('facebook')['external_downloader'] == 'aria2c'
+        assert engine.settings('facebook')['external_downloader_args'] == ['-x', '4', '--summary-interval=0']
+        assert engine.settings('tiktok') == engine.settings()
+    
+    def test_from_env_invalid(self, monkeypatch):
+        """Test a malformed setting is reported."""
+        monkeypatch.setenv('DOWNLOAD_CHUNK_SIZE_TIKTOK', 'big')
+        with pytest.raises(ValueError):
+            DownloadEngine.from_env(['tiktok'])
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,77 @@
+"""
+Unit tests for File ID Index module
+"""
+
+import pytest
+from file_id_index import FileIdIndex
+from state_store import StateStore
+
+
+class TestFileIdIndex:
+    """Test cases for the Telegram file_id index."""
+    
+    def test_unknown_key(self, tmp_path):
+        """Test lookup of a video that was never uploaded."""
+        index = FileIdIndex(str(tmp_path / 'file_ids.json'))
+        assert index.get('youtube:abc:default') is None
+    
+    def test_set_and_get(self, tmp_path):
+        """Test recording a file_id."""
+        index = FileIdIndex(str(tmp_path / 'file_ids.json'))
+        index.set('youtube:abc:default', 'BAACAgIAAxkBAAI')
+        
+        assert index.get('youtube:abc:default') == 'BAACAgIAAxkBAAI'
+    
+    def test_persists_across_restart(self, tmp_path):
+        """Test file_ids survive a restart."""
+        path = str(tmp_path / 'file_ids.json')
+        FileIdIndex(path).set('tiktok:123:default', 'FILE123')
+        
+        assert FileIdIndex(path).get('tiktok:123:default') == 'FILE123'
+    
+    def test_remove(self, tmp_path):
+        """Test forgetting a rejected file_id."""
+        path = str(tmp_path / 'file_ids.json')
+        index = FileIdIndex(path)
+        index.set('youtube:abc:default', 'FILE123')
+        index.remove('youtube:abc:default')
+        
+        assert index.get('youtube:abc:default') is None
+        assert FileIdIndex(path).get('youtube:abc:default') is None
+    
+    def test_corrupt_index(self, tmp_path):
+        """Test a corrupt index file starts empty."""
+        path = tmp_path / 'file_ids.json'
+        path.write_text('{not json')
+        
+        assert FileIdIndex(str(path)).get('youtube:abc:default') is None
+    
+    def test_persists_in_state_store(self, tmp_path):
+        """Test file_ids survive a restart through the state store."""
+        db_path = str(tmp_path / 'state.sqlite3')
+        state = StateStore(db_path)
+        index = FileIdIndex(str(tmp_path / 'file_ids.json'), state=state)
+        index.set('tiktok:123:default', 'FILE123')
+        index.set('tiktok:456:default', 'FILE456')
+        index.remove('tiktok:456:default')
+        state.close()
+        
+        reloaded = FileIdIndex(str(tmp_path / 'file_ids.json'), state=StateStore(db_path))
+        assert reloaded.get('tiktok:123:default') == 'FILE123'
+        assert reloaded.get('tiktok:456:default') is None
+        assert not (tmp_path / 'file_ids.json').exists()
+    
+    def test_json_index_is_imported_into_state_store(self, tmp_path):
+        """Test an index written without the state store is migrated once."""
+        path = str(tmp_path / 'file_ids.json')
+        FileIdIndex(path).set('youtube:abc:default', 'FILE123')
+        
+        state = StateStore(str(tmp_path / 'state.sqlite3'))
+        index = FileIdIndex(path, state=state)
+        assert index.get('youtube:abc:default') == 'FILE123'
+        assert state.load('file_id') == {'youtube:abc:default': 'FILE123'}
+        assert not (tmp_path / 'file_ids.json').exists()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
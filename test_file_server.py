@@ -0,0 +1,248 @@
+"""
+Unit tests for File Server module
+"""
+
+import asyncio
+import pytest
+from file_server import FileServer, LinkSigner
+
+CONTENT = bytes(range(256)) * 400
+
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+async def fetch(port, target, headers=None, method='GET'):
+    """Send one request and return (status, headers, body)."""
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    lines = [f'{method} {target} HTTP/1.1', 'Host: localhost', 'Connection: close']
+    lines.extend(f'{name}: {value}' for name, value in (headers or {}).items())
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    parsed = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        parsed[name.strip().lower()] = value.strip()
+    return int(status_line.split()[1]), parsed, body
+
+
+def run_with_server(tmp_path, scenario, clock=None, **kwargs):
+    """Serve tmp_path on a free port while running scenario(server)."""
+    (tmp_path / 'video.mp4').write_bytes(CONTENT)
+    
+    async def run():
+        signer = LinkSigner(b'secret', ttl=3600, clock=clock or FakeClock())
+        server = FileServer(str(tmp_path), signer, host='127.0.0.1', port=0, **kwargs)
+        await server.start()
+        try:
+            return await scenario(server)
+        finally:
+            await server.close()
+    
+    return asyncio.run(run())
+
+
+def path_of(url):
+    return url.split('/', 3)[3].join(['/', ''])
+
+
+class TestLinkSigner:
+    """Test cases for signed links."""
+    
+    def test_sign_and_verify(self):
+        """Test a signed link verifies until it expires."""
+        clock = FakeClock()
+        signer = LinkSigner(b'secret', ttl=60, clock=clock)
+        expires, signature = signer.sign('a.mp4')
+        
+        assert expires == 1_000_060
+        assert signer.verify('a.mp4', str(expires), signature) is True
+        assert signer.verify('b.mp4', str(expires), signature) is False
+        assert signer.verify('a.mp4', str(expires + 1), signature) is False
+        assert LinkSigner(b'other').verify('a.mp4', str(expires), signature) is False
+        
+        clock.now += 61
+        assert signer.verify('a.mp4', str(expires), signature) is None
+    
+    def test_empty_secret_rejected(self):
+        """Test a signer needs a key."""
+        with pytest.raises(ValueError):
+            LinkSigner(b'')
+
+
+class TestFileServer:
+    """Test cases for serving download_dir."""
+    
+    def test_parse_range(self):
+        """Test Range header forms."""
+        assert FileServer.parse_range('bytes=0-99', 1000) == (0, 100)
+        assert FileServer.parse_range('bytes=900-', 1000) == (900, 1000)
+        assert FileServer.parse_range('bytes=-100', 1000) == (900, 1000)
+        assert FileServer.parse_range('bytes=990-2000', 1000) == (990, 1000)
+        assert FileServer.parse_range('bytes=1000-', 1000) is None
+        assert FileServer.parse_range('bytes=0-1,5-6', 1000) == (0, 1000)
+        assert FileServer.parse_range('items=0-1', 1000) == (0, 1000)
+    
+    def test_full_download(self, tmp_path):
+        """Test a signed link serves the whole file."""
+        async def scenario(server):
+            return await fetch(server.port, path_of(server.link(str(tmp_path / 'video.mp4'))))
+        
+        status, headers, body = run_with_server(tmp_path, scenario)
+        
+        assert status == 200
+        assert body == CONTENT
+        assert headers['content-type'] == 'video/mp4'
+        assert headers['accept-ranges'] == 'bytes'
+        assert headers['etag']
+    
+    @pytest.mark.parametrize('sendfile', [True, False])
+    def test_range_request(self, tmp_path, sendfile):
+        """Test a byte range is served as 206 Partial Content."""
+        async def scenario(server):
+            return await fetch(server.port, path_of(server.link(str(tmp_path / 'video.mp4'))),
+                               {'Range': 'bytes=1000-1999'})
+        
+        status, headers, body = run_with_server(tmp_path, scenario, sendfile=sendfile)
+        
+        assert status == 206
+        assert body == CONTENT[1000:2000]
+        assert headers['content-range'] == f'bytes 1000-1999/{len(CONTENT)}'
+        assert headers['content-length'] == '1000'
+    
+    def test_unsatisfiable_range(self, tmp_path):
+        """Test a range past the end of the file is rejected."""
+        async def scenario(server):
+            return await fetch(server.port, path_of(server.link(str(tmp_path / 'video.mp4'))),
+                               {'Range': f'bytes={len(CONTENT)}-'})
+        
+        status, headers, _ = run_with_server(tmp_path, scenario)
+        
+        assert status == 416
+        assert headers['content-range'] == f'bytes */{len(CONTENT)}'
+    
+    def test_etag_revalidation(self, tmp_path):
+        """Test a matching If-None-Match answers 304 without a body."""
+        async def scenario(server):
+            target = path_of(server.link(str(tmp_path / 'video.mp4')))
+            _, headers, _ = await fetch(server.port, target, method='HEAD')
+            return await fetch(server.port, target, {'If-None-Match': headers['etag']})
+        
+        status, _, body = run_with_server(tmp_path, scenario)
+        
+        assert status == 304
+        assert body == b''
+    
+    def test_stale_if_range_serves_full_file(self, tmp_path):
+        """Test a range is ignored when the file changed since the client's copy."""
+        async def scenario(server):
+            return await fetch(server.port, path_of(server.link(str(tmp_path / 'video.mp4'))),
+                               {'Range': 'bytes=0-9', 'If-Range': '"old"'})
+        
+        status, _, body = run_with_server(tmp_path, scenario)
+        
+        assert status == 200
+        assert body == CONTENT
+    
+    def test_rejects_bad_and_expired_links(self, tmp_path):
+        """Test tampered links are forbidden and expired links are gone."""
+        clock = FakeClock()
+        
+        async def scenario(server):
+            target = path_of(server.link(str(tmp_path / 'video.mp4')))
+            tampered = target.replace('s=', 's=x')
+            unsigned = await fetch(server.port, '/video.mp4')
+            bad = await fetch(server.port, tampered)
+            clock.now += 3601
+            expired = await fetch(server.port, target)
+            return unsigned[0], bad[0], expired[0]
+        
+        assert run_with_server(tmp_path, scenario, clock=clock) == (403, 403, 410)
+    
+    def test_hidden_and_nested_paths_not_served(self, tmp_path):
+        """Test index files and paths outside the directory are never served."""
+        (tmp_path / '.state.sqlite3').write_bytes(b'state')
+        
+        async def scenario(server):
+            expires, signature = server.signer.sign('.state.sqlite3')
+            hidden = await fetch(server.port, f'/.state.sqlite3?e={expires}&s={signature}')
+            expires, signature = server.signer.sign('../secret')
+            escaped = await fetch(server.port, f'/..%2Fsecret?e={expires}&s={signature}')
+            return hidden[0], escaped[0]
+        
+        assert run_with_server(tmp_path, scenario) == (404, 404)
+    
+    def test_subdirectory_files_served(self, tmp_path):
+        """Test a file in a worker's cache directory is linked by its relative path and served."""
+        (tmp_path / 'worker-1').mkdir()
+        (tmp_path / 'worker-1' / 'clip.mp4').write_bytes(b'worker video')
+        
+        async def scenario(server):
+            url = server.link(str(tmp_path / 'worker-1' / 'clip.mp4'))
+            status, _, body = await fetch(server.port, path_of(url))
+            return url.split('?')[0], status, body
+        
+        url, status, body = run_with_server(tmp_path, scenario)
+        assert url.endswith('/worker-1/clip.mp4')
+        assert (status, body) == (200, b'worker video')
+    
+    def test_links_outside_root_refused(self, tmp_path):
+        """Test files outside the directory get no link and symlinks out of it are not followed."""
+        outside = tmp_path.parent / f'{tmp_path.name}-outside'
+        outside.mkdir()
+        (outside / 'secret.mp4').write_bytes(b'secret')
+        (tmp_path / 'escape').symlink_to(outside, target_is_directory=True)
+        
+        async def scenario(server):
+            with pytest.raises(ValueError):
+                server.link(str(outside / 'secret.mp4'))
+            expires, signature = server.signer.sign('escape/secret.mp4')
+            status, _, _ = await fetch(server.port, f'/escape/secret.mp4?e={expires}&s={signature}')
+            return status
+        
+        assert run_with_server(tmp_path, scenario) == 404
+    
+    def test_keep_alive(self, tmp_path):
+        """Test several range requests share one connection."""
+        async def scenario(server):
+            target = path_of(server.link(str(tmp_path / 'video.mp4')))
+            reader, writer = await asyncio.open_connection('127.0.0.1', server.port)
+            bodies = []
+            for start in (0, 100, 200):
+                writer.write(f'GET {target} HTTP/1.1\r\nHost: x\r\nRange: bytes={start}-{start + 9}\r\n\r\n'.encode())
+                await writer.drain()
+                head = await reader.readuntil(b'\r\n\r\n')
+                assert b'206' in head.split(b'\r\n')[0]
+                bodies.append(await reader.readexactly(10))
+            writer.close()
+            return bodies
+        
+        assert run_with_server(tmp_path, scenario) == [CONTENT[0:10], CONTENT[100:110], CONTENT[200:210]]
+    
+    def test_expire_links_runs_callbacks(self, tmp_path):
+        """Test a file's release callback runs once its link has expired."""
+        clock = FakeClock()
+        released = []
+        
+        async def scenario(server):
+            server.link(str(tmp_path / 'video.mp4'), on_expire=lambda: released.append('video'))
+            first = server.expire_links()
+            clock.now += 3601
+            second = server.expire_links()
+            return first, second, server.live_links
+        
+        assert run_with_server(tmp_path, scenario, clock=clock) == (0, 1, 0)
+        assert released == ['video']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
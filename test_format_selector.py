@@ -0,0 +1,137 @@
+"""
+Unit tests for Format Selector module
+"""
+
+import pytest
+from format_selector import FormatSelector
+
+MB = 1024 * 1024
+
+
+def progressive(format_id, height, size):
+    """Build a progressive (video with audio) format."""
+    return {
+        'format_id': format_id, 'height': height, 'filesize': size,
+        'vcodec': 'avc1', 'acodec': 'mp4a', 'url': f"https://cdn/{format_id}"
+    }
+
+
+def video_only(format_id, height, size):
+    """Build a video-only format."""
+    return {
+        'format_id': format_id, 'height': height, 'filesize': size,
+        'vcodec': 'avc1', 'acodec': 'none', 'url': f"https://cdn/{format_id}"
+    }
+
+
+def audio_only(format_id, size):
+    """Build an audio-only format."""
+    return {
+        'format_id': format_id, 'filesize': size,
+        'vcodec': 'none', 'acodec': 'mp4a', 'url': f"https://cdn/{format_id}"
+    }
+
+
+class TestFormatSelector:
+    """Test cases for size-aware format selection."""
+    
+    def test_best_fitting_resolution(self):
+        """Test the highest resolution under the budget is chosen."""
+        selector = FormatSelector(max_bytes=50 * MB)
+        info = {'formats': [
+            progressive('1080', 1080, 120 * MB),
+            progressive('720', 720, 45 * MB),
+            progressive('360', 360, 10 * MB),
+        ]}
+        
+        choice = selector.select(info)
+        assert choice['format_id'] == '720'
+        assert choice['fits'] is True
+        assert choice['urls'] == ['https://cdn/720']
+    
+    def test_falls_back_to_lower_resolution(self):
+        """Test the ladder steps down until a format fits."""
+        selector = FormatSelector(max_bytes=20 * MB, heights=(1080, 720, 480))
+        info = {'formats': [
+            progressive('720', 720, 60 * MB),
+            progressive('480', 480, 15 * MB),
+        ]}
+        
+        assert selector.select(info)['format_id'] == '480'
+    
+    def test_nothing_fits_picks_smallest(self):
+        """Test oversized videos are reported as not fitting and the smallest format is chosen."""
+        selector = FormatSelector(max_bytes=50 * MB)
+        info = {'formats': [
+            progressive('720', 720, 300 * MB),
+            progressive('360', 360, 90 * MB),
+            progressive('1080', 1080, 600 * MB),
+        ]}
+        
+        choice = selector.select(info)
+        assert choice['fits'] is False
+        assert choice['format_id'] == '360'
+        assert choice['filesize'] == 90 * MB
+        assert choice['urls'] == ['https://cdn/360']
+    
+    def test_merge_video_and_audio(self):
+        """Test separate streams are combined when merging is allowed."""
+        selector = FormatSelector(max_bytes=50 * MB, allow_merge=True)
+        info = {'formats': [
+            video_only('137', 1080, 80 * MB),
+            video_only('136', 720, 40 * MB),
+            audio_only('140', 5 * MB),
+            audio_only('251', 6 * MB),
+            progressive('18', 360, 12 * MB),
+        ]}
+        
+        choice = selector.select(info)
+        assert choice['format_id'] == '136+140'
+        assert choice['filesize'] == 45 * MB
+    
+    def test_no_merge_without_ffmpeg(self):
+        """Test only progressive formats are used when merging is off."""
+        selector = FormatSelector(max_bytes=50 * MB, allow_merge=False)
+        info = {'formats': [
+            video_only('136', 720, 40 * MB),
+            audio_only('140', 5 * MB),
+            progressive('18', 360, 12 * MB),
+        ]}
+        
+        assert selector.select(info)['format_id'] == '18'
+    
+    def test_size_estimated_from_bitrate(self):
+        """Test sizes are estimated from tbr and duration when missing."""
+        assert FormatSelector.estimate_size({'tbr': 800}, 100) == 10000000
+        assert FormatSelector.estimate_size({'filesize_approx': 5}, 100) == 5
+        assert FormatSelector.estimate_size({}, 100) is None
+    
+    def test_unknown_sizes_use_default_format(self):
+        """Test yt-dlp's default is kept when no sizes are known."""
+        selector = FormatSelector(max_bytes=50 * MB)
+        info = {'url': 'https://cdn/v', 'formats': [
+            {'format_id': 'a', 'vcodec': 'avc1', 'acodec': 'mp4a'},
+        ]}
+        
+        choice = selector.select(info)
+        assert choice['format_id'] is None
+        assert choice['fits'] is True
+        assert choice['urls'] == ['https://cdn/v']
+    
+    def test_resolution_cap(self):
+        """Test formats above the top of the ladder are ignored."""
+        selector = FormatSelector(max_bytes=500 * MB, heights=(720, 360))
+        info = {'formats': [
+            progressive('2160', 2160, 100 * MB),
+            progressive('720', 720, 50 * MB),
+        ]}
+        
+        assert selector.select(info)['format_id'] == '720'
+    
+    def test_profile(self):
+        """Test the policy name used in cache keys."""
+        assert FormatSelector(max_bytes=1000).profile == 'max1000'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
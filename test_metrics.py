@@ -0,0 +1,130 @@
+"""
+Unit tests for Metrics module
+"""
+
+import asyncio
+import pytest
+from metrics import BotMetrics, Counter, Gauge, Histogram, MetricsServer, Registry, error_type
+
+
+class TestMetrics:
+    """Test cases for the Prometheus text exposition."""
+    
+    def test_counter_with_labels(self):
+        """Test labeled counters render one sample per label set."""
+        counter = Counter('bot_errors_total', 'Failures.', ('stage', 'type'))
+        counter.labels('download', 'download_failed').inc()
+        counter.labels('download', 'download_failed').inc(2)
+        counter.labels('upload', 'TimedOut').inc()
+        
+        assert counter.render() == [
+            '# HELP bot_errors_total Failures.',
+            '# TYPE bot_errors_total counter',
+            'bot_errors_total{stage="download",type="download_failed"} 3',
+            'bot_errors_total{stage="upload",type="TimedOut"} 1',
+        ]
+    
+    def test_wrong_label_count(self):
+        """Test a label set of the wrong size is rejected."""
+        with pytest.raises(ValueError):
+            Counter('c', 'Count.', ('stage',)).labels('a', 'b')
+    
+    def test_gauge_function(self):
+        """Test a gauge can be read from a callable at scrape time."""
+        depth = [3]
+        gauge = Gauge('bot_queue_depth', 'Tasks waiting.')
+        gauge.set_function(lambda: depth[0])
+        depth[0] = 7
+        
+        assert gauge.render()[-1] == 'bot_queue_depth 7'
+    
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets count values at or below their bound."""
+        histogram = Histogram('latency_seconds', 'Latency.', ('platform',), buckets=(0.1, 1))
+        child = histogram.labels('youtube')
+        for value in (0.05, 0.1, 0.5, 3):
+            child.observe(value)
+        
+        assert histogram.render()[2:] == [
+            'latency_seconds_bucket{platform="youtube",le="0.1"} 2',
+            'latency_seconds_bucket{platform="youtube",le="1"} 3',
+            'latency_seconds_bucket{platform="youtube",le="+Inf"} 4',
+            'latency_seconds_sum{platform="youtube"} 3.65',
+            'latency_seconds_count{platform="youtube"} 4',
+        ]
+    
+    def test_timer_observes_duration(self):
+        """Test the stage timer records one observation even when the block raises."""
+        metrics = BotMetrics()
+        with pytest.raises(RuntimeError):
+            with metrics.stage('download', 'tiktok'):
+                raise RuntimeError('boom')
+        
+        assert 'bot_stage_seconds_count{stage="download",platform="tiktok"} 1' in metrics.render()
+    
+    def test_label_values_are_escaped(self):
+        """Test quotes and backslashes in label values are escaped."""
+        counter = Counter('c', 'Count.', ('type',))
+        counter.labels('a"b\\c').inc()
+        
+        assert counter.render()[-1] == 'c{type="a\\"b\\\\c"} 1'
+    
+    def test_duplicate_registration(self):
+        """Test two metrics cannot share a name."""
+        registry = Registry()
+        registry.register(Counter('c', 'Count.'))
+        with pytest.raises(ValueError):
+            registry.register(Counter('c', 'Count.'))
+    
+    def test_error_type(self):
+        """Test error messages reduce to a bounded set of label values."""
+        assert error_type('Download failed: ERROR: [youtube] abc: Video unavailable') == 'download_failed'
+        assert error_type('Could not fetch video info: HTTP Error 404') == 'could_not_fetch_video'
+        assert error_type(None) == 'unknown'
+    
+    def test_bot_metrics(self):
+        """Test the bot's helpers record cache hits, bytes and errors."""
+        metrics = BotMetrics()
+        metrics.cache('download', True)
+        metrics.cache('download', False)
+        metrics.transferred('upload', 'youtube', 1024)
+        metrics.transferred('upload', 'youtube', None)
+        metrics.error('metadata', 'Unexpected error: boom')
+        body = metrics.render()
+        
+        assert 'bot_cache_requests_total{cache="download",result="hit"} 1' in body
+        assert 'bot_cache_requests_total{cache="download",result="miss"} 1' in body
+        assert 'bot_bytes_total{direction="upload",platform="youtube"} 1024' in body
+        assert 'bot_errors_total{stage="metadata",type="unexpected_error"} 1' in body
+
+
+class TestMetricsServer:
+    """Test cases for the /metrics HTTP endpoint."""
+    
+    async def _request(self, port: int, path: str) -> bytes:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n'.encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    
+    def test_serves_metrics(self):
+        """Test GET /metrics returns the rendered metrics."""
+        async def scenario():
+            server = MetricsServer(lambda: 'bot_up 1\n', port=0)
+            await server.start()
+            try:
+                return await self._request(server.port, '/metrics'), await self._request(server.port, '/')
+            finally:
+                await server.close()
+        
+        metrics_response, other_response = asyncio.run(scenario())
+        assert metrics_response.startswith(b'HTTP/1.1 200 OK')
+        assert b'text/plain; version=0.0.4' in metrics_response
+        assert metrics_response.endswith(b'\r\n\r\nbot_up 1\n')
+        assert other_response.startswith(b'HTTP/1.1 404')
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,227 @@
+"""
+Unit tests for Outbound module
+"""
+
+import asyncio
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from outbound import OutboundScheduler
+from telegram_request import retry_after_error
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class StubBot:
+    """Passes calls through the scheduler the way ExtBot does and records them."""
+    
+    def __init__(self, scheduler: OutboundScheduler, clock: FakeClock):
+        self.scheduler = scheduler
+        self.clock = clock
+        self.calls = []
+        self.failures = {}
+    
+    async def _post(self, endpoint, data):
+        self.calls.append((endpoint, dict(data), self.clock.now))
+        error = self.failures.get(endpoint, [])
+        if error:
+            raise error.pop(0)
+        await asyncio.sleep(0)
+        return data.get('text', True)
+    
+    async def call(self, endpoint, rate_limit_args=None, **data):
+        return await self.scheduler.process_request(
+            self._post, (endpoint, data), {}, endpoint, data, rate_limit_args
+        )
+    
+    def send_message(self, chat_id, text, **kwargs):
+        return self.call('sendMessage', chat_id=chat_id, text=text, **kwargs)
+    
+    def edit_message_text(self, chat_id, message_id, text, **kwargs):
+        return self.call('editMessageText', chat_id=chat_id, message_id=message_id, text=text, **kwargs)
+
+
+def make_bot(**settings):
+    clock = FakeClock()
+    
+    async def sleep(seconds):
+        clock.now += seconds
+        await asyncio.sleep(0)
+    
+    settings.setdefault('global_rate', 0)
+    return StubBot(OutboundScheduler(clock=clock, sleep=sleep, **settings), clock)
+
+
+def run(bot: StubBot, *coroutines):
+    """Run calls concurrently, then stop the scheduler."""
+    async def scenario():
+        try:
+            return await asyncio.gather(*coroutines, return_exceptions=True)
+        finally:
+            await bot.scheduler.shutdown()
+    return asyncio.run(scenario())
+
+
+class TestLimits:
+    """Test cases for the global and per-chat buckets."""
+    
+    def test_chat_burst_then_rate(self):
+        """Test a chat gets its burst at once and then one message per second."""
+        bot = make_bot(chat_rate=60, chat_burst=3)
+        results = run(bot, *[bot.send_message(1, f"m{i}") for i in range(5)])
+        
+        assert results == ['m0', 'm1', 'm2', 'm3', 'm4']
+        assert [when for _, _, when in bot.calls] == pytest.approx([0, 0, 0, 1, 2])
+    
+    def test_chats_are_independent(self):
+        """Test a busy chat does not delay another chat."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        run(bot, bot.send_message(1, 'a'), bot.send_message(1, 'b'), bot.send_message(2, 'c'))
+        
+        sent = {data['text']: when for _, data, when in bot.calls}
+        assert sent == pytest.approx({'a': 0, 'b': 1, 'c': 0})
+    
+    def test_groups_are_stricter(self):
+        """Test groups get the group rate (20 per minute = one every 3 s)."""
+        bot = make_bot(chat_rate=60, group_rate=20, chat_burst=1)
+        run(bot, bot.send_message(-100, 'a'), bot.send_message(-100, 'b'))
+        
+        assert [when for _, _, when in bot.calls] == pytest.approx([0, 3])
+    
+    def test_global_rate(self):
+        """Test the global bucket spreads calls to many chats."""
+        bot = make_bot(global_rate=2, chat_rate=0)
+        run(bot, *[bot.send_message(chat, 'hi') for chat in range(1, 7)])
+        
+        assert [when for _, _, when in bot.calls] == pytest.approx([0, 0, 0.5, 1, 1.5, 2])
+    
+    def test_calls_without_chat_are_direct(self):
+        """Test calls that are not sent to a chat skip the queue."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        results = run(bot, bot.call('getMe'), bot.call('answerCallbackQuery', callback_query_id='q'))
+        
+        assert results == [True, True]
+        assert bot.scheduler.sent == 0
+
+
+class TestLanes:
+    """Test cases for priorities and coalescing."""
+    
+    def test_interactive_before_progress(self):
+        """Test replies queued after a progress edit are still sent first."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        progress = OutboundScheduler.PROGRESS_ARGS
+        run(
+            bot,
+            bot.edit_message_text(1, 10, 'progress', rate_limit_args=progress),
+            bot.send_message(1, 'reply 1'),
+            bot.send_message(1, 'reply 2')
+        )
+        
+        assert [(data['text'], when) for _, data, when in bot.calls] == [
+            ('reply 1', 0), ('reply 2', 1), ('progress', 2)
+        ]
+    
+    def test_queued_edits_are_coalesced(self):
+        """Test edits superseded while queued are merged into the newest one."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        progress = OutboundScheduler.PROGRESS_ARGS
+        results = run(
+            bot,
+            bot.send_message(1, 'reply'),
+            *[bot.edit_message_text(1, 10, f"{percent}%", rate_limit_args=progress) for percent in (10, 20, 30)],
+            bot.edit_message_text(1, 11, 'other message', rate_limit_args=progress)
+        )
+        
+        assert results == ['reply', '30%', '30%', '30%', 'other message']
+        assert [data['text'] for _, data, _ in bot.calls] == ['reply', '30%', 'other message']
+        assert bot.scheduler.coalesced == 2
+    
+    def test_interactive_edit_promotes_queued_progress(self):
+        """Test a final edit replaces a queued progress edit and takes its place in the fast lane."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        progress = OutboundScheduler.PROGRESS_ARGS
+        run(
+            bot,
+            bot.send_message(1, 'reply'),
+            bot.send_message(2, 'elsewhere', rate_limit_args=progress),
+            bot.edit_message_text(1, 10, '50%', rate_limit_args=progress),
+            bot.edit_message_text(1, 10, 'done')
+        )
+        
+        assert [(data['text'], when) for _, data, when in bot.calls] == [
+            ('reply', 0), ('elsewhere', 0), ('done', 1)
+        ]
+        assert bot.scheduler.queued == 0
+    
+    def test_cancelled_call_is_dropped(self):
+        """Test a queued call whose caller gave up is never sent."""
+        bot = make_bot(chat_rate=60, chat_burst=1)
+        
+        async def scenario():
+            first = asyncio.create_task(bot.send_message(1, 'first'))
+            stale = asyncio.create_task(bot.edit_message_text(1, 10, 'stale'))
+            await asyncio.sleep(0)
+            stale.cancel()
+            await first
+            await bot.send_message(1, 'last')
+            await bot.scheduler.shutdown()
+        
+        asyncio.run(scenario())
+        assert [data['text'] for _, data, _ in bot.calls] == ['first', 'last']
+
+
+class TestFloodControl:
+    """Test cases for RetryAfter handling."""
+    
+    def test_retry_after_requeues(self):
+        """Test a call hit by flood control is sent again after the wait, and other chats go on."""
+        bot = make_bot(chat_rate=0)
+        bot.failures['sendMessage'] = [retry_after_error(5)]
+        results = run(bot, bot.send_message(1, 'limited'), bot.send_message(2, 'free'))
+        
+        assert results == ['limited', 'free']
+        assert [(data['text'], when) for _, data, when in bot.calls] == [
+            ('limited', 0), ('free', 0), ('limited', 5)
+        ]
+        assert bot.scheduler.retries == 1
+    
+    def test_progress_is_not_retried(self):
+        """Test progress edits hand flood control back to the caller."""
+        bot = make_bot(chat_rate=0)
+        bot.failures['editMessageText'] = [retry_after_error(5)]
+        results = run(bot, bot.edit_message_text(1, 10, '5%', rate_limit_args=OutboundScheduler.PROGRESS_ARGS))
+        
+        assert isinstance(results[0], RetryAfter)
+        assert len(bot.calls) == 1
+    
+    def test_gives_up_after_max_retries(self):
+        """Test the error reaches the caller once the retries are used up."""
+        bot = make_bot(chat_rate=0, max_retries=1)
+        bot.failures['sendMessage'] = [retry_after_error(1), retry_after_error(1)]
+        results = run(bot, bot.send_message(1, 'hi'))
+        
+        assert isinstance(results[0], RetryAfter)
+        assert len(bot.calls) == 2
+    
+    def test_other_errors_reach_caller(self):
+        """Test errors other than flood control are not retried."""
+        bot = make_bot(chat_rate=0)
+        bot.failures['sendMessage'] = [BadRequest('Chat not found')]
+        results = run(bot, bot.send_message(1, 'hi'), bot.send_message(1, 'again'))
+        
+        assert isinstance(results[0], BadRequest)
+        assert results[1] == 'again'
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,174 @@
+"""
+Unit tests for Pending Store module
+"""
+
+import pytest
+from pending_store import PendingDownloadStore, SQLitePendingStore
+from state_store import StateStore
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestPendingDownloadStore:
+    """Test cases for the bounded, expiring pending-download store."""
+    
+    def test_add_and_pop(self):
+        """Test claiming a pending download."""
+        store = PendingDownloadStore()
+        key = store.add({'file_path': 'a.mp4'})
+        
+        assert store.get(key) == {'file_path': 'a.mp4'}
+        assert store.pop(key) == {'file_path': 'a.mp4'}
+        assert store.pop(key) is None
+        assert len(store) == 0
+    
+    def test_keys_are_unique_and_short(self):
+        """Test keys fit Telegram callback data."""
+        store = PendingDownloadStore()
+        keys = {store.add({}) for _ in range(100)}
+        
+        assert len(keys) == 100
+        assert all(len(f"file_{key}") <= 64 for key in keys)
+    
+    def test_max_size_drops_oldest(self):
+        """Test the store never grows past max_size."""
+        dropped = []
+        store = PendingDownloadStore(max_size=2, on_expire=dropped.append)
+        first = store.add({'n': 1})
+        store.add({'n': 2})
+        store.add({'n': 3})
+        
+        assert len(store) == 2
+        assert store.get(first) is None
+        assert dropped == [{'n': 1}]
+    
+    def test_expired_entry_cannot_be_claimed(self):
+        """Test entries past their TTL are rejected and released."""
+        clock = FakeClock()
+        dropped = []
+        store = PendingDownloadStore(ttl=60, on_expire=dropped.append, clock=clock)
+        key = store.add({'n': 1})
+        
+        clock.now = 61
+        assert store.get(key) is None
+        assert store.pop(key) is None
+        assert dropped == [{'n': 1}]
+    
+    def test_sweep(self):
+        """Test sweeping drops only expired entries."""
+        clock = FakeClock()
+        dropped = []
+        store = PendingDownloadStore(ttl=60, on_expire=dropped.append, clock=clock)
+        store.add({'n': 1})
+        clock.now = 30
+        fresh = store.add({'n': 2})
+        
+        clock.now = 61
+        assert store.sweep() == [{'n': 1}]
+        assert dropped == [{'n': 1}]
+        assert store.get(fresh) == {'n': 2}
+    
+    def test_memory_flat_over_time(self):
+        """Test a long stream of ignored downloads keeps the store bounded."""
+        clock = FakeClock()
+        store = PendingDownloadStore(max_size=200, ttl=60, clock=clock)
+        for second in range(10000):
+            clock.now = second
+            store.add({'n': second})
+            assert len(store) <= 200
+            if second % 300 == 0:
+                store.sweep()
+                assert len(store) <= 60
+    
+    def test_invalid_max_size(self):
+        """Test max_size validation."""
+        with pytest.raises(ValueError):
+            PendingDownloadStore(max_size=0)
+    
+    def test_restart_restores_live_entries(self, tmp_path):
+        """Test unclaimed entries survive a restart and keep their remaining TTL."""
+        db_path = str(tmp_path / 'state.sqlite3')
+        wall = FakeClock(1000)
+        state = StateStore(db_path, clock=wall)
+        store = PendingDownloadStore(ttl=60, clock=FakeClock(), state=state)
+        claimed = store.add({'n': 1})
+        waiting = store.add({'n': 2})
+        store.pop(claimed)
+        state.close()
+        
+        wall.now = 1050
+        clock = FakeClock(500)
+        restored = PendingDownloadStore(ttl=60, clock=clock, state=StateStore(db_path, clock=wall))
+        assert len(restored) == 1
+        assert restored.get(waiting) == {'n': 2}
+        clock.now = 511
+        assert restored.pop(waiting) is None
+    
+    def test_restart_skips_expired_entries(self, tmp_path):
+        """Test entries that expired while the bot was down are not restored."""
+        db_path = str(tmp_path / 'state.sqlite3')
+        wall = FakeClock(1000)
+        state = StateStore(db_path, clock=wall)
+        PendingDownloadStore(ttl=60, state=state).add({'n': 1})
+        state.close()
+        
+        wall.now = 1061
+        assert len(PendingDownloadStore(ttl=60, state=StateStore(db_path, clock=wall))) == 0
+
+
+class TestSQLitePendingStore:
+    """Test cases for the pending store shared between processes."""
+    
+    def test_shared_between_instances(self, tmp_path):
+        """Test an entry added by one process is claimed once by another."""
+        path = str(tmp_path / 'state.sqlite3')
+        front = SQLitePendingStore(path)
+        workers = [SQLitePendingStore(path) for _ in range(2)]
+        
+        key = front.add({'url': 'https://youtu.be/abc', 'direct_urls': ['u']})
+        
+        assert workers[0].get(key) == {'url': 'https://youtu.be/abc', 'direct_urls': ['u']}
+        assert workers[1].pop(key) == {'url': 'https://youtu.be/abc', 'direct_urls': ['u']}
+        assert workers[0].pop(key) is None
+        assert len(front) == 0
+    
+    def test_expiry_and_sweep(self, tmp_path):
+        """Test expired entries cannot be claimed and are swept."""
+        clock = FakeClock()
+        expired = []
+        store = SQLitePendingStore(str(tmp_path / 'state.sqlite3'), ttl=10, on_expire=expired.append, clock=clock)
+        
+        old = store.add({'n': 1})
+        clock.now = 5
+        store.add({'n': 2})
+        clock.now = 11
+        
+        assert store.pop(old) is None
+        assert store.sweep() == []
+        clock.now = 16
+        assert store.sweep() == [{'n': 2}]
+        assert expired == [{'n': 1}, {'n': 2}]
+        assert len(store) == 0
+    
+    def test_max_size_drops_oldest(self, tmp_path):
+        """Test the oldest entries are dropped beyond max_size."""
+        dropped = []
+        store = SQLitePendingStore(str(tmp_path / 'state.sqlite3'), max_size=2, on_expire=dropped.append)
+        keys = [store.add({'n': n}) for n in range(3)]
+        
+        assert dropped == [{'n': 0}]
+        assert store.get(keys[0]) is None
+        assert store.get(keys[2]) == {'n': 2}
+        assert len(store) == 2
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,194 @@
+"""
+Unit tests for Platform Health module
+"""
+
+import pytest
+
+from platform_health import (
+    PERMANENT, TRANSIENT, UNAVAILABLE, UNKNOWN,
+    CircuitBreaker, PlatformHealth, RetryPolicy, classify_error
+)
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestClassification:
+    """Test cases for sorting errors into transient and permanent."""
+    
+    def test_transient_errors(self):
+        """Test rate limits, timeouts and server errors are retried."""
+        for error in (
+            'ERROR: [Instagram] abc: Requested content is not available, rate-limit reached or login required',
+            'ERROR: [TikTok] 123: Unable to download webpage: HTTP Error 429: Too Many Requests',
+            'ERROR: [youtube] abc: Sign in to confirm you\'re not a bot',
+            'ERROR: Unable to download webpage: <urlopen error timed out>',
+            'ERROR: [facebook] 1: HTTP Error 503: Service Unavailable',
+            'Connection reset by peer',
+        ):
+            assert classify_error(error) == TRANSIENT, error
+    
+    def test_permanent_errors(self):
+        """Test private, removed and unsupported videos are not retried."""
+        for error in (
+            'ERROR: [youtube] abc: Private video. Sign in if you\'ve been granted access to this video',
+            'ERROR: [youtube] abc: Video unavailable. This video has been removed by the uploader',
+            'ERROR: [TikTok] 123: Unable to download webpage: HTTP Error 404: Not Found',
+            'ERROR: Unsupported URL: https://example.com/',
+            'ERROR: [twitter] 1: No video could be found in this tweet',
+        ):
+            assert classify_error(error) == PERMANENT, error
+    
+    def test_unknown_errors(self):
+        """Test unrecognised errors are neither retried nor called permanent."""
+        assert classify_error("KeyError: 'formats'") == UNKNOWN
+        assert classify_error(None) == UNKNOWN
+
+
+class TestRetryPolicy:
+    """Test cases for jittered exponential backoff."""
+    
+    def test_only_transient_errors_are_retried(self):
+        """Test the retry budget and the error kinds that use it."""
+        policy = RetryPolicy(retries=2)
+        
+        assert policy.should_retry(TRANSIENT, 0)
+        assert policy.should_retry(TRANSIENT, 1)
+        assert not policy.should_retry(TRANSIENT, 2)
+        assert not policy.should_retry(PERMANENT, 0)
+        assert not policy.should_retry(UNKNOWN, 0)
+        assert not policy.should_retry(None, 0)
+    
+    def test_delay_is_jittered_up_to_backoff(self):
+        """Test delays are uniform up to a doubling, capped bound."""
+        assert RetryPolicy(backoff=1, backoff_max=5, rng=lambda: 0.999).delay(10) == pytest.approx(5, abs=0.01)
+        
+        policy = RetryPolicy(backoff=1, backoff_max=100, rng=lambda: 0.5)
+        assert [policy.delay(n) for n in range(4)] == [0.5, 1, 2, 4]
+        assert RetryPolicy(rng=lambda: 0.0).delay(3) == 0
+
+
+class TestCircuitBreaker:
+    """Test cases for opening, probing and closing the breaker."""
+    
+    def make(self, **settings):
+        clock = FakeClock()
+        settings.setdefault('min_requests', 4)
+        return CircuitBreaker(failure_rate=0.5, window=60, cooldown=30, clock=clock, **settings), clock
+    
+    def test_opens_at_failure_rate(self):
+        """Test the breaker opens once enough calls fail and refuses calls."""
+        breaker, _ = self.make()
+        for ok in (True, False, True):
+            breaker.record(ok)
+        assert breaker.state == CircuitBreaker.CLOSED
+        
+        breaker.record(False)
+        assert breaker.state == CircuitBreaker.OPEN
+        assert not breaker.allow()
+        assert breaker.retry_after() == 30
+    
+    def test_needs_minimum_requests(self):
+        """Test a few early failures do not open the breaker."""
+        breaker, _ = self.make()
+        for _ in range(3):
+            breaker.record(False)
+        assert breaker.state == CircuitBreaker.CLOSED
+    
+    def test_old_outcomes_expire(self):
+        """Test failures outside the window no longer count."""
+        breaker, clock = self.make()
+        for _ in range(3):
+            breaker.record(False)
+        clock.now = 61
+        breaker.record(False)
+        
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.counts() == (1, 1)
+    
+    def test_half_open_probe_closes(self):
+        """Test a single probe is let through after the cooldown and success closes the breaker."""
+        breaker, clock = self.make(min_requests=1)
+        breaker.record(False)
+        clock.now = 30
+        
+        assert breaker.allow()
+        assert breaker.state == CircuitBreaker.HALF_OPEN
+        assert not breaker.allow()
+        breaker.record(True)
+        assert breaker.state == CircuitBreaker.CLOSED
+        assert breaker.allow() and breaker.allow()
+    
+    def test_failed_probe_reopens(self):
+        """Test a failing probe starts a new cooldown."""
+        breaker, clock = self.make(min_requests=1)
+        breaker.record(False)
+        clock.now = 30
+        assert breaker.allow()
+        breaker.record(False)
+        
+        assert breaker.state == CircuitBreaker.OPEN
+        assert breaker.retry_after() == 30
+    
+    def test_lost_probe_is_replaced(self):
+        """Test a probe that never reports back does not keep the breaker half-open forever."""
+        breaker, clock = self.make(min_requests=1)
+        breaker.record(False)
+        clock.now = 30
+        assert breaker.allow()
+        clock.now = 59
+        assert not breaker.allow()
+        clock.now = 60
+        assert breaker.allow()
+
+
+class TestPlatformHealth:
+    """Test cases for per-platform tracking."""
+    
+    def test_platforms_are_independent(self):
+        """Test a failing platform does not affect another one."""
+        health = PlatformHealth(min_requests=2, clock=FakeClock())
+        health.record('instagram', TRANSIENT, 'rate-limit reached')
+        health.record('instagram', UNKNOWN, 'KeyError')
+        health.record('youtube', None)
+        
+        assert not health.allow('instagram')
+        assert health.allow('youtube')
+        
+        report = health.snapshot()
+        assert report['instagram']['state'] == CircuitBreaker.OPEN
+        assert report['instagram']['error_rate'] == 1.0
+        assert report['instagram']['last_error'] == 'KeyError'
+        assert report['instagram']['totals'][UNAVAILABLE] == 1
+        assert report['youtube']['state'] == CircuitBreaker.CLOSED
+    
+    def test_permanent_errors_are_healthy(self):
+        """Test private or removed videos count as answers from a working platform."""
+        health = PlatformHealth(min_requests=2, clock=FakeClock())
+        for _ in range(5):
+            health.record('youtube', PERMANENT, 'Private video')
+        
+        stats = health.snapshot()['youtube']
+        assert stats['state'] == CircuitBreaker.CLOSED
+        assert stats['failures'] == 0
+        assert stats['totals'][PERMANENT] == 5
+    
+    def test_disabled_breaker_still_counts(self):
+        """Test failure_rate 0 never refuses calls but keeps the counters."""
+        health = PlatformHealth(failure_rate=0, min_requests=1, clock=FakeClock())
+        for _ in range(5):
+            health.record('tiktok', TRANSIENT, 'timed out')
+        
+        assert health.allow('tiktok')
+        assert health.snapshot()['tiktok']['totals'][TRANSIENT] == 5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,201 @@
+"""
+Unit tests for Progress module
+"""
+
+import asyncio
+import threading
+import time
+import pytest
+from progress import ProgressReporter, format_bytes, format_duration, render_progress
+from rate_limiter import TokenBucket
+from telegram_request import retry_after_error
+
+
+class Recorder:
+    """Message edit stand-in recording the texts it receives."""
+    
+    def __init__(self):
+        self.texts = []
+    
+    async def __call__(self, text):
+        self.texts.append(text)
+
+
+class TestRendering:
+    """Test cases for progress text."""
+    
+    def test_format_bytes(self):
+        """Test byte counts scale to readable units."""
+        assert format_bytes(512) == '512 B'
+        assert format_bytes(1536) == '1.5 KB'
+        assert format_bytes(50 * 1024 * 1024) == '50.0 MB'
+    
+    def test_format_duration(self):
+        """Test durations render as m:ss or h:mm:ss."""
+        assert format_duration(45) == '0:45'
+        assert format_duration(3725) == '1:02:05'
+    
+    def test_render_with_total(self):
+        """Test a known total shows a bar, percent, speed and ETA."""
+        text = render_progress('Downloading video', 42, 100, speed=2048, eta=65)
+        assert text == '⏳ Downloading video... ▓▓▓▓░░░░░░ 42% of 100 B at 2.0 KB/s, ETA 1:05'
+    
+    def test_render_without_progress(self):
+        """Test a transfer without byte counts shows its size and elapsed time."""
+        assert render_progress('Uploading video', None, 2048, elapsed=35) == '⏳ Uploading video... 2.0 KB, 0:35 elapsed'
+        assert render_progress('Uploading video', None, None, elapsed=5) == '⏳ Uploading video... 0:05 elapsed'
+
+
+class TestProgressReporter:
+    """Test cases for throttled progress edits."""
+    
+    def test_updates_are_coalesced(self):
+        """Test a flood of updates from a worker thread becomes a few edits of the latest state."""
+        recorder = Recorder()
+        
+        async def run():
+            reporter = ProgressReporter(recorder, interval=0.05)
+            
+            def worker():
+                for n in range(1, 2001):
+                    reporter.hook({'status': 'downloading', 'downloaded_bytes': n, 'total_bytes': 2000})
+                    time.sleep(0.0001)
+            
+            thread = threading.Thread(target=worker)
+            thread.start()
+            await asyncio.to_thread(thread.join)
+            await asyncio.sleep(0.12)
+            await reporter.close()
+            return reporter
+        
+        reporter = asyncio.run(run())
+        
+        assert 1 <= reporter.edits <= 20
+        assert recorder.texts[-1].startswith('⏳ Downloading video... ▓▓▓▓▓▓▓▓▓▓ 100%')
+    
+    def test_first_edit_waits_an_interval(self):
+        """Test the message is not edited right after the caller set it."""
+        recorder = Recorder()
+        
+        async def run():
+            reporter = ProgressReporter(recorder, interval=0.1)
+            reporter.update('Downloading video', 1, 10)
+            await asyncio.sleep(0.03)
+            early = list(recorder.texts)
+            await asyncio.sleep(0.12)
+            await reporter.close()
+            return early
+        
+        assert asyncio.run(run()) == []
+        assert len(recorder.texts) == 1
+    
+    def test_unchanged_text_is_not_sent(self):
+        """Test an update that renders the same text does not edit again."""
+        recorder = Recorder()
+        
+        async def run():
+            reporter = ProgressReporter(recorder, interval=0.01)
+            for _ in range(3):
+                reporter.update('Downloading video', 5, 10)
+                await asyncio.sleep(0.03)
+            await reporter.close()
+        
+        asyncio.run(run())
+        assert len(recorder.texts) == 1
+    
+    def test_shared_budget(self):
+        """Test edits are skipped while the bot-wide edit budget is spent."""
+        recorder = Recorder()
+        
+        async def run():
+            budget = TokenBucket(rate=0.001, capacity=1)
+            first = ProgressReporter(recorder, interval=0.01, budget=budget)
+            second = ProgressReporter(recorder, interval=0.01, budget=budget)
+            first.update('Downloading video', 1, 10)
+            second.update('Downloading video', 2, 10)
+            await asyncio.sleep(0.05)
+            await first.close()
+            await second.close()
+        
+        asyncio.run(run())
+        assert len(recorder.texts) == 1
+    
+    def test_close_drops_pending_edit(self):
+        """Test a pending edit cannot overwrite the final message."""
+        recorder = Recorder()
+        
+        async def run():
+            reporter = ProgressReporter(recorder, interval=0.05)
+            reporter.update('Downloading video', 1, 10)
+            await asyncio.sleep(0)
+            await reporter.close()
+            reporter.update('Downloading video', 2, 10)
+            await asyncio.sleep(0.1)
+        
+        asyncio.run(run())
+        assert recorder.texts == []
+    
+    def test_retry_after_pauses_edits(self):
+        """Test flood control errors push the next edit back."""
+        calls = []
+        
+        async def edit(text):
+            calls.append(text)
+            raise retry_after_error(10)
+        
+        async def run():
+            reporter = ProgressReporter(edit, interval=0.01)
+            reporter.update('Downloading video', 1, 10)
+            await asyncio.sleep(0.05)
+            reporter.update('Downloading video', 2, 10)
+            await asyncio.sleep(0.05)
+            await reporter.close()
+        
+        asyncio.run(run())
+        assert len(calls) == 1
+    
+    def test_disabled(self):
+        """Test a zero interval turns progress reporting off."""
+        recorder = Recorder()
+        
+        async def run():
+            async with ProgressReporter(recorder, interval=0) as reporter:
+                async with reporter.heartbeat('Uploading video', 100):
+                    reporter.update('Downloading video', 1, 10)
+                    await asyncio.sleep(0.02)
+        
+        asyncio.run(run())
+        assert recorder.texts == []
+    
+    def test_heartbeat(self):
+        """Test a transfer without byte progress shows elapsed time."""
+        recorder = Recorder()
+        
+        async def run():
+            async with ProgressReporter(recorder, interval=0.02) as reporter:
+                async with reporter.heartbeat('Uploading video', 2048):
+                    await asyncio.sleep(0.07)
+        
+        asyncio.run(run())
+        assert recorder.texts
+        assert recorder.texts[0].startswith('⏳ Uploading video... 2.0 KB')
+    
+    def test_transfer_derives_speed(self):
+        """Test byte-count callbacks get speed and ETA."""
+        now = [0.0]
+        recorder = Recorder()
+        
+        async def run():
+            reporter = ProgressReporter(recorder, interval=0.01, clock=lambda: now[0])
+            report = reporter.transfer('Uploading video')
+            now[0] = 2.0
+            report(1024, 4096)
+            await asyncio.sleep(0.03)
+            await reporter.close()
+        
+        asyncio.run(run())
+        assert recorder.texts == ['⏳ Uploading video... ▓▓░░░░░░░░ 25% of 4.0 KB at 512 B/s, ETA 0:06']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,201 @@
+"""
+Unit tests for Rate Limiter module
+"""
+
+import asyncio
+import pytest
+from rate_limiter import AdmissionController, FairScheduler, RateLimiter, TokenBucket, format_wait
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """Test cases for the token bucket."""
+    
+    def test_burst_then_refill(self):
+        """Test a full bucket allows a burst and then refills at its rate."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=4, clock=clock)
+        
+        assert bucket.consume(4)
+        assert not bucket.consume()
+        assert bucket.retry_after() == pytest.approx(0.5)
+        
+        clock.now = 0.5
+        assert bucket.consume()
+        assert not bucket.consume()
+    
+    def test_refill_is_capped(self):
+        """Test an idle bucket never holds more than its capacity."""
+        clock = FakeClock()
+        bucket = TokenBucket(rate=1, capacity=3, clock=clock)
+        bucket.consume(3)
+        clock.now = 100
+        
+        assert bucket.available() == 3
+        assert bucket.full
+    
+    def test_invalid_settings(self):
+        """Test a bucket that could never grant a token is rejected."""
+        with pytest.raises(ValueError):
+            TokenBucket(rate=0, capacity=1)
+
+
+class TestRateLimiter:
+    """Test cases for keyed rate limits."""
+    
+    def test_keys_are_independent(self):
+        """Test one user's spending does not affect another."""
+        limiter = RateLimiter(per_minute=60, burst=2, clock=FakeClock())
+        assert limiter.bucket(1).consume(2)
+        
+        assert not limiter.bucket(1).consume()
+        assert limiter.bucket(2).consume()
+    
+    def test_disabled(self):
+        """Test a zero rate disables the limit."""
+        assert RateLimiter(per_minute=0, burst=5).bucket(1) is None
+    
+    def test_full_buckets_are_pruned(self):
+        """Test memory stays bounded by dropping refilled buckets."""
+        clock = FakeClock()
+        limiter = RateLimiter(per_minute=60, burst=1, clock=clock, max_keys=10)
+        for user in range(10):
+            limiter.bucket(user).consume()
+        clock.now = 5
+        limiter.bucket('new')
+        
+        assert len(limiter) == 1
+
+
+class TestAdmissionController:
+    """Test cases for per-user and per-chat admission."""
+    
+    def test_partial_admission(self):
+        """Test links beyond the user's burst are refused with a retry delay."""
+        clock = FakeClock()
+        admission = AdmissionController(
+            RateLimiter(per_minute=6, burst=3, clock=clock),
+            RateLimiter(per_minute=60, burst=30, clock=clock)
+        )
+        
+        assert admission.admit(1, 100, 5) == (3, pytest.approx(10))
+        assert admission.admit(1, 100, 1) == (0, pytest.approx(10))
+        clock.now = 10
+        assert admission.admit(1, 100, 1) == (1, 0.0)
+    
+    def test_chat_limit_applies_across_users(self):
+        """Test many users in one chat share the chat budget."""
+        clock = FakeClock()
+        admission = AdmissionController(
+            RateLimiter(per_minute=60, burst=5, clock=clock),
+            RateLimiter(per_minute=60, burst=6, clock=clock)
+        )
+        
+        assert admission.admit(1, 100, 5)[0] == 5
+        assert admission.admit(2, 100, 5)[0] == 1
+        assert admission.admit(3, 200, 5)[0] == 5
+    
+    def test_refused_links_cost_nothing(self):
+        """Test a refused link does not use up the other limit."""
+        clock = FakeClock()
+        admission = AdmissionController(
+            RateLimiter(per_minute=60, burst=1, clock=clock),
+            RateLimiter(per_minute=60, burst=3, clock=clock)
+        )
+        admission.admit(1, 100, 3)
+        
+        assert admission.admit(2, 100, 2)[0] == 1
+    
+    def test_format_wait(self):
+        """Test retry delays are rounded up for the reply."""
+        assert format_wait(0.2) == '1s'
+        assert format_wait(59) == '59s'
+        assert format_wait(61) == '2 min'
+
+
+class TestFairScheduler:
+    """Test cases for the round-robin global concurrency budget."""
+    
+    def test_runs_immediately_with_free_slots(self):
+        """Test requests start without queueing while slots are free."""
+        async def scenario():
+            scheduler = FairScheduler(2)
+            assert scheduler.position('a') == 0
+            await scheduler.acquire('a')
+            await scheduler.acquire('b')
+            assert scheduler.active == 2
+            assert scheduler.position('c') == 1
+        
+        asyncio.run(scenario())
+    
+    def test_round_robin_across_users(self):
+        """Test a user with many queued requests cannot starve the others."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            order = []
+            
+            async def request(user, n):
+                async with scheduler.slot(user):
+                    order.append(f'{user}{n}')
+                    await asyncio.sleep(0)
+            
+            await scheduler.acquire('busy')
+            tasks = [asyncio.create_task(request('a', n)) for n in range(3)]
+            await asyncio.sleep(0)
+            tasks += [asyncio.create_task(request('b', n)) for n in range(2)]
+            tasks.append(asyncio.create_task(request('c', 0)))
+            await asyncio.sleep(0)
+            scheduler.release()
+            await asyncio.gather(*tasks)
+            return order
+        
+        assert asyncio.run(scenario()) == ['a0', 'b0', 'c0', 'a1', 'b1', 'a2']
+    
+    def test_position_follows_serving_order(self):
+        """Test the reported position matches the round-robin order."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            await scheduler.acquire('busy')
+            waiters = [asyncio.create_task(scheduler.acquire(user)) for user in 'aaab']
+            await asyncio.sleep(0)
+            
+            positions = (scheduler.position('a'), scheduler.position('b'), scheduler.position('c'))
+            for waiter in waiters:
+                waiter.cancel()
+            await asyncio.gather(*waiters, return_exceptions=True)
+            return positions, scheduler.waiting
+        
+        # Queue is a0 b0 a1 a2; a's next request follows a2, b's follows a1
+        assert asyncio.run(scenario()) == ((5, 4, 3), 0)
+    
+    def test_cancelled_waiter_frees_its_place(self):
+        """Test a cancelled request neither holds nor leaks a slot."""
+        async def scenario():
+            scheduler = FairScheduler(1)
+            await scheduler.acquire('a')
+            waiter = asyncio.create_task(scheduler.acquire('b'))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            scheduler.release()
+            return scheduler.active, scheduler.waiting
+        
+        assert asyncio.run(scenario()) == (0, 0)
+    
+    def test_invalid_capacity(self):
+        """Test a scheduler without slots is rejected."""
+        with pytest.raises(ValueError):
+            FairScheduler(0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
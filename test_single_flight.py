@@ -0,0 +1,101 @@
+"""
+Unit tests for Single Flight module
+"""
+
+import asyncio
+import pytest
+from single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Test cases for in-flight request deduplication."""
+    
+    def test_concurrent_calls_share_one_execution(self):
+        """Test N simultaneous calls for one key run the function once."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return 'result'
+        
+        async def run():
+            return await asyncio.gather(*[flight.do('video', work) for _ in range(20)])
+        
+        results = asyncio.run(run())
+        
+        assert len(calls) == 1
+        assert [r for r, _ in results] == ['result'] * 20
+        assert sum(1 for _, shared in results if not shared) == 1
+        assert flight.in_flight == 0
+    
+    def test_different_keys_run_separately(self):
+        """Test calls for different keys are not merged."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return len(calls)
+        
+        async def run():
+            return await asyncio.gather(flight.do('a', work), flight.do('b', work))
+        
+        asyncio.run(run())
+        assert len(calls) == 2
+    
+    def test_sequential_calls_run_again(self):
+        """Test a finished call is not reused by later requests."""
+        flight = SingleFlight()
+        calls = []
+        
+        async def work():
+            calls.append(1)
+            return 'result'
+        
+        async def run():
+            await flight.do('video', work)
+            await flight.do('video', work)
+        
+        asyncio.run(run())
+        assert len(calls) == 2
+    
+    def test_exception_reaches_every_waiter(self):
+        """Test a failed call raises in all waiters."""
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError('boom')
+        
+        async def run():
+            return await asyncio.gather(
+                *[flight.do('video', work) for _ in range(3)],
+                return_exceptions=True
+            )
+        
+        results = asyncio.run(run())
+        assert all(isinstance(r, RuntimeError) for r in results)
+    
+    def test_cancelled_waiter_does_not_cancel_others(self):
+        """Test one waiter giving up leaves the shared call running."""
+        flight = SingleFlight()
+        
+        async def work():
+            await asyncio.sleep(0.05)
+            return 'result'
+        
+        async def run():
+            first = asyncio.create_task(flight.do('video', work))
+            second = asyncio.create_task(flight.do('video', work))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            return await second
+        
+        assert asyncio.run(run()) == ('result', True)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,123 @@
+"""
+Unit tests for State Store module
+"""
+
+import time
+import sqlite3
+import pytest
+from state_store import StateStore
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+def count_rows(db_path, table='kv'):
+    """Count committed rows as seen by another connection."""
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    finally:
+        conn.close()
+
+
+class TestStateStore:
+    """Test cases for the batched SQLite state store."""
+    
+    def test_set_and_load(self, tmp_path):
+        """Test values round-trip through JSON."""
+        store = StateStore(str(tmp_path / 'state.sqlite3'), flush_interval=0)
+        store.set('pending', 'abc', {'url': 'https://youtu.be/x', 'size': 3})
+        
+        assert store.load('pending') == {'abc': {'url': 'https://youtu.be/x', 'size': 3}}
+        assert store.load('cache') == {}
+        store.close()
+    
+    def test_writes_are_batched(self, tmp_path):
+        """Test buffered writes are committed together on flush."""
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_interval=3600)
+        for n in range(10):
+            store.set('file_id', f'key{n}', f'FILE{n}')
+        
+        assert count_rows(path) == 0
+        store.flush()
+        assert count_rows(path) == 10
+        store.close()
+    
+    def test_full_batch_is_committed_early(self, tmp_path):
+        """Test reaching max_batch wakes the flusher before the interval."""
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_interval=3600, max_batch=5)
+        for n in range(5):
+            store.set('file_id', f'key{n}', f'FILE{n}')
+        
+        deadline = time.monotonic() + 5
+        while count_rows(path) < 5 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert count_rows(path) == 5
+        store.close()
+    
+    def test_later_writes_win(self, tmp_path):
+        """Test writes to one key within a batch collapse to the last one."""
+        store = StateStore(str(tmp_path / 'state.sqlite3'), flush_interval=3600)
+        store.set('cache', 'a', 1)
+        store.set('cache', 'a', 2)
+        store.set('cache', 'b', 1)
+        store.delete('cache', 'b')
+        
+        assert len(store._writes) == 2
+        assert store.load('cache') == {'a': 2}
+        store.close()
+    
+    def test_expired_records_are_not_loaded(self, tmp_path):
+        """Test expired records are deleted on load."""
+        path = str(tmp_path / 'state.sqlite3')
+        clock = FakeClock()
+        store = StateStore(path, flush_interval=0, clock=clock)
+        store.set('pending', 'old', {'n': 1}, expires_at=1010)
+        store.set('pending', 'new', {'n': 2}, expires_at=1030)
+        store.set('pending', 'forever', {'n': 3})
+        clock.now = 1020
+        
+        assert [key for key, _, _ in store.load_with_expiry('pending')] == ['forever', 'new']
+        assert count_rows(path) == 2
+        store.close()
+    
+    def test_persists_across_restart(self, tmp_path):
+        """Test buffered writes are committed on close and reloaded."""
+        path = str(tmp_path / 'state.sqlite3')
+        store = StateStore(path, flush_interval=3600)
+        store.set('file_id', 'youtube:abc:default', 'FILE123')
+        store.close()
+        
+        reopened = StateStore(path)
+        assert reopened.load('file_id') == {'youtube:abc:default': 'FILE123'}
+        reopened.close()
+    
+    def test_deliveries(self, tmp_path):
+        """Test delivery records are returned newest first."""
+        clock = FakeClock()
+        store = StateStore(str(tmp_path / 'state.sqlite3'), clock=clock)
+        store.record_delivery(42, 'upload', 'youtube:abc:default', 'FILE123')
+        clock.now += 1
+        store.record_delivery(42, 'file_id', 'youtube:abc:default', 'FILE123')
+        clock.now += 1
+        store.record_delivery(7, 'link')
+        
+        deliveries = store.deliveries(limit=2)
+        assert [d['method'] for d in deliveries] == ['link', 'file_id']
+        assert deliveries[0] == {
+            'chat_id': 7, 'cache_key': None, 'method': 'link', 'file_id': None, 'delivered_at': 1002.0
+        }
+        store.close()
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,180 @@
+"""
+Unit tests for Stream Upload module
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from stream_upload import StreamingUploader, StreamingUploadError
+from telegram_request import PooledRequest, RetryAfterLimiter, RoutingRequest
+
+VIDEO = b'\x00\x01video-bytes' * 1000
+
+
+def make_transport(received, ok=True, source_status=200):
+    """Build a mock transport acting as media server and Bot API."""
+    async def handler(request):
+        if request.method == 'GET':
+            if request.url.path == '/redirect':
+                return httpx.Response(302, headers={'Location': 'https://cdn.example/v.mp4'})
+            received['source_headers'] = dict(request.headers)
+            return httpx.Response(source_status, content=VIDEO)
+        received['url'] = str(request.url)
+        received['headers'] = dict(request.headers)
+        received['body'] = b''.join([chunk async for chunk in request.stream])
+        if not ok:
+            return httpx.Response(400, json={'ok': False, 'description': 'Bad Request: wrong file'})
+        return httpx.Response(200, json={'ok': True, 'result': {'video': {'file_id': 'FILE1'}}})
+    return httpx.MockTransport(handler)
+
+
+def make_bot(request=None, rate_limiter=None):
+    """Build a bot stand-in with the attributes the uploader uses."""
+    return SimpleNamespace(base_url='https://api.example/botTOKEN', request=request, rate_limiter=rate_limiter)
+
+
+def stream_info(**overrides):
+    """Build a stream description as returned by fetch_metadata."""
+    info = {'url': 'https://cdn.example/v.mp4', 'ext': 'mp4', 'protocol': 'https',
+            'http_headers': {'User-Agent': 'test-agent'}}
+    info.update(overrides)
+    return info
+
+
+class TestStreamingUploader:
+    """Test cases for piping downloads into sendVideo."""
+    
+    def test_can_stream(self):
+        """Test which formats qualify for streaming."""
+        assert StreamingUploader.can_stream(stream_info()) is True
+        assert StreamingUploader.can_stream(stream_info(protocol='m3u8_native')) is False
+        assert StreamingUploader.can_stream(stream_info(ext='webm')) is False
+        assert StreamingUploader.can_stream(None) is False
+    
+    def test_send_video_streams_body(self):
+        """Test the source bytes are forwarded inside a multipart request."""
+        received = {}
+        client = httpx.AsyncClient(transport=make_transport(received))
+        uploader = StreamingUploader(client=client)
+        
+        result = asyncio.run(uploader.send_video(make_bot(), 42, stream_info(), caption='📹 Clip', filename='v.mp4'))
+        
+        assert result == {'video': {'file_id': 'FILE1'}}
+        assert received['url'] == 'https://api.example/botTOKEN/sendVideo'
+        assert received['source_headers']['user-agent'] == 'test-agent'
+        body = received['body']
+        assert VIDEO in body
+        assert b'name="chat_id"\r\n\r\n42\r\n' in body
+        assert '📹 Clip'.encode('utf-8') in body
+        assert int(received['headers']['content-length']) == len(body)
+    
+    def test_send_video_reports_progress(self):
+        """Test upload progress is reported as video chunks are sent."""
+        client = httpx.AsyncClient(transport=make_transport({}))
+        uploader = StreamingUploader(client=client, chunk_size=4096)
+        reports = []
+        
+        asyncio.run(uploader.send_video(make_bot(), 42, stream_info(), progress=lambda done, total: reports.append((done, total))))
+        
+        assert len(reports) > 1
+        assert reports[-1] == (len(VIDEO), len(VIDEO))
+        assert [done for done, _ in reports] == sorted(done for done, _ in reports)
+    
+    def test_telegram_rejection(self):
+        """Test an API error is raised as StreamingUploadError."""
+        client = httpx.AsyncClient(transport=make_transport({}, ok=False))
+        uploader = StreamingUploader(client=client)
+        
+        with pytest.raises(StreamingUploadError, match='wrong file'):
+            asyncio.run(uploader.send_video(make_bot(), 42, stream_info()))
+    
+    def test_source_error(self):
+        """Test a failing media server aborts before uploading."""
+        received = {}
+        client = httpx.AsyncClient(transport=make_transport(received, source_status=403))
+        uploader = StreamingUploader(client=client)
+        
+        with pytest.raises(StreamingUploadError, match='403'):
+            asyncio.run(uploader.send_video(make_bot(), 42, stream_info()))
+        assert 'body' not in received
+    
+    def test_source_redirect(self):
+        """Test a media server redirect is followed."""
+        received = {}
+        client = httpx.AsyncClient(transport=make_transport(received))
+        uploader = StreamingUploader(client=client)
+        
+        result = asyncio.run(uploader.send_video(make_bot(), 42, stream_info(url='https://cdn.example/redirect')))
+        assert result == {'video': {'file_id': 'FILE1'}}
+        assert VIDEO in received['body']
+    
+    def test_upload_uses_bot_upload_pool(self):
+        """Test the upload goes through the bot's upload pool, not the source client."""
+        received = {}
+        
+        async def source_only(request):
+            assert request.method == 'GET'
+            return httpx.Response(200, content=VIDEO)
+        
+        upload = PooledRequest(httpx_kwargs={'transport': make_transport(received)})
+        bot = make_bot(request=RoutingRequest(PooledRequest(), upload))
+        uploader = StreamingUploader(client=httpx.AsyncClient(transport=httpx.MockTransport(source_only)))
+        
+        asyncio.run(uploader.send_video(bot, 42, stream_info()))
+        assert received['url'] == 'https://api.example/botTOKEN/sendVideo'
+        assert VIDEO in received['body']
+    
+    def test_flood_control_is_retried_by_rate_limiter(self):
+        """Test a 429 from sendVideo is waited out by the bot's rate limiter."""
+        received = {}
+        sleeps = []
+        now = [0.0]
+        
+        async def handler(request):
+            if request.method == 'GET':
+                return httpx.Response(200, content=VIDEO)
+            received['uploads'] = received.get('uploads', 0) + 1
+            received['body'] = b''.join([chunk async for chunk in request.stream])
+            if received['uploads'] == 1:
+                return httpx.Response(429, json={
+                    'ok': False, 'error_code': 429, 'description': 'Too Many Requests',
+                    'parameters': {'retry_after': 3}
+                })
+            return httpx.Response(200, json={'ok': True, 'result': {'video': {'file_id': 'FILE1'}}})
+        
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            now[0] += seconds
+        
+        bot = make_bot(rate_limiter=RetryAfterLimiter(clock=lambda: now[0], sleep=sleep))
+        uploader = StreamingUploader(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        
+        result = asyncio.run(uploader.send_video(bot, 42, stream_info()))
+        assert result == {'video': {'file_id': 'FILE1'}}
+        assert received['uploads'] == 2
+        assert VIDEO in received['body']
+        assert sleeps == [3]
+    
+    def test_flood_control_without_rate_limiter(self):
+        """Test a 429 is reported as StreamingUploadError when nothing retries it."""
+        async def handler(request):
+            if request.method == 'GET':
+                return httpx.Response(200, content=VIDEO)
+            return httpx.Response(429, json={'ok': False, 'parameters': {'retry_after': 3}})
+        
+        uploader = StreamingUploader(client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        with pytest.raises(StreamingUploadError, match='Flood control'):
+            asyncio.run(uploader.send_video(make_bot(), 42, stream_info()))
+    
+    def test_unstreamable_format(self):
+        """Test formats that need yt-dlp are refused."""
+        uploader = StreamingUploader(client=httpx.AsyncClient())
+        
+        with pytest.raises(StreamingUploadError):
+            asyncio.run(uploader.send_video(make_bot(), 42, stream_info(protocol='m3u8_native')))
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
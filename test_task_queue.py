@@ -0,0 +1,165 @@
+"""
+Unit tests for Task Queue module
+"""
+
+import asyncio
+import pytest
+from task_queue import InProcessTaskQueue, SQLiteTaskQueue
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 1000.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def make_queue(request, tmp_path):
+    """Build queues of either backend with the given options."""
+    def make(**kwargs):
+        if request.param == 'memory':
+            return InProcessTaskQueue(**kwargs)
+        return SQLiteTaskQueue(str(tmp_path / 'queue.sqlite3'), poll_interval=0.01, **kwargs)
+    return make
+
+
+class TestTaskQueue:
+    """Test cases shared by both queue backends."""
+    
+    def test_fifo_order(self, make_queue):
+        """Test tasks come out in the order they were put."""
+        async def run():
+            queue = make_queue()
+            for n in range(3):
+                await queue.put('message', {'n': n})
+            tasks = [await queue.get(timeout=1) for _ in range(3)]
+            await queue.close()
+            return tasks
+        
+        tasks = asyncio.run(run())
+        assert [t['payload']['n'] for t in tasks] == [0, 1, 2]
+        assert all(t['kind'] == 'message' and t['attempts'] == 1 for t in tasks)
+    
+    def test_get_times_out(self, make_queue):
+        """Test get returns None when nothing arrives in time."""
+        async def run():
+            queue = make_queue()
+            task = await queue.get(timeout=0.05)
+            await queue.close()
+            return task
+        
+        assert asyncio.run(run()) is None
+    
+    def test_complete_removes_task(self, make_queue):
+        """Test a completed task is not handed out again."""
+        async def run():
+            queue = make_queue()
+            await queue.put('callback', {})
+            task = await queue.get(timeout=1)
+            await queue.complete(task['id'])
+            again = await queue.get(timeout=0.05)
+            await queue.close()
+            return again
+        
+        assert asyncio.run(run()) is None
+    
+    def test_fail_retries_until_max_attempts(self, make_queue):
+        """Test a failing task is retried, then dropped."""
+        async def run():
+            queue = make_queue(max_attempts=2)
+            await queue.put('message', {})
+            first = await queue.get(timeout=1)
+            retried = await queue.fail(first['id'], 'boom')
+            second = await queue.get(timeout=1)
+            dropped = not await queue.fail(second['id'], 'boom')
+            third = await queue.get(timeout=0.05)
+            await queue.close()
+            return retried, second['attempts'], dropped, third
+        
+        assert asyncio.run(run()) == (True, 2, True, None)
+    
+    def test_task_attempt_limit(self, make_queue):
+        """Test a task put with max_attempts=1 is not retried whatever the queue default."""
+        async def run():
+            queue = make_queue(max_attempts=3)
+            await queue.put('callback', {}, max_attempts=1)
+            task = await queue.get(timeout=1)
+            retried = await queue.fail(task['id'], 'boom')
+            again = await queue.get(timeout=0.05)
+            await queue.close()
+            return retried, again
+        
+        assert asyncio.run(run()) == (False, None)
+
+
+class TestSQLiteTaskQueue:
+    """Test cases for the queue shared between processes."""
+    
+    def test_shared_between_instances(self, tmp_path):
+        """Test each task goes to exactly one of several consumers."""
+        path = str(tmp_path / 'queue.sqlite3')
+        
+        async def run():
+            producer = SQLiteTaskQueue(path)
+            consumers = [SQLiteTaskQueue(path, poll_interval=0.01) for _ in range(3)]
+            for n in range(30):
+                await producer.put('message', {'n': n})
+            
+            seen = []
+            for consumer in consumers * 10:
+                task = await consumer.get(timeout=1)
+                seen.append(task['payload']['n'])
+                await consumer.complete(task['id'])
+            
+            remaining = len(producer)
+            for queue in [producer] + consumers:
+                await queue.close()
+            return seen, remaining
+        
+        seen, remaining = asyncio.run(run())
+        assert sorted(seen) == list(range(30))
+        assert remaining == 0
+    
+    def test_expired_lease_is_handed_out_again(self, tmp_path):
+        """Test a task held by a dead worker is picked up by another."""
+        clock = FakeClock()
+        path = str(tmp_path / 'queue.sqlite3')
+        
+        async def run():
+            queue = SQLiteTaskQueue(path, lease=60, clock=clock)
+            await queue.put('callback', {'key': 'abc'})
+            await queue.get(timeout=0)
+            held = await queue.get(timeout=0)
+            clock.now += 61
+            reclaimed = await queue.get(timeout=0)
+            await queue.close()
+            return held, reclaimed
+        
+        held, reclaimed = asyncio.run(run())
+        assert held is None
+        assert reclaimed['payload'] == {'key': 'abc'}
+        assert reclaimed['attempts'] == 2
+    
+    def test_abandoned_task_out_of_attempts_is_failed(self, tmp_path):
+        """Test an expired lease on the last attempt marks the task failed."""
+        clock = FakeClock()
+        
+        async def run():
+            queue = SQLiteTaskQueue(str(tmp_path / 'queue.sqlite3'), lease=60, max_attempts=1, clock=clock)
+            await queue.put('message', {})
+            await queue.get(timeout=0)
+            clock.now += 61
+            task = await queue.get(timeout=0)
+            failed = queue.failed
+            await queue.close()
+            return task, failed
+        
+        assert asyncio.run(run()) == (None, 1)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
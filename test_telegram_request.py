@@ -0,0 +1,208 @@
+"""
+Unit tests for Telegram Request module
+"""
+
+import asyncio
+import warnings
+
+import pytest
+from telegram import InputFile
+from telegram.error import RetryAfter
+from telegram.request import HTTPXRequest, RequestData
+from telegram.request._requestparameter import RequestParameter
+from telegram.warnings import PTBDeprecationWarning
+
+from telegram_request import (
+    RetryAfterLimiter,
+    RoutingRequest,
+    make_request,
+    requests_from_env,
+    retry_after_error,
+    retry_after_seconds
+)
+
+
+class FakeClock:
+    """Manually advanced time source."""
+    
+    def __init__(self, now: float = 0.0):
+        self.now = now
+    
+    def __call__(self):
+        return self.now
+
+
+class FakeRequest:
+    """Records the calls it receives."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        self.calls = []
+        self.initialized = False
+        self.read_timeout = 5.0
+    
+    async def initialize(self):
+        self.initialized = True
+    
+    async def shutdown(self):
+        self.initialized = False
+    
+    async def do_request(self, url, method, request_data=None, **timeouts):
+        self.calls.append((url, timeouts))
+        return 200, self.name.encode()
+
+
+def text_data() -> RequestData:
+    return RequestData([RequestParameter.from_input('text', 'hello')])
+
+
+def file_data() -> RequestData:
+    return RequestData([RequestParameter.from_input('video', InputFile(b'data', filename='video.mp4'))])
+
+
+class TestRoutingRequest:
+    """Test cases for splitting uploads from other calls."""
+    
+    def test_uploads_use_upload_pool(self):
+        """Test calls carrying files go to the upload request and others to the api request."""
+        api, upload = FakeRequest('api'), FakeRequest('upload')
+        router = RoutingRequest(api, upload)
+        
+        async def scenario():
+            text = await router.do_request('u/sendMessage', 'POST', text_data(), read_timeout=3)
+            video = await router.do_request('u/sendVideo', 'POST', file_data())
+            bare = await router.do_request('u/getMe', 'POST')
+            return text, video, bare
+        
+        assert asyncio.run(scenario()) == ((200, b'api'), (200, b'upload'), (200, b'api'))
+        assert api.calls[0] == ('u/sendMessage', {'read_timeout': 3})
+        assert [url for url, _ in upload.calls] == ['u/sendVideo']
+    
+    def test_lifecycle_covers_both(self):
+        """Test initialize and shutdown reach both request objects."""
+        api, upload = FakeRequest('api'), FakeRequest('upload')
+        router = RoutingRequest(api, upload)
+        
+        asyncio.run(router.initialize())
+        assert api.initialized and upload.initialized
+        asyncio.run(router.shutdown())
+        assert not api.initialized and not upload.initialized
+        assert router.read_timeout == 5.0
+    
+    def test_from_env(self, monkeypatch):
+        """Test pool sizes and timeouts come from the environment."""
+        monkeypatch.setenv('TELEGRAM_POOL_SIZE', '64')
+        monkeypatch.setenv('TELEGRAM_UPLOAD_POOL_SIZE', '2')
+        monkeypatch.setenv('TELEGRAM_READ_TIMEOUT', '7.5')
+        monkeypatch.setenv('TELEGRAM_UPLOAD_POOL_TIMEOUT', '90')
+        router = requests_from_env()
+        
+        assert isinstance(router.api, HTTPXRequest)
+        assert router.api._client_kwargs['limits'].max_connections == 64
+        assert router.upload._client_kwargs['limits'].max_connections == 2
+        assert router.read_timeout == 7.5
+        assert router.upload._client_kwargs['timeout'].pool == 90
+    
+    def test_http2_falls_back_without_h2(self, monkeypatch):
+        """Test HTTP/2 is only requested when the h2 package is importable."""
+        monkeypatch.setattr('telegram_request.http2_available', lambda: False)
+        request = make_request(4, 1, 1, 1, 1, http_version='2')
+        assert request._client_kwargs['http1'] is True
+        assert request._client_kwargs['http2'] is False
+
+
+class TestRetryAfterLimiter:
+    """Test cases for flood-control handling."""
+    
+    def make_limiter(self, max_retries: int = 3):
+        clock = FakeClock()
+        sleeps = []
+        
+        async def sleep(seconds):
+            sleeps.append(seconds)
+            clock.now += seconds
+        
+        return RetryAfterLimiter(max_retries, clock=clock, sleep=sleep), clock, sleeps
+    
+    def failing_callback(self, failures: int, retry_after=5):
+        calls = []
+        
+        async def callback(*args, **kwargs):
+            calls.append((args, kwargs))
+            if len(calls) <= failures:
+                raise retry_after_error(retry_after)
+            return 'sent'
+        
+        return callback, calls
+    
+    def test_retries_after_waiting(self):
+        """Test a RetryAfter is waited out and the call repeated."""
+        limiter, _, sleeps = self.make_limiter()
+        callback, calls = self.failing_callback(failures=2)
+        
+        result = asyncio.run(limiter.process_request(
+            callback, ('a',), {'b': 1}, 'sendMessage', {'chat_id': 1}, None
+        ))
+        
+        assert result == 'sent'
+        assert sleeps == [5, 5]
+        assert calls == [(('a',), {'b': 1})] * 3
+        assert limiter.retries == 2
+    
+    def test_gives_up_after_max_retries(self):
+        """Test the error is raised once the retries are used up."""
+        limiter, _, sleeps = self.make_limiter(max_retries=1)
+        callback, calls = self.failing_callback(failures=5)
+        
+        with pytest.raises(RetryAfter):
+            asyncio.run(limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 1}, None))
+        assert len(calls) == 2
+        
+        # rate_limit_args overrides the retries per call
+        callback, calls = self.failing_callback(failures=1)
+        with pytest.raises(RetryAfter):
+            asyncio.run(limiter.process_request(callback, (), {}, 'sendMessage', {'chat_id': 2}, 0))
+        assert len(calls) == 1
+    
+    def test_pause_is_per_chat(self):
+        """Test flood control in one chat delays that chat but not others."""
+        limiter, clock, sleeps = self.make_limiter()
+        limiter._pause(1, 10)
+        ok, _ = self.failing_callback(failures=0)
+        
+        asyncio.run(limiter.process_request(ok, (), {}, 'sendMessage', {'chat_id': 2}, None))
+        assert sleeps == []
+        asyncio.run(limiter.process_request(ok, (), {}, 'sendMessage', {'chat_id': 1}, None))
+        assert sleeps == [10]
+        assert clock.now == 10
+    
+    def test_global_pause(self):
+        """Test flood control outside a chat delays every call."""
+        limiter, clock, sleeps = self.make_limiter()
+        callback, _ = self.failing_callback(failures=1, retry_after=3)
+        asyncio.run(limiter.process_request(callback, (), {}, 'getUpdates', {}, None))
+        assert sleeps == [3]
+        
+        limiter._pause(None, 4)
+        ok, _ = self.failing_callback(failures=0)
+        asyncio.run(limiter.process_request(ok, (), {}, 'sendMessage', {'chat_id': 9}, None))
+        assert sleeps == [3, 4]
+        assert list(limiter._paused_until) == [None]
+    
+    def test_retry_after_seconds(self):
+        """Test both int and timedelta retry_after values are understood."""
+        with pytest.warns(PTBDeprecationWarning):
+            error = RetryAfter(7)
+        assert retry_after_seconds(error) == 7.0
+        assert retry_after_seconds(retry_after_error(1.5)) == 1.5
+    
+    def test_retry_after_error(self):
+        """Test building a RetryAfter and reading it back raise no deprecation warning."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            error = retry_after_error(2.5)
+            assert retry_after_seconds(error) == 2.5
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
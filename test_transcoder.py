@@ -0,0 +1,265 @@
+"""
+Unit tests for Transcoder module
+"""
+
+import os
+import asyncio
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import transcoder
+from download_cache import DownloadCache
+from transcoder import TranscodeError, Transcoder, ffmpeg_command, parse_probe, plan
+
+MB = 1024 * 1024
+
+
+def media(size=10 * MB, duration=60.0, container='mov,mp4,m4a,3gp,3g2,mj2',
+          video_codec='h264', audio_codec='aac', height=1080):
+    return {
+        'container': container, 'duration': duration, 'size': size,
+        'video_codec': video_codec, 'audio_codec': audio_codec, 'height': height,
+    }
+
+
+class TestPlan:
+    """Test cases for choosing between nothing, remuxing and re-encoding."""
+    
+    def test_parse_probe(self):
+        """Test ffprobe output is reduced to the planning fields."""
+        data = {
+            'format': {'format_name': 'matroska,webm', 'duration': '12.5', 'size': '2048'},
+            'streams': [
+                {'codec_type': 'audio', 'codec_name': 'opus'},
+                {'codec_type': 'video', 'codec_name': 'vp9', 'height': 720},
+            ],
+        }
+        assert parse_probe(data) == {
+            'container': 'matroska,webm', 'duration': 12.5, 'size': 2048,
+            'video_codec': 'vp9', 'audio_codec': 'opus', 'height': 720,
+        }
+    
+    def test_sendable_video_is_left_alone(self):
+        """Test an MP4 within the limit needs no work."""
+        assert plan(media(), 50 * MB) == {'action': 'none'}
+    
+    def test_container_only_is_remuxed(self):
+        """Test compatible streams in another container are copied, not re-encoded."""
+        assert plan(media(container='matroska,webm'), 50 * MB) == {'action': 'remux', 'audio': 'copy'}
+        assert plan(media(container='matroska,webm', audio_codec='opus'), 50 * MB) == {
+            'action': 'remux', 'audio': 'aac'
+        }
+    
+    def test_oversized_video_is_encoded_to_fit(self):
+        """Test the bitrate is chosen so the output fits the limit."""
+        job = plan(media(size=200 * MB, duration=300), 50 * MB, audio_bitrate=128_000)
+        
+        assert job['action'] == 'encode'
+        total_bits = (job['video_bitrate'] + job['audio_bitrate']) * 300
+        assert total_bits / 8 <= 50 * MB
+        assert total_bits / 8 > 0.9 * 50 * MB
+        # ~1.2 Mbit/s looks better at 720p than at 1080p
+        assert job['height'] == 720
+    
+    def test_small_sources_keep_their_height(self):
+        """Test videos are never scaled up."""
+        job = plan(media(size=200 * MB, duration=300, height=480), 50 * MB)
+        assert job['height'] is None
+    
+    def test_incompatible_codec_is_not_inflated(self):
+        """Test re-encoding for the codec alone stays at the source bitrate."""
+        job = plan(media(size=5 * MB, duration=100, video_codec='vp9', container='matroska,webm'), 50 * MB)
+        
+        assert job['action'] == 'encode'
+        assert job['video_bitrate'] <= 5 * MB * 8 / 100
+    
+    def test_too_long_is_rejected(self):
+        """Test a video that would need an unwatchable bitrate is refused."""
+        with pytest.raises(TranscodeError):
+            plan(media(size=2000 * MB, duration=4 * 3600), 50 * MB)
+        with pytest.raises(TranscodeError):
+            plan(media(size=200 * MB, duration=0), 50 * MB)
+        with pytest.raises(TranscodeError):
+            plan(media(video_codec=None), 50 * MB)
+    
+    def test_commands(self):
+        """Test remux copies streams and encode sets bitrate and scaling."""
+        remux = ffmpeg_command({'action': 'remux', 'audio': 'copy'}, 'in.webm', 'out.mp4')
+        assert remux[remux.index('-c:v') + 1] == 'copy'
+        assert remux[remux.index('-c:a') + 1] == 'copy'
+        assert remux[-3:] == ['-f', 'mp4', 'out.mp4']
+        assert '+faststart' in remux
+        
+        job = {'action': 'encode', 'video_bitrate': 1_000_000, 'audio_bitrate': 128_000, 'height': 720}
+        encode = ffmpeg_command(job, 'in.mp4', 'out.mp4', preset='fast', threads=2)
+        assert encode[encode.index('-c:v') + 1] == 'libx264'
+        assert encode[encode.index('-b:v') + 1] == '1000000'
+        assert encode[encode.index('-maxrate') + 1] == '1000000'
+        assert encode[encode.index('-vf') + 1] == 'scale=-2:720'
+        assert encode[encode.index('-preset') + 1] == 'fast'
+
+
+class TestTranscoder:
+    """Test cases for running the stage and caching its output."""
+    
+    def make(self, tmp_path, monkeypatch, outcome='encode'):
+        calls = []
+        release = threading.Event()
+        release.set()
+        
+        def fake_fit_file(source, target, max_bytes, settings):
+            calls.append((source, target))
+            release.wait(5)
+            if outcome == 'error':
+                raise TranscodeError('Video is too long to fit 1 MB')
+            if outcome != 'none':
+                with open(target, 'wb') as f:
+                    f.write(b'y' * 10)
+            return {'action': outcome, 'size': 10}
+        
+        monkeypatch.setattr(transcoder, 'fit_file', fake_fit_file)
+        cache = DownloadCache(str(tmp_path))
+        source = tmp_path / 'abc.webm'
+        source.write_bytes(b'x' * 100)
+        cache.put('youtube:abc:max50', str(source))
+        stage = Transcoder(cache, 50, executor=ThreadPoolExecutor(2))
+        return stage, cache, str(source), calls, release
+    
+    def test_output_is_cached_next_to_original(self, tmp_path, monkeypatch):
+        """Test the fitted file sits beside the original and is reused."""
+        stage, cache, source, calls, _ = self.make(tmp_path, monkeypatch)
+        
+        first = asyncio.run(stage.fit(source, 'youtube:abc:max50'))
+        assert first['success'] and first['action'] == 'encode'
+        assert first['file_path'] == str(tmp_path / 'abc.fit50.mp4')
+        assert cache.get('youtube:abc:max50:fit50')['source'] == source
+        
+        second = asyncio.run(stage.fit(source, 'youtube:abc:max50'))
+        assert second['cached'] and second['file_path'] == first['file_path']
+        assert len(calls) == 1
+        stage.shutdown()
+    
+    def test_concurrent_requests_share_one_run(self, tmp_path, monkeypatch):
+        """Test simultaneous requests for one video run ffmpeg once and each get a reference."""
+        stage, cache, source, calls, release = self.make(tmp_path, monkeypatch)
+        release.clear()
+        
+        async def scenario():
+            tasks = [asyncio.create_task(stage.fit(source, 'youtube:abc:max50')) for _ in range(3)]
+            await asyncio.sleep(0.05)
+            release.set()
+            return await asyncio.gather(*tasks)
+        
+        results = asyncio.run(scenario())
+        assert [result['success'] for result in results] == [True] * 3
+        assert len(calls) == 1
+        assert cache.disk_usage()['pinned_files'] == 2
+        for _ in range(3):
+            cache.release(results[0]['file_path'])
+        cache.release(source)
+        assert cache.disk_usage()['pinned_files'] == 0
+        stage.shutdown()
+    
+    def test_nothing_to_do_returns_original(self, tmp_path, monkeypatch):
+        """Test a sendable file is returned as it is."""
+        stage, cache, source, _, _ = self.make(tmp_path, monkeypatch, outcome='none')
+        result = asyncio.run(stage.fit(source, 'youtube:abc:max50'))
+        
+        assert result == {'success': True, 'file_path': source, 'error': None, 'action': 'none', 'cached': False}
+        assert cache.get('youtube:abc:max50:fit50') is None
+        stage.shutdown()
+    
+    def test_failure_is_reported(self, tmp_path, monkeypatch):
+        """Test a video that cannot be fitted yields an error result."""
+        stage, _, source, _, _ = self.make(tmp_path, monkeypatch, outcome='error')
+        result = asyncio.run(stage.fit(source, 'youtube:abc:max50'))
+        
+        assert not result['success']
+        assert 'too long' in result['error']
+        stage.shutdown()
+    
+    def test_pool_failure_is_reported(self, tmp_path):
+        """Test a worker pool that cannot run the job yields an error result instead of raising."""
+        cache = DownloadCache(str(tmp_path))
+        source = tmp_path / 'abc.webm'
+        source.write_bytes(b'x' * 100)
+        cache.put('youtube:abc:max50', str(source))
+        pool = ThreadPoolExecutor(1)
+        stage = Transcoder(cache, 50, executor=pool)
+        pool.shutdown()
+        
+        result = asyncio.run(stage.fit(str(source), 'youtube:abc:max50'))
+        assert not result['success']
+        assert 'Transcoding failed' in result['error']
+    
+    def test_stuck_ffmpeg_times_out(self, tmp_path, monkeypatch):
+        """Test ffmpeg is given a timeout from the duration and a timeout is a TranscodeError."""
+        timeouts = []
+        target = tmp_path / 'abc.fit.mp4'
+        
+        def stuck_run(command, **kwargs):
+            timeouts.append(kwargs.get('timeout'))
+            (tmp_path / 'abc.fit.mp4.part').write_bytes(b'partial')
+            raise subprocess.TimeoutExpired(command, kwargs.get('timeout'))
+        
+        monkeypatch.setattr(transcoder, 'probe', lambda path, ffprobe: media(size=100 * MB, duration=600.0))
+        monkeypatch.setattr(transcoder.subprocess, 'run', stuck_run)
+        settings = {'ffmpeg': 'ffmpeg', 'ffprobe': 'ffprobe', 'preset': 'veryfast', 'threads': 1,
+                    'audio_bitrate': 128_000, 'timeout_factor': 4, 'min_timeout': 120}
+        
+        with pytest.raises(TranscodeError, match='timed out'):
+            transcoder.fit_file(str(tmp_path / 'abc.webm'), str(target), 50 * MB, settings)
+        assert timeouts == [2400]
+        assert not (tmp_path / 'abc.fit.mp4.part').exists()
+    
+    def test_needs_fitting(self, tmp_path):
+        """Test only oversized or non-MP4 files go through the stage."""
+        stage = Transcoder(DownloadCache(str(tmp_path)), 50, executor=ThreadPoolExecutor(1))
+        small, large, webm = tmp_path / 'a.mp4', tmp_path / 'b.mp4', tmp_path / 'c.webm'
+        small.write_bytes(b'x' * 10)
+        large.write_bytes(b'x' * 100)
+        webm.write_bytes(b'x' * 10)
+        
+        assert not stage.needs_fitting(str(small))
+        assert stage.needs_fitting(str(large))
+        assert stage.needs_fitting(str(webm))
+        assert not stage.needs_fitting(str(tmp_path / 'missing.mp4'))
+        stage.shutdown()
+
+
+@pytest.mark.skipif(not Transcoder.available(), reason='ffmpeg is not installed')
+class TestFfmpeg:
+    """Test cases running the real ffmpeg on generated clips."""
+    
+    def clip(self, path, codec_args, seconds=4):
+        subprocess.run(
+            ['ffmpeg', '-v', 'error', '-y', '-f', 'lavfi', '-i', f'testsrc2=size=1280x720:rate=30:duration={seconds}',
+             '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}', *codec_args, str(path)],
+            check=True
+        )
+        return str(path)
+    
+    def test_remux_and_encode(self, tmp_path):
+        """Test a Matroska H.264 clip is remuxed and an oversized clip is compressed below the limit."""
+        mkv = self.clip(tmp_path / 'a.mkv', ['-c:v', 'libx264', '-b:v', '4M', '-c:a', 'aac'])
+        remuxed = transcoder.fit_file(mkv, str(tmp_path / 'a.fit.mp4'), 50 * MB, {
+            'ffmpeg': 'ffmpeg', 'ffprobe': 'ffprobe', 'preset': 'ultrafast', 'threads': 1, 'audio_bitrate': 64_000,
+            'timeout_factor': 10, 'min_timeout': 120
+        })
+        assert remuxed['action'] == 'remux'
+        
+        limit = 800 * 1024
+        fitted = transcoder.fit_file(mkv, str(tmp_path / 'b.fit.mp4'), limit, {
+            'ffmpeg': 'ffmpeg', 'ffprobe': 'ffprobe', 'preset': 'ultrafast', 'threads': 1, 'audio_bitrate': 64_000,
+            'timeout_factor': 10, 'min_timeout': 120
+        })
+        assert fitted['action'] == 'encode'
+        assert fitted['size'] <= limit
+        assert os.path.getsize(tmp_path / 'b.fit.mp4') == fitted['size']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
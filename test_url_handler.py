@@ -2,8 +2,106 @@
 Unit tests for URL Handler module
 """
 
+import asyncio
+
+import httpx
 import pytest
-from url_handler import URLHandler
+from url_handler import ShortLinkResolver, URLHandler
+
+
+# URL form -> canonical (platform, video_id); None for unsupported links
+CANONICAL_CASES = [
+    # YouTube
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://youtube.com/watch?v=dQw4w9WgXcQ&si=AbCdEf", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/watch?v=dQw4w9WgXcQ&list=PL123&index=2", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/watch/?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("http://youtube.com/watch?v=dQw4w9WgXcQ#t=30", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://m.youtube.com/watch?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://music.youtube.com/watch?v=dQw4w9WgXcQ&feature=share", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://youtu.be/dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://youtu.be/dQw4w9WgXcQ?si=xyz&t=42", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/shorts/dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://youtube.com/shorts/dQw4w9WgXcQ?feature=share", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/embed/dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/live/dQw4w9WgXcQ?si=abc", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/v/dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("HTTPS://WWW.YOUTUBE.COM/watch?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com:443/watch?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("youtube.com/watch?v=dQw4w9WgXcQ", ('youtube', 'dQw4w9WgXcQ')),
+    ("https://www.youtube.com/", None),
+    ("https://www.youtube.com/@channel", None),
+    ("https://www.youtube.com/playlist?list=PL123", None),
+    # Facebook
+    ("https://www.facebook.com/someone/videos/1234567890", ('facebook', '1234567890')),
+    ("https://www.facebook.com/someone/videos/1234567890/?mibextid=abc", ('facebook', '1234567890')),
+    ("https://www.facebook.com/someone/videos/a-title/1234567890/", ('facebook', '1234567890')),
+    ("https://m.facebook.com/someone/videos/1234567890/", ('facebook', '1234567890')),
+    ("https://web.facebook.com/someone/videos/1234567890", ('facebook', '1234567890')),
+    ("https://www.facebook.com/watch/?v=1234567890", ('facebook', '1234567890')),
+    ("https://www.facebook.com/watch?v=1234567890&ref=sharing", ('facebook', '1234567890')),
+    ("https://www.facebook.com/video.php?v=1234567890", ('facebook', '1234567890')),
+    ("https://www.facebook.com/reel/1234567890", ('facebook', '1234567890')),
+    ("https://www.facebook.com/someone", None),
+    ("https://www.facebook.com/groups/123/posts/456", None),
+    # X (Twitter)
+    ("https://twitter.com/user/status/1712345678901234567", ('twitter', '1712345678901234567')),
+    ("https://x.com/user/status/1712345678901234567?s=20", ('twitter', '1712345678901234567')),
+    ("https://x.com/user/status/1712345678901234567?s=46&t=AbCdEf", ('twitter', '1712345678901234567')),
+    ("https://mobile.twitter.com/user/status/1712345678901234567", ('twitter', '1712345678901234567')),
+    ("https://twitter.com/i/status/1712345678901234567", ('twitter', '1712345678901234567')),
+    ("https://x.com/user/status/1712345678901234567/video/1", ('twitter', '1712345678901234567')),
+    ("https://twitter.com/user/statuses/1712345678901234567", ('twitter', '1712345678901234567')),
+    ("https://www.x.com/user/status/1712345678901234567", ('twitter', '1712345678901234567')),
+    ("https://x.com/user", None),
+    ("https://x.com/home", None),
+    # Instagram
+    ("https://www.instagram.com/p/CzAbC123xyz/", ('instagram', 'CzAbC123xyz')),
+    ("https://www.instagram.com/reel/CzAbC123xyz/?igsh=MWQ1ZGUxMzBkMA==", ('instagram', 'CzAbC123xyz')),
+    ("https://www.instagram.com/reels/CzAbC123xyz/", ('instagram', 'CzAbC123xyz')),
+    ("https://www.instagram.com/tv/CzAbC123xyz", ('instagram', 'CzAbC123xyz')),
+    ("https://www.instagram.com/some.user/reel/CzAbC123xyz/", ('instagram', 'CzAbC123xyz')),
+    ("https://instagram.com/p/CzAbC123xyz?utm_source=ig_web_copy_link", ('instagram', 'CzAbC123xyz')),
+    ("https://www.instagram.com/some.user/", None),
+    # TikTok
+    ("https://www.tiktok.com/@some.user/video/7301234567890123456", ('tiktok', '7301234567890123456')),
+    ("https://www.tiktok.com/@some.user/video/7301234567890123456?is_from_webapp=1&sender_device=pc",
+     ('tiktok', '7301234567890123456')),
+    ("https://www.tiktok.com/@/video/7301234567890123456", ('tiktok', '7301234567890123456')),
+    ("https://www.tiktok.com/embed/7301234567890123456", ('tiktok', '7301234567890123456')),
+    ("https://www.tiktok.com/embed/v2/7301234567890123456", ('tiktok', '7301234567890123456')),
+    ("https://m.tiktok.com/v/7301234567890123456.html", ('tiktok', '7301234567890123456')),
+    ("https://www.tiktok.com/@some.user", None),
+    ("https://www.tiktok.com/discover", None),
+    # Unsupported hosts
+    ("https://example.com/watch?v=dQw4w9WgXcQ", None),
+    ("https://notyoutube.com/watch?v=dQw4w9WgXcQ", None),
+    ("https://vimeo.com/123456", None),
+]
+
+# Short links: (URL, platform, short-link code)
+SHORT_LINK_CASES = [
+    ("https://vm.tiktok.com/ZM2abcDEF/", 'tiktok', 'ZM2abcDEF'),
+    ("https://vt.tiktok.com/ZS8xyz/", 'tiktok', 'ZS8xyz'),
+    ("https://www.tiktok.com/t/ZT8abc123/", 'tiktok', 'ZT8abc123'),
+    ("https://fb.watch/aBcD12/", 'facebook', 'aBcD12'),
+    ("https://www.facebook.com/share/v/1AbCdEf/", 'facebook', '1AbCdEf'),
+    ("https://www.facebook.com/share/r/1AbCdEf/?mibextid=xyz", 'facebook', '1AbCdEf'),
+]
+
+
+def redirect_transport(redirects, calls=None):
+    """Mock transport answering each URL in redirects with a 301 to its target."""
+    def handler(request):
+        if calls is not None:
+            calls.append((request.method, str(request.url)))
+        target = redirects.get(str(request.url))
+        if target is None:
+            return httpx.Response(200)
+        return httpx.Response(301, headers={'Location': target})
+    return httpx.MockTransport(handler)
 
 
 class TestURLHandler:
@@ -104,10 +202,173 @@ class TestURLHandler:
         assert URLHandler.identify_platform("https://tiktok.com/@user/video/123") == 'tiktok'
         assert URLHandler.identify_platform("https://example.com") == ''
     
+    def test_extract_video_id(self):
+        """Test video ID extraction without network access."""
+        assert URLHandler.extract_video_id("https://youtube.com/watch?v=abc-1&t=5", 'youtube') == 'abc-1'
+        assert URLHandler.extract_video_id("https://youtu.be/abc", 'youtube') == 'abc'
+        assert URLHandler.extract_video_id("https://youtube.com/shorts/abc", 'youtube') == 'abc'
+        assert URLHandler.extract_video_id("https://tiktok.com/@user/video/123", 'tiktok') == '123'
+        assert URLHandler.extract_video_id("https://x.com/user/status/456", 'twitter') == '456'
+        assert URLHandler.extract_video_id("https://instagram.com/reel/ABC/", 'instagram') == 'ABC'
+        assert URLHandler.extract_video_id("https://example.com", 'youtube') == ''
+    
+    def test_extract_returns_video_id(self):
+        """Test that extraction reports the video ID found in the same pass."""
+        text = "https://youtu.be/abc123 and x.com/user/status/42"
+        urls = URLHandler.extract_urls(text)
+        
+        assert [u['video_id'] for u in urls] == ['abc123', '42']
+        assert urls[1]['url'] == 'https://x.com/user/status/42'
+    
+    def test_extract_keeps_message_order(self):
+        """Test URLs with and without protocol come back in message order."""
+        text = "instagram.com/reel/A1 then https://youtu.be/B2"
+        urls = URLHandler.extract_urls(text)
+        
+        assert [u['platform'] for u in urls] == ['instagram', 'youtube']
+    
+    def test_http_url_not_duplicated(self):
+        """Test that an http:// URL is not reported again as a bare host match."""
+        urls = URLHandler.extract_urls("http://youtube.com/watch?v=abc")
+        
+        assert len(urls) == 1
+        assert urls[0]['url'] == 'http://youtube.com/watch?v=abc'
+    
+    def test_classify(self):
+        """Test single-pass platform and ID classification."""
+        assert URLHandler.classify("https://WWW.YouTube.com/watch?v=abc") == ('youtube', 'abc')
+        assert URLHandler.classify("https://youtube.com/watch?feature=share&v=abc") == ('youtube', 'abc')
+        assert URLHandler.classify("https://fb.watch/xyz/") == ('facebook', 'xyz')
+        assert URLHandler.classify("https://vm.tiktok.com/ZM123/") == ('tiktok', 'ZM123')
+        assert URLHandler.classify("https://youtube.com/about") is None
+        assert URLHandler.classify("https://notyoutube.com/watch?v=abc") is None
+    
     def test_is_valid_url(self):
         """Test URL validation."""
         assert URLHandler.is_valid_url("https://youtube.com/watch?v=test") == True
         assert URLHandler.is_valid_url("https://example.com") == False
+    
+    @pytest.mark.parametrize('url, expected', CANONICAL_CASES)
+    def test_canonicalize(self, url, expected):
+        """Test that every supported URL form reduces to (platform, video_id)."""
+        assert URLHandler.canonicalize(url) == expected
+    
+    @pytest.mark.parametrize('url, platform, code', SHORT_LINK_CASES)
+    def test_short_links(self, url, platform, code):
+        """Test that short links are recognised but need resolving."""
+        assert URLHandler.is_short_link(url)
+        assert URLHandler.canonicalize(url) is None
+        assert URLHandler.classify(url) == (platform, code)
+    
+    def test_equivalent_links_deduplicated(self):
+        """Test that different forms of one video are reported once."""
+        text = (
+            "youtu.be/dQw4w9WgXcQ "
+            "https://youtube.com/watch?v=dQw4w9WgXcQ&si=abc "
+            "https://m.youtube.com/shorts/dQw4w9WgXcQ "
+            "https://x.com/a/status/1?s=20 https://twitter.com/a/status/1"
+        )
+        urls = URLHandler.extract_urls(text)
+        
+        assert [(u['platform'], u['video_id']) for u in urls] == [('youtube', 'dQw4w9WgXcQ'), ('twitter', '1')]
+    
+    def test_strip_tracking(self):
+        """Test removal of sharing and tracking query parameters."""
+        assert URLHandler.strip_tracking(
+            "https://youtube.com/watch?v=abc&si=x&utm_source=y&t=42"
+        ) == "https://youtube.com/watch?v=abc&t=42"
+        assert URLHandler.strip_tracking("https://x.com/a/status/1?s=20") == "https://x.com/a/status/1"
+        assert URLHandler.strip_tracking("https://youtu.be/abc") == "https://youtu.be/abc"
+        
+        urls = URLHandler.extract_urls("https://www.instagram.com/reel/ABC/?igsh=xyz")
+        assert urls[0]['url'] == "https://www.instagram.com/reel/ABC/"
+
+
+class TestShortLinkResolver:
+    """Test cases for cached short-link resolution."""
+    
+    def test_resolve_follows_redirects(self):
+        """Test that a short link resolves through its redirect chain."""
+        transport = redirect_transport({
+            'https://vm.tiktok.com/ZM1/': 'https://www.tiktok.com/t/ZM1',
+            'https://www.tiktok.com/t/ZM1': 'https://www.tiktok.com/@u/video/42?_r=1',
+        })
+        
+        async def run():
+            async with httpx.AsyncClient(transport=transport, follow_redirects=True) as client:
+                resolver = ShortLinkResolver(client=client)
+                return await resolver.resolve('https://vm.tiktok.com/ZM1/')
+        
+        assert asyncio.run(run()) == 'https://www.tiktok.com/@u/video/42?_r=1'
+    
+    def test_resolve_cached_until_ttl(self):
+        """Test that lookups are cached and repeated after the TTL."""
+        now = [0.0]
+        calls = []
+        transport = redirect_transport({'https://fb.watch/abc/': 'https://www.facebook.com/watch/?v=7'}, calls)
+        
+        async def run():
+            async with httpx.AsyncClient(transport=transport, follow_redirects=True) as client:
+                resolver = ShortLinkResolver(ttl=60, client=client, clock=lambda: now[0])
+                await resolver.resolve('https://fb.watch/abc/')
+                await resolver.resolve('https://fb.watch/abc/?mibextid=1')
+                now[0] = 61
+                await resolver.resolve('https://fb.watch/abc/')
+        
+        asyncio.run(run())
+        heads = [call for call in calls if call == ('HEAD', 'https://fb.watch/abc/')]
+        assert len(heads) == 2
+    
+    def test_resolve_falls_back_to_get(self):
+        """Test that servers refusing HEAD are resolved with GET."""
+        def handler(request):
+            if request.method == 'HEAD':
+                return httpx.Response(405)
+            if str(request.url) == 'https://fb.watch/abc/':
+                return httpx.Response(302, headers={'Location': 'https://www.facebook.com/reel/9'})
+            return httpx.Response(200, content=b'page')
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True) as client:
+                return await ShortLinkResolver(client=client).resolve('https://fb.watch/abc/')
+        
+        assert asyncio.run(run()) == 'https://www.facebook.com/reel/9'
+    
+    def test_resolve_failure_returns_none(self):
+        """Test that network errors and links without a redirect give None."""
+        def handler(request):
+            if 'broken' in str(request.url):
+                raise httpx.ConnectError('unreachable')
+            return httpx.Response(200)
+        
+        async def run():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler), follow_redirects=True) as client:
+                resolver = ShortLinkResolver(client=client)
+                return (
+                    await resolver.resolve('https://vm.tiktok.com/broken/'),
+                    await resolver.resolve('https://vm.tiktok.com/stays/')
+                )
+        
+        assert asyncio.run(run()) == (None, None)
+    
+    def test_resolve_all_canonicalizes_and_deduplicates(self):
+        """Test that resolved short links merge with direct links to the same video."""
+        transport = redirect_transport({
+            'https://vm.tiktok.com/ZM1/': 'https://www.tiktok.com/@u/video/42?is_from_webapp=1',
+        })
+        urls = URLHandler.extract_urls(
+            "https://www.tiktok.com/@u/video/42 https://vm.tiktok.com/ZM1/ https://fb.watch/gone/"
+        )
+        
+        async def run():
+            async with httpx.AsyncClient(transport=transport, follow_redirects=True) as client:
+                return await ShortLinkResolver(client=client).resolve_all(urls)
+        
+        resolved = asyncio.run(run())
+        assert [(u['platform'], u['video_id'], u['short_link']) for u in resolved] == [
+            ('tiktok', '42', False),
+            ('facebook', 'gone', True),
+        ]
 
 
 if __name__ == '__main__':
@@ -0,0 +1,483 @@
+"""
+Unit tests for Video Downloader module
+"""
+
+import os
+import asyncio
+import threading
+import time
+import pytest
+import yt_dlp
+from download_cache import DownloadCache
+from download_engine import DownloadEngine
+from format_selector import FormatSelector
+from platform_health import PERMANENT, TRANSIENT, UNAVAILABLE, CircuitBreaker, PlatformHealth, RetryPolicy
+from video_downloader import VideoDownloader
+
+
+class ConcurrencyProbe:
+    """Blocking download stand-in that records peak concurrency."""
+    
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+    
+    def __call__(self, url, platform, **kwargs):
+        with self.lock:
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        return {'success': True, 'file_path': url, 'error': None}
+
+
+class FakeYoutubeDL:
+    """yt-dlp stand-in returning canned info and recording calls."""
+    
+    info = {}
+    calls = []
+    
+    def __init__(self, opts):
+        self.opts = opts
+        self.params = dict(opts)
+        self.cookiejar = object()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *args):
+        return False
+    
+    def build_format_selector(self, format_spec):
+        return format_spec
+    
+    def close(self):
+        pass
+    
+    def extract_info(self, url, download=True):
+        FakeYoutubeDL.calls.append((url, download))
+        return dict(FakeYoutubeDL.info)
+
+
+class TestVideoDownloader:
+    """Test cases for the async download worker pool."""
+    
+    def test_invalid_worker_count(self, tmp_path):
+        """Test worker pool size validation."""
+        with pytest.raises(ValueError):
+            VideoDownloader(str(tmp_path), max_workers=0)
+    
+    def test_download_async_runs_in_parallel(self, tmp_path):
+        """Test downloads for different users overlap in the pool."""
+        downloader = VideoDownloader(str(tmp_path), max_workers=4)
+        probe = ConcurrencyProbe()
+        downloader.download_video = probe
+        
+        async def run():
+            return await asyncio.gather(*[
+                downloader.download_video_async(f"url{i}", 'youtube') for i in range(4)
+            ])
+        
+        results = asyncio.run(run())
+        downloader.shutdown()
+        
+        assert [r['file_path'] for r in results] == ['url0', 'url1', 'url2', 'url3']
+        assert probe.peak == 4
+    
+    def test_platform_limit(self, tmp_path):
+        """Test per-platform concurrency limit is honoured."""
+        downloader = VideoDownloader(str(tmp_path), max_workers=4, platform_limits={'tiktok': 1})
+        probe = ConcurrencyProbe()
+        downloader.download_video = probe
+        
+        async def run():
+            await asyncio.gather(*[
+                downloader.download_video_async(f"url{i}", 'tiktok') for i in range(3)
+            ])
+        
+        asyncio.run(run())
+        downloader.shutdown()
+        
+        assert probe.peak == 1
+    
+    def test_event_loop_stays_responsive(self, tmp_path):
+        """Test the event loop keeps running while a download blocks."""
+        downloader = VideoDownloader(str(tmp_path), max_workers=1)
+        downloader.download_video = ConcurrencyProbe(delay=0.2)
+        ticks = []
+        
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.01)
+        
+        async def run():
+            await asyncio.gather(downloader.download_video_async('url', 'youtube'), ticker())
+        
+        asyncio.run(run())
+        downloader.shutdown()
+        
+        assert len(ticks) == 5
+        assert ticks[-1] - ticks[0] < 0.15
+    
+    def test_simultaneous_requests_share_one_download(self, tmp_path):
+        """Test N simultaneous requests for one video trigger one download."""
+        downloader = VideoDownloader(str(tmp_path), max_workers=4)
+        probe = ConcurrencyProbe()
+        calls = []
+        
+        def download(url, platform, **kwargs):
+            calls.append(url)
+            return probe(url, platform)
+        
+        downloader.download_video = download
+        
+        async def run():
+            return await asyncio.gather(*[
+                downloader.download_video_async('https://youtu.be/abc', 'youtube') for _ in range(10)
+            ])
+        
+        results = asyncio.run(run())
+        downloader.shutdown()
+        
+        assert len(calls) == 1
+        assert all(r['success'] for r in results)
+    
+    def test_shared_download_takes_reference_per_waiter(self, tmp_path):
+        """Test every waiter of a shared download owns a file reference."""
+        downloader = VideoDownloader(str(tmp_path), max_workers=2)
+        path = tmp_path / 'abc.mp4'
+        
+        def download(url, platform, **kwargs):
+            time.sleep(0.05)
+            path.write_bytes(b'video')
+            entry = downloader.cache.put('youtube:abc:default', str(path))
+            return downloader._result_from_entry(entry, cached=False)
+        
+        downloader.download_video = download
+        
+        async def run():
+            return await asyncio.gather(*[
+                downloader.download_video_async('https://youtu.be/abc', 'youtube') for _ in range(3)
+            ])
+        
+        results = asyncio.run(run())
+        downloader.shutdown()
+        
+        assert [r['cached'] for r in results].count(False) == 1
+        assert downloader.cache._refcounts['youtube:abc:default'] == 3
+    
+    def test_cache_hit_skips_extraction(self, tmp_path, monkeypatch):
+        """Test a repeat request is served from the cache without yt-dlp."""
+        downloader = VideoDownloader(str(tmp_path))
+        path = tmp_path / 'abc.mp4'
+        path.write_bytes(b'video')
+        downloader.cache.put('youtube:abc:default', str(path), {'title': 'Cached'})
+        
+        def no_network(*args, **kwargs):
+            raise AssertionError("yt-dlp should not be called on a cache hit")
+        
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', no_network)
+        result = asyncio.run(downloader.download_video_async('https://youtu.be/abc', 'youtube'))
+        downloader.shutdown()
+        
+        assert result['success'] is True
+        assert result['cached'] is True
+        assert result['title'] == 'Cached'
+        assert result['file_path'] == str(path)
+    
+    def test_equivalent_urls_share_cache_entry(self, tmp_path, monkeypatch):
+        """Test that any form of a video's URL hits the same cache entry."""
+        downloader = VideoDownloader(str(tmp_path))
+        path = tmp_path / 'abc.mp4'
+        path.write_bytes(b'video')
+        downloader.cache.put('youtube:abc:default', str(path), {'title': 'Cached'})
+        
+        def no_network(*args, **kwargs):
+            raise AssertionError("yt-dlp should not be called on a cache hit")
+        
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', no_network)
+        for url in (
+            'https://m.youtube.com/watch?v=abc&si=share',
+            'https://www.youtube.com/shorts/abc',
+            'youtube.com/embed/abc',
+        ):
+            result = downloader.download_video(url, 'youtube')
+            assert result['cached'] is True
+            downloader.cleanup_file(result['file_path'])
+        downloader.shutdown()
+    
+    def test_cleanup_file_releases_cached_file(self, tmp_path):
+        """Test cleanup_file keeps cached files on disk."""
+        downloader = VideoDownloader(str(tmp_path))
+        path = tmp_path / 'abc.mp4'
+        path.write_bytes(b'video')
+        downloader.cache.put('youtube:abc:default', str(path))
+        
+        downloader.cleanup_file(str(path))
+        downloader.shutdown()
+        
+        assert path.exists()
+    
+    def test_cleanup_file_deletes_untracked_file(self, tmp_path):
+        """Test cleanup_file deletes files the cache does not own."""
+        downloader = VideoDownloader(str(tmp_path))
+        path = tmp_path / 'other.mp4'
+        path.write_bytes(b'video')
+        
+        downloader.cleanup_file(str(path))
+        downloader.shutdown()
+        
+        assert not path.exists()
+    
+    def test_remove_orphaned_files(self, tmp_path):
+        """Test untracked, old files are removed and others kept."""
+        downloader = VideoDownloader(str(tmp_path))
+        cached = tmp_path / 'abc.mp4'
+        cached.write_bytes(b'video')
+        downloader.cache.put('youtube:abc:default', str(cached))
+        orphan = tmp_path / 'old.mp4'
+        orphan.write_bytes(b'video')
+        os.utime(orphan, (time.time() - 3600, time.time() - 3600))
+        partial = tmp_path / 'new.mp4.part'
+        partial.write_bytes(b'video')
+        
+        removed = downloader.remove_orphaned_files(min_age=600)
+        downloader.shutdown()
+        
+        assert removed == [str(orphan)]
+        assert cached.exists()
+        assert partial.exists()
+        assert (tmp_path / DownloadCache.INDEX_FILENAME).exists()
+    
+    def test_fetch_metadata_does_not_download(self, tmp_path, monkeypatch):
+        """Test metadata mode resolves info without fetching media."""
+        FakeYoutubeDL.calls = []
+        FakeYoutubeDL.info = {
+            'id': 'abc',
+            'extractor_key': 'Youtube',
+            'title': 'Clip',
+            'duration': 42,
+            'requested_formats': [
+                {'url': 'https://cdn/video', 'filesize': 1000},
+                {'url': 'https://cdn/audio', 'filesize_approx': 200},
+            ],
+        }
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+        downloader = VideoDownloader(str(tmp_path))
+        
+        result = asyncio.run(downloader.fetch_metadata_async('https://youtu.be/abc', 'youtube'))
+        downloader.shutdown()
+        
+        assert FakeYoutubeDL.calls == [('https://youtu.be/abc', False)]
+        assert result['success'] is True
+        assert result['title'] == 'Clip'
+        assert result['filesize'] == 1200
+        assert result['direct_urls'] == ['https://cdn/video', 'https://cdn/audio']
+        assert result['cache_key'] == 'youtube:abc:default'
+        assert list(tmp_path.glob('*.mp4')) == []
+    
+    def test_fetch_metadata_unknown_size(self, tmp_path, monkeypatch):
+        """Test a missing size estimate is reported as None."""
+        FakeYoutubeDL.info = {'id': '1', 'extractor_key': 'TikTok', 'url': 'https://cdn/v'}
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+        downloader = VideoDownloader(str(tmp_path))
+        
+        result = downloader.fetch_metadata('https://tiktok.com/@u/video/1', 'tiktok')
+        downloader.shutdown()
+        
+        assert result['filesize'] is None
+        assert result['direct_urls'] == ['https://cdn/v']
+    
+    def test_fetch_metadata_from_cache(self, tmp_path, monkeypatch):
+        """Test metadata for a cached video needs no network access."""
+        downloader = VideoDownloader(str(tmp_path))
+        path = tmp_path / 'abc.mp4'
+        path.write_bytes(b'video')
+        downloader.cache.put('youtube:abc:default', str(path), {'title': 'Cached'})
+        
+        def no_network(*args, **kwargs):
+            raise AssertionError("yt-dlp should not be called for cached metadata")
+        
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', no_network)
+        result = downloader.fetch_metadata('https://youtu.be/abc', 'youtube')
+        downloader.shutdown()
+        
+        assert result['title'] == 'Cached'
+        assert result['filesize'] == 5
+        assert result['cache_key'] == 'youtube:abc:default'
+    
+    def test_fetch_metadata_link_only(self, tmp_path, monkeypatch):
+        """Test videos over the upload budget are flagged before downloading."""
+        FakeYoutubeDL.info = {
+            'id': 'big',
+            'extractor_key': 'Youtube',
+            'formats': [
+                {'format_id': '22', 'height': 720, 'filesize': 900, 'vcodec': 'avc1',
+                 'acodec': 'mp4a', 'url': 'https://cdn/22'},
+            ],
+        }
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+        downloader = VideoDownloader(str(tmp_path), format_selector=FormatSelector(max_bytes=500))
+        
+        result = downloader.fetch_metadata('https://youtu.be/big', 'youtube')
+        downloader.shutdown()
+        
+        assert result['fits_upload'] is False
+        assert result['format_id'] == '22'
+        assert result['stream'] is None
+        assert result['direct_urls'] == ['https://cdn/22']
+        assert result['cache_key'] == 'youtube:big:max500'
+    
+    def test_download_uses_selected_format(self, tmp_path, monkeypatch):
+        """Test the format picked from metadata is passed to yt-dlp."""
+        seen = {}
+        
+        class RecordingYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=True):
+                seen.update(self.params)
+                raise yt_dlp.utils.DownloadError('stop')
+        
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', RecordingYoutubeDL)
+        downloader = VideoDownloader(str(tmp_path))
+        
+        result = downloader.download_video('https://youtu.be/abc', 'youtube', format_id='136+140')
+        downloader.shutdown()
+        
+        assert seen['format'] == '136+140'
+        assert result['success'] is False
+    
+    def test_download_engine_settings_per_platform(self, tmp_path, monkeypatch):
+        """Test download engine tuning reaches each platform's yt-dlp instance."""
+        seen = {}
+        
+        class RecordingYoutubeDL(FakeYoutubeDL):
+            def extract_info(self, url, download=True):
+                seen[url] = dict(self.params)
+                raise yt_dlp.utils.DownloadError('stop')
+        
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', RecordingYoutubeDL)
+        engine = DownloadEngine(concurrent_fragments=2, overrides={'youtube': {'concurrent_fragments': 8}})
+        downloader = VideoDownloader(str(tmp_path), engine=engine)
+        
+        downloader.download_video('https://youtu.be/abc', 'youtube')
+        downloader.download_video('https://tiktok.com/@u/video/1', 'tiktok')
+        downloader.shutdown()
+        
+        assert seen['https://youtu.be/abc']['concurrent_fragment_downloads'] == 8
+        assert seen['https://tiktok.com/@u/video/1']['concurrent_fragment_downloads'] == 2
+
+
+
+class FlakyYoutubeDL(FakeYoutubeDL):
+    """Fake extractor failing with queued errors before returning canned info."""
+    
+    failures = []
+    
+    def extract_info(self, url, download=True):
+        FakeYoutubeDL.calls.append((url, download))
+        if FlakyYoutubeDL.failures:
+            raise yt_dlp.utils.DownloadError(FlakyYoutubeDL.failures.pop(0))
+        return dict(FakeYoutubeDL.info)
+
+
+class TestPlatformFailures:
+    """Test cases for retries and the per-platform circuit breaker."""
+    
+    RATE_LIMITED = 'ERROR: [Instagram] abc: Requested content is not available, rate-limit reached or login required'
+    
+    def make(self, tmp_path, monkeypatch, failures, retries=2, **health):
+        FakeYoutubeDL.calls = []
+        FakeYoutubeDL.info = {'id': 'abc', 'extractor_key': 'Instagram', 'title': 'Reel', 'url': 'https://cdn/v'}
+        FlakyYoutubeDL.failures = list(failures)
+        monkeypatch.setattr(yt_dlp, 'YoutubeDL', FlakyYoutubeDL)
+        health.setdefault('min_requests', 3)
+        return VideoDownloader(
+            str(tmp_path),
+            health=PlatformHealth(**health),
+            retry=RetryPolicy(retries=retries, backoff=0)
+        )
+    
+    def lookup(self, downloader, n=1):
+        async def run():
+            return [
+                await downloader.fetch_metadata_async(f'https://instagram.com/reel/r{i}/', 'instagram')
+                for i in range(n)
+            ]
+        return asyncio.run(run())
+    
+    def test_transient_errors_are_retried(self, tmp_path, monkeypatch):
+        """Test a rate-limited lookup succeeds on a later attempt."""
+        downloader = self.make(tmp_path, monkeypatch, [self.RATE_LIMITED, self.RATE_LIMITED])
+        result, = self.lookup(downloader)
+        downloader.shutdown()
+        
+        assert result['success']
+        assert len(FakeYoutubeDL.calls) == 3
+        totals = downloader.health.snapshot()['instagram']['totals']
+        assert totals[TRANSIENT] == 2 and totals['success'] == 1
+    
+    def test_retries_are_bounded(self, tmp_path, monkeypatch):
+        """Test the last transient error is returned once retries run out."""
+        downloader = self.make(tmp_path, monkeypatch, [self.RATE_LIMITED] * 5, retries=1, min_requests=10)
+        result, = self.lookup(downloader)
+        downloader.shutdown()
+        
+        assert not result['success']
+        assert result['error_kind'] == TRANSIENT
+        assert len(FakeYoutubeDL.calls) == 2
+    
+    def test_permanent_errors_are_not_retried(self, tmp_path, monkeypatch):
+        """Test a private video fails at once and leaves the platform healthy."""
+        downloader = self.make(tmp_path, monkeypatch, ['ERROR: [Instagram] abc: This video is private'])
+        result, = self.lookup(downloader)
+        downloader.shutdown()
+        
+        assert result['error_kind'] == PERMANENT
+        assert len(FakeYoutubeDL.calls) == 1
+        assert downloader.health.snapshot()['instagram']['failures'] == 0
+    
+    def test_open_circuit_fails_fast(self, tmp_path, monkeypatch):
+        """Test requests are refused without calling the extractor while the platform is failing."""
+        downloader = self.make(tmp_path, monkeypatch, [self.RATE_LIMITED] * 3, retries=0)
+        results = self.lookup(downloader, n=5)
+        
+        assert [result.get('error_kind') for result in results] == [TRANSIENT] * 3 + [UNAVAILABLE] * 2
+        assert len(FakeYoutubeDL.calls) == 3
+        assert 'try again in 30s' in results[-1]['error']
+        
+        download = asyncio.run(downloader.download_video_async('https://instagram.com/reel/x/', 'instagram'))
+        downloader.shutdown()
+        assert download['error_kind'] == UNAVAILABLE
+        assert len(FakeYoutubeDL.calls) == 3
+    
+    def test_probe_closes_circuit(self, tmp_path, monkeypatch):
+        """Test the platform is used again once a probe after the cooldown succeeds."""
+        downloader = self.make(tmp_path, monkeypatch, [self.RATE_LIMITED] * 3, retries=0, cooldown=0.05)
+        self.lookup(downloader, n=3)
+        assert downloader.health.snapshot()['instagram']['state'] == CircuitBreaker.OPEN
+        
+        time.sleep(0.06)
+        results = self.lookup(downloader, n=2)
+        downloader.shutdown()
+        assert [result['success'] for result in results] == [True, True]
+        assert downloader.health.snapshot()['instagram']['state'] == CircuitBreaker.CLOSED
+    
+    def test_cached_video_is_served_while_circuit_is_open(self, tmp_path, monkeypatch):
+        """Test a broken platform does not block videos already in the cache."""
+        downloader = self.make(tmp_path, monkeypatch, [self.RATE_LIMITED] * 3, retries=0)
+        video = tmp_path / 'cached.mp4'
+        video.write_bytes(b'x' * 10)
+        downloader.cache.put(DownloadCache.make_key('instagram', 'cached', 'default'), str(video))
+        self.lookup(downloader, n=3)
+        
+        result = asyncio.run(downloader.fetch_metadata_async('https://instagram.com/reel/cached/', 'instagram'))
+        downloader.shutdown()
+        assert result['success'] and result['cached']
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
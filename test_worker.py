@@ -0,0 +1,87 @@
+"""
+Unit tests for the download worker
+"""
+
+import asyncio
+import pytest
+from task_queue import InProcessTaskQueue
+from worker import TaskWorker
+
+
+class TestTaskWorker:
+    """Test cases for running queued tasks."""
+    
+    def test_runs_tasks_with_bounded_concurrency(self):
+        """Test every task runs once and no more than concurrency at a time."""
+        active = 0
+        peak = 0
+        done = []
+        
+        async def handle(payload):
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            active -= 1
+            done.append(payload['n'])
+        
+        async def run():
+            queue = InProcessTaskQueue()
+            for n in range(10):
+                await queue.put('message', {'n': n})
+            worker = TaskWorker(queue, {'message': handle}, concurrency=3, poll_timeout=0.01)
+            runner = asyncio.create_task(worker.run())
+            while len(done) < 10:
+                await asyncio.sleep(0.01)
+            worker.stop()
+            await runner
+        
+        asyncio.run(run())
+        assert sorted(done) == list(range(10))
+        assert peak == 3
+    
+    def test_failed_task_is_retried(self):
+        """Test an exception sends the task back to the queue."""
+        attempts = []
+        
+        async def flaky(payload):
+            attempts.append(payload)
+            if len(attempts) == 1:
+                raise RuntimeError("Telegram unavailable")
+        
+        async def run():
+            queue = InProcessTaskQueue(max_attempts=3)
+            await queue.put('callback', {'key': 'abc'})
+            worker = TaskWorker(queue, {'callback': flaky}, poll_timeout=0.01)
+            runner = asyncio.create_task(worker.run())
+            while len(attempts) < 2:
+                await asyncio.sleep(0.01)
+            worker.stop()
+            await runner
+            return len(queue)
+        
+        assert asyncio.run(run()) == 0
+        assert attempts == [{'key': 'abc'}, {'key': 'abc'}]
+    
+    def test_unknown_kind_is_dropped(self):
+        """Test a task without a handler fails instead of stopping the worker."""
+        async def run():
+            queue = InProcessTaskQueue(max_attempts=1)
+            await queue.put('unknown', {})
+            worker = TaskWorker(queue, {}, poll_timeout=0.01)
+            runner = asyncio.create_task(worker.run())
+            await asyncio.sleep(0.05)
+            worker.stop()
+            await runner
+            return len(queue)
+        
+        assert asyncio.run(run()) == 0
+    
+    def test_invalid_concurrency(self):
+        """Test that a worker needs at least one slot."""
+        with pytest.raises(ValueError):
+            TaskWorker(InProcessTaskQueue(), {}, concurrency=0)
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,157 @@
+"""
+Unit tests for YoutubeDL Pool module
+"""
+
+import threading
+import pytest
+import yt_dlp
+from ydl_pool import YoutubeDLPool
+
+
+class FakeYoutubeDL:
+    """yt-dlp stand-in tracking instances and their per-call state."""
+    
+    created = []
+    
+    def __init__(self, params):
+        self.params = params
+        self.cookiejar = object()
+        self.format_selector = None
+        self.closed = False
+        FakeYoutubeDL.created.append(self)
+    
+    def build_format_selector(self, format_spec):
+        return ('selector', format_spec)
+    
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    FakeYoutubeDL.created = []
+    monkeypatch.setattr(yt_dlp, 'YoutubeDL', FakeYoutubeDL)
+    return YoutubeDLPool({'quiet': True}, max_uses=3)
+
+
+class TestYoutubeDLPool:
+    """Test cases for reusing yt-dlp instances."""
+    
+    def test_reuses_instance_per_platform(self, pool):
+        """Test repeated calls for one platform share an instance."""
+        with pool.session('youtube') as first:
+            pass
+        with pool.session('youtube') as second:
+            pass
+        with pool.session('tiktok') as other:
+            pass
+        
+        assert first is second
+        assert other is not first
+        assert pool.created == 2
+    
+    def test_threads_get_their_own_instances(self, pool):
+        """Test an instance is never shared between worker threads."""
+        seen = []
+        
+        def work():
+            with pool.session('youtube') as ydl:
+                seen.append(ydl)
+        
+        threads = [threading.Thread(target=work) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        assert seen[0] is not seen[1]
+    
+    def test_cookie_jar_is_shared(self, pool):
+        """Test all instances use the cookie jar of the first one."""
+        with pool.session('youtube') as first:
+            pass
+        with pool.session('tiktok') as second:
+            pass
+        
+        assert second.cookiejar is first.cookiejar
+    
+    def test_platform_params(self, pool):
+        """Test per-platform options are merged into each platform's instance."""
+        pool.platform_params = lambda platform: {'concurrent_fragment_downloads': 8} if platform == 'youtube' else {}
+        with pool.session('youtube') as youtube:
+            pass
+        with pool.session('tiktok') as tiktok:
+            pass
+        
+        assert youtube.params['concurrent_fragment_downloads'] == 8
+        assert youtube.params['quiet'] is True
+        assert 'concurrent_fragment_downloads' not in tiktok.params
+    
+    def test_progress_hook_per_call(self, pool):
+        """Test progress goes to the hook of the running call only."""
+        seen = []
+        with pool.session('youtube', progress_hook=seen.append) as ydl:
+            for hook in ydl.params['progress_hooks']:
+                hook({'status': 'downloading'})
+        with pool.session('youtube') as ydl:
+            for hook in ydl.params['progress_hooks']:
+                hook({'status': 'finished'})
+        
+        assert seen == [{'status': 'downloading'}]
+    
+    def test_format_is_applied_per_call(self, pool):
+        """Test a format chosen for one call does not leak into the next."""
+        with pool.session('youtube', '136+140') as ydl:
+            assert ydl.params['format'] == '136+140'
+            assert ydl.format_selector == ('selector', '136+140')
+        with pool.session('youtube') as ydl:
+            assert ydl.params['format'] is None
+            assert ydl.format_selector is None
+    
+    def test_download_error_keeps_instance(self, pool):
+        """Test an ordinary extraction failure does not throw the instance away."""
+        with pytest.raises(yt_dlp.utils.DownloadError):
+            with pool.session('youtube') as first:
+                raise yt_dlp.utils.DownloadError('unavailable')
+        with pool.session('youtube') as second:
+            pass
+        
+        assert second is first
+    
+    def test_unexpected_error_replaces_instance(self, pool):
+        """Test an instance in an unknown state is closed and replaced."""
+        with pytest.raises(RuntimeError):
+            with pool.session('youtube') as first:
+                raise RuntimeError('boom')
+        with pool.session('youtube') as second:
+            pass
+        
+        assert second is not first
+        assert first.closed
+    
+    def test_instances_are_recycled(self, pool):
+        """Test an instance is replaced after max_uses calls."""
+        instances = []
+        for _ in range(4):
+            with pool.session('youtube') as ydl:
+                instances.append(ydl)
+        
+        assert instances[0] is instances[2]
+        assert instances[3] is not instances[0]
+        assert instances[0].closed
+    
+    def test_close(self, pool):
+        """Test closing the pool closes every instance."""
+        with pool.session('youtube'):
+            pass
+        with pool.session('tiktok'):
+            pass
+        pool.close()
+        
+        assert all(ydl.closed for ydl in FakeYoutubeDL.created)
+        with pool.session('youtube') as ydl:
+            assert not ydl.closed
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
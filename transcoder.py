@@ -0,0 +1,381 @@
+"""
+Transcoder Module
+Post-download stage fitting videos to Telegram's upload limit with ffmpeg:
+streams in the wrong container are remuxed without re-encoding, oversized
+videos are re-encoded to a bitrate that fits. ffmpeg runs in a process pool
+bounded by the CPU count, and results are cached next to the original.
+"""
+
+import os
+import json
+import shutil
+import asyncio
+import logging
+import subprocess
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from download_cache import DownloadCache
+from single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+# Codecs Telegram clients play inline from an MP4 container
+MP4_VIDEO_CODECS = frozenset({'h264', 'hevc'})
+MP4_AUDIO_CODECS = frozenset({'aac', 'mp3'})
+
+# (minimum video bitrate, height): lower bitrates look better at lower resolutions
+HEIGHT_LADDER = ((2_500_000, 1080), (1_200_000, 720), (600_000, 480), (0, 360))
+
+
+class TranscodeError(Exception):
+    """Raised when a video cannot be probed or fitted."""
+
+
+def parse_probe(data: Dict) -> Dict:
+    """
+    Reduce ffprobe's JSON output to what planning needs.
+    
+    Args:
+        data: Parsed output of ``ffprobe -show_format -show_streams``
+    
+    Returns:
+        Dictionary with 'container', 'duration', 'size', 'video_codec',
+        'audio_codec' and 'height' keys
+    """
+    streams = data.get('streams', [])
+    fmt = data.get('format', {})
+    video = next((s for s in streams if s.get('codec_type') == 'video'), {})
+    audio = next((s for s in streams if s.get('codec_type') == 'audio'), {})
+    try:
+        duration = float(fmt.get('duration') or video.get('duration') or 0)
+    except ValueError:
+        duration = 0.0
+    return {
+        'container': fmt.get('format_name', ''),
+        'duration': duration,
+        'size': int(fmt.get('size') or 0),
+        'video_codec': video.get('codec_name'),
+        'audio_codec': audio.get('codec_name'),
+        'height': video.get('height'),
+    }
+
+
+def probe(file_path: str, ffprobe: str = 'ffprobe') -> Dict:
+    """
+    Inspect a media file with ffprobe.
+    
+    Args:
+        file_path: Path of the file
+        ffprobe: ffprobe executable
+    
+    Returns:
+        Same dictionary as parse_probe
+    """
+    try:
+        output = subprocess.run(
+            [ffprobe, '-v', 'error', '-print_format', 'json', '-show_format', '-show_streams', file_path],
+            check=True, capture_output=True, timeout=60
+        ).stdout
+        return parse_probe(json.loads(output))
+    except (OSError, subprocess.SubprocessError, ValueError) as e:
+        raise TranscodeError(f"Could not read video: {e}")
+
+
+def plan(
+    media: Dict,
+    max_bytes: int,
+    audio_bitrate: int = 128_000,
+    headroom: float = 0.95,
+    min_video_bitrate: int = 150_000
+) -> Dict:
+    """
+    Decide how to make a video sendable within max_bytes.
+    
+    Args:
+        media: Probe result of the video
+        max_bytes: Upload limit in bytes
+        audio_bitrate: Bits per second kept for re-encoded audio
+        headroom: Fraction of max_bytes targeted, leaving room for
+            container overhead and encoder overshoot
+        min_video_bitrate: Lowest video bitrate worth sending; longer
+            videos are rejected instead of turned into mush
+    
+    Returns:
+        Dictionary with 'action' ('none', 'remux' or 'encode'); remux adds
+        'audio' ('copy' or 'aac'), encode adds 'video_bitrate',
+        'audio_bitrate' and 'height' (None keeps the resolution)
+    """
+    if not media.get('video_codec'):
+        raise TranscodeError("No video stream found")
+    
+    audio_codec = media.get('audio_codec')
+    video_ok = media['video_codec'] in MP4_VIDEO_CODECS
+    audio_ok = audio_codec is None or audio_codec in MP4_AUDIO_CODECS
+    fits = media['size'] <= max_bytes
+    if fits and video_ok:
+        if audio_ok and 'mp4' in media['container'].split(','):
+            return {'action': 'none'}
+        # Only the container (and maybe the small audio stream) is the problem
+        return {'action': 'remux', 'audio': 'copy' if audio_ok else 'aac'}
+    
+    duration = media.get('duration') or 0
+    if duration <= 0:
+        raise TranscodeError("Unknown duration, cannot pick a bitrate")
+    
+    audio_bitrate = audio_bitrate if audio_codec else 0
+    video_bitrate = int(max_bytes * 8 * headroom / duration) - audio_bitrate
+    if fits:
+        # Re-encoding for the codec only: never raise the source's bitrate
+        video_bitrate = min(video_bitrate, int(media['size'] * 8 / duration))
+    if video_bitrate < min_video_bitrate:
+        raise TranscodeError(f"Video is too long to fit {max_bytes // (1024 * 1024)} MB")
+    
+    height = next(height for floor, height in HEIGHT_LADDER if video_bitrate >= floor)
+    source_height = media.get('height')
+    return {
+        'action': 'encode',
+        'video_bitrate': video_bitrate,
+        'audio_bitrate': audio_bitrate,
+        'height': height if source_height and source_height > height else None,
+    }
+
+
+def ffmpeg_command(
+    job: Dict,
+    source: str,
+    target: str,
+    ffmpeg: str = 'ffmpeg',
+    preset: str = 'veryfast',
+    threads: int = 0
+) -> List[str]:
+    """
+    Build the ffmpeg command line for a plan.
+    
+    Args:
+        job: Result of plan() with action 'remux' or 'encode'
+        source: Input file
+        target: Output file (written as MP4 whatever its extension)
+        ffmpeg: ffmpeg executable
+        preset: x264 preset for re-encoding
+        threads: Encoder threads (0 lets ffmpeg decide)
+    
+    Returns:
+        Argument list
+    """
+    command = [ffmpeg, '-hide_banner', '-loglevel', 'error', '-nostdin', '-y', '-i', source,
+               '-map', '0:v:0', '-map', '0:a:0?']
+    if job['action'] == 'remux':
+        command += ['-c:v', 'copy']
+        command += ['-c:a', 'copy'] if job['audio'] == 'copy' else ['-c:a', 'aac', '-b:a', '128k']
+    else:
+        bitrate = job['video_bitrate']
+        command += ['-c:v', 'libx264', '-preset', preset, '-threads', str(threads),
+                    '-b:v', str(bitrate), '-maxrate', str(bitrate), '-bufsize', str(bitrate * 2),
+                    '-pix_fmt', 'yuv420p']
+        if job['height']:
+            command += ['-vf', f"scale=-2:{job['height']}"]
+        if job['audio_bitrate']:
+            command += ['-c:a', 'aac', '-b:a', str(job['audio_bitrate']), '-ac', '2']
+    # Index at the front so clients can start playing before the download ends
+    command += ['-movflags', '+faststart', '-f', 'mp4', target]
+    return command
+
+
+def fit_file(source: str, target: str, max_bytes: int, settings: Dict) -> Dict:
+    """
+    Probe, plan and run ffmpeg for one file; runs in a worker process.
+    
+    An encode that still comes out too large is retried once at a lower bitrate.
+    
+    Args:
+        source: Downloaded file
+        target: Where the fitted file is written
+        max_bytes: Upload limit in bytes
+        settings: 'ffmpeg', 'ffprobe', 'preset', 'threads', 'audio_bitrate',
+            'timeout_factor' and 'min_timeout'
+    
+    Returns:
+        Dictionary with 'action' and, unless the action is 'none', 'size'
+    """
+    media = probe(source, settings['ffprobe'])
+    job = plan(media, max_bytes, settings['audio_bitrate'])
+    if job['action'] == 'none':
+        return {'action': 'none'}
+    
+    # A stuck ffmpeg would hold a worker forever; allow a multiple of the video's length
+    timeout = max(settings['min_timeout'], media['duration'] * settings['timeout_factor'])
+    partial_path = f"{target}.part"
+    for attempt in range(2):
+        command = ffmpeg_command(
+            job, source, partial_path, settings['ffmpeg'], settings['preset'], settings['threads']
+        )
+        try:
+            subprocess.run(command, check=True, capture_output=True, timeout=timeout)
+        except subprocess.TimeoutExpired:
+            _remove(partial_path)
+            raise TranscodeError(f"ffmpeg timed out after {timeout:.0f}s")
+        except subprocess.CalledProcessError as e:
+            _remove(partial_path)
+            message = e.stderr.decode('utf-8', 'replace').strip().splitlines()
+            raise TranscodeError(f"ffmpeg failed: {message[-1] if message else e.returncode}")
+        except OSError as e:
+            raise TranscodeError(f"Could not run ffmpeg: {e}")
+        
+        size = os.path.getsize(partial_path)
+        if size <= max_bytes:
+            os.replace(partial_path, target)
+            return {'action': job['action'], 'size': size}
+        if job['action'] != 'encode' or attempt:
+            break
+        job['video_bitrate'] = int(job['video_bitrate'] * max_bytes / size * 0.9)
+    
+    _remove(partial_path)
+    raise TranscodeError("Compressed video is still over the upload limit")
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class Transcoder:
+    """Fits downloaded videos to the upload limit in a pool of worker processes."""
+    
+    DEFAULT_PRESET = 'veryfast'
+    DEFAULT_AUDIO_BITRATE = 128_000
+    DEFAULT_TIMEOUT_FACTOR = 4.0
+    DEFAULT_MIN_TIMEOUT = 120.0
+    
+    def __init__(
+        self,
+        cache: DownloadCache,
+        max_bytes: int,
+        workers: Optional[int] = None,
+        preset: str = DEFAULT_PRESET,
+        audio_bitrate: int = DEFAULT_AUDIO_BITRATE,
+        ffmpeg: str = 'ffmpeg',
+        ffprobe: str = 'ffprobe',
+        timeout_factor: float = DEFAULT_TIMEOUT_FACTOR,
+        min_timeout: float = DEFAULT_MIN_TIMEOUT,
+        executor: Optional[Executor] = None
+    ):
+        """
+        Initialize the transcoder.
+        
+        Args:
+            cache: Download cache the fitted files are stored in
+            max_bytes: Upload limit the files are fitted to
+            workers: ffmpeg processes running at once (defaults to half the
+                CPUs); each gets an equal share of the CPUs as threads
+            preset: x264 preset (faster presets need more bits for the same quality)
+            audio_bitrate: Bits per second for re-encoded audio
+            ffmpeg: ffmpeg executable
+            ffprobe: ffprobe executable
+            timeout_factor: ffmpeg is killed after this many times the video's
+                duration (but never before min_timeout seconds)
+            min_timeout: Seconds every ffmpeg run is allowed
+            executor: Pool running fit_file (injectable for tests)
+        """
+        cpus = os.cpu_count() or 1
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers or cpus // 2)
+        self.settings = {
+            'ffmpeg': ffmpeg,
+            'ffprobe': ffprobe,
+            'preset': preset,
+            'threads': max(1, cpus // self.workers),
+            'audio_bitrate': audio_bitrate,
+            'timeout_factor': timeout_factor,
+            'min_timeout': min_timeout,
+        }
+        # Spawned workers do not inherit the bot's threads and event loop
+        self._executor = executor or ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+        )
+        self._inflight = SingleFlight()
+    
+    @staticmethod
+    def available(ffmpeg: str = 'ffmpeg', ffprobe: str = 'ffprobe') -> bool:
+        """Check whether ffmpeg and ffprobe are installed."""
+        return shutil.which(ffmpeg) is not None and shutil.which(ffprobe) is not None
+    
+    def needs_fitting(self, file_path: str) -> bool:
+        """Cheap check whether a downloaded file may need this stage at all."""
+        try:
+            size = os.path.getsize(file_path)
+        except OSError:
+            return False
+        return size > self.max_bytes or Path(file_path).suffix.lower() != '.mp4'
+    
+    def output_path(self, file_path: str) -> str:
+        """Path of the fitted file, next to the original."""
+        path = Path(file_path)
+        return str(path.with_name(f"{path.stem}.fit{self.max_bytes}.mp4"))
+    
+    def cache_key(self, source_key: str) -> str:
+        """Cache key of the fitted version of a cached download."""
+        return f"{source_key}:fit{self.max_bytes}"
+    
+    async def fit(self, file_path: str, source_key: str) -> Dict:
+        """
+        Make a downloaded video sendable, reusing an earlier result.
+        
+        Concurrent requests for the same video share one ffmpeg run.
+        
+        Args:
+            file_path: Downloaded file (the caller holds a cache reference)
+            source_key: Cache key of the download
+        
+        Returns:
+            Dictionary with 'success' (bool), 'file_path' (str), 'error' (str)
+            and 'action' ('none', 'remux', 'encode') keys. When a new file is
+            returned the caller also owns a reference on it, next to the one
+            on the original.
+        """
+        key = self.cache_key(source_key)
+        entry = self.cache.acquire(key)
+        if entry is not None:
+            return {'success': True, 'file_path': entry['file_path'], 'error': None,
+                    'action': entry.get('action'), 'cached': True}
+        
+        result, shared = await self._inflight.do(key, lambda: self._run(file_path, key))
+        if shared and result['success'] and result['action'] != 'none':
+            # Joined someone else's run: take our own reference on the file
+            entry = self.cache.acquire(key)
+            if entry is None:
+                return {'success': False, 'file_path': None, 'error': 'Fitted video was evicted', 'action': None}
+        return result
+    
+    async def _run(self, file_path: str, key: str) -> Dict:
+        """Run fit_file in the pool and cache its output; every failure becomes an error result."""
+        target = self.output_path(file_path)
+        loop = asyncio.get_running_loop()
+        try:
+            outcome = await loop.run_in_executor(
+                self._executor, fit_file, file_path, target, self.max_bytes, self.settings
+            )
+            if outcome['action'] == 'none':
+                return {'success': True, 'file_path': file_path, 'error': None, 'action': 'none', 'cached': False}
+            entry = self.cache.put(key, target, metadata={'action': outcome['action'], 'source': file_path})
+        except TranscodeError as e:
+            return {'success': False, 'file_path': None, 'error': str(e), 'action': None}
+        except asyncio.CancelledError:
+            # Callers wait through SingleFlight's shield, so only shutdown() cancels this
+            return {'success': False, 'file_path': None, 'error': 'Transcoder is shutting down', 'action': None}
+        except Exception as e:
+            # A crashed or shut down worker pool, or an unwritable output path
+            logger.error(f"Transcoding {file_path} failed: {e}", exc_info=True)
+            return {'success': False, 'file_path': None, 'error': f'Transcoding failed: {e}', 'action': None}
+        
+        return {'success': True, 'file_path': entry['file_path'], 'error': None,
+                'action': outcome['action'], 'cached': False}
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop the worker processes."""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
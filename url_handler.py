@@ -5,79 +5,223 @@ Supports: YouTube, Facebook, X (Twitter), Instagram, TikTok
 """
 
 import re
-from typing import List, Dict
-from urllib.parse import urlparse
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Callable, List, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import httpx
 
 
 class URLHandler:
     """Handles URL extraction and validation for supported platforms."""
     
-    SUPPORTED_PLATFORMS = {
-        'youtube': [
-            r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtu\.be/[\w-]+',
-            r'(?:https?://)?(?:www\.)?youtube\.com/shorts/[\w-]+',
+    # Host (without "www.") -> platform
+    PLATFORM_HOSTS = {
+        'youtube.com': 'youtube',
+        'm.youtube.com': 'youtube',
+        'music.youtube.com': 'youtube',
+        'youtube-nocookie.com': 'youtube',
+        'youtu.be': 'youtube',
+        'facebook.com': 'facebook',
+        'm.facebook.com': 'facebook',
+        'web.facebook.com': 'facebook',
+        'fb.watch': 'facebook',
+        'twitter.com': 'twitter',
+        'mobile.twitter.com': 'twitter',
+        'x.com': 'twitter',
+        'instagram.com': 'instagram',
+        'tiktok.com': 'tiktok',
+        'm.tiktok.com': 'tiktok',
+        'vm.tiktok.com': 'tiktok',
+        'vt.tiktok.com': 'tiktok',
+    }
+    
+    # Host -> path patterns; the 'id' group captures the video ID and the
+    # 'short' group the code of a short link that must be resolved first
+    PATH_PATTERNS = {
+        'youtube.com': [
+            r'/watch/?\?(?:[^#\s]*&)?v=(?P<id>[\w-]+)',
+            r'/(?:shorts|embed|live|v)/(?P<id>[\w-]+)',
+        ],
+        'youtu.be': [
+            r'/(?P<id>[\w-]+)',
         ],
-        'facebook': [
-            r'(?:https?://)?(?:www\.)?facebook\.com/.*?/videos/\d+',
-            r'(?:https?://)?(?:www\.)?fb\.watch/[\w-]+',
-            r'(?:https?://)?(?:www\.)?facebook\.com/share/r/[\w-]+',
-            r'(?:https?://)?(?:www\.)?facebook\.com/share/v/[\w-]+',
+        'facebook.com': [
+            r'/.*?/videos/(?:[^/?#\s]+/)?(?P<id>\d+)',
+            r'/(?:watch/?|video\.php)\?(?:[^#\s]*&)?v=(?P<id>\d+)',
+            r'/reel/(?P<id>\d+)',
+            r'/share/[rv]/(?P<short>[\w-]+)',
         ],
-        'twitter': [
-            r'(?:https?://)?(?:www\.)?twitter\.com/\w+/status/\d+',
-            r'(?:https?://)?(?:www\.)?x\.com/\w+/status/\d+',
+        'fb.watch': [
+            r'/(?P<short>[\w-]+)',
         ],
-        'instagram': [
-            r'(?:https?://)?(?:www\.)?instagram\.com/(?:p|reel)/[\w-]+',
+        'twitter.com': [
+            r'/\w+/status(?:es)?/(?P<id>\d+)',
         ],
-        'tiktok': [
-            r'(?:https?://)?(?:www\.)?tiktok\.com/@[\w.-]+/video/\d+',
-            r'(?:https?://)?(?:vm\.)?tiktok\.com/[\w-]+',
+        'instagram.com': [
+            r'/(?:[\w.]+/)?(?:p|reels?|tv)/(?P<id>[\w-]+)',
+        ],
+        'tiktok.com': [
+            r'/@[\w.-]*/video/(?P<id>\d+)',
+            r'/embed(?:/v2)?/(?P<id>\d+)',
+            r'/v/(?P<id>\d+)',
+            r'/t/(?P<short>[\w-]+)',
+        ],
+        'vm.tiktok.com': [
+            r'/(?P<short>[\w-]+)',
         ],
     }
     
+    # Hosts sharing another host's path patterns
+    HOST_ALIASES = {
+        'm.youtube.com': 'youtube.com',
+        'music.youtube.com': 'youtube.com',
+        'youtube-nocookie.com': 'youtube.com',
+        'm.facebook.com': 'facebook.com',
+        'web.facebook.com': 'facebook.com',
+        'mobile.twitter.com': 'twitter.com',
+        'x.com': 'twitter.com',
+        'm.tiktok.com': 'tiktok.com',
+        'vt.tiktok.com': 'vm.tiktok.com',
+    }
+    
+    # Query parameters that only carry sharing/tracking information
+    TRACKING_PARAMS = {
+        'si', 'feature', 'pp', 'fbclid', 'gclid', 'igsh', 'igshid', 'mibextid',
+        'rdid', 'ref', 'ref_src', 'ref_url', 's', '_r', '_t', 'is_from_webapp',
+        'sender_device', 'share_app_id', 'share_item_id', 'web_id',
+    }
+    TRACKING_PREFIXES = ('utm_',)
+    
+    # Compiled once at class load: one scan finds URLs with and without protocol
+    _CANDIDATE_RE = re.compile(
+        r'https?://[^\s]+|(?:www\.)?(?:'
+        + '|'.join(re.escape(host) for host in sorted(PLATFORM_HOSTS, key=len, reverse=True))
+        + r')[^\s]+',
+        re.IGNORECASE
+    )
+    _SPLIT_RE = re.compile(r'(?:https?://)?(?P<host>[^/\s?#:]+)(?::\d+)?(?P<path>.*)', re.IGNORECASE | re.DOTALL)
+    _COMPILED_PATHS = {
+        host: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+        for host, patterns in PATH_PATTERNS.items()
+    }
+    
     @classmethod
     def extract_urls(cls, text: str) -> List[Dict[str, str]]:
         """
         Extract all valid URLs from the given text.
         
+        Links to the same video are reported once, whatever form they take.
+        
         Args:
             text: User message text
             
         Returns:
-            List of dictionaries containing 'url' and 'platform' keys
+            List of dictionaries containing 'url' (tracking parameters
+            removed), 'platform', 'video_id' and 'short_link' (True when
+            video_id is a short-link code that still needs resolving) keys
         """
-        # General URL pattern to find all potential URLs
-        url_pattern = r'https?://[^\s]+'
-        potential_urls = re.findall(url_pattern, text)
-        
-        # Also check for URLs without protocol
-        no_protocol_pattern = r'(?:www\.)?(?:youtube\.com|youtu\.be|facebook\.com|fb\.watch|twitter\.com|x\.com|instagram\.com|tiktok\.com|vm\.tiktok\.com)[^\s]+'
-        potential_urls.extend(re.findall(no_protocol_pattern, text))
-        
         extracted = []
         seen = set()
         
-        for url in potential_urls:
+        for match in cls._CANDIDATE_RE.finditer(text):
+            url = match.group(0)
+            
             # Normalize URL
-            if not url.startswith('http'):
+            if not url.lower().startswith('http'):
                 url = 'https://' + url
             
+            parsed = cls._parse(url)
+            if not parsed:
+                continue
+            
+            platform, video_id, short_link = parsed
+            
             # Avoid duplicates
-            if url in seen:
+            if (platform, video_id) in seen:
                 continue
             
-            platform = cls.identify_platform(url)
-            if platform:
-                extracted.append({
-                    'url': url,
-                    'platform': platform
-                })
-                seen.add(url)
+            extracted.append({
+                'url': cls.strip_tracking(url),
+                'platform': platform,
+                'video_id': video_id,
+                'short_link': short_link
+            })
+            seen.add((platform, video_id))
         
         return extracted
     
+    @classmethod
+    def classify(cls, url: str) -> Optional[Tuple[str, str]]:
+        """
+        Identify the platform and video ID of a URL in a single pass.
+        
+        The host selects the platform through a dispatch table, then only
+        that host's precompiled path patterns are tried.
+        
+        Args:
+            url: The URL to check
+            
+        Returns:
+            Tuple of (platform, video_id or short-link code) or None if unsupported
+        """
+        parsed = cls._parse(url)
+        return parsed[:2] if parsed else None
+    
+    @classmethod
+    def canonicalize(cls, url: str) -> Optional[Tuple[str, str]]:
+        """
+        Reduce any supported URL form to its canonical identity.
+        
+        Args:
+            url: The URL to canonicalize
+            
+        Returns:
+            Tuple of (platform, video_id), or None if the URL is unsupported
+            or is a short link (resolve it with ShortLinkResolver first)
+        """
+        parsed = cls._parse(url)
+        if not parsed or parsed[2]:
+            return None
+        return parsed[:2]
+    
+    @classmethod
+    def is_short_link(cls, url: str) -> bool:
+        """
+        Check if a URL is a short link whose video ID is only known after a redirect.
+        
+        Args:
+            url: The URL to check
+            
+        Returns:
+            True for short links, False otherwise
+        """
+        parsed = cls._parse(url)
+        return bool(parsed and parsed[2])
+    
+    @classmethod
+    def strip_tracking(cls, url: str) -> str:
+        """
+        Remove sharing and tracking query parameters from a URL.
+        
+        Args:
+            url: The URL to clean
+            
+        Returns:
+            URL without tracking parameters
+        """
+        parts = urlsplit(url)
+        if not parts.query:
+            return url
+        
+        query = [
+            (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+            if name.lower() not in cls.TRACKING_PARAMS and not name.lower().startswith(cls.TRACKING_PREFIXES)
+        ]
+        return urlunsplit(parts._replace(query=urlencode(query)))
+    
     @classmethod
     def identify_platform(cls, url: str) -> str:
         """
@@ -89,10 +233,24 @@ class URLHandler:
         Returns:
             Platform name or empty string if unsupported
         """
-        for platform, patterns in cls.SUPPORTED_PLATFORMS.items():
-            for pattern in patterns:
-                if re.match(pattern, url, re.IGNORECASE):
-                    return platform
+        classified = cls.classify(url)
+        return classified[0] if classified else ''
+    
+    @classmethod
+    def extract_video_id(cls, url: str, platform: str) -> str:
+        """
+        Extract the video ID from a URL without any network access.
+        
+        Args:
+            url: The URL to parse
+            platform: Platform name returned by identify_platform
+            
+        Returns:
+            Video ID (or short-link code) or empty string if not found
+        """
+        classified = cls.classify(url)
+        if classified and classified[0] == platform:
+            return classified[1]
         return ''
     
     @classmethod
@@ -106,4 +264,145 @@ class URLHandler:
         Returns:
             True if supported, False otherwise
         """
-        return bool(cls.identify_platform(url))
+        return bool(cls.classify(url))
+    
+    @classmethod
+    def _parse(cls, url: str) -> Optional[Tuple[str, str, bool]]:
+        """Match a URL against its host's patterns: (platform, id, short_link)."""
+        parts = cls._SPLIT_RE.match(url)
+        if not parts:
+            return None
+        
+        host = parts.group('host').lower()
+        if host.startswith('www.'):
+            host = host[4:]
+        
+        platform = cls.PLATFORM_HOSTS.get(host)
+        if not platform:
+            return None
+        
+        path = parts.group('path')
+        for pattern in cls._COMPILED_PATHS[cls.HOST_ALIASES.get(host, host)]:
+            match = pattern.match(path)
+            if match:
+                short = match.groupdict().get('short')
+                if short:
+                    return platform, short, True
+                return platform, match.group('id'), False
+        return None
+
+
+class ShortLinkResolver:
+    """Resolves short links to their target URL through a cached redirect lookup."""
+    
+    DEFAULT_TTL = 24 * 60 * 60
+    DEFAULT_MAX_SIZE = 10000
+    
+    def __init__(
+        self,
+        ttl: float = DEFAULT_TTL,
+        max_size: int = DEFAULT_MAX_SIZE,
+        timeout: float = 10.0,
+        client: Optional[httpx.AsyncClient] = None,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        """
+        Initialize the resolver.
+        
+        Args:
+            ttl: Seconds a resolved redirect stays cached
+            max_size: Maximum number of cached redirects; the oldest is dropped first
+            timeout: Network timeout in seconds for each lookup
+            client: HTTP client to use (one is created when omitted)
+            clock: Time source (injectable for tests)
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._client = client or httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            follow_redirects=True,
+            headers={'User-Agent': 'Mozilla/5.0'}
+        )
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    async def resolve(self, url: str) -> Optional[str]:
+        """
+        Follow a short link's redirects to the URL it points at.
+        
+        Args:
+            url: Short link
+        
+        Returns:
+            Target URL, or None if the lookup failed
+        """
+        key = URLHandler.strip_tracking(url)
+        item = self._cache.get(key)
+        if item is not None:
+            if item[0] > self.clock():
+                self._cache.move_to_end(key)
+                return item[1]
+            del self._cache[key]
+        
+        try:
+            response = await self._client.head(key)
+            if response.status_code >= 400:
+                # Some servers refuse HEAD; the redirect chain is the same for GET
+                async with self._client.stream('GET', key) as response:
+                    pass
+        except httpx.HTTPError:
+            return None
+        
+        target = str(response.url)
+        if target == key:
+            return None
+        
+        self._cache[key] = (self.clock() + self.ttl, target)
+        while len(self._cache) > self.max_size:
+            self._cache.popitem(last=False)
+        return target
+    
+    async def resolve_all(self, urls: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        """
+        Resolve the short links among extracted URLs and drop duplicate videos.
+        
+        Short links that cannot be resolved are kept as they are so the
+        downloader can still try them.
+        
+        Args:
+            urls: Result of URLHandler.extract_urls
+        
+        Returns:
+            URLs with short links replaced by their canonical target
+        """
+        targets = await asyncio.gather(*(
+            self.resolve(url_info['url']) if url_info.get('short_link') else self._none()
+            for url_info in urls
+        ))
+        
+        resolved = []
+        seen = set()
+        for url_info, target in zip(urls, targets):
+            canonical = URLHandler.canonicalize(target) if target else None
+            if canonical and canonical[0] == url_info['platform']:
+                url_info = dict(
+                    url_info,
+                    url=URLHandler.strip_tracking(target),
+                    video_id=canonical[1],
+                    short_link=False
+                )
+            
+            if (url_info['platform'], url_info['video_id']) in seen:
+                continue
+            seen.add((url_info['platform'], url_info['video_id']))
+            resolved.append(url_info)
+        return resolved
+    
+    async def close(self) -> None:
+        """Close the HTTP client."""
+        await self._client.aclose()
+    
+    @staticmethod
+    async def _none() -> None:
+        """Placeholder result for URLs that need no lookup."""
+        return None
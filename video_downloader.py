@@ -4,21 +4,70 @@ Downloads videos from supported platforms using yt-dlp.
 """
 
 import os
+import time
+import asyncio
+import logging
 import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 import yt_dlp
 
+from disk_quota import DiskQuota
+from download_cache import DownloadCache
+from download_engine import DownloadEngine
+from format_selector import FormatSelector
+from platform_health import UNAVAILABLE, UNKNOWN, PlatformHealth, RetryPolicy, classify_error
+from rate_limiter import format_wait
+from single_flight import SingleFlight
+from state_store import StateStore
+from url_handler import URLHandler
+from ydl_pool import YoutubeDLPool
+
+logger = logging.getLogger(__name__)
 
 class VideoDownloader:
     """Handles video downloading from various platforms."""
     
-    def __init__(self, download_dir: Optional[str] = None):
+    DEFAULT_MAX_WORKERS = 4
+    
+    def __init__(
+        self,
+        download_dir: Optional[str] = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        platform_limits: Optional[Dict[str, int]] = None,
+        cache_max_bytes: int = DownloadCache.DEFAULT_MAX_BYTES,
+        cache_ttl: float = DownloadCache.DEFAULT_TTL,
+        cache_watermarks: Tuple[float, float] = (
+            DiskQuota.DEFAULT_HIGH_WATERMARK, DiskQuota.DEFAULT_LOW_WATERMARK
+        ),
+        format_selector: Optional[FormatSelector] = None,
+        state: Optional[StateStore] = None,
+        engine: Optional[DownloadEngine] = None,
+        health: Optional[PlatformHealth] = None,
+        retry: Optional[RetryPolicy] = None
+    ):
         """
         Initialize the video downloader.
         
         Args:
             download_dir: Directory to save downloaded videos (defaults to temp)
+            max_workers: Number of worker threads running downloads
+            platform_limits: Maximum concurrent downloads per platform
+                (platforms not listed are only bounded by max_workers)
+            cache_max_bytes: Disk budget for cached downloads
+            cache_ttl: Seconds a cached download is kept after its last use
+            cache_watermarks: (high, low) fractions of cache_max_bytes; eviction
+                starts above high and frees space down to low
+            format_selector: Size-aware format policy used by fetch_metadata
+                (None keeps yt-dlp's own format choice)
+            state: Store persisting the download cache index across restarts
+            engine: Download engine tuning (fragments, chunking, retries),
+                optionally per platform (None uses DownloadEngine's defaults)
+            health: Per-platform error tracking and circuit breakers for
+                lookups and downloads (None uses PlatformHealth's defaults)
+            retry: Retries of transient errors (None uses RetryPolicy's defaults)
         """
         if download_dir:
             self.download_dir = Path(download_dir)
@@ -26,31 +75,74 @@ class VideoDownloader:
         else:
             self.download_dir = Path(tempfile.gettempdir()) / 'telegram_bot_downloads'
             self.download_dir.mkdir(parents=True, exist_ok=True)
+        
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        
+        self.max_workers = max_workers
+        self.platform_limits = dict(platform_limits or {})
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix='download'
+        )
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._inflight = SingleFlight()
+        self.health = health or PlatformHealth()
+        self.retry = retry or RetryPolicy()
+        self.cache = DownloadCache(
+            str(self.download_dir),
+            max_bytes=cache_max_bytes,
+            ttl=cache_ttl,
+            state=state,
+            high_watermark=cache_watermarks[0],
+            low_watermark=cache_watermarks[1]
+        )
+        self.format_selector = format_selector
+        self.format_profile = format_selector.profile if format_selector else 'default'
+        
+        # NOTE: Only pass 'format' when fetch_metadata picked one from the
+        # formats actually offered; a fixed selector string risks
+        # "Requested format is not available" errors. The pool applies the
+        # format per call, so metadata lookups and downloads share instances.
+        self.engine = engine or DownloadEngine()
+        self.ydl_pool = YoutubeDLPool(
+            {
+                'outtmpl': str(self.download_dir / '%(id)s.%(ext)s'),
+                'quiet': True,
+                'no_warnings': True,
+            },
+            platform_params=self.engine.params
+        )
     
-    def download_video(self, url: str, platform: str) -> Dict:
+    def download_video(
+        self,
+        url: str,
+        platform: str,
+        format_id: Optional[str] = None,
+        progress_hook: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
         """
         Download video from the given URL.
         
         Args:
             url: Video URL
             platform: Platform name (youtube, facebook, twitter, instagram, tiktok)
+            format_id: yt-dlp format chosen by fetch_metadata (None lets yt-dlp choose)
+            progress_hook: Receives yt-dlp progress updates (called on the worker thread)
             
         Returns:
-            Dictionary with 'success' (bool), 'file_path' (str), 'error' (str) keys
+            Dictionary with 'success' (bool), 'file_path' (str), 'error' (str) keys.
+            Successful results also carry 'cache_key' and 'cached' (bool); the
+            caller owns a reference on the file and must call cleanup_file.
+            Failures carry 'error_kind' (transient, permanent or unknown).
         """
+        cached = self._get_cached(url, platform)
+        if cached:
+            return cached
+        
         try:
-            # Configure yt-dlp options
-            # NOTE: NOT specifying 'format' to let yt-dlp auto-select the best available
-            # This avoids "Requested format is not available" errors
-            ydl_opts = {
-                'outtmpl': str(self.download_dir / '%(id)s.%(ext)s'),
-                'quiet': True,
-                'no_warnings': True,
-                'extract_flat': False,
-            }
-            
-            # Download the video
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Download the video with this worker's long-lived yt-dlp instance
+            with self.ydl_pool.session(platform, format_id, progress_hook) as ydl:
                 info = ydl.extract_info(url, download=True)
                 filename = ydl.prepare_filename(info)
                 
@@ -59,37 +151,349 @@ class VideoDownloader:
                     return {
                         'success': False,
                         'file_path': None,
-                        'error': 'Download completed but file not found'
+                        'error': 'Download completed but file not found',
+                        'error_kind': UNKNOWN
                     }
                 
-                return {
-                    'success': True,
-                    'file_path': filename,
-                    'error': None,
-                    'title': info.get('title', 'video'),
-                    'duration': info.get('duration', 0)
-                }
+                # Store under the extractor's canonical ID, reachable from the URL's ID too
+                key = DownloadCache.make_key(
+                    info.get('extractor_key') or platform,
+                    str(info.get('id', filename)),
+                    self.format_profile
+                )
+                url_key = self._url_cache_key(url, platform)
+                entry = self.cache.put(
+                    key,
+                    filename,
+                    metadata={
+                        'title': info.get('title', 'video'),
+                        'duration': info.get('duration', 0),
+                        'extractor': info.get('extractor_key', platform),
+                        'video_id': info.get('id'),
+                    },
+                    aliases=[url_key] if url_key else None
+                )
+                return self._result_from_entry(entry, cached=False)
         
         except yt_dlp.utils.DownloadError as e:
             return {
                 'success': False,
                 'file_path': None,
-                'error': f'Download failed: {str(e)}'
+                'error': f'Download failed: {str(e)}',
+                'error_kind': classify_error(str(e))
             }
         except Exception as e:
             return {
                 'success': False,
                 'file_path': None,
-                'error': f'Unexpected error: {str(e)}'
+                'error': f'Unexpected error: {str(e)}',
+                'error_kind': classify_error(str(e))
             }
     
+    async def download_video_async(
+        self,
+        url: str,
+        platform: str,
+        format_id: Optional[str] = None,
+        progress_hook: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """
+        Download a video in the worker pool without blocking the event loop.
+        
+        Waits for a free slot in the platform's concurrency limit, then runs
+        download_video on a worker thread. Concurrent requests for the same
+        video share a single download; each caller gets its own reference on
+        the resulting file. Transient errors are retried with backoff, and
+        while the platform's circuit is open the call fails at once.
+        
+        Args:
+            url: Video URL
+            platform: Platform name (youtube, facebook, twitter, instagram, tiktok)
+            format_id: yt-dlp format chosen by fetch_metadata
+            progress_hook: Receives yt-dlp progress updates; only the caller
+                that starts a shared download gets them
+            
+        Returns:
+            Same dictionary as download_video
+        """
+        # Cache hits return immediately without waiting for a worker
+        cached = self._get_cached(url, platform)
+        if cached:
+            return cached
+        
+        key = self._url_cache_key(url, platform) or url
+        result, shared = await self._inflight.do(
+            key, lambda: self._run_with_retries(
+                partial(self.download_video, format_id=format_id, progress_hook=progress_hook), url, platform
+            )
+        )
+        if not shared:
+            return result
+        
+        # Joined someone else's download: take our own reference on the file
+        result = dict(result)
+        if result['success'] and result.get('cache_key'):
+            entry = self.cache.acquire(result['cache_key'])
+            if entry is not None:
+                result = self._result_from_entry(entry, cached=True)
+        return result
+    
+    def fetch_metadata(self, url: str, platform: str) -> Dict:
+        """
+        Resolve video metadata without downloading the media.
+        
+        Args:
+            url: Video URL
+            platform: Platform name (youtube, facebook, twitter, instagram, tiktok)
+            
+        Returns:
+            Dictionary with 'success' (bool), 'error' (str), 'title', 'duration',
+            'filesize' (estimated bytes or None), 'direct_urls' (media URLs),
+            'format_id' (format to download), 'fits_upload' (False when no
+            format fits the upload limit), 'stream' (single-stream source
+            usable for streaming upload, or None), 'cache_key' and 'cached'
+            (answered from the download cache) keys; failures carry
+            'error_kind' instead
+        """
+        # Already downloaded: answer from the cache without network access
+        url_key = self._url_cache_key(url, platform)
+        entry = self.cache.get(url_key) if url_key else None
+        if entry is not None:
+            return {
+                'success': True,
+                'error': None,
+                'title': entry.get('title', 'video'),
+                'duration': entry.get('duration', 0),
+                'filesize': entry['size'],
+                'direct_urls': [],
+                'format_id': None,
+                'fits_upload': self._fits_upload(entry['size']),
+                'stream': None,
+                'cache_key': entry['key'],
+                'cached': True
+            }
+        
+        try:
+            with self.ydl_pool.session(platform) as ydl:
+                info = ydl.extract_info(url, download=False)
+            
+            if self.format_selector:
+                choice = self.format_selector.select(info)
+            else:
+                # Merged formats are fetched as separate video and audio streams
+                formats = info.get('requested_formats') or [info]
+                sizes = [f.get('filesize') or f.get('filesize_approx') for f in formats]
+                choice = {
+                    'format_id': None,
+                    'filesize': sum(sizes) if all(sizes) else None,
+                    'urls': [f['url'] for f in formats if f.get('url')],
+                    'formats': formats,
+                    'fits': True,
+                }
+            
+            return {
+                'success': True,
+                'error': None,
+                'title': info.get('title', 'video'),
+                'duration': info.get('duration', 0),
+                'filesize': choice['filesize'],
+                'direct_urls': choice['urls'],
+                'format_id': choice['format_id'],
+                'fits_upload': choice['fits'],
+                # Telegram would refuse an oversized stream after the transfer
+                'stream': self._stream_info(choice['formats']) if choice['fits'] else None,
+                'cache_key': DownloadCache.make_key(
+                    info.get('extractor_key') or platform,
+                    str(info.get('id')),
+                    self.format_profile
+                ),
+                'cached': False
+            }
+        
+        except yt_dlp.utils.DownloadError as e:
+            return {
+                'success': False,
+                'error': f'Could not fetch video info: {str(e)}',
+                'error_kind': classify_error(str(e))
+            }
+        except Exception as e:
+            return {
+                'success': False,
+                'error': f'Unexpected error: {str(e)}',
+                'error_kind': classify_error(str(e))
+            }
+    
+    async def fetch_metadata_async(self, url: str, platform: str) -> Dict:
+        """
+        Resolve video metadata in the worker pool.
+        
+        Concurrent lookups of the same video share one extraction. Videos in
+        the download cache are answered even while the platform's circuit
+        is open.
+        
+        Args:
+            url: Video URL
+            platform: Platform name (youtube, facebook, twitter, instagram, tiktok)
+            
+        Returns:
+            Same dictionary as fetch_metadata
+        """
+        url_key = self._url_cache_key(url, platform)
+        if url_key and self.cache.get(url_key) is not None:
+            return self.fetch_metadata(url, platform)
+        
+        key = 'metadata:' + (url_key or url)
+        result, _ = await self._inflight.do(
+            key, lambda: self._run_with_retries(self.fetch_metadata, url, platform)
+        )
+        return dict(result)
+    
+    async def _run_with_retries(self, func: Callable[[str, str], Dict], url: str, platform: str) -> Dict:
+        """
+        Run a yt-dlp call through the platform's circuit breaker, retrying transient errors.
+        
+        Returns:
+            The call's result, or a failure with error_kind 'unavailable'
+            when the platform's circuit is open
+        """
+        attempt = 0
+        while True:
+            if not self.health.allow(platform):
+                wait = format_wait(self.health.retry_after(platform))
+                return {
+                    'success': False,
+                    'file_path': None,
+                    'error': f'Platform unavailable: {platform} is failing right now, try again in {wait}',
+                    'error_kind': UNAVAILABLE
+                }
+            
+            result = await self._run_in_pool(func, url, platform)
+            kind = None if result['success'] else result.get('error_kind', UNKNOWN)
+            self.health.record(platform, kind, result.get('error'))
+            if not self.retry.should_retry(kind, attempt):
+                return result
+            
+            # Sleep outside the platform slot so other downloads can use it
+            delay = self.retry.delay(attempt)
+            attempt += 1
+            logger.info(f"Retrying {url} in {delay:.1f}s ({attempt}/{self.retry.retries}): {result['error']}")
+            await asyncio.sleep(delay)
+    
+    async def _run_in_pool(self, func: Callable[[str, str], Dict], url: str, platform: str) -> Dict:
+        """Run a blocking yt-dlp call on a worker thread within the platform limit."""
+        async with self._get_semaphore(platform):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, func, url, platform)
+    
+    def _url_cache_key(self, url: str, platform: str) -> Optional[str]:
+        """Build the cache key for a URL from its canonical (platform, video ID)."""
+        canonical = URLHandler.canonicalize(url)
+        if not canonical or canonical[0] != platform:
+            return None
+        return DownloadCache.make_key(platform, canonical[1], self.format_profile)
+    
+    @staticmethod
+    def _stream_info(formats: List[Dict]) -> Optional[Dict]:
+        """Describe a single-stream format for the streaming upload path."""
+        if len(formats) != 1 or not formats[0].get('url'):
+            return None
+        fmt = formats[0]
+        return {
+            'url': fmt['url'],
+            'http_headers': fmt.get('http_headers') or {},
+            'ext': fmt.get('ext'),
+            'protocol': fmt.get('protocol', 'https'),
+            'format_id': fmt.get('format_id'),
+        }
+    
+    def _fits_upload(self, size: Optional[int]) -> bool:
+        """Check a size against the format policy's upload budget."""
+        if not self.format_selector or size is None:
+            return True
+        return size <= self.format_selector.max_bytes
+    
+    def _get_cached(self, url: str, platform: str) -> Optional[Dict]:
+        """Return a download result from the cache, skipping network extraction."""
+        key = self._url_cache_key(url, platform)
+        if not key:
+            return None
+        entry = self.cache.acquire(key)
+        if entry is None:
+            return None
+        return self._result_from_entry(entry, cached=True)
+    
+    @staticmethod
+    def _result_from_entry(entry: Dict, cached: bool) -> Dict:
+        """Convert a cache entry into a download result."""
+        return {
+            'success': True,
+            'file_path': entry['file_path'],
+            'error': None,
+            'title': entry.get('title', 'video'),
+            'duration': entry.get('duration', 0),
+            'cache_key': entry['key'],
+            'cached': cached
+        }
+    
+    def _get_semaphore(self, platform: str) -> asyncio.Semaphore:
+        """Return the semaphore limiting concurrent downloads for a platform."""
+        semaphore = self._semaphores.get(platform)
+        if semaphore is None:
+            limit = self.platform_limits.get(platform, self.max_workers)
+            semaphore = asyncio.Semaphore(max(1, min(limit, self.max_workers)))
+            self._semaphores[platform] = semaphore
+        return semaphore
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the download worker pool.
+        
+        Args:
+            wait: Block until running downloads have finished
+        """
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+        self.ydl_pool.close()
+    
+    def remove_orphaned_files(self, min_age: float) -> List[str]:
+        """
+        Delete files in download_dir that the cache does not track.
+        
+        Index files and files modified within min_age seconds (for example
+        partial files of downloads still running) are left alone.
+        
+        Args:
+            min_age: Minimum age in seconds of a file before it is removed
+            
+        Returns:
+            Paths of the removed files
+        """
+        removed = []
+        cutoff = time.time() - min_age
+        for path in self.download_dir.iterdir():
+            if path.name.startswith('.') or not path.is_file():
+                continue
+            try:
+                if path.stat().st_mtime > cutoff or self.cache.contains_path(str(path)):
+                    continue
+                path.unlink()
+                removed.append(str(path))
+            except OSError:
+                pass  # Vanished or locked; retried on the next sweep
+        return removed
+    
     def cleanup_file(self, file_path: str) -> None:
         """
-        Delete a downloaded file.
+        Release a downloaded file.
+        
+        Cached files are reference counted and only deleted by cache eviction;
+        files unknown to the cache are deleted immediately.
         
         Args:
-            file_path: Path to the file to delete
+            file_path: Path to the file to release
         """
+        if self.cache.release(file_path):
+            return
+        
         try:
             if os.path.exists(file_path):
                 os.remove(file_path)
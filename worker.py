@@ -0,0 +1,134 @@
+"""
+Download Worker
+Runs queued message and button-press tasks taken from the shared job queue,
+so downloads and uploads can be spread over several processes or machines.
+
+Usage:
+    QUEUE_BACKEND=sqlite QUEUE_DB=/shared/queue.sqlite3 python worker.py
+"""
+
+import signal
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class TaskWorker:
+    """Takes tasks from a queue and runs their handlers with bounded concurrency."""
+    
+    def __init__(
+        self,
+        tasks,
+        handlers: Dict[str, Callable[[Dict], Awaitable[None]]],
+        concurrency: int = 4,
+        poll_timeout: float = 1.0
+    ):
+        """
+        Initialize the worker.
+        
+        Args:
+            tasks: Task queue (InProcessTaskQueue or SQLiteTaskQueue)
+            handlers: Coroutine function per task kind, called with the task payload
+            concurrency: Maximum number of tasks running at the same time
+            poll_timeout: Seconds to wait for a task before checking for stop
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        
+        self.tasks = tasks
+        self.handlers = handlers
+        self.concurrency = concurrency
+        self.poll_timeout = poll_timeout
+        self._stopped = False
+    
+    def stop(self) -> None:
+        """Stop taking new tasks; run returns once the running ones finish."""
+        self._stopped = True
+    
+    async def run(self) -> None:
+        """Process tasks until stop is called."""
+        semaphore = asyncio.Semaphore(self.concurrency)
+        running = set()
+        
+        while not self._stopped:
+            await semaphore.acquire()
+            task = None
+            try:
+                if not self._stopped:
+                    task = await self.tasks.get(timeout=self.poll_timeout)
+            finally:
+                if task is None:
+                    semaphore.release()
+            if task is None:
+                continue
+            
+            job = asyncio.create_task(self._run_task(task, semaphore))
+            running.add(job)
+            job.add_done_callback(running.discard)
+        
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+    
+    async def _run_task(self, task: Dict, semaphore: asyncio.Semaphore) -> None:
+        """Run one task and report the outcome to the queue."""
+        try:
+            handler = self.handlers.get(task['kind'])
+            if handler is None:
+                raise ValueError(f"Unknown task kind: {task['kind']}")
+            await handler(task['payload'])
+        except Exception as e:
+            retried = await self.tasks.fail(task['id'], str(e))
+            logger.warning(
+                f"Task {task['id']} ({task['kind']}) failed on attempt {task['attempts']}: {e}"
+                + (" - will retry" if retried else "")
+            )
+        else:
+            await self.tasks.complete(task['id'])
+        finally:
+            semaphore.release()
+
+
+async def run_worker() -> None:
+    """Run a standalone worker process until SIGINT or SIGTERM."""
+    from bot import TelegramBot
+    
+    service = TelegramBot()
+    if service.queue_backend == 'memory':
+        raise ValueError("worker.py needs a shared queue; set QUEUE_BACKEND=sqlite")
+    
+    async with service.make_bot() as bot:
+        worker = TaskWorker(
+            service.tasks,
+            service.task_handlers(bot),
+            concurrency=max(1, service.queue_workers)
+        )
+        
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, worker.stop)
+        
+        async def sweep_forever():
+            while True:
+                await asyncio.sleep(service.sweep_interval)
+                await service.sweep_pending(None)
+        
+        await service.start_metrics()
+        sweeper = asyncio.create_task(sweep_forever())
+        logger.info(f"Worker started with {worker.concurrency} concurrent tasks")
+        try:
+            await worker.run()
+        finally:
+            sweeper.cancel()
+            await service.close()
+            logger.info("Worker stopped")
+
+
+def main():
+    """Main entry point."""
+    asyncio.run(run_worker())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+"""
+YoutubeDL Pool Module
+Long-lived yt-dlp instances, one per worker thread and platform. Reusing an
+instance skips extractor setup, cookie loading and request-handler creation
+on every call and keeps the handler's open connections; all instances share
+one cookie jar.
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import yt_dlp
+
+
+class YoutubeDLPool:
+    """Hands out a reusable YoutubeDL per (thread, platform)."""
+    
+    DEFAULT_MAX_USES = 1000
+    
+    def __init__(
+        self,
+        params: Dict[str, Any],
+        max_uses: int = DEFAULT_MAX_USES,
+        platform_params: Optional[Callable[[str], Dict[str, Any]]] = None
+    ):
+        """
+        Initialize the pool; instances are created on first use.
+        
+        Args:
+            params: YoutubeDL options shared by all instances (the format is
+                chosen per call)
+            max_uses: Calls after which an instance is replaced, bounding the
+                state yt-dlp accumulates per instance
+            platform_params: Returns extra options for a platform's
+                instances, such as download engine tuning
+        """
+        self.params = dict(params)
+        self.max_uses = max_uses
+        self.platform_params = platform_params
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._instances: List[Any] = []
+        self._cookiejar = None
+        self.created = 0
+    
+    @contextmanager
+    def session(
+        self,
+        platform: str,
+        format_id: Optional[str] = None,
+        progress_hook: Optional[Callable[[Dict], None]] = None
+    ) -> Iterator[Any]:
+        """
+        Borrow this thread's instance for a platform.
+        
+        Instances are never shared between threads, since YoutubeDL is not
+        thread-safe. An instance that raised anything other than a
+        DownloadError is discarded rather than reused.
+        
+        Args:
+            platform: Platform name; each platform gets its own instance
+            format_id: yt-dlp format for this call (None selects yt-dlp's default)
+            progress_hook: Receives yt-dlp's progress updates during this call
+        
+        Yields:
+            YoutubeDL instance
+        """
+        instances = self._thread_instances()
+        entry = instances.get(platform)
+        if entry is None or entry['uses'] >= self.max_uses:
+            if entry is not None:
+                self._discard(entry['ydl'])
+            entry = {'ydl': self._create(platform), 'uses': 0}
+            instances[platform] = entry
+        entry['uses'] += 1
+        
+        ydl = entry['ydl']
+        self._select_format(ydl, format_id)
+        self._local.progress_hook = progress_hook
+        try:
+            yield ydl
+        except yt_dlp.utils.DownloadError:
+            raise
+        except Exception:
+            instances.pop(platform, None)
+            self._discard(ydl)
+            raise
+        finally:
+            self._local.progress_hook = None
+    
+    def close(self) -> None:
+        """Close every instance, saving cookies and releasing connections."""
+        with self._lock:
+            instances, self._instances = self._instances, []
+        for ydl in instances:
+            try:
+                ydl.close()
+            except Exception:
+                pass  # Best effort at shutdown
+        self._local = threading.local()
+    
+    def _thread_instances(self) -> Dict[str, Dict]:
+        """Instances owned by the calling thread, keyed by platform."""
+        instances = getattr(self._local, 'instances', None)
+        if instances is None:
+            instances = self._local.instances = {}
+        return instances
+    
+    def _create(self, platform: str) -> Any:
+        """Create an instance for a platform sharing the pool's cookie jar."""
+        # Looked up on every creation so the class can be swapped out (tests)
+        params = dict(self.params)
+        if self.platform_params:
+            params.update(self.platform_params(platform))
+        # Hooks are fixed at creation; this one forwards to the current call's hook
+        params['progress_hooks'] = [self._dispatch_progress]
+        ydl = yt_dlp.YoutubeDL(params)
+        with self._lock:
+            if self._cookiejar is None:
+                # The first instance loads the cookie file; the rest share its jar
+                self._cookiejar = ydl.cookiejar
+            else:
+                ydl.cookiejar = self._cookiejar
+            self._instances.append(ydl)
+            self.created += 1
+        return ydl
+    
+    def _discard(self, ydl: Any) -> None:
+        """Close an instance that is no longer handed out."""
+        with self._lock:
+            if ydl in self._instances:
+                self._instances.remove(ydl)
+        try:
+            ydl.close()
+        except Exception:
+            pass
+    
+    def _dispatch_progress(self, status: Dict) -> None:
+        """Forward a progress update to the hook of the call running on this thread."""
+        hook = getattr(self._local, 'progress_hook', None)
+        if hook is not None:
+            hook(status)
+    
+    @staticmethod
+    def _select_format(ydl: Any, format_id: Optional[str]) -> None:
+        """Apply a per-call format to a long-lived instance."""
+        ydl.params['format'] = format_id
+        ydl.format_selector = ydl.build_format_selector(format_id) if format_id else None